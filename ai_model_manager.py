@@ -1,17 +1,14 @@
 import os
 import asyncio
-import requests
+import importlib
 import io
-import soundfile as sf
-from huggingface_hub import InferenceClient, login as hf_login
-from transformers import pipeline
 from config_loader import get_config
 from error_utils import retry_on_exception
 import logging
-from asset_manager import AssetManager
 from dotenv import load_dotenv
 
 from backend.ai_models.loader import resolve_model_path, ModelNotReady # New import
+from backend.ai_models.inference_scheduler import InferenceScheduler
 
 # Use standard logging to avoid circular import with logging_setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -36,7 +33,41 @@ _local_llm_pipeline = None
 _local_image_pipeline = None
 _local_tts_pipeline = None
 _local_stt_pipeline = None
-asset_manager = AssetManager()
+_inference_schedulers = {}
+
+# Heavy backends are imported on first use so importing this module (and everything that imports it)
+# stays cheap. They remain module attributes, e.g. `patch("ai_model_manager.InferenceClient")` still works.
+_LAZY_IMPORTS = {
+    "InferenceClient": ("huggingface_hub", "InferenceClient"),
+    "hf_login": ("huggingface_hub", "login"),
+    "pipeline": ("transformers", "pipeline"),
+    "sf": ("soundfile", None),
+    "remove_watermark": ("services.watermark_remover", "remove_watermark"),
+}
+
+def __getattr__(name):
+    if name == "asset_manager":
+        from asset_manager import AssetManager
+        value = AssetManager()
+    elif name in _LAZY_IMPORTS:
+        module_name, attr = _LAZY_IMPORTS[name]
+        value = importlib.import_module(module_name)
+        if attr:
+            value = getattr(value, attr)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+async def close_asset_manager():
+    """Closes the shared AssetManager's download session, if the manager was ever created."""
+    manager = globals().get("asset_manager")
+    if manager is not None:
+        await manager.close()
+
+def _lazy(name):
+    """Returns a lazily imported backend, honouring anything already bound (or patched) on the module."""
+    return globals()[name] if name in globals() else __getattr__(name)
 
 def init_hf_client():
     """
@@ -55,11 +86,11 @@ def init_hf_client():
             else:
                 try:
                     if HF_TOKEN:
-                        _hf_client = InferenceClient(token=HF_TOKEN)
+                        _hf_client = _lazy("InferenceClient")(token=HF_TOKEN)
                         logger.info("✅ Hugging Face client initialized with explicit token.")
                     else:
                         # Rely on cached login or provider defaults
-                        _hf_client = InferenceClient()
+                        _hf_client = _lazy("InferenceClient")()
                         logger.info("ℹ️ Hugging Face client initialized without explicit token (cache/env may apply).")
                 except Exception as e:
                     logger.warning(f"HF client setup failed: {e}. Proceeding without HF client.")
@@ -93,7 +124,7 @@ async def _load_local_llm_model():
         logger.info(f"Attempting to load local LLM pipeline from: {model_path}")
         try:
             def do_load():
-                return pipeline("text-generation", model=str(model_path), device_map="auto")
+                return _lazy("pipeline")("text-generation", model=str(model_path), device_map="auto")
             
             loop = asyncio.get_running_loop()
             _local_llm_pipeline = await loop.run_in_executor(None, do_load)
@@ -127,7 +158,7 @@ async def _load_local_image_model():
         logger.info(f"Attempting to load local image generation pipeline from: {model_path}")
         try:
             def do_load():
-                return pipeline("text-to-image", model=str(model_path), device_map="auto")
+                return _lazy("pipeline")("text-to-image", model=str(model_path), device_map="auto")
             
             loop = asyncio.get_running_loop()
             _local_image_pipeline = await loop.run_in_executor(None, do_load)
@@ -161,7 +192,7 @@ async def _load_local_tts_model():
         logger.info(f"Attempting to load local TTS pipeline from: {model_path}")
         try:
             def do_load():
-                return pipeline("text-to-speech", model=str(model_path), device_map="auto")
+                return _lazy("pipeline")("text-to-speech", model=str(model_path), device_map="auto")
             
             loop = asyncio.get_running_loop()
             _local_tts_pipeline = await loop.run_in_executor(None, do_load)
@@ -195,7 +226,7 @@ async def _load_local_stt_model():
         logger.info(f"Attempting to load local STT pipeline from: {model_path}")
         try:
             def do_load():
-                return pipeline("automatic-speech-recognition", model=str(model_path), device_map="auto")
+                return _lazy("pipeline")("automatic-speech-recognition", model=str(model_path), device_map="auto")
             
             loop = asyncio.get_running_loop()
             _local_stt_pipeline = await loop.run_in_executor(None, do_load)
@@ -205,7 +236,35 @@ async def _load_local_stt_model():
             _local_stt_pipeline = None
     return _local_stt_pipeline is not None
 
-from security.encryption_utils import encrypt_data, decrypt_data
+def _run_local_batch(pipeline_global):
+    """Batch runner calling the current module-global pipeline with a list of inputs."""
+    def run(inputs, kwargs):
+        outputs = globals()[pipeline_global](inputs, **kwargs)
+        if hasattr(outputs, "images"):  # diffusers-style pipelines return one object holding every image
+            outputs = outputs.images
+        return list(outputs)
+    return run
+
+async def _local_inference(pipeline_global, item, **kwargs):
+    """
+    // [TASK]: Route local pipeline calls through a per-model micro-batching scheduler
+    // [GOAL]: Batch concurrent requests and collapse identical ones on a dedicated worker per model
+    """
+    scheduler = _inference_schedulers.get(pipeline_global)
+    if scheduler is None:
+        settings = config.inference if isinstance(config.inference, dict) else {}
+        scheduler = _inference_schedulers[pipeline_global] = InferenceScheduler(
+            pipeline_global,
+            _run_local_batch(pipeline_global),
+            max_batch_size=int(settings.get("max_batch_size") or 8),
+            max_wait_ms=float(settings.get("max_wait_ms") or 10.0),
+        )
+    return await scheduler.submit(item, **kwargs)
+
+def get_inference_stats():
+    return {name: scheduler.get_stats() for name, scheduler in _inference_schedulers.items()}
+
+from security.encryption_utils import encrypt_data, decrypt_data, encrypt_bytes, encrypt_bytes_async
 
 @retry_on_exception()
 async def generate_text(prompt, model_id=None, **kwargs):
@@ -219,12 +278,11 @@ async def generate_text(prompt, model_id=None, **kwargs):
     hf_model_id = model_id or config.models.text_generation.hf_api_id
     use_local_fallback = kwargs.pop('use_local_fallback', False)
 
-    # Encrypt prompt before sending to model
-    encrypted_prompt = encrypt_data(prompt)
-
     if client and hf_model_id and not use_local_fallback:
         logger.info(f"Generating text using HF model: {hf_model_id}")
         try:
+            # Encrypt prompt before it leaves the process
+            encrypted_prompt = encrypt_data(prompt)
             def do_hf_call():
                 return client.text_generation(encrypted_prompt, model=hf_model_id, **kwargs)
             loop = asyncio.get_running_loop()
@@ -239,12 +297,9 @@ async def generate_text(prompt, model_id=None, **kwargs):
         logger.info("Generating text using local LLM pipeline.")
         try:
             generation_params = {"max_new_tokens": 250, "num_return_sequences": 1, "truncation": True, **kwargs}
-            def do_local_call():
-                return _local_llm_pipeline(encrypted_prompt, **generation_params)
-            loop = asyncio.get_running_loop()
-            generated = await loop.run_in_executor(None, do_local_call)
-            generated_text_encrypted = generated[0]['generated_text']
-            generated_text = decrypt_data(generated_text_encrypted) # Decrypt output
+            # The local model never leaves the process: pass plaintext so identical prompts share one in-flight call
+            generated = await _local_inference("_local_llm_pipeline", prompt, **generation_params)
+            generated_text = generated[0]['generated_text']
             logger.info("✅ Successfully generated text with local LLM.")
             return generated_text
         except Exception as e:
@@ -260,8 +315,6 @@ async def generate_text(prompt, model_id=None, **kwargs):
         else:
             raise ValueError("No text generation model available (HF or local fallback path not configured).")
 
-from services.watermark_remover import remove_watermark
-
 @retry_on_exception()
 async def generate_image(prompt, model_id=None, remove_watermark_flag=False, watermark_hint="", **kwargs):
     """
@@ -286,9 +339,7 @@ async def generate_image(prompt, model_id=None, remove_watermark_flag=False, wat
             loop = asyncio.get_running_loop()
             response = await loop.run_in_executor(None, do_hf_call)
             
-            raw_img_bytes = response if isinstance(response, (bytes, bytearray)) else response.content
-            
-            img_bytes = encrypt_bytes(raw_img_bytes)
+            img_bytes = response if isinstance(response, (bytes, bytearray)) else response.content
             
         except Exception as e:
             logger.exception(f"❌ HF image generation failed: {e}")
@@ -297,24 +348,18 @@ async def generate_image(prompt, model_id=None, remove_watermark_flag=False, wat
         if await _load_local_image_model():
             logger.info("Using local image generation fallback.")
             try:
-                def do_local_call():
-                    return _local_image_pipeline(prompt, **kwargs)
-                loop = asyncio.get_running_loop()
-                result = await loop.run_in_executor(None, do_local_call)
+                result = await _local_inference("_local_image_pipeline", prompt, **kwargs)
                 
                 if isinstance(result, (bytes, bytearray)):
                     raw_img_bytes = result
-                elif hasattr(result, 'images'):
+                elif hasattr(result, 'save'):
                     buf = io.BytesIO()
-                    result.images[0].save(buf, format='PNG')
+                    result.save(buf, format='PNG')
                     raw_img_bytes = buf.getvalue()
                 else:
                     raw_img_bytes = None
                 
-                if raw_img_bytes:
-                    img_bytes = encrypt_bytes(raw_img_bytes)
-                else:
-                    img_bytes = None
+                img_bytes = raw_img_bytes or None
             except Exception as e:
                 logger.exception(f"❌ Local image generation failed: {e}")
                 img_bytes = None
@@ -322,13 +367,10 @@ async def generate_image(prompt, model_id=None, remove_watermark_flag=False, wat
             logger.warning("No local image model configured/loaded.")
             img_bytes = None
 
-    if img_bytes:
-        img_bytes = decrypt_bytes(img_bytes)
-
     if img_bytes and remove_watermark_flag:
         try:
             logger.info("Attempting to remove watermark from generated image.")
-            img_bytes = remove_watermark(img_bytes, hint_prompt=watermark_hint)
+            img_bytes = _lazy("remove_watermark")(img_bytes, hint_prompt=watermark_hint)
             logger.info("✅ Watermark removal attempted successfully.")
         except Exception as e:
             logger.warning(f"❌ Watermark removal failed: {e}", exc_info=True)
@@ -361,7 +403,7 @@ async def text_to_speech(text, model_id=None, **kwargs):
             res.raise_for_status()
             logger.info(f"✅ Successfully generated speech with HF model: {hf_model_id}")
             raw_audio_bytes = res.content
-            audio_bytes = encrypt_bytes(raw_audio_bytes)
+            audio_bytes = await encrypt_bytes_async(raw_audio_bytes)
             return audio_bytes
         except Exception as e:
             logger.warning(f"HF API call for TTS failed: {e}. Trying local fallback.")
@@ -369,19 +411,16 @@ async def text_to_speech(text, model_id=None, **kwargs):
     if await _load_local_tts_model():
         logger.info("Generating speech using local TTS pipeline.")
         try:
-            def do_local_call():
-                return _local_tts_pipeline(text, **kwargs)
-            loop = asyncio.get_running_loop()
-            result = await loop.run_in_executor(None, do_local_call)
+            result = await _local_inference("_local_tts_pipeline", text, **kwargs)
             
             audio_data = result["audio"]
             samplerate = result["sampling_rate"]
             
             wav_io = io.BytesIO()
-            sf.write(wav_io, audio_data.squeeze(), samplerate, format='WAV')
+            _lazy("sf").write(wav_io, audio_data.squeeze(), samplerate, format='WAV')
             logger.info("✅ Successfully generated speech with local pipeline.")
             raw_audio_bytes = wav_io.getvalue()
-            audio_bytes = encrypt_bytes(raw_audio_bytes)
+            audio_bytes = await encrypt_bytes_async(raw_audio_bytes)
             return audio_bytes
         except Exception as e:
             logger.exception(f"❌ Local TTS generation failed: {e}")
@@ -404,7 +443,7 @@ async def text_to_speech(text, model_id=None, **kwargs):
                 wf.writeframes(silence_frame * num_frames)
             logger.warning("No TTS model available. Returning placeholder silence audio (wave).")
             raw_audio_bytes = buf.getvalue()
-            audio_bytes = encrypt_bytes(raw_audio_bytes)
+            audio_bytes = await encrypt_bytes_async(raw_audio_bytes)
             return audio_bytes
         except Exception as e:
             logger.exception(f"Failed to generate silence fallback for TTS: {e}")
@@ -443,10 +482,7 @@ async def speech_to_text(audio_path, model_id=None, **kwargs):
     if await _load_local_stt_model():
         logger.info("Transcribing audio using local STT pipeline.")
         try:
-            def do_local_call():
-                return _local_stt_pipeline(audio_path, **kwargs)
-            loop = asyncio.get_running_loop()
-            result = await loop.run_in_executor(None, do_local_call)
+            result = await _local_inference("_local_stt_pipeline", audio_path, **kwargs)
             transcribed_text_encrypted = result["text"]
             transcribed_text = decrypt_data(transcribed_text_encrypted)
             logger.info("✅ Successfully transcribed audio with local pipeline.")
@@ -10,9 +10,9 @@ import hashlib
 from datetime import timedelta, datetime
 from typing import Optional, List, Dict, Any
 
-from fastapi import FastAPI, HTTPException, Depends, Request, status, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Request, status, UploadFile, File, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import func
 from sqlalchemy.orm import Session
@@ -28,6 +28,7 @@ from auth.auth_service import create_user, authenticate_user, create_access_toke
 from auth.tenancy import current_tenant, TenantMiddleware
 from auth.rbac import has_role, Role
 from security.audit_log_manager import audit_log_manager, AuditEventType
+from backend.services.usage_analytics import usage_analytics
 
 from pipeline_orchestrator import PipelineOrchestrator
 from billing_middleware import enforce_limits, BillingException
@@ -35,7 +36,7 @@ from landing_page_service import LandingPageService
 from scan_alert_system import ScanAlertSystem
 from crm_integration import CRMIntegrationService
 from utils.parallel_processing import ParallelProcessor
-from i18n_utils import gettext, get_locale_from_request
+from i18n_utils import gettext, get_locale_from_request, translation_catalogs
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
 from starlette_prometheus import PrometheusMiddleware, metrics
@@ -59,6 +60,10 @@ from backend.routers.custom_domain import router as custom_domain_router
 from backend.models.webhook_dlq import WebhookDLQItem
 from backend.superadmin.auth import create_superadmin_users
 from backend.mock_db import mock_db
+from backend.core.jobs import enqueue_job, get_job_status, stream_job_events
+from backend.core.job_store import job_store
+from sla_tracker import sla_rollup_engine
+from ai_model_manager import close_asset_manager
 
 from billing.plan_guard import PlanGuard, PlanGuardException
 from billing_models import get_default_plans, get_user_subscription
@@ -317,7 +322,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         payload = verify_jwt(token)
         user_id = payload.get("user_id")
         if user_id is None:
-            audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_FAILURE, "Authentication failed: User ID missing in token.", user_id=None, ip_address=request.client.host if request else None)
+            audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_FAILURE, "Authentication failed: User ID missing in token.", user_id=None, ip_address=request.client.host if request else None, request=request)
             raise HTTPException(status_code=401, detail="Invalid authentication credentials: User ID missing")
         request.state.user_id = user_id
 
@@ -337,7 +342,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
 
         return payload
     except Exception as e:
-        audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_FAILURE, f"Authentication failed for token: {token[:10]}... Error: {e}", user_id=None, ip_address=request.client.host if request else None)
+        audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_FAILURE, f"Authentication failed for token: {token[:10]}... Error: {e}", user_id=None, ip_address=request.client.host if request else None, request=request)
         raise HTTPException(status_code=401, detail=f"Invalid authentication credentials: {e}")
 
 async def get_current_active_user(current_user_payload: dict = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
@@ -402,6 +407,19 @@ async def pii_redaction_middleware(request: Request, call_next):
 
     return response
 
+@app.middleware("http")
+async def sla_outcome_middleware(request: Request, call_next):
+    start_time = time.perf_counter()
+    success = False
+    try:
+        response = await call_next(request)
+        success = response.status_code < 500
+        return response
+    finally:
+        tenant_id = getattr(request.state, "tenant_id", None)
+        if tenant_id is not None:
+            sla_rollup_engine.record(tenant_id, (time.perf_counter() - start_time) * 1000, success)
+
 # --- Event Handlers ---
 
 def rate_limit_user_id_key_func(request: Request) -> str:
@@ -427,10 +445,36 @@ async def startup():
         logger.warning(f"FastAPI-Limiter Redis not available, continuing without rate limiting: {e}")
     
     run_safety_rollback_on_boot()
+    job_store.initialize()
 
     with next(get_db()) as db_session:
         await create_superadmin_users(db_session)
 
+    app.state.sla_flush_task = asyncio.create_task(_flush_sla_rollups_periodically())
+    # Feature flag edits in config.yaml take effect without a restart
+    app.state.feature_flag_watch_task = asyncio.create_task(feature_flag_manager.watch())
+    # Edited .po catalogs are picked up the same way
+    app.state.translation_watch_task = asyncio.create_task(translation_catalogs.watch())
+
+SLA_ROLLUP_FLUSH_INTERVAL_SECONDS = 60
+
+async def _flush_sla_rollups_periodically():
+    while True:
+        await asyncio.sleep(SLA_ROLLUP_FLUSH_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(sla_rollup_engine.flush)
+        except Exception as e:
+            logger.error(f"Failed to flush SLA rollups: {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task_name in ("sla_flush_task", "feature_flag_watch_task", "translation_watch_task"):
+        task = getattr(app.state, task_name, None)
+        if task:
+            task.cancel()
+    await asyncio.to_thread(sla_rollup_engine.flush)
+    await close_asset_manager()
+
 # --- API Endpoints ---
 
 @app.get("/health")
@@ -444,16 +488,16 @@ async def register_user_endpoint(user: UserCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=403, detail="Only admins can create other admins")
     db_user = create_user(db, user.username, user.email, user.password, user.tenant_name, user.role)
     if not db_user:
-        audit_log_manager.log_event(db, AuditEventType.USER_REGISTER, f"User registration failed: Username {user.username} or email {user.email} already registered.", user_id=None, ip_address=request.client.host)
+        audit_log_manager.log_event(db, AuditEventType.USER_REGISTER, f"User registration failed: Username {user.username} or email {user.email} already registered.", user_id=None, ip_address=request.client.host, request=request)
         raise HTTPException(status_code=400, detail=gettext("username_or_email_registered", locale=locale))
-    audit_log_manager.log_event(db, AuditEventType.USER_REGISTER, f"User registered: {user.username} (Tenant: {user.tenant_name})", user_id=db_user.id, tenant_id=db_user.tenant_id, ip_address=request.client.host)
+    audit_log_manager.log_event(db, AuditEventType.USER_REGISTER, f"User registered: {user.username} (Tenant: {user.tenant_name})", user_id=db_user.id, tenant_id=db_user.tenant_id, ip_address=request.client.host, request=request)
     return db_user
 
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db), request: Request = None):
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
-        audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_FAILURE, f"Login failed: Invalid credentials for username {form_data.username}.", user_id=None, ip_address=request.client.host)
+        audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_FAILURE, f"Login failed: Invalid credentials for username {form_data.username}.", user_id=None, ip_address=request.client.host, request=request)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -464,12 +508,12 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         data={"user_id": user.id, "username": user.username, "tenant_id": user.tenant_id},
         expires_delta=access_token_expires
     )
-    audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_SUCCESS, f"User logged in: {user.username} (Tenant: {user.tenant.name})", user_id=user.id, tenant_id=user.tenant_id, ip_address=request.client.host)
+    audit_log_manager.log_event(db, AuditEventType.USER_LOGIN_SUCCESS, f"User logged in: {user.username} (Tenant: {user.tenant.name})", user_id=user.id, tenant_id=user.tenant_id, ip_address=request.client.host, request=request)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/users/me", response_model=UserProfile)
 async def read_users_me(current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db), request: Request = None):
-    audit_log_manager.log_event(db, AuditEventType.USER_PROFILE_VIEW, f"User profile viewed for user: {current_user.username}", user_id=current_user.id, tenant_id=current_user.tenant_id, ip_address=request.client.host)
+    audit_log_manager.log_event(db, AuditEventType.USER_PROFILE_VIEW, f"User profile viewed for user: {current_user.username}", user_id=current_user.id, tenant_id=current_user.tenant_id, ip_address=request.client.host, request=request)
     return current_user
 
 @app.put("/users/me", response_model=UserProfile)
@@ -481,7 +525,7 @@ async def update_users_me(user_update: UserUpdate, db: Session = Depends(get_db)
     updated_user = update_user_profile(db, current_user.id, update_data)
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
-    audit_log_manager.log_event(db, AuditEventType.USER_PROFILE_UPDATE, f"User profile updated for user: {current_user.username}", user_id=current_user.id, tenant_id=current_user.tenant_id, ip_address=request.client.host, event_details=user_update.dict(exclude_unset=True))
+    audit_log_manager.log_event(db, AuditEventType.USER_PROFILE_UPDATE, f"User profile updated for user: {current_user.username}", user_id=current_user.id, tenant_id=current_user.tenant_id, ip_address=request.client.host, event_details=user_update.dict(exclude_unset=True), request=request)
     return updated_user
 
 @app.get("/users/me/plan")
@@ -589,7 +633,7 @@ async def update_tenant_branding(
     db.commit()
     db.refresh(tenant)
 
-    audit_log_manager.log_event(db, AuditEventType.TENANT_BRANDING_UPDATE, f"Tenant branding updated for tenant ID: {tenant_id}", user_id=current_user.id, tenant_id=tenant_id, ip_address=request.client.host, event_details=branding_data.dict(exclude_unset=True))
+    audit_log_manager.log_event(db, AuditEventType.TENANT_BRANDING_UPDATE, f"Tenant branding updated for tenant ID: {tenant_id}", user_id=current_user.id, tenant_id=tenant_id, ip_address=request.client.host, event_details=branding_data.dict(exclude_unset=True), request=request)
     return {"message": "Tenant branding updated successfully", "tenant_id": tenant_id}
 
 @app.get("/reports/sla/{tenant_id}/{month}")
@@ -597,7 +641,9 @@ async def get_sla_report(tenant_id: str, month: str, current_user: User = Depend
     if str(current_user.tenant_id) != tenant_id and current_user.role != Role.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized to view this tenant's SLA.")
     
-    record = mock_db.get_sla_record(tenant_id, month)
+    record = await asyncio.to_thread(sla_rollup_engine.get_monthly_report, tenant_id, month)
+    if not record:
+        record = mock_db.get_sla_record(tenant_id, month)
     if not record:
         raise HTTPException(status_code=404, detail="SLA record not found for specified tenant and month.")
     return record
@@ -633,43 +679,10 @@ async def get_analytics_data(db: Session = Depends(get_db), timeRange: str = "7d
     Provides real-time analytics data for the Shujaa Studio dashboard.
     """
     try:
-        # --- Overview Metrics ---
-        total_users = db.query(func.count(User.id)).scalar()
-        total_videos = db.query(func.count(AuditLog.id)).filter(
-            AuditLog.event_type == AuditEventType.API_ACCESS,
-            AuditLog.message.like('%/generate_video%')
-        ).scalar()
-        total_audio = db.query(func.count(AuditLog.id)).filter(
-            AuditLog.event_type == AuditEventType.API_ACCESS,
-            AuditLog.message.like('%/generate_tts%')
-        ).scalar()
-        total_images = total_videos * 5 
-
-        overview = {
-            "total_users": total_users,
-            "total_videos": total_videos,
-            "total_images": total_images,
-            "total_audio": total_audio,
-        }
-
-        # --- Usage Trends ---
-        days = 7 if timeRange == "7d" else 30
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        usage_trends_query = db.query(
-            func.date(AuditLog.timestamp).label('date'),
-            func.count(AuditLog.id).filter(AuditLog.message.like('%/generate_video%')).label('videos'),
-            func.count(AuditLog.id).filter(AuditLog.message.like('%/generate_tts%')).label('audio')
-        ).filter(AuditLog.timestamp >= start_date).group_by(func.date(AuditLog.timestamp)).order_by(func.date(AuditLog.timestamp)).all()
-
-        usage_trends = [
-            {
-                "date": row.date.isoformat(),
-                "videos": row.videos,
-                "images": row.videos * 5,
-                "audio": row.audio
-            } for row in usage_trends_query
-        ]
+        # --- Overview Metrics & Usage Trends (served from daily rollups) ---
+        usage = usage_analytics.get_dashboard_usage(db, timeRange)
+        overview = usage["overview"]
+        usage_trends = usage["usage_trends"]
 
         # --- Popular Content (remains mock data for now) ---
         popular_content = [
@@ -863,8 +876,47 @@ async def delete_asset(asset_id: str, current_user: User = Depends(get_current_a
 
 
 
-@app.post("/generate_video", dependencies=[Depends(RateLimiter(times=1, seconds=5))])
-async def generate_video_endpoint(request_data: GenerateVideoRequest, current_user: dict = Depends(get_current_user), current_tenant: str = Depends(current_tenant), db: Session = Depends(get_db), request: Request = None):
+def _build_video_job_payload(request_data: GenerateVideoRequest, user_id: str) -> Dict[str, Any]:
+    input_type = "general_prompt"
+    input_data = request_data.prompt
+    if request_data.news_url:
+        input_type = "news_url"
+        input_data = request_data.news_url
+    elif request_data.script_file:
+        input_type = "script_file"
+        input_data = request_data.script_file
+
+    return {
+        "user_id": user_id,
+        "input_type": input_type,
+        "input_data": input_data,
+        "user_preferences": {"upload_youtube": request_data.upload_youtube},
+    }
+
+def _get_user_tier_code(user_id: str) -> str:
+    user_sub = get_user_subscription(user_id)
+    current_plan = next((p for p in get_default_plans() if p.name == user_sub.plan_name), None)
+    return current_plan.tier_code if current_plan else "FREE"
+
+def _job_links(job_id: str) -> Dict[str, str]:
+    return {"status_url": f"/jobs/{job_id}", "events_url": f"/jobs/{job_id}/events"}
+
+def _scoped_idempotency_key(user_id: str, idempotency_key: Optional[str], suffix: str = "") -> Optional[str]:
+    # Keys are scoped per user so two users can never collide on (or read) each other's jobs
+    return f"{user_id}:{idempotency_key}{suffix}" if idempotency_key else None
+
+async def _job_submission_response(job_id: str) -> Dict[str, Any]:
+    # An idempotent resubmission may resolve to a job that already finished; serve its cached result
+    job = await get_job_status(job_id)
+    response = {"status": "queued", "job_id": job_id, **_job_links(job_id)}
+    if job.get("status") == "completed":
+        response.update(status="completed", result=job.get("result"))
+    elif job.get("status") in ("running", "retrying"):
+        response["status"] = job["status"]
+    return response
+
+@app.post("/generate_video", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(RateLimiter(times=1, seconds=5))])
+async def generate_video_endpoint(request_data: GenerateVideoRequest, current_user: dict = Depends(get_current_user), current_tenant: str = current_tenant, db: Session = Depends(get_db), request: Request = None, idempotency_key: Optional[str] = Header(None, alias="X-Idempotency-Key")):
     start_time = time.time()
     status_label = "failure"
     user_id = str(current_user.get("user_id"))
@@ -882,41 +934,38 @@ async def generate_video_endpoint(request_data: GenerateVideoRequest, current_us
             status_label = "validation_failure"
             raise HTTPException(status_code=400, detail="Either 'prompt', 'news_url', or 'script_file' must be provided.")
 
-        input_type = "general_prompt"
-        input_data = request_data.prompt
-        if request_data.news_url:
-            input_type = "news_url"
-            input_data = request_data.news_url
-        elif request_data.script_file:
-            input_type = "script_file"
-            input_data = request_data.script_file
-
-        user_preferences = {"upload_youtube": request_data.upload_youtube}
-        result = await orchestrator.run_pipeline(
-            input_type=input_type,
-            input_data=input_data,
-            user_preferences=user_preferences,
-            api_call=True,
-            request=request
-        )
-
-        if result.get("status") == "error":
-            status_label = "pipeline_error"
-            raise HTTPException(status_code=500, detail=result.get("message"))
-
-        status_label = "success"
+        # Rendering runs on the Celery priority queues; the client polls or streams progress.
+        job_id = await enqueue_job("GENERATE_VIDEO", _build_video_job_payload(request_data, user_id), user_tier_code=_get_user_tier_code(user_id), idempotency_key=_scoped_idempotency_key(user_id, idempotency_key))
+        status_label = "queued"
         
         # ... (conceptual usage tracking)
 
-        return result
+        return await _job_submission_response(job_id)
     finally:
         end_time = time.time()
         duration = end_time - start_time
         VIDEO_GENERATION_REQUESTS.labels(status=status_label).inc()
         VIDEO_GENERATION_DURATION.labels(status=status_label).observe(duration)
-        if status_label != "success":
+        if status_label not in ("success", "queued"):
             VIDEO_GENERATION_FAILURES.inc()
 
+async def _get_owned_job(job_id: str, current_user: dict) -> Dict[str, Any]:
+    job = await get_job_status(job_id)
+    if job.get("status") == "not_found" or str(job.get("payload", {}).get("user_id")) != str(current_user.get("user_id")):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_video_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await _get_owned_job(job_id, current_user)
+    return {key: job.get(key) for key in ("id", "type", "status", "stage", "progress", "result", "error", "created_at", "started_at", "finished_at")}
+
+@app.get("/jobs/{job_id}/events")
+async def stream_video_job_events(job_id: str, current_user: dict = Depends(get_current_user)):
+    await _get_owned_job(job_id, current_user)
+    poll_interval = config.jobs.get("events_poll_interval_seconds", 0.5)
+    return StreamingResponse(stream_job_events(job_id, poll_interval), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/generate_tts", dependencies=[Depends(RateLimiter(times=1, seconds=5))])
 async def generate_tts_endpoint(text: str, voice_name: str, current_user: dict = Depends(get_current_user)):
     user_id = str(current_user.get("user_id"))
@@ -933,8 +982,8 @@ async def generate_tts_endpoint(text: str, voice_name: str, current_user: dict =
         logger.error(f"Error generating TTS for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate TTS.")
 
-@app.post("/batch_generate_video")
-async def batch_generate_video_endpoint(batch_request: BatchGenerateVideoRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db), request: Request = None):
+@app.post("/batch_generate_video", status_code=status.HTTP_202_ACCEPTED)
+async def batch_generate_video_endpoint(batch_request: BatchGenerateVideoRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db), request: Request = None, idempotency_key: Optional[str] = Header(None, alias="X-Idempotency-Key")):
     user_id = str(current_user.get("user_id"))
     await plan_guard.check_action_permission(user_id, "WRITE")
 
@@ -943,26 +992,17 @@ async def batch_generate_video_endpoint(batch_request: BatchGenerateVideoRequest
     if len(batch_request.requests) > MAX_BATCH_SIZE:
         raise HTTPException(status_code=400, detail=f"Batch size cannot exceed {MAX_BATCH_SIZE}.")
 
-    async def video_worker(request_data: GenerateVideoRequest):
-        try:
-            # ... (worker logic)
-            return await orchestrator.run_pipeline(...)
-        except Exception as e:
-            return {"status": "error", "message": str(e), "request_prompt": request_data.prompt}
-
-    parallel_processor = ParallelProcessor(max_workers=config.parallel_processing.max_workers)
-    batch_results = await parallel_processor.run_parallel(items=batch_request.requests, worker_function=video_worker)
-
-    successful_jobs = [res for res in batch_results if res.get("status") == "success"]
-    failed_jobs = [res for res in batch_results if res.get("status") != "success"]
+    tier_code = _get_user_tier_code(user_id)
+    jobs = []
+    for index, request_data in enumerate(batch_request.requests):
+        job_id = await enqueue_job("GENERATE_VIDEO", _build_video_job_payload(request_data, user_id), user_tier_code=tier_code, idempotency_key=_scoped_idempotency_key(user_id, idempotency_key, f":{index}"))
+        jobs.append({"request_prompt": request_data.prompt, **await _job_submission_response(job_id)})
 
-    logger.info(f"Batch video generation completed for user {user_id}. Success: {len(successful_jobs)}, Failed: {len(failed_jobs)}")
+    logger.info(f"Batch video generation queued for user {user_id}. Jobs: {len(jobs)}")
     return {
         "batch_id": f"batch_{uuid.uuid4().hex[:8]}",
-        "status": "completed",
-        "successful_videos": len(successful_jobs),
-        "failed_videos": len(failed_jobs),
-        "results": batch_results
+        "status": "queued",
+        "jobs": jobs
     }
 
 # ... (rest of the endpoints)
@@ -1,9 +1,10 @@
 import os
+import json
 import asyncio
 import aiohttp
 import hashlib
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 import boto3
 from botocore.exceptions import ClientError
@@ -14,6 +15,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 config = get_config()
 
+class RangeNotSatisfiable(aiohttp.ClientError):
+    """The server has no bytes past the requested resume offset."""
+
+
 class LazyAsset:
     """
     Represents an asset that is loaded lazily (on demand).
@@ -65,15 +70,52 @@ class AssetManager:
     // [TASK]: Manage high-performance asset loading with caching and integrity checks
     // [GOAL]: Centralize asset management for models, images, and weights
     """
-    def __init__(self):
-        self.cache_dir = Path("asset_cache")
+    def __init__(self, cache_dir: Optional[Path] = None, cdn_endpoints: Optional[List[str]] = None,
+                 hedge_delay_ms: Optional[float] = None, resume_attempts: Optional[int] = None):
+        settings = config.assets if isinstance(config.assets, dict) else {}
+        self.cache_dir = Path(cache_dir or "asset_cache")
         self.cache_dir.mkdir(exist_ok=True)
         self.storage_provider = config.storage.provider
         self.s3_client = self._get_s3_client() if self.storage_provider == "s3" else None
-        self.cdn_endpoints = config.app.cdn_endpoints or []
+        self.cdn_endpoints = (config.app.cdn_endpoints or []) if cdn_endpoints is None else cdn_endpoints
         self.last_used_cdn_index = 0
+
+        # A second candidate is raced once the current one has not answered within hedge_delay_ms
+        self.hedge_delay = (hedge_delay_ms if hedge_delay_ms is not None else settings.get("hedge_delay_ms", 300)) / 1000
+        self.resume_attempts = resume_attempts if resume_attempts is not None else settings.get("resume_attempts", 3)
+        self.max_connections = settings.get("max_connections", 32)
+        self.chunk_size = settings.get("chunk_size_kb", 256) * 1024
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._downloads: Dict[Path, asyncio.Task] = {}
         logger.info(f"AssetManager initialized. Cache directory: {self.cache_dir}")
 
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """One pooled session (keep-alive connections) shared by every download on this loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._session_loop is not loop:
+            await self.close()  # A session is bound to its loop; release the old one before replacing it
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Closes the pooled session on the loop that owns it. Called from app shutdown."""
+        session, loop = self._session, self._session_loop
+        self._session = self._session_loop = None
+        if session is None or session.closed:
+            return
+        try:
+            if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            else:
+                # Its own loop, or one that has finished: closing here still drops the pooled connections
+                await session.close()
+        except Exception as e:
+            logger.warning(f"Closing asset download session failed: {e}")
+
     def _get_s3_client(self):
         # [SNIPPET]: thinkwithai + kenyafirst + enterprise-secure
         # [CONTEXT]: Creating an S3 client for asset management.
@@ -108,52 +150,131 @@ class AssetManager:
             logger.error(f"Failed to generate signed URL for {asset_key}: {e}")
             return None
 
+    def _candidate_urls(self, url: str, signed_url: Optional[str]) -> List[Tuple[str, Optional[int]]]:
+        """(url, cdn index) in preference order: signed URL, CDNs round-robin, then the origin."""
+        candidates = []
+        if signed_url:
+            candidates.append((signed_url, None))
+
+        # Add CDN endpoints for fallback in a round-robin fashion
+        asset_name = os.path.basename(url)
+        for i in range(len(self.cdn_endpoints)):
+            cdn_index = (self.last_used_cdn_index + i) % len(self.cdn_endpoints)
+            candidates.append((f"{self.cdn_endpoints[cdn_index].rstrip('/')}/{asset_name}", cdn_index))
+
+        candidates.append((url, None))  # Always try the original URL as a last resort
+        return [(u, index) for u, index in candidates if u]
+
+    async def _open(self, session: aiohttp.ClientSession, url: str, offset: int) -> aiohttp.ClientResponse:
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        response = await session.get(url, headers=headers)
+        if response.status == 416:  # Nothing left past offset: the partial file is stale
+            response.release()
+            raise RangeNotSatisfiable(url)
+        response.raise_for_status()
+        return response
+
+    async def _hedged_get(self, candidates: List[Tuple[str, Optional[int]]], offset: int) -> Optional[Tuple[int, aiohttp.ClientResponse]]:
+        """
+        // [TASK]: Race CDN candidates for the first response
+        // [GOAL]: Tail latency of the fastest healthy CDN instead of the first configured one
+
+        Starts the first candidate and adds the next one whenever the racers are slower than the
+        hedge delay or one fails. The first successful response wins; the others are cancelled.
+        """
+        session = await self._get_session()
+        racing: Dict[asyncio.Task, int] = {}
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            url = candidates[next_index][0]
+            logger.info(f"Attempting to download asset from: {url}")
+            racing[asyncio.create_task(self._open(session, url, offset))] = next_index
+            next_index += 1
+
+        launch()
+        try:
+            while racing:
+                timeout = self.hedge_delay if next_index < len(candidates) else None
+                done, _ = await asyncio.wait(racing, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch()  # Hedge: the current racers are slow
+                    continue
+                winner = None
+                for task in done:
+                    index = racing.pop(task)
+                    if task.exception() is None and winner is None:
+                        winner = (index, task.result())
+                    elif task.exception() is None:
+                        task.result().release()
+                    else:
+                        logger.error(f"❌ Failed to download asset from {candidates[index][0]}: {task.exception()}")
+                if winner:
+                    return winner
+                if next_index < len(candidates):
+                    launch()
+            return None
+        finally:
+            for task in racing:
+                task.cancel()
+            for result in await asyncio.gather(*racing, return_exceptions=True):
+                if isinstance(result, aiohttp.ClientResponse):
+                    result.release()
+
+    async def _stream_to_file(self, response: aiohttp.ClientResponse, part_path: Path, append: bool) -> int:
+        """Stream the body to disk; writes run in a worker thread so the loop keeps serving other downloads."""
+        f = await asyncio.to_thread(open, part_path, "ab" if append else "wb")
+        written = 0
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                await asyncio.to_thread(f.write, chunk)
+                written += len(chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        return written
+
     async def _download_asset(self, url: str, destination_path: Path, signed_url: Optional[str] = None) -> bool:
         """
         // [TASK]: Download an asset asynchronously with CDN fallback and signed URLs
-        // [GOAL]: Support round-robin CDN fallback and signed URLs
+        // [GOAL]: Hedged CDN requests over a pooled session, resuming interrupted transfers with HTTP Range
         // [ELITE_CURSOR_SNIPPET]: aihandle
         """
-        urls_to_try = []
-        if signed_url:
-            urls_to_try.append(signed_url)
+        candidates = self._candidate_urls(url, signed_url)
+        part_path = destination_path.with_name(destination_path.name + ".part")
 
-        # Add CDN endpoints for fallback in a round-robin fashion
-        if self.cdn_endpoints:
-            for i in range(len(self.cdn_endpoints)):
-                cdn_index = (self.last_used_cdn_index + i) % len(self.cdn_endpoints)
-                cdn_base_url = self.cdn_endpoints[cdn_index]
-                asset_name = os.path.basename(url)
-                cdn_url = f"{cdn_base_url.rstrip('/')}/{asset_name}"
-                urls_to_try.append(cdn_url)
-
-        urls_to_try.append(url) # Always try the original URL as a last resort
-
-        for i, current_url in enumerate(urls_to_try):
-            if not current_url:
-                continue
-            logger.info(f"Attempting to download asset from: {current_url} to {destination_path}")
+        for attempt in range(self.resume_attempts + 1):
+            offset = part_path.stat().st_size if part_path.exists() else 0
+            winner = await self._hedged_get(candidates, offset)
+            if winner is None:
+                if offset:
+                    part_path.unlink(missing_ok=True)  # Retry from scratch once before giving up
+                    continue
+                return False  # All download attempts failed
+
+            index, response = winner
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(current_url) as response:
-                        response.raise_for_status() # Raise an exception for bad status codes
-                        with open(destination_path, 'wb') as f:
-                            while True:
-                                chunk = await response.content.read(8192)
-                                if not chunk:
-                                    break
-                                f.write(chunk)
-                logger.info(f"✅ Successfully downloaded asset: {destination_path}")
-                # Update the last used CDN index if a CDN was successful
-                if i > 0 and i < len(self.cdn_endpoints) + 1:
-                    self.last_used_cdn_index = (self.last_used_cdn_index + i) % len(self.cdn_endpoints)
-                return True
-            except aiohttp.ClientError as e:
-                logger.error(f"❌ Failed to download asset from {current_url}: {e}")
-            except Exception as e:
-                logger.error(f"An unexpected error occurred during download from {current_url}: {e}")
-        
-        return False # All download attempts failed
+                resumed = offset > 0 and response.status == 206 and \
+                    response.headers.get("Content-Range", "").startswith(f"bytes {offset}-")
+                expected = response.content_length
+                written = await self._stream_to_file(response, part_path, append=resumed)
+                if expected is not None and written < expected:
+                    raise aiohttp.ClientPayloadError(f"Connection closed after {written} of {expected} bytes")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Download of {destination_path.name} interrupted ({e}); resuming (attempt {attempt + 1})")
+                continue
+            finally:
+                response.release()
+
+            os.replace(part_path, destination_path)
+            logger.info(f"✅ Successfully downloaded asset: {destination_path}")
+            # Update the last used CDN index if a CDN was successful
+            cdn_index = candidates[index][1]
+            if cdn_index is not None:
+                self.last_used_cdn_index = cdn_index
+            return True
+
+        return False
 
     def _calculate_checksum(self, file_path: Path, algorithm='sha256') -> str:
         """
@@ -169,10 +290,41 @@ class AssetManager:
                 hasher.update(chunk)
         return hasher.hexdigest()
 
+    def _sidecar_path(self, file_path: Path) -> Path:
+        return file_path.with_name(file_path.name + ".meta.json")
+
+    def _read_verified_checksum(self, file_path: Path, algorithm: str = 'sha256') -> Optional[str]:
+        """Checksum recorded for the file's current size+mtime, if it has not changed since."""
+        try:
+            meta = json.loads(self._sidecar_path(file_path).read_text())
+            stat = file_path.stat()
+        except (OSError, ValueError):
+            return None
+        if meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns:
+            return meta.get(algorithm)
+        return None
+
+    def _write_verified_checksum(self, file_path: Path, checksum: str, algorithm: str = 'sha256'):
+        stat = file_path.stat()
+        meta = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, algorithm: checksum}
+        self._sidecar_path(file_path).write_text(json.dumps(meta))
+
+    async def _checksum(self, file_path: Path) -> str:
+        """Recorded checksum when the file is unchanged, otherwise hash it off the event loop."""
+        checksum = self._read_verified_checksum(file_path)
+        if checksum is None:
+            checksum = await asyncio.to_thread(self._calculate_checksum, file_path)
+            self._write_verified_checksum(file_path, checksum)
+        return checksum
+
+    def _invalidate(self, file_path: Path):
+        file_path.unlink(missing_ok=True)
+        self._sidecar_path(file_path).unlink(missing_ok=True)
+
     async def _perform_get_asset(self, asset_id: str, url: str, expected_checksum: str = None, version: str = "latest", signed_url: Optional[str] = None, is_lazy_load: bool = False) -> Path:
         """
         Internal method to perform the actual asset retrieval (from cache or download).
-        Used by get_asset and LazyAsset.
+        Used by get_asset and LazyAsset. Concurrent requests for the same asset share one download.
         """
         asset_filename = f"{asset_id}_{version}_{os.path.basename(url)}"
         local_path = self.cache_dir / asset_filename
@@ -180,17 +332,26 @@ class AssetManager:
         if local_path.exists():
             logger.info(f"Asset {asset_id} found in cache: {local_path}")
             if expected_checksum:
-                calculated_checksum = self._calculate_checksum(local_path)
+                calculated_checksum = await self._checksum(local_path)
                 if calculated_checksum == expected_checksum:
                     logger.info(f"✅ Checksum verified for cached asset: {asset_id}")
                     return local_path
                 else:
                     logger.warning(f"❌ Checksum mismatch for cached asset {asset_id}. Recalculating...")
-                    os.remove(local_path) # Invalidate cache
+                    self._invalidate(local_path) # Invalidate cache
             else:
                 logger.info(f"Checksum not provided for {asset_id}. Using cached version.")
                 return local_path
 
+        download = self._downloads.get(local_path)
+        if download is None:
+            download = self._downloads[local_path] = asyncio.create_task(
+                self._fetch(asset_id, url, local_path, expected_checksum, signed_url)
+            )
+            download.add_done_callback(lambda _: self._downloads.pop(local_path, None))
+        return await asyncio.shield(download)
+
+    async def _fetch(self, asset_id: str, url: str, local_path: Path, expected_checksum: Optional[str], signed_url: Optional[str]) -> Path:
         # Download if not in cache or checksum mismatch
         logger.info(f"Asset {asset_id} not in cache or checksum mismatch. Downloading...")
         start_time = asyncio.get_event_loop().time()
@@ -201,11 +362,12 @@ class AssetManager:
 
         if download_success:
             if expected_checksum:
-                calculated_checksum = self._calculate_checksum(local_path)
+                calculated_checksum = await asyncio.to_thread(self._calculate_checksum, local_path)
                 if calculated_checksum != expected_checksum:
                     logger.error(f"❌ Checksum mismatch after download for {asset_id}. Deleting corrupted file.")
-                    os.remove(local_path)
+                    self._invalidate(local_path)
                     raise ValueError(f"Checksum mismatch for {asset_id} after download.") # Fallback if log_and_raise not defined
+                self._write_verified_checksum(local_path, calculated_checksum)
             logger.info(f"✅ Asset {asset_id} ready at: {local_path}")
             return local_path
         else:
@@ -1,10 +1,18 @@
+import asyncio
+import hashlib
+import threading
+import time
 import jwt
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
 from logging_setup import get_logger
 from config_loader import get_config
+from error_utils import log_and_raise
 
 logger = get_logger(__name__)
 config = get_config()
@@ -15,6 +23,15 @@ config = get_config()
 
 _private_key = None
 _public_key = None
+_signing_kid = None
+# kid -> public key. Previous keys stay here after a rotation so tokens they signed (and their
+# cached verifications) remain valid until they expire or the key is retired.
+_verification_keys: Dict[str, Any] = {}
+
+def key_id(public_key) -> str:
+    """Stable kid for a public key: a truncated SHA-256 of its DER encoding."""
+    der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(der).hexdigest()[:16]
 
 def _load_jwt_keys():
     global _private_key, _public_key
@@ -36,6 +53,13 @@ def _load_jwt_keys():
         else:
             logger.warning("JWT keys not found in configuration. Generating RSA keys for demonstration. DO NOT USE IN PRODUCTION.")
             _generate_rsa_keys_for_demo() # Call a new demo function
+        rotate_signing_key(_private_key, kid=config.security.jwt_kid or None)
+
+        # Keys retired from signing but still accepted for verification: {kid: public PEM}
+        previous = config.security.jwt_previous_public_keys
+        if isinstance(previous, dict):
+            for kid, pem in previous.items():
+                add_verification_key(serialization.load_pem_public_key(pem.encode(), backend=default_backend()), kid=kid)
 
 def _generate_rsa_keys_for_demo(): # New function for demo key generation
     """
@@ -49,6 +73,130 @@ def _generate_rsa_keys_for_demo(): # New function for demo key generation
     )
     _public_key = _private_key.public_key()
 
+def add_verification_key(public_key, kid: Optional[str] = None) -> str:
+    """Accept tokens signed by `public_key` (e.g. another instance's key or one being phased out)."""
+    kid = kid or key_id(public_key)
+    _verification_keys[kid] = public_key
+    return kid
+
+def rotate_signing_key(private_key, kid: Optional[str] = None) -> str:
+    """
+    // [TASK]: Start signing new tokens with another key
+    // [GOAL]: Rotate without invalidating outstanding tokens or flushing the verified-token cache
+    """
+    global _private_key, _public_key, _signing_kid
+    _private_key = private_key
+    _public_key = private_key.public_key()
+    _signing_kid = add_verification_key(_public_key, kid)
+    logger.info(f"JWT signing key is now kid={_signing_kid} ({len(_verification_keys)} verification keys)")
+    return _signing_kid
+
+def retire_key(kid: str):
+    """Stop accepting tokens signed by `kid`; their cached verifications are dropped too."""
+    if kid == _signing_kid:
+        raise ValueError("Cannot retire the active signing key; rotate first.")
+    _verification_keys.pop(kid, None)
+    token_cache.evict(lambda entry: entry.kid == kid)
+
+
+@dataclass
+class _VerifiedToken:
+    claims: dict
+    kid: Optional[str]
+    expires_at: float # exp claim (inf when absent)
+    not_before: float
+    cached_until: float = 0.0
+
+
+class VerifiedTokenCache:
+    """
+    // [TASK]: Remember tokens whose signature has already been verified
+    // [GOAL]: Skip RSA verification for bearer tokens reused across requests
+
+    Keyed by the SHA-256 of the token, so raw tokens are never held. verify_jwt re-checks exp/nbf
+    on every hit with PyJWT's boundaries (expired at now >= exp). Entries are LRU-bounded and live
+    no longer than max_ttl_seconds so revocations made outside this process are picked up.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_ttl_seconds: float = 900, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.max_ttl_seconds = max_ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[bytes, _VerifiedToken]" = OrderedDict()
+        self._revoked: Dict[bytes, float] = {} # digest -> exp, kept until the token would have expired anyway
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, digest: bytes) -> Optional[_VerifiedToken]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if self.clock() >= entry.cached_until:
+                del self._entries[digest]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, digest: bytes, entry: _VerifiedToken):
+        entry.cached_until = self.clock() + self.max_ttl_seconds
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke(self, digest: bytes, expires_at: float):
+        with self._lock:
+            self._entries.pop(digest, None)
+            now = self.clock()
+            self._revoked = {d: exp for d, exp in self._revoked.items() if exp > now}
+            self._revoked[digest] = expires_at
+
+    def is_revoked(self, digest: bytes) -> bool:
+        return digest in self._revoked
+
+    def discard(self, digest: bytes):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def evict(self, predicate: Callable[[_VerifiedToken], bool]):
+        with self._lock:
+            for digest in [d for d, entry in self._entries.items() if predicate(entry)]:
+                del self._entries[digest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_auth_settings = config.auth if isinstance(config.auth, dict) else {}
+token_cache = VerifiedTokenCache(
+    max_entries=_auth_settings.get("token_cache_max_entries", 10000),
+    max_ttl_seconds=_auth_settings.get("token_cache_max_ttl_seconds", 900),
+)
+# Callables taking the verified claims and returning True when the token must be rejected.
+# They run on every verification, cached or not, so they must be cheap (in-memory lookups).
+_revocation_hooks: List[Callable[[dict], bool]] = []
+
+def register_revocation_hook(hook: Callable[[dict], bool]):
+    _revocation_hooks.append(hook)
+
+def revoke_token(token: str):
+    """Reject this exact token from now on (e.g. logout), in this process."""
+    try:
+        exp = float(jwt.decode(token, options={"verify_signature": False}).get("exp", 0))
+    except jwt.InvalidTokenError:
+        exp = 0.0
+    token_cache.revoke(VerifiedTokenCache.digest(token), exp or token_cache.clock() + token_cache.max_ttl_seconds)
+
 # Call the key loading function
 _load_jwt_keys()
 
@@ -62,7 +210,7 @@ def create_jwt(payload: dict, expiry_minutes: int = 30) -> str:
     to_encode = payload.copy()
     expire = datetime.utcnow() + timedelta(minutes=expiry_minutes)
     to_encode.update({"exp": expire, "iat": datetime.utcnow()})
-    encoded_jwt = jwt.encode(to_encode, _private_key, algorithm="RS256")
+    encoded_jwt = jwt.encode(to_encode, _private_key, algorithm="RS256", headers={"kid": _signing_kid})
     logger.info(f"JWT created for user: {payload.get('user_id')}")
     return encoded_jwt
 
@@ -78,20 +226,67 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
             minutes = 30
     return create_jwt(data, expiry_minutes=minutes)
 
+def _verify_signature(token: str) -> _VerifiedToken:
+    kid = jwt.get_unverified_header(token).get("kid")
+    if kid is None:
+        public_key = _public_key # Tokens issued before kids were added
+    else:
+        public_key = _verification_keys.get(kid)
+        if public_key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+    claims = jwt.decode(token, public_key, algorithms=["RS256"])
+    expires_at = float(claims["exp"]) if "exp" in claims else float("inf")
+    return _VerifiedToken(claims, kid, expires_at, float(claims.get("nbf", 0)))
+
 def verify_jwt(token: str) -> dict:
     """
     // [TASK]: Verify a JWT token
     // [GOAL]: Validate token authenticity and extract payload
+
+    The RSA check runs once per token; later calls are served from token_cache, with
+    exp/nbf and revocation still checked on every call.
     """
     try:
-        decoded_payload = jwt.decode(token, _public_key, algorithms=["RS256"])
-        logger.info(f"JWT verified for user: {decoded_payload.get('user_id')}")
-        return decoded_payload
+        digest = VerifiedTokenCache.digest(token)
+        if token_cache.is_revoked(digest):
+            raise jwt.InvalidTokenError("Token has been revoked")
+        entry = token_cache.get(digest)
+        if entry is None:
+            entry = _verify_signature(token)
+            token_cache.put(digest, entry)
+            logger.debug(f"JWT verified for user: {entry.claims.get('user_id')}")
+        else:
+            now = token_cache.clock()
+            if now >= entry.expires_at:
+                token_cache.discard(digest)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            if now < entry.not_before:
+                raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+        if any(hook(entry.claims) for hook in _revocation_hooks):
+            raise jwt.InvalidTokenError("Token has been revoked")
+        return dict(entry.claims) # Callers may mutate their copy
     except jwt.ExpiredSignatureError:
         log_and_raise(jwt.ExpiredSignatureError("Token has expired"), "JWT verification failed")
     except jwt.InvalidTokenError as e:
         log_and_raise(e, "Invalid JWT token")
 
+def benchmark_verify(iterations: int = 2000) -> Dict[str, float]:
+    """Per-call verify_jwt cost for a cold token (full RSA check) vs. a cached one."""
+    token = create_jwt({"user_id": "bench_user"})
+    digest = VerifiedTokenCache.digest(token)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        token_cache.discard(digest)
+        verify_jwt(token)
+    cold_us = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verify_jwt(token)
+    cached_us = (time.perf_counter() - started) / iterations * 1e6
+    return {"cold_us": round(cold_us, 2), "cached_us": round(cached_us, 2), "speedup": round(cold_us / cached_us, 1)}
+
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import hashlib # Elite Cursor Snippet: hashlib_import
@@ -59,6 +59,29 @@ class AuditLog(Base):
         self.previous_hash = previous_hash
         self.current_hash = self.calculate_hash(previous_hash)
 
+class UsageEvent(Base):
+    # // [TASK]: Structured usage event stream written alongside the audit log
+    # // [GOAL]: Typed endpoint/event columns so analytics never parse audit messages
+    __tablename__ = "usage_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=True)
+    endpoint = Column(String, index=True) # e.g., "/generate_video"
+    event_type = Column(String, index=True) # e.g., "API_ACCESS"
+
+class DailyUsageRollup(Base):
+    # // [TASK]: Incrementally maintained per-day usage counters
+    # // [GOAL]: Serve dashboard analytics without scanning raw events
+    __tablename__ = "daily_usage_rollups"
+    __table_args__ = (UniqueConstraint("day", "endpoint", name="uq_daily_usage_day_endpoint"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)
+    endpoint = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
 class Consent(Base):
     __tablename__ = "consents"
 
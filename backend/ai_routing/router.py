@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import math
 import os
 import time
 import random # For canary routing
@@ -7,6 +8,7 @@ from typing import Any, Dict, List, Optional, Type
 
 import yaml
 from dotmap import DotMap
+from fastapi import HTTPException
 
 from backend.ai_routing.providers.base_provider import BaseProvider
 from backend.ai_routing.providers.colab_provider import ColabProvider
@@ -14,6 +16,7 @@ from backend.ai_routing.providers.kaggle_provider import KaggleProvider
 from backend.ai_routing.providers.huggingface_provider import HuggingFaceProvider
 from backend.ai_routing.providers.runpod_provider import RunPodProvider
 from backend.ai_routing.providers.gemini_provider import GeminiProvider
+from backend.ai_routing.provider_stats import ProviderStatsRegistry, hedged_call
 
 # Import healthcheck functions
 from backend.ai_health.healthcheck import record_metric, aggregate, score_inference
@@ -37,6 +40,21 @@ class Router:
         self.health_check_interval = self.config.get('health_check_interval', 30) # seconds
         self.fallback_retries = self.config.get('fallback_retries', 2)
 
+        # Observed per-task latency/error rates and circuit breakers, fed by execute_with_fallback
+        adaptive = self.config.get('adaptive_routing') or {}
+        self.adaptive_routing = adaptive.get('enabled', True)
+        self.hedging = adaptive.get('hedging', False)
+        self.hedge_min_delay_ms = adaptive.get('hedge_min_delay_ms', 50)
+        self.hedge_min_samples = adaptive.get('hedge_min_samples', 20)
+        self.provider_stats = ProviderStatsRegistry(
+            alpha=adaptive.get('ewma_alpha', 0.2),
+            latency_window=adaptive.get('latency_window', 100),
+            failure_threshold=adaptive.get('breaker_failure_threshold', 5),
+            error_rate_threshold=adaptive.get('breaker_error_rate', 0.5),
+            min_samples=adaptive.get('breaker_min_samples', 10),
+            cooldown_seconds=adaptive.get('breaker_cooldown_seconds', 30),
+        )
+
         # Dynamically initialize and register providers from config
         for provider_name, provider_config in self.config.providers.items():
             provider_type = provider_config.get("type")
@@ -98,15 +116,18 @@ class Router:
             logger.info(f"Health checks completed. Next check in {self.health_check_interval} seconds.")
             await asyncio.sleep(self.health_check_interval)
 
-    def route_task(self, task_type: str, payload: Dict[str, Any]) -> Optional[BaseProvider]:
+    def rank_providers(self, task_type: str) -> List[BaseProvider]:
         """
-        Chooses the best provider for a given task type based on routing rules,
-        health, and latency.
+        // [TASK]: Order the healthy providers for a task type, best first
+        // [GOAL]: Rank on observed EWMA latency and error rate; probe latency is only the prior
+
+        Providers with an open circuit breaker are left out. With adaptive routing disabled the
+        order is the last health-probe latency, as before.
         """
         rules = self.config.routing_rules.get(task_type)
         if not rules:
             logger.warning(f"No routing rules found for task type '{task_type}'.")
-            return None
+            return []
 
         eligible_providers = []
         for provider_name in rules.priority:
@@ -120,15 +141,27 @@ class Router:
 
         if not eligible_providers:
             logger.error(f"No healthy providers available for task type '{task_type}'.")
-            return None
+            return []
+
+        if not self.adaptive_routing:
+            # Sort by latency (fastest first) if multiple eligible providers
+            return sorted(eligible_providers, key=lambda p: p.latency)
 
-        # Sort by latency (fastest first) if multiple eligible providers
-        eligible_providers.sort(key=lambda p: p.latency)
+        ranked = self.provider_stats.rank(eligible_providers, task_type)
+        if not ranked:
+            logger.error(f"All healthy providers for task type '{task_type}' have open circuit breakers.")
+        return ranked
 
-        return eligible_providers[0]
+    def route_task(self, task_type: str, payload: Dict[str, Any]) -> Optional[BaseProvider]:
+        """
+        Chooses the best provider for a given task type based on routing rules,
+        health, and latency.
+        """
+        ranked = self.rank_providers(task_type)
+        return ranked[0] if ranked else None
 
-    async def execute_with_fallback(self, task_type: str, payload: Dict[str, Any], request: Any) -> Dict[str, Any]: # Added request: Any
-        user_plan = request.state.get("user_plan")
+    async def execute_with_fallback(self, task_type: str, payload: Dict[str, Any], request: Any = None) -> Dict[str, Any]: # Added request: Any
+        user_plan = getattr(getattr(request, "state", None), "user_plan", None)
         if not user_plan:
             logger.warning("User plan not found in request state. Defaulting to FREE tier policy.")
             # Fallback to FREE tier policy if user_plan is not set (e.g., for unauthenticated requests)
@@ -186,9 +219,9 @@ class Router:
         provider_name = payload.get("provider_name") # Example
 
         # Get model metadata from ModelStore if available
-        model_metadata = None
+        model_metadata = {}
         if model_name and provider_name:
-            current_model_info = self.model_store.current(provider_name, model_name)
+            current_model_info = model_store.current(provider_name, model_name)
             if current_model_info:
                 model_metadata = current_model_info.get("metadata", {})
 
@@ -222,14 +255,25 @@ class Router:
 
         attempt = 0
         while attempt <= self.fallback_retries:
-            provider = target_provider # Start with the chosen provider (blue/green/canary)
+            # Start with the chosen provider (blue/green/canary); retries re-rank, so a provider
+            # that just failed (or whose breaker opened) drops behind the alternatives
+            ranked = self.rank_providers(task_type)
+            if attempt == 0:
+                ranked = [target_provider] + [p for p in ranked if p is not target_provider]
+            candidates = (ranked or [target_provider])[:2 if self.hedging else 1]
+            provider = candidates[0]
 
             logger.info(f"Attempting task '{task_type}' with provider '{provider.name}' (attempt {attempt + 1})...")
             start_time = time.time()
             inference_ok = False
             inference_score = 0.0
             try:
-                result = await provider.process_request(task_type, payload)
+                provider, result = await hedged_call(
+                    candidates, task_type, lambda p: p.process_request(task_type, payload), self.provider_stats,
+                    hedge_min_delay_ms=self.hedge_min_delay_ms,
+                    hedge_min_samples=self.hedge_min_samples if self.hedging else math.inf,
+                    respect_breakers=self.adaptive_routing,
+                )
                 latency_ms = (time.time() - start_time) * 1000
                 inference_ok = True
                 inference_score = score_inference(result) # Score the inference result
@@ -271,7 +315,7 @@ class Router:
                         # Promote green to active
                         green_version_tag = model_metadata.get("green_version_tag") # Assuming green_version_tag is stored in metadata
                         if green_version_tag:
-                            self.model_store.activate(provider_name, model_name, green_version_tag, metadata={"strategy":"bluegreen", "promoted_from_canary": True})
+                            model_store.activate(provider_name, model_name, green_version_tag, metadata={"strategy":"bluegreen", "promoted_from_canary": True})
                             logger.info(f"Promoted {model_name} to active version: {green_version_tag}")
                         else:
                             logger.warning(f"Could not promote green version for {model_name}: green_version_tag not found in metadata.")
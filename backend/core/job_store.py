@@ -0,0 +1,456 @@
+import json
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+from sqlalchemy import Column, Integer, String, Float, Text, and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from config_loader import get_config
+from database import Base, SessionLocal, engine
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+config = get_config()
+
+TERMINAL_STATUSES = ("completed", "failed")
+RUNNABLE_STATUSES = ("pending", "retrying")
+
+class BaseJobStore:
+    """
+    // [TASK]: Shared job store behaviour
+    // [GOAL]: Throttled, coalesced progress updates and TTL bookkeeping on top of backend primitives
+
+    Backends implement create/get/update/transition/claim/append_event/get_events/cleanup_expired.
+    `transition` is an atomic compare-and-set on the job status. `claim` also takes over a "running"
+    job whose worker stopped heartbeating for `lease_seconds` (the worker died mid-job).
+    """
+    def __init__(self, ttl_seconds: float = 86400, progress_min_interval_seconds: float = 1.0, cleanup_interval_seconds: float = 300, lease_seconds: float = 120):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.progress_min_interval_seconds = progress_min_interval_seconds
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self._progress_lock = threading.Lock()
+        self._last_progress: Dict[str, Tuple[float, str]] = {} # job_id -> (monotonic write time, stage)
+        self._pending_progress: Dict[str, Dict[str, Any]] = {} # job_id -> latest coalesced event
+        self._last_cleanup = time.monotonic()
+
+    def report_progress(self, job_id: str, stage: str, progress: int, detail: Optional[str] = None):
+        """
+        Records a progress event. Updates within the same stage are written at most once per
+        `progress_min_interval_seconds`; intermediate values are coalesced into the latest one.
+        Stage changes and terminal stages flush immediately.
+        """
+        event = {"stage": stage, "progress": progress, "detail": detail, "timestamp": time.time()}
+        now = time.monotonic()
+        with self._progress_lock:
+            last = self._last_progress.get(job_id)
+            same_stage = last is not None and last[1] == stage
+            if same_stage and stage not in TERMINAL_STATUSES and now - last[0] < self.progress_min_interval_seconds:
+                self._pending_progress[job_id] = event
+                return
+            pending = self._pending_progress.pop(job_id, None)
+            # A coalesced update from the previous stage is flushed first; within a stage it is superseded
+            to_write = [pending, event] if pending and not same_stage else [event]
+            if stage in TERMINAL_STATUSES:
+                self._last_progress.pop(job_id, None)
+            else:
+                self._last_progress[job_id] = (now, stage)
+
+        for item in to_write:
+            self.append_event(job_id, item)
+        self.update(job_id, stage=stage, progress=progress)
+
+    def initialize(self):
+        """Creates backend storage; called once at API/worker startup rather than on import."""
+
+    def heartbeat(self, job_id: str):
+        """Renews the claiming worker's lease on a running job."""
+        self.update(job_id, heartbeat_at=time.time())
+
+    def lease_remaining(self, job: Dict[str, Any]) -> float:
+        """Seconds until a running job's lease lapses and another worker may claim it."""
+        return (job.get("heartbeat_at") or 0) + self.lease_seconds - time.time()
+
+    def expiry_for(self, status: str) -> Optional[float]:
+        return time.time() + self.ttl_seconds if status in TERMINAL_STATUSES else None
+
+    def maybe_cleanup(self):
+        if time.monotonic() - self._last_cleanup >= self.cleanup_interval_seconds:
+            self._last_cleanup = time.monotonic()
+            try:
+                removed = self.cleanup_expired()
+                if removed:
+                    logger.info(f"Removed {removed} expired jobs from the job store.")
+            except Exception as e:
+                logger.warning(f"Job store cleanup failed: {e}")
+
+    def cleanup_expired(self) -> int:
+        return 0
+
+class InMemoryJobStore(BaseJobStore):
+    """
+    // [TASK]: Process-local job store
+    // [GOAL]: Back eager/local Celery runs and tests where API and task share one process
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, List[Dict[str, Any]]] = {}
+        self._idempotency_keys: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any], idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+        with self._lock:
+            if idempotency_key:
+                existing_id = self._idempotency_keys.get(idempotency_key)
+                existing = self._jobs.get(existing_id) if existing_id else None
+                if existing and existing.get("status") != "failed":
+                    return existing_id, False
+                self._idempotency_keys[idempotency_key] = job["id"]
+            self._jobs[job["id"]] = dict(job, idempotency_key=idempotency_key, expires_at=None)
+            self._events[job["id"]] = []
+        return job["id"], True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def transition(self, job_id: str, from_statuses: Iterable[str], to_status: str, **fields) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.get("status") not in tuple(from_statuses):
+                return False
+            job.update(fields, status=to_status, expires_at=self.expiry_for(to_status))
+            return True
+
+    def claim(self, job_id: str, **fields) -> bool:
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            stale = job.get("status") == "running" and (job.get("heartbeat_at") or 0) < now - self.lease_seconds
+            if job.get("status") not in RUNNABLE_STATUSES and not stale:
+                return False
+            job.update(fields, status="running", heartbeat_at=now, expires_at=None)
+            return True
+
+    def append_event(self, job_id: str, event: Dict[str, Any]):
+        with self._lock:
+            self._events.setdefault(job_id, []).append(event)
+
+    def get_events(self, job_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events.get(job_id, [])[start:])
+
+    def cleanup_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.get("expires_at") and job["expires_at"] <= now]
+            for job_id in expired:
+                job = self._jobs.pop(job_id)
+                self._events.pop(job_id, None)
+                if job.get("idempotency_key") and self._idempotency_keys.get(job["idempotency_key"]) == job_id:
+                    del self._idempotency_keys[job["idempotency_key"]]
+        return len(expired)
+
+# Atomically checks the status field against the allowed list before writing the new fields.
+_REDIS_TRANSITION_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'status')
+if not current then return 0 end
+local n = tonumber(ARGV[1])
+for i = 2, n + 1 do
+  if ARGV[i] == current then
+    for j = n + 2, #ARGV, 2 do
+      redis.call('HSET', KEYS[1], ARGV[j], ARGV[j + 1])
+    end
+    return 1
+  end
+end
+return 0
+"""
+
+# Claims a runnable job, or a running one whose heartbeat is older than ARGV[1], then writes the fields.
+_REDIS_CLAIM_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'status')
+if not current then return 0 end
+local claimable = false
+if current == '"running"' then
+  local heartbeat = tonumber(redis.call('HGET', KEYS[1], 'heartbeat_at') or '')
+  claimable = heartbeat == nil or heartbeat < tonumber(ARGV[1])
+else
+  local n = tonumber(ARGV[2])
+  for i = 3, n + 2 do
+    if ARGV[i] == current then claimable = true end
+  end
+end
+if not claimable then return 0 end
+for j = tonumber(ARGV[2]) + 3, #ARGV, 2 do
+  redis.call('HSET', KEYS[1], ARGV[j], ARGV[j + 1])
+end
+return 1
+"""
+
+class RedisJobStore(BaseJobStore):
+    """
+    // [TASK]: Redis-backed job store shared by API and Celery worker processes
+    // [GOAL]: Make job status, results and progress events visible across processes
+
+    Each job is a hash (JSON-encoded fields) plus an event list; terminal jobs expire after ttl_seconds.
+    """
+    def __init__(self, url: str, key_prefix: str = "job", **kwargs):
+        super().__init__(**kwargs)
+        import redis # Imported lazily so the other stores work without redis installed
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.key_prefix = key_prefix
+        self._transition_script = self.client.register_script(_REDIS_TRANSITION_SCRIPT)
+        self._claim_script = self.client.register_script(_REDIS_CLAIM_SCRIPT)
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.key_prefix}:{job_id}"
+
+    def _events_key(self, job_id: str) -> str:
+        return f"{self.key_prefix}:{job_id}:events"
+
+    def _idempotency_key(self, key: str) -> str:
+        return f"{self.key_prefix}:idempotency:{key}"
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {k: json.dumps(v, default=str) for k, v in fields.items()}
+
+    def create(self, job: Dict[str, Any], idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+        if idempotency_key:
+            idem_key = self._idempotency_key(idempotency_key)
+            if not self.client.set(idem_key, job["id"], nx=True, ex=int(self.ttl_seconds)):
+                existing_id = self.client.get(idem_key)
+                existing = self.get(existing_id) if existing_id else None
+                if existing and existing.get("status") != "failed":
+                    return existing_id, False
+                self.client.set(idem_key, job["id"], ex=int(self.ttl_seconds))
+        self.client.hset(self._key(job["id"]), mapping=self._encode(dict(job, idempotency_key=idempotency_key)))
+        return job["id"], True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.client.hgetall(self._key(job_id))
+        return {k: json.loads(v) for k, v in raw.items()} if raw else None
+
+    def update(self, job_id: str, **fields):
+        if fields:
+            self.client.hset(self._key(job_id), mapping=self._encode(fields))
+
+    def transition(self, job_id: str, from_statuses: Iterable[str], to_status: str, **fields) -> bool:
+        from_statuses = [json.dumps(s) for s in from_statuses]
+        pairs = [item for kv in self._encode(dict(fields, status=to_status)).items() for item in kv]
+        applied = bool(self._transition_script(keys=[self._key(job_id)], args=[len(from_statuses), *from_statuses, *pairs]))
+        if applied and to_status in TERMINAL_STATUSES:
+            pipe = self.client.pipeline()
+            pipe.expire(self._key(job_id), int(self.ttl_seconds))
+            pipe.expire(self._events_key(job_id), int(self.ttl_seconds))
+            pipe.execute()
+        return applied
+
+    def claim(self, job_id: str, **fields) -> bool:
+        now = time.time()
+        runnable = [json.dumps(s) for s in RUNNABLE_STATUSES]
+        pairs = [item for kv in self._encode(dict(fields, status="running", heartbeat_at=now)).items() for item in kv]
+        return bool(self._claim_script(keys=[self._key(job_id)], args=[now - self.lease_seconds, len(runnable), *runnable, *pairs]))
+
+    def append_event(self, job_id: str, event: Dict[str, Any]):
+        self.client.rpush(self._events_key(job_id), json.dumps(event, default=str))
+
+    def get_events(self, job_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        return [json.loads(e) for e in self.client.lrange(self._events_key(job_id), start, -1)]
+
+class JobRecord(Base):
+    __tablename__ = "job_records"
+
+    id = Column(String(36), primary_key=True)
+    type = Column(String(100), nullable=False)
+    status = Column(String(20), index=True, nullable=False)
+    stage = Column(String(100), nullable=True)
+    progress = Column(Integer, default=0)
+    payload = Column(Text, nullable=True) # JSON
+    result = Column(Text, nullable=True) # JSON
+    error = Column(Text, nullable=True)
+    idempotency_key = Column(String(255), unique=True, nullable=True)
+    created_at = Column(Float, nullable=False)
+    started_at = Column(Float, nullable=True)
+    heartbeat_at = Column(Float, nullable=True) # Lease renewal by the worker running the job
+    finished_at = Column(Float, nullable=True)
+    expires_at = Column(Float, index=True, nullable=True)
+
+class JobEventRecord(Base):
+    __tablename__ = "job_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(String(36), index=True, nullable=False)
+    data = Column(Text, nullable=False) # JSON
+
+class SQLJobStore(BaseJobStore):
+    """
+    // [TASK]: SQL-backed job store
+    // [GOAL]: Durable, cross-process job state when Redis is not configured
+    """
+    _JSON_FIELDS = ("payload", "result")
+    _COLUMNS = ("id", "type", "status", "stage", "progress", "payload", "result", "error", "idempotency_key", "created_at", "started_at", "heartbeat_at", "finished_at", "expires_at")
+
+    def __init__(self, session_factory=SessionLocal, bind=engine, **kwargs):
+        super().__init__(**kwargs)
+        self.session_factory = session_factory
+        self.bind = bind
+
+    def initialize(self):
+        Base.metadata.create_all(bind=self.bind, tables=[JobRecord.__table__, JobEventRecord.__table__])
+
+    def _to_columns(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        columns = {}
+        for key, value in fields.items():
+            if key not in self._COLUMNS:
+                continue
+            columns[key] = json.dumps(value, default=str) if key in self._JSON_FIELDS and value is not None else value
+        return columns
+
+    def _to_job(self, record: JobRecord) -> Dict[str, Any]:
+        job = {column: getattr(record, column) for column in self._COLUMNS}
+        for key in self._JSON_FIELDS:
+            job[key] = json.loads(job[key]) if job[key] else None
+        return job
+
+    def create(self, job: Dict[str, Any], idempotency_key: Optional[str] = None) -> Tuple[str, bool]:
+        db = self.session_factory()
+        try:
+            if idempotency_key:
+                existing = db.query(JobRecord).filter(JobRecord.idempotency_key == idempotency_key).first()
+                if existing and existing.status != "failed":
+                    return existing.id, False
+                if existing:
+                    existing.idempotency_key = None # Failed attempts release the key for a fresh run
+            db.add(JobRecord(**self._to_columns(dict(job, idempotency_key=idempotency_key))))
+            db.commit()
+            return job["id"], True
+        except IntegrityError:
+            # A concurrent submission claimed the key first
+            db.rollback()
+            existing = db.query(JobRecord).filter(JobRecord.idempotency_key == idempotency_key).first()
+            if existing is None:
+                raise
+            return existing.id, False
+        finally:
+            db.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            record = db.get(JobRecord, job_id)
+            return self._to_job(record) if record else None
+        finally:
+            db.close()
+
+    def update(self, job_id: str, **fields):
+        columns = self._to_columns(fields)
+        if not columns:
+            return
+        db = self.session_factory()
+        try:
+            db.query(JobRecord).filter(JobRecord.id == job_id).update(columns, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def transition(self, job_id: str, from_statuses: Iterable[str], to_status: str, **fields) -> bool:
+        columns = self._to_columns(dict(fields, status=to_status, expires_at=self.expiry_for(to_status)))
+        db = self.session_factory()
+        try:
+            # Conditional UPDATE is the compare-and-set: only one writer can move the job out of from_statuses
+            updated = (
+                db.query(JobRecord)
+                  .filter(JobRecord.id == job_id, JobRecord.status.in_(tuple(from_statuses)))
+                  .update(columns, synchronize_session=False)
+            )
+            db.commit()
+            return updated == 1
+        finally:
+            db.close()
+
+    def claim(self, job_id: str, **fields) -> bool:
+        now = time.time()
+        columns = self._to_columns(dict(fields, status="running", heartbeat_at=now, expires_at=None))
+        lease_lapsed = and_(
+            JobRecord.status == "running",
+            or_(JobRecord.heartbeat_at.is_(None), JobRecord.heartbeat_at < now - self.lease_seconds),
+        )
+        db = self.session_factory()
+        try:
+            updated = (
+                db.query(JobRecord)
+                  .filter(JobRecord.id == job_id, or_(JobRecord.status.in_(RUNNABLE_STATUSES), lease_lapsed))
+                  .update(columns, synchronize_session=False)
+            )
+            db.commit()
+            return updated == 1
+        finally:
+            db.close()
+
+    def append_event(self, job_id: str, event: Dict[str, Any]):
+        db = self.session_factory()
+        try:
+            db.add(JobEventRecord(job_id=job_id, data=json.dumps(event, default=str)))
+            db.commit()
+        finally:
+            db.close()
+
+    def get_events(self, job_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(JobEventRecord.data)
+                  .filter(JobEventRecord.job_id == job_id)
+                  .order_by(JobEventRecord.id)
+                  .offset(start)
+                  .all()
+            )
+            return [json.loads(row.data) for row in rows]
+        finally:
+            db.close()
+
+    def cleanup_expired(self) -> int:
+        db = self.session_factory()
+        try:
+            expired_ids = [row.id for row in db.query(JobRecord.id).filter(JobRecord.expires_at <= time.time()).all()]
+            if expired_ids:
+                db.query(JobEventRecord).filter(JobEventRecord.job_id.in_(expired_ids)).delete(synchronize_session=False)
+                db.query(JobRecord).filter(JobRecord.id.in_(expired_ids)).delete(synchronize_session=False)
+                db.commit()
+            return len(expired_ids)
+        finally:
+            db.close()
+
+def create_job_store():
+    backend = config.jobs.get("store_backend", "redis")
+    options = {
+        "ttl_seconds": config.jobs.get("ttl_seconds", 86400),
+        "progress_min_interval_seconds": config.jobs.get("progress_min_interval_seconds", 1.0),
+        "lease_seconds": config.jobs.get("lease_seconds", 120),
+    }
+    if backend == "memory":
+        return InMemoryJobStore(**options)
+
+    redis_url = config.redis.get("url") if config.get("redis") else None
+    if backend == "redis" and isinstance(redis_url, str) and "://" in redis_url:
+        try:
+            return RedisJobStore(redis_url, **options)
+        except Exception as e:
+            logger.warning(f"Redis job store unavailable ({e}); falling back to SQL job store.")
+    elif backend == "redis":
+        logger.warning("No Redis URL configured for the job store; falling back to SQL job store.")
+    return SQLJobStore(**options)
+
+job_store = create_job_store()
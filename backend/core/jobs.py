@@ -1,51 +1,116 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import asyncio
+import contextlib
+import functools
+import json
+import threading
+import time
 import uuid
 import logging
+from celery.signals import worker_init
 from backend.depwatcher.patcher import apply_patch_plan
 from backend.depwatcher.approvals import _patch_plans # Access the in-memory storage
 from celery_app import app, PRIORITY_QUEUE_MAP # Import Celery app and priority map
 from backend.core.jobs_hooks import record_usage_cost # Import record_usage_cost
+from backend.core.job_store import job_store, TERMINAL_STATUSES
 from database import SessionLocal # Import SessionLocal
 
 logger = logging.getLogger(__name__)
 
-# In-memory job storage (replace with database in production)
-jobs_storage: Dict[str, Dict[str, Any]] = {}
+_orchestrator = None
+
+def _get_orchestrator():
+    # Built on first video job so importing this module stays cheap for the API and other job types
+    global _orchestrator
+    if _orchestrator is None:
+        from pipeline_orchestrator import PipelineOrchestrator
+        _orchestrator = PipelineOrchestrator()
+    return _orchestrator
+
+def _run_generate_video(job_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    def on_progress(stage: str, progress: int, detail: Optional[str] = None):
+        job_store.report_progress(job_id, stage, progress, detail)
+
+    result = asyncio.run(_get_orchestrator().run_pipeline(
+        input_type=payload["input_type"],
+        input_data=payload["input_data"],
+        user_preferences=payload.get("user_preferences"),
+        api_call=True,
+        progress_callback=on_progress,
+    ))
+    if result.get("status") == "error":
+        raise RuntimeError(result.get("message", "Pipeline failed"))
+    return result
+
+@worker_init.connect
+def _initialize_job_store(**kwargs):
+    # Job store tables are created when a worker boots, not as a side effect of importing this module
+    job_store.initialize()
+
+@contextlib.contextmanager
+def _lease_heartbeat(job_id: str):
+    # Renews the job's lease while this worker runs it; if the worker dies the lease lapses and the job can be reclaimed
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(job_store.lease_seconds / 4):
+            try:
+                job_store.heartbeat(job_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join(timeout=5)
 
 @app.task(bind=True) # Make this a Celery task
 def process_job_task(self, job_id: str, job_type: str, payload: Dict[str, Any], telemetry_tags: Dict[str, Any]):
-    job = jobs_storage[job_id]
+    # Atomic claim: a redelivered or duplicate task for a job that already ran is a no-op,
+    # while a job left "running" by a worker that died is taken over once its lease lapses
+    if not job_store.claim(job_id, started_at=time.time()):
+        job = job_store.get(job_id) or {}
+        if job.get("status") == "running" and not self.request.is_eager:
+            # Redelivered after a worker loss, before the dead worker's lease ran out: check again once it has
+            countdown = max(job_store.lease_remaining(job), 0) + 1
+            logger.info(f"Job {job_id} ({job_type}) is leased by another worker; rechecking in {countdown:.0f}s.")
+            raise self.retry(countdown=countdown, max_retries=None)
+        logger.info(f"Skipping job {job_id} ({job_type}); status is {job.get('status', 'missing')}.")
+        return job.get("result")
+
     db = SessionLocal() # Create a new session for the task
     try:
-        job["status"] = "running"
         logger.info(f"Processing job {job_id} ({job_type}) with tags: {telemetry_tags}")
-        job["progress"] = 0 # Reset progress for actual work
+        job_store.report_progress(job_id, "running", 0) # Reset progress for actual work
 
-        if job_type == "APPLY_PATCH_PLAN":
-            plan_id = payload.get("plan_id")
-            if not plan_id:
-                raise ValueError("Patch plan ID not provided in payload.")
+        with _lease_heartbeat(job_id):
+            if job_type == "GENERATE_VIDEO":
+                job_result = _run_generate_video(job_id, payload)
+            elif job_type == "APPLY_PATCH_PLAN":
+                plan_id = payload.get("plan_id")
+                if not plan_id:
+                    raise ValueError("Patch plan ID not provided in payload.")
             
-            # Retrieve the PatchPlan object from in-memory storage
-            patch_plan = next((p for p in _patch_plans if p.id == plan_id), None)
-            if not patch_plan:
-                raise ValueError(f"Patch plan with ID {plan_id} not found.")
-
-            # apply_patch_plan is async, but Celery tasks are sync. Need to run it in an event loop.
-            # For simplicity, we'll use asyncio.run here, but in a real Celery worker,
-            # you'd typically use a library like `celery-gevent` or `eventlet` for async tasks.
-            import asyncio
-            asyncio.run(apply_patch_plan(patch_plan))
-            job["result"] = {"message": "Patch applied successfully"}
-        else:
-            # Simulate work for other job types
-            import time
-            time.sleep(2) 
-            job["progress"] = 100
-            job["result"] = {"message": f"Processed {job_type} (simulated)"}
-
-        job["status"] = "completed"
-        job["progress"] = 100
+                # Retrieve the PatchPlan object from in-memory storage
+                patch_plan = next((p for p in _patch_plans if p.id == plan_id), None)
+                if not patch_plan:
+                    raise ValueError(f"Patch plan with ID {plan_id} not found.")
+
+                # apply_patch_plan is async, but Celery tasks are sync. Need to run it in an event loop.
+                # For simplicity, we'll use asyncio.run here, but in a real Celery worker,
+                # you'd typically use a library like `celery-gevent` or `eventlet` for async tasks.
+                asyncio.run(apply_patch_plan(patch_plan))
+                job_result = {"message": "Patch applied successfully"}
+            else:
+                # Simulate work for other job types
+                time.sleep(2) 
+                job_result = {"message": f"Processed {job_type} (simulated)"}
+
+        job_store.transition(job_id, ("running",), "completed", result=job_result, finished_at=time.time())
+        job_store.report_progress(job_id, "completed", 100)
         logger.info(f"Job {job_id} ({job_type}) completed.")
 
         # Record usage cost after successful completion
@@ -70,8 +135,10 @@ def process_job_task(self, job_id: str, job_type: str, payload: Dict[str, Any],
         ))
 
     except Exception as e:
-        job["status"] = "failed"
-        job["error"] = str(e)
+        retries_left = self.request.retries < telemetry_tags.get("maxRetries", 1)
+        job_status = "retrying" if retries_left else "failed"
+        job_store.transition(job_id, ("running",), job_status, error=str(e), finished_at=None if retries_left else time.time())
+        job_store.report_progress(job_id, job_status, 0 if retries_left else 100, str(e))
         logger.error(f"Job {job_id} ({job_type}) failed: {e}")
         
         # Record usage cost for failed job (if applicable, e.g., partial cost)
@@ -94,23 +161,35 @@ def process_job_task(self, job_id: str, job_type: str, payload: Dict[str, Any],
             actual_cost_usd=0.0 # Or a partial cost if applicable
         ))
 
-        # Celery retry logic
-        raise self.retry(exc=e, countdown=5, max_retries=self.request.retries + 1) # Example retry
+        # Celery retry logic, bounded by the tier's retry budget
+        if retries_left:
+            raise self.retry(exc=e, countdown=5, max_retries=telemetry_tags.get("maxRetries", 1))
     finally:
         db.close() # Close the session
 
-async def enqueue_job(job_type: str, payload: Dict[str, Any], user_tier_code: str = "FREE") -> str:
+async def enqueue_job(job_type: str, payload: Dict[str, Any], user_tier_code: str = "FREE", idempotency_key: Optional[str] = None) -> str:
+    """
+    Creates and dispatches a job. When `idempotency_key` matches an earlier job that has not failed,
+    that job's id is returned instead and nothing is re-run (its cached result is served by get_job_status).
+    """
+    job_store.maybe_cleanup()
     job_id = str(uuid.uuid4())
     job = {
         "id": job_id,
         "type": job_type,
         "status": "pending",
+        "stage": "queued",
         "progress": 0,
         "payload": payload,
         "result": None,
-        "error": None
+        "error": None,
+        "created_at": time.time(),
     }
-    jobs_storage[job_id] = job
+    job_id, created = job_store.create(job, idempotency_key=idempotency_key)
+    if not created:
+        logger.info(f"Idempotent resubmission of {job_type}; reusing job {job_id}")
+        return job_id
+    job_store.report_progress(job_id, "queued", 0)
     logger.info(f"Job enqueued: {job_type} with ID {job_id}")
 
     # Determine queue and retries based on tier
@@ -123,17 +202,47 @@ async def enqueue_job(job_type: str, payload: Dict[str, Any], user_tier_code: st
         "userId": payload.get("user_id", "anonymous"), # Assuming user_id is in payload
         "tier": user_tier_code,
         "taskType": job_type,
+        "maxRetries": max_retries,
         # Add model@version, provider if available in payload
     }
 
-    # Dispatch Celery task
-    process_job_task.apply_async(
+    dispatch = functools.partial(
+        process_job_task.apply_async,
         args=[job_id, job_type, payload, telemetry_tags],
         queue=queue_name,
-        max_retries=max_retries,
         # Add DLQ routing if configured in celery_app.py
     )
+    if app.conf.task_always_eager:
+        # Eager tasks run inline; keep them off the event loop so submission still returns immediately
+        asyncio.get_running_loop().run_in_executor(None, dispatch)
+    else:
+        dispatch()
     return job_id
 
 async def get_job_status(job_id: str) -> Dict[str, Any]:
-    return jobs_storage.get(job_id, {"status": "not_found"})
\ No newline at end of file
+    # Redis and SQL job stores are synchronous clients; keep their round trips off the event loop
+    return await asyncio.to_thread(job_store.get, job_id) or {"status": "not_found"}
+
+async def get_job_events(job_id: str, start: int = 0):
+    return await asyncio.to_thread(job_store.get_events, job_id, start)
+
+async def stream_job_events(job_id: str, poll_interval: float = 0.5):
+    """
+    // [TASK]: Server-sent events for one job: progress events, then its terminal status
+    // [GOAL]: The stream always ends, including when the job expires or is deleted mid-stream
+    """
+    sent = 0
+    while True:
+        events = await get_job_events(job_id, sent)
+        for event in events:
+            yield f"event: progress\ndata: {json.dumps(event, default=str)}\n\n"
+        sent += len(events)
+
+        job = await get_job_status(job_id)
+        if job.get("status") == "not_found":
+            yield f"event: error\ndata: {json.dumps({'error': 'job not found', 'job_id': job_id})}\n\n"
+            return
+        if job.get("status") in TERMINAL_STATUSES and not events:
+            yield f"event: {job['status']}\ndata: {json.dumps({'result': job.get('result'), 'error': job.get('error')}, default=str)}\n\n"
+            return
+        await asyncio.sleep(poll_interval)
\ No newline at end of file
@@ -4,6 +4,7 @@ from datetime import datetime
 
 from backend.ai.models import UsageCost
 from backend.costs.provider_costs import provider_costs_service
+from backend.services.quota_service import quota_service
 from logging_setup import get_logger
 
 logger = get_logger(__name__)
@@ -40,6 +41,11 @@ async def record_usage_cost(
     db.add(usage_cost)
     db.commit()
     db.refresh(usage_cost)
+    try:
+        await quota_service.add_monthly_cost(user_id, estimated_cost_usd)
+    except Exception as e:
+        # The counter re-seeds from usage_costs after cost_resync_seconds, so a miss only delays the cap
+        logger.warning(f"Could not update running monthly cost for {user_id}: {e}")
     logger.info(f"Recorded usage cost for job {job_id}: {estimated_cost_usd:.4f} USD for {amount} {metric} of {task_type}")
 
 # TODO: Implement pre-job budget check in PolicyResolverMiddleware
@@ -0,0 +1,10 @@
+from database import SessionLocal
+from backend.services.usage_analytics import usage_analytics
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        written = usage_analytics.backfill_from_audit_logs(db)
+    finally:
+        db.close()
+    print(f"✅ Backfilled {written} daily usage rollups from audit logs.")
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from backend.depwatcher.schemas import PatchCandidate, PatchPlan
 from datetime import datetime
 import uuid
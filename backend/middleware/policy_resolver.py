@@ -1,99 +1,163 @@
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import HTTPException
 from starlette.responses import JSONResponse
-from typing import Callable, Awaitable
+from starlette.types import ASGIApp, Receive, Scope, Send
+from typing import Callable, Dict, Optional, Tuple
 from logging_setup import get_logger
 from config_loader import get_config
-from billing_models import get_user_subscription, get_default_plans # Assuming these are accessible
+from billing_models import Plan, get_user_subscription, get_default_plans # Assuming these are accessible
 from backend.services.quota_service import quota_service # Import quota_service
 
 logger = get_logger(__name__)
 config = get_config()
 
-class PolicyResolverMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Awaitable[JSONResponse]]):
-        # Skip policy resolution for health checks, docs, openapi, auth, or static files
-        if (
-            request.url.path.startswith("/health")
-            or request.url.path.startswith("/static")
-            or request.url.path.startswith("/docs")
-            or request.url.path.startswith("/openapi")
-            or request.url.path.startswith("/token")
-            or request.url.path.startswith("/register")
-            or request.url.path.startswith("/superadmin/token")
-        ):
-            return await call_next(request)
+# Skip policy resolution for health checks, docs, openapi, auth, or static files
+EXEMPT_PREFIXES = ("/health", "/static", "/docs", "/openapi", "/token", "/register", "/superadmin/token")
+
+
+@dataclass(frozen=True)
+class PlanIndex:
+    """
+    // [TASK]: Compile the plan catalogue once
+    // [GOAL]: O(1) plan lookup by name instead of scanning get_default_plans() per request
+    """
+    by_name: Dict[str, Plan]
+    free: Plan
+
+    @classmethod
+    def build(cls) -> "PlanIndex":
+        plans = get_default_plans()
+        free = next((p for p in plans if p.tier_code == "FREE"), None)
+        if not free:
+            logger.critical("FREE tier plan not found in default plans. System misconfiguration.")
+            raise HTTPException(status_code=500, detail="System misconfiguration: FREE plan not found.")
+        return cls({p.name: p for p in plans}, free)
+
+
+class PolicyResolverMiddleware:
+    """
+    // [TASK]: Attach the caller's plan to request.state and pre-check quotas
+    // [GOAL]: Bounded per-request cost: cached plan index and per-user policies, running cost counter
+
+    Plain ASGI middleware: BaseHTTPMiddleware's per-request task group and body streams cost
+    more than the policy lookup itself. Resolved policies are kept for ttl_seconds (LRU bounded
+    by max_entries) and are dropped early by invalidate_user() or, for everyone, invalidate().
+    """
+
+    def __init__(self, app: ASGIApp, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        settings = config.policy if isinstance(config.policy, dict) else {}
+        self.app = app
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.get("cache_ttl_seconds", 60)
+        self.max_entries = max_entries if max_entries is not None else settings.get("cache_max_users", 100_000)
+        self.clock = clock
+        self._index: Optional[PlanIndex] = None
+        self._version = 0
+        # user_id -> (plan, expires_at, catalogue version it was resolved against)
+        self._policies: "OrderedDict[str, Tuple[Plan, float, int]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
 
-        # Get user ID from request state (Starlette State is attribute-based)
-        user_id = getattr(request.state, "user_id", None)
+    def invalidate(self):
+        """The plan catalogue changed: recompile it and re-resolve every user on next request."""
+        self._version += 1
+        self._index = None
+        self._policies.clear()
 
-        user_plan = None
+    def invalidate_user(self, user_id: str):
+        """The user's subscription changed."""
+        self._policies.pop(user_id, None)
+
+    def plan_index(self) -> PlanIndex:
+        if self._index is None:
+            self._index = PlanIndex.build()
+        return self._index
+
+    def resolve(self, user_id: Optional[str]) -> Plan:
+        index = self.plan_index()
         if not user_id:
             # For unauthenticated requests, apply default FREE tier policy
-            all_plans = get_default_plans()
-            user_plan = next((p for p in all_plans if p.tier_code == "FREE"), None)
-            if not user_plan:
-                logger.critical("FREE tier plan not found in default plans. System misconfiguration.")
-                raise HTTPException(status_code=500, detail="System misconfiguration: FREE plan not found.")
             logger.debug("Unauthenticated request. Applying FREE tier policy.")
-        else:
-            # Fetch user's subscription and determine tier
-            user_subscription = get_user_subscription(user_id)
-            all_plans = get_default_plans()
-            user_plan = next((p for p in all_plans if p.name == user_subscription.plan_name), None)
-
-            if not user_plan:
-                logger.error(f"User {user_id} has an unknown plan: {user_subscription.plan_name}. Defaulting to FREE tier.")
-                user_plan = next((p for p in all_plans if p.tier_code == "FREE"), None)
-                if not user_plan:
-                    logger.critical("FREE tier plan not found in default plans. System misconfiguration.")
-                    raise HTTPException(status_code=500, detail="System misconfiguration: FREE plan not found.")
-
-        # Attach user_plan to request state for downstream access
-        request.state.user_plan = user_plan
-
-        # --- Enforce Quotas and Rate Limits (Pre-check) ---
-        # Apply these checks only to resource-consuming endpoints
-        if request.url.path == "/generate_video": # Example: apply to video generation
-            # Get a database session for cost checks
-            db = None
-            try:
-                db = SessionLocal()
-                # Cost Cap Check
-                if user_plan.cost_caps.monthlyUsd > 0:
-                    current_monthly_cost = await get_user_monthly_cost(user_id if user_id else "anonymous", db)
-                    if current_monthly_cost >= user_plan.cost_caps.monthlyUsd:
-                        if user_plan.cost_caps.hardStop:
-                            logger.warning(f"Hard stop: User {user_id} exceeded monthly cost cap of {user_plan.cost_caps.monthlyUsd} USD. Current: {current_monthly_cost}")
-                            raise HTTPException(status_code=403, detail="Monthly cost cap exceeded. Please upgrade your plan.")
-                        else:
-                            logger.warning(f"Soft throttle: User {user_id} exceeded monthly cost cap of {user_plan.cost_caps.monthlyUsd} USD. Current: {current_monthly_cost}")
-                            # Implement soft throttling logic here (e.g., downgrade priority, reduce quality)
-
-                # Rate Limit Check
-                if not await quota_service.check_rate_limit(
-                    user_id=user_id if user_id else "anonymous",
-                    rpm_limit=user_plan.quotas.rateLimit.rpm,
-                    rps_limit=user_plan.quotas.rateLimit.rps,
-                    burst_limit=user_plan.quotas.rateLimit.burst
-                ):
-                    raise HTTPException(status_code=429, detail="Too Many Requests. Please try again later or upgrade your plan.")
-                
-                # Quota Check (for jobs metric, assuming 1 job per video generation request)
-                # This is a provisional check. Finalization happens after job completion.
-                if not await quota_service.check_and_increment_quota(
-                    user_id=user_id if user_id else "anonymous",
-                    metric="jobs",
-                    amount=1,
-                    monthly_limit=user_plan.quotas.monthly.jobs
-                ):
-                    raise HTTPException(status_code=429, detail="Monthly job quota exceeded. Please upgrade your plan.")
-            finally:
-                if db: db.close()
-            
-            # TODO: Record provisional usage here for the specific job
-            # This would require the job_id to be known at this stage, or passed later.
-            # For now, check_and_increment_quota acts as a provisional increment.
+            return index.free
+
+        now = self.clock()
+        cached = self._policies.get(user_id)
+        if cached and cached[1] > now and cached[2] == self._version:
+            self._policies.move_to_end(user_id)
+            self.stats["hits"] += 1
+            return cached[0]
+
+        self.stats["misses"] += 1
+        # Fetch user's subscription and determine tier
+        user_subscription = get_user_subscription(user_id)
+        user_plan = index.by_name.get(user_subscription.plan_name)
+        if not user_plan:
+            logger.error(f"User {user_id} has an unknown plan: {user_subscription.plan_name}. Defaulting to FREE tier.")
+            user_plan = index.free
+
+        self._policies[user_id] = (user_plan, now + self.ttl_seconds, self._version)
+        self._policies.move_to_end(user_id)
+        while len(self._policies) > self.max_entries:
+            self._policies.popitem(last=False)
+        return user_plan
+
+    async def enforce_quotas(self, user_id: str, user_plan: Plan):
+        # Cost Cap Check
+        if user_plan.cost_caps.monthlyUsd > 0:
+            current_monthly_cost = await quota_service.get_monthly_cost(user_id)
+            if current_monthly_cost >= user_plan.cost_caps.monthlyUsd:
+                if user_plan.cost_caps.hardStop:
+                    logger.warning(f"Hard stop: User {user_id} exceeded monthly cost cap of {user_plan.cost_caps.monthlyUsd} USD. Current: {current_monthly_cost}")
+                    raise HTTPException(status_code=403, detail="Monthly cost cap exceeded. Please upgrade your plan.")
+                else:
+                    logger.warning(f"Soft throttle: User {user_id} exceeded monthly cost cap of {user_plan.cost_caps.monthlyUsd} USD. Current: {current_monthly_cost}")
+                    # Implement soft throttling logic here (e.g., downgrade priority, reduce quality)
+
+        # Rate Limit Check
+        if not await quota_service.check_rate_limit(
+            user_id=user_id,
+            rpm_limit=user_plan.quotas.rateLimit.rpm,
+            rps_limit=user_plan.quotas.rateLimit.rps,
+            burst_limit=user_plan.quotas.rateLimit.burst
+        ):
+            raise HTTPException(status_code=429, detail="Too Many Requests. Please try again later or upgrade your plan.")
+
+        # Quota Check (for jobs metric, assuming 1 job per video generation request)
+        # This is a provisional check. Finalization happens after job completion.
+        if not await quota_service.check_and_increment_quota(
+            user_id=user_id,
+            metric="jobs",
+            amount=1,
+            monthly_limit=user_plan.quotas.monthly.jobs
+        ):
+            raise HTTPException(status_code=429, detail="Monthly job quota exceeded. Please upgrade your plan.")
+
+        # TODO: Record provisional usage here for the specific job
+        # This would require the job_id to be known at this stage, or passed later.
+        # For now, check_and_increment_quota acts as a provisional increment.
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        # Starlette's request.state reads and writes this dict
+        state = scope.setdefault("state", {})
+        user_id = state.get("user_id")
+        try:
+            user_plan = self.resolve(user_id)
+            # Attach user_plan to request state for downstream access
+            state["user_plan"] = user_plan
+
+            # --- Enforce Quotas and Rate Limits (Pre-check) ---
+            # Apply these checks only to resource-consuming endpoints
+            if scope["path"] == "/generate_video": # Example: apply to video generation
+                await self.enforce_quotas(user_id if user_id else "anonymous", user_plan)
+        except HTTPException as e:
+            # Middleware sits outside the app's exception handlers; answer directly
+            await JSONResponse({"detail": e.detail}, status_code=e.status_code)(scope, receive, send)
+            return
 
         # TODO: Implement full policy resolution logic here:
         # 1. Decide: pinned vs latest vs allow_minor (semver compare).
@@ -101,5 +165,54 @@ class PolicyResolverMiddleware(BaseHTTPMiddleware):
         # 3. Attach to req.ctx: { taskType, model, version, providers[], priorityQueue, costBudget }.
         # 4. If policy forbids unverified models and chosen is unverified → downgrade to next provider.
 
-        response = await call_next(request)
-        return response
+        await self.app(scope, receive, send)
+
+
+async def benchmark_policy_middleware(app: Optional[ASGIApp] = None, users: int = 1000, requests: int = 20000,
+                                      path: str = "/api/jobs") -> Dict[str, float]:
+    """
+    Drives `app` in-process with and without the middleware across `users` distinct callers and
+    reports the middleware's per-request overhead. Defaults to a bare ASGI endpoint so the
+    numbers isolate the middleware; pass the real app (without this middleware) for end-to-end share.
+    """
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    inner = app or endpoint
+    middleware = PolicyResolverMiddleware(inner)
+
+    async def drive(target: ASGIApp):
+        timings = []
+        for i in range(requests):
+            scope = {"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b"",
+                     "state": {"user_id": f"bench_user_{i % users}"}}
+            started = time.perf_counter()
+            await target(scope, receive, send)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        return sum(timings) / len(timings), timings[int(len(timings) * 0.99)]
+
+    bare_mean, bare_p99 = await drive(inner)
+    wrapped_mean, wrapped_p99 = await drive(middleware)
+    return {
+        "app_mean_us": round(bare_mean, 2),
+        "with_middleware_mean_us": round(wrapped_mean, 2),
+        "middleware_mean_us": round(wrapped_mean - bare_mean, 2),
+        "middleware_p99_us": round(wrapped_p99 - bare_p99, 2),
+        "middleware_share": round((wrapped_mean - bare_mean) / wrapped_mean, 3),
+        "policy_cache_hit_rate": round(middleware.stats["hits"] / requests, 3),
+    }
+
+
+if __name__ == "__main__":
+    import asyncio
+    import json
+
+    print(json.dumps(asyncio.run(benchmark_policy_middleware()), indent=2))
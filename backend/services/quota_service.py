@@ -1,6 +1,8 @@
+import asyncio
+import time
 import redis.asyncio as redis
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from logging_setup import get_logger
 from config_loader import get_config
 from sqlalchemy.orm import Session
@@ -11,15 +13,17 @@ logger = get_logger(__name__)
 config = get_config()
 
 class _NoopPipeline:
-    async def zadd(self, *args, **kwargs):
-        return 0
-    async def zcard(self, *args, **kwargs):
-        return 0
-    async def expire(self, *args, **kwargs):
-        return True
+    def zremrangebyscore(self, *args, **kwargs):
+        return self
+    def zadd(self, *args, **kwargs):
+        return self
+    def zcard(self, *args, **kwargs):
+        return self
+    def expire(self, *args, **kwargs):
+        return self
     async def execute(self):
-        # Return two zeros for zcard results at the end
-        return [None, None, None, None, 0, 0]
+        # zremrangebyscore x2, zadd x2, zcard x2, expire x2
+        return [0, 0, 0, 0, 0, 0, True, True]
 
 class _NoopAsyncRedis:
     async def incrby(self, *args, **kwargs):
@@ -36,9 +40,20 @@ class _NoopAsyncRedis:
         return 1
     async def decrby(self, *args, **kwargs):
         return 0
+    async def incrbyfloat(self, *args, **kwargs):
+        return 0.0
+    async def get(self, *args, **kwargs):
+        return None
+    async def exists(self, *args, **kwargs):
+        return 0
 
 class QuotaService:
     def __init__(self):
+        settings = config.policy if isinstance(config.policy, dict) else {}
+        self.cost_cache_seconds = settings.get("cost_cache_seconds", 5)
+        self.cost_resync_seconds = settings.get("cost_resync_seconds", 3600)
+        # (user_id, month key) -> (running monthly cost in USD, cached at)
+        self._monthly_costs: Dict[str, Tuple[float, float]] = {}
         # Initialize Redis client safely; fall back to Noop to avoid crashing the server
         try:
             url = getattr(config, 'redis', None) and getattr(config.redis, 'url', None)
@@ -48,6 +63,9 @@ class QuotaService:
         except Exception as e:
             logger.warning(f"Redis disabled: {e}. Falling back to Noop client; rate limits/quotas won't be enforced.")
             self.redis_client = _NoopAsyncRedis()
+        if isinstance(self.redis_client, _NoopAsyncRedis):
+            # Nothing shared to re-read: keep the local counter until it is due for a resync
+            self.cost_cache_seconds = self.cost_resync_seconds
 
     async def _get_monthly_key(self, user_id: str, metric: str) -> str:
         now = datetime.utcnow()
@@ -76,11 +94,10 @@ class QuotaService:
         minute_key = await self._get_rate_limit_key(user_id, "minute")
         second_key = await self._get_rate_limit_key(user_id, "second")
 
-        # Clean up old entries and count current requests
-        await self.redis_client.zremrangebyscore(minute_key, 0, now - 60) # Remove entries older than 60 seconds
-        await self.redis_client.zremrangebyscore(second_key, 0, now - 1) # Remove entries older than 1 second
-
+        # Clean up old entries and count current requests in a single round trip
         pipe = self.redis_client.pipeline()
+        pipe.zremrangebyscore(minute_key, 0, now - 60) # Remove entries older than 60 seconds
+        pipe.zremrangebyscore(second_key, 0, now - 1) # Remove entries older than 1 second
         pipe.zadd(minute_key, {now: now})
         pipe.zadd(second_key, {now: now})
         pipe.zcard(minute_key)
@@ -89,8 +106,8 @@ class QuotaService:
         pipe.expire(second_key, 1) # Expire after 1 second
         results = await pipe.execute()
 
-        current_minute_requests = results[-2] # Result of zcard(minute_key)
-        current_second_requests = results[-1] # Result of zcard(second_key)
+        current_minute_requests = results[4] # Result of zcard(minute_key)
+        current_second_requests = results[5] # Result of zcard(second_key)
 
         if current_minute_requests > rpm_limit or current_second_requests > rps_limit:
             logger.warning(f"Rate limit exceeded for user {user_id}. RPM: {current_minute_requests}/{rpm_limit}, RPS: {current_second_requests}/{rps_limit}")
@@ -104,6 +121,39 @@ class QuotaService:
 
         return True
 
+    async def get_monthly_cost(self, user_id: str) -> float:
+        """
+        // [TASK]: Current month's estimated spend for cost-cap checks
+        // [GOAL]: Read a running counter instead of summing usage_costs on every request
+
+        Order of lookup: in-process value (cost_cache_seconds), the shared Redis counter, and
+        only when neither exists a SQL aggregate that seeds the counter. Counters expire after
+        cost_resync_seconds so drift from missed increments is bounded.
+        """
+        key = await self._get_monthly_key(user_id, "cost_usd")
+        cached = self._monthly_costs.get(key)
+        if cached and time.monotonic() - cached[1] < self.cost_cache_seconds:
+            return cached[0]
+
+        value = await self.redis_client.get(key)
+        if value is None:
+            value = await asyncio.to_thread(_query_monthly_cost_in_session, user_id)
+            # NX: another worker may have seeded (and since incremented) the counter meanwhile
+            await self.redis_client.set(key, value, ex=self.cost_resync_seconds, nx=True)
+        cost = float(value)
+        self._monthly_costs[key] = (cost, time.monotonic())
+        return cost
+
+    async def add_monthly_cost(self, user_id: str, amount_usd: float):
+        """Adds a committed usage cost to the running counter (no-op until the counter is seeded)."""
+        key = await self._get_monthly_key(user_id, "cost_usd")
+        cached = self._monthly_costs.get(key)
+        if cached:
+            self._monthly_costs[key] = (cached[0] + amount_usd, cached[1])
+        # Unseeded counters are left alone: the next read seeds them from SQL, which includes this row
+        if await self.redis_client.exists(key):
+            await self.redis_client.incrbyfloat(key, amount_usd)
+
     async def record_provisional_usage(self, user_id: str, job_id: str, metric: str, amount: int):
         # Record usage that is pending job completion
         key = f"provisional:{user_id}:{job_id}:{metric}"
@@ -133,7 +183,19 @@ quota_service = QuotaService()
 async def get_user_monthly_cost(user_id: str, db: Session) -> float:
     """
     Calculates the estimated total cost for the current month for a given user.
+    Request paths should use quota_service.get_monthly_cost, which keeps a running counter.
     """
+    return _query_monthly_cost(user_id, db)
+
+def _query_monthly_cost_in_session(user_id: str) -> float:
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        return _query_monthly_cost(user_id, db)
+    finally:
+        db.close()
+
+def _query_monthly_cost(user_id: str, db: Session) -> float:
     now = datetime.utcnow()
     start_of_month = datetime(now.year, now.month, 1)
 
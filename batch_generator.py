@@ -14,7 +14,7 @@ import os
 import sys
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 from datetime import datetime
 import argparse
@@ -23,7 +23,7 @@ import argparse
 sys.path.append(str(Path(__file__).parent / "offline_video_maker"))
 
 from offline_video_maker.generate_video import OfflineVideoMaker
-from offline_video_maker.helpers import MediaUtils, SubtitleEngine, MusicIntegration, VerticalExport
+from offline_video_maker.helpers import MediaUtils, SubtitleEngine, MusicIntegration, VerticalExport, OutputPreset
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -260,18 +260,16 @@ class BatchVideoGenerator:
             os.rename(video_path, str(final_video_path))
             video_path = str(final_video_path)
             
-            # Add subtitles if enabled
-            if enable_subtitles and self.subtitle_engine.is_available():
-                video_path = self._add_subtitles(video_path, task_dir)
+            # Build subtitles if enabled; the narration script is known, so alignment works without Whisper
+            srt_path = None
+            script_text = " ".join(scene["text"] for scene in self.video_generator.current_scenes)
+            if enable_subtitles and (self.subtitle_engine.can_align(script_text) or self.subtitle_engine.is_available()):
+                srt_path = self._build_subtitles(video_path, task_dir, script_text)
             
-            # Export to platforms if specified
+            # Burn subtitles and export to platforms in a single ffmpeg pass
             exported_files = {}
-            if platforms:
-                export_dir = task_dir / "exports"
-                results = self.vertical_export.batch_convert_to_platforms(
-                    video_path, str(export_dir), platforms
-                )
-                exported_files = {platform: success for platform, success in results.items()}
+            if srt_path or platforms:
+                video_path, exported_files = self._render_outputs(video_path, task_dir, srt_path, platforms)
             
             # Create task metadata
             metadata = {
@@ -305,8 +303,8 @@ class BatchVideoGenerator:
                 'error': str(e)
             }
     
-    def _add_subtitles(self, video_path: str, task_dir: Path) -> str:
-        """Add subtitles to video"""
+    def _build_subtitles(self, video_path: str, task_dir: Path, script_text: Optional[str] = None) -> Optional[str]:
+        """Write an SRT for the video, aligned to the narration script when one is given"""
         try:
             # Extract audio
             audio_path = task_dir / "audio.wav"
@@ -317,17 +315,46 @@ class BatchVideoGenerator:
             
             # Generate subtitles
             srt_path = task_dir / "subtitles.srt"
-            if self.subtitle_engine.generate_subtitles_from_audio(str(audio_path), str(srt_path)):
-                # Burn subtitles
-                subtitled_video = task_dir / "video_with_subtitles.mp4"
-                if self.media_utils.burn_subtitles(video_path, str(srt_path), str(subtitled_video)):
-                    return str(subtitled_video)
+            if self.subtitle_engine.generate_subtitles_from_audio(str(audio_path), str(srt_path), script_text=script_text):
+                return str(srt_path)
             
-            return video_path
+            return None
             
         except Exception as e:
-            logger.error(f"[BATCH] Subtitle addition failed: {e}")
-            return video_path
+            logger.error(f"[BATCH] Subtitle generation failed: {e}")
+            return None
+    
+    def _render_outputs(self, video_path: str, task_dir: Path, srt_path: Optional[str],
+                        platforms: List[str]) -> Tuple[str, Dict[str, bool]]:
+        """
+        // [TASK]: Burn subtitles and encode every platform export from one decode of the video
+        // [GOAL]: One ffmpeg invocation per task instead of a burn pass plus a re-encode per platform
+        """
+        plan = self.media_utils.render_plan().video(video_path)
+        final_video = video_path
+        if srt_path:
+            final_video = str(task_dir / "video_with_subtitles.mp4")
+            plan.subtitles(srt_path).output(final_video, OutputPreset(audio_args=("-c:a", "copy")))
+        
+        export_dir = task_dir / "exports"
+        exports = {}
+        for platform in platforms:
+            if platform not in self.vertical_export.platforms:
+                logger.error(f"[BATCH] Unknown platform: {platform}")
+                continue
+            exports[platform] = str(export_dir / f"{Path(final_video).stem}_{platform}.mp4")
+            plan.output(exports[platform], self.vertical_export.output_preset(platform))
+        if exports:
+            export_dir.mkdir(exist_ok=True)
+        
+        if not plan.outputs or not plan.render():
+            return video_path, {platform: False for platform in platforms}
+        
+        exported_files = {
+            platform: platform in exports and self.vertical_export.enforce_size_limit(exports[platform], platform)
+            for platform in platforms
+        }
+        return final_video, exported_files
     
     def _save_batch_progress(self):
         """Save current batch progress"""
@@ -1,10 +1,12 @@
-import requests
-from typing import Optional, List, Dict, Any, Callable
-from dataclasses import asdict
+import time
+import asyncio
+import aiohttp
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta # Import datetime and timedelta
 from sqlalchemy.orm import Session # Import Session
 from auth.user_models import User # Import User only; no Role enum defined
-from billing_models import get_default_plans, Plan, ModelPolicy, Quotas, MonthlyQuotas, RateLimit, PinnedModel, CostCaps, Visibility
+from billing_models import get_default_plans, get_user_subscription, UserSubscription, Plan, ModelPolicy, Quotas, MonthlyQuotas, RateLimit, PinnedModel, CostCaps, Visibility
 from backend.notifications.admin_notify import send_admin_notification # New import
 
 class PlanGuardException(Exception):
@@ -15,48 +17,117 @@ class PlanGuardException(Exception):
         self.grace_expires_at = grace_expires_at
         self.is_view_only = is_view_only
 
+@dataclass
+class Entitlement:
+    """Everything the check_* methods need to know about a user, resolved once per TTL."""
+    is_super_admin: bool
+    subscription: UserSubscription
+    expires_at: float
+
+
 class PlanGuard:
-    def __init__(self, backend_api_url: str = "http://localhost:8000", db_session_factory: Optional[Callable[[], Session]] = None):
+    """
+    // [TASK]: Non-blocking plan and entitlement resolution for every check_* call
+    // [GOAL]: One catalogue fetch per TTL and one DB lookup per user per TTL, however many checks run
+
+    The plan catalogue is served from memory; once older than plans_ttl_seconds the stale copy is
+    returned while a single background refresh runs. Per-user entitlements (super-admin flag and
+    subscription) are cached for entitlement_ttl_seconds, concurrent misses for the same user share
+    one lookup, and invalidate_user() must be called when a subscription or role changes.
+    """
+
+    def __init__(self, backend_api_url: str = "http://localhost:8000", db_session_factory: Optional[Callable[[], Session]] = None,
+                 plans_ttl_seconds: float = 300.0, entitlement_ttl_seconds: float = 60.0, request_timeout_seconds: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
         self.backend_api_url = backend_api_url
         self._cached_plans: Optional[List[Plan]] = None
         self.db_session_factory = db_session_factory # Store the session factory
+        self.plans_ttl_seconds = plans_ttl_seconds
+        self.entitlement_ttl_seconds = entitlement_ttl_seconds
+        self.request_timeout_seconds = request_timeout_seconds
+        self.clock = clock
+        self._plans_fetched_at: Optional[float] = None
+        self._plans_refresh: Optional[asyncio.Task] = None
+        self._entitlements: Dict[str, Entitlement] = {}
+        self._entitlement_loads: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._entitlement_generation: Dict[str, int] = {}
+
+    @staticmethod
+    def _parse_plans(data: List[Dict[str, Any]]) -> List[Plan]:
+        # Deserialize JSON data back into Plan dataclass objects
+        plans = []
+        for p_data in data:
+            # Handle nested dataclasses
+            model_policy = ModelPolicy(**p_data.pop('model_policy', {}))
+            quotas_data = p_data.pop('quotas', {})
+            monthly_quotas = MonthlyQuotas(**quotas_data.pop('monthly', {}))
+            rate_limit = RateLimit(**quotas_data.pop('rateLimit', {}))
+            quotas = Quotas(monthly=monthly_quotas, rateLimit=rate_limit, **quotas_data)
+            cost_caps = CostCaps(**p_data.pop('cost_caps', {}))
+            visibility = Visibility(**p_data.pop('visibility', {}))
+
+            plan = Plan(
+                model_policy=model_policy,
+                quotas=quotas,
+                cost_caps=cost_caps,
+                visibility=visibility,
+                **p_data
+            )
+            plans.append(plan)
+        return plans
 
     async def _fetch_plans_from_api(self) -> Optional[List[Plan]]:
         try:
-            response = requests.get(f"{self.backend_api_url}/api/plans")
-            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            data = response.json()
-            
-            # Deserialize JSON data back into Plan dataclass objects
-            plans = []
-            for p_data in data:
-                # Handle nested dataclasses
-                model_policy = ModelPolicy(**p_data.pop('model_policy', {}))
-                quotas_data = p_data.pop('quotas', {})
-                monthly_quotas = MonthlyQuotas(**quotas_data.pop('monthly', {}))
-                rate_limit = RateLimit(**quotas_data.pop('rateLimit', {}))
-                quotas = Quotas(monthly=monthly_quotas, rateLimit=rate_limit, **quotas_data)
-                cost_caps = CostCaps(**p_data.pop('cost_caps', {}))
-                visibility = Visibility(**p_data.pop('visibility', {}))
-
-                plan = Plan(
-                    model_policy=model_policy,
-                    quotas=quotas,
-                    cost_caps=cost_caps,
-                    visibility=visibility,
-                    **p_data
-                )
-                plans.append(plan)
-            self._cached_plans = plans
-            return plans
-        except requests.exceptions.RequestException as e:
+            timeout = aiohttp.ClientTimeout(total=self.request_timeout_seconds)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"{self.backend_api_url}/api/plans") as response:
+                    response.raise_for_status()  # Raise for bad responses (4xx or 5xx)
+                    data = await response.json()
+            return self._parse_plans(data)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"Warning: Could not connect to backend API at {self.backend_api_url}. Falling back to default plans. Error: {e}")
             return None
         except Exception as e:
             print(f"Error fetching plans from API: {e}")
             return None
 
-    async def _is_super_admin(self, user_id: str) -> bool:
+    async def _refresh_plans(self) -> List[Plan]:
+        plans = await self._fetch_plans_from_api()
+        if plans:
+            self._cached_plans = plans
+        elif not self._cached_plans:
+            self._cached_plans = get_default_plans() # Fallback to hardcoded defaults
+        # Failed refreshes also wait a full TTL, so an unreachable API is not retried on every check
+        self._plans_fetched_at = self.clock()
+        return self._cached_plans
+
+    def _current_refresh(self) -> Optional[asyncio.Task]:
+        task = self._plans_refresh
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            return None
+        return task
+
+    async def get_plans(self) -> List[Plan]:
+        """Plan catalogue with TTL and stale-while-revalidate; only the very first call waits on the API."""
+        refresh = self._current_refresh()
+        if self._cached_plans is None:
+            if refresh is None:
+                refresh = self._plans_refresh = asyncio.create_task(self._refresh_plans())
+            return await asyncio.shield(refresh)
+        if self.clock() - self._plans_fetched_at >= self.plans_ttl_seconds and refresh is None:
+            self._plans_refresh = asyncio.create_task(self._refresh_plans())
+        return self._cached_plans
+
+    def invalidate_plans(self):
+        """Force the next get_plans() to revalidate (e.g. after a plan catalogue edit)."""
+        if self._plans_fetched_at is not None:
+            self._plans_fetched_at = float("-inf")
+
+    def _load_entitlement(self, user_id: str) -> Tuple[bool, UserSubscription]:
+        """Blocking DB lookups for one user; runs in a worker thread."""
+        return self._query_super_admin(user_id), get_user_subscription(user_id)
+
+    def _query_super_admin(self, user_id: str) -> bool:
         if not self.db_session_factory:
             print("Warning: db_session_factory not provided to PlanGuard. Cannot check super admin status.")
             return False
@@ -68,24 +139,57 @@ class PlanGuard:
                 return True
             return False
 
+    async def get_entitlement(self, user_id: str) -> Entitlement:
+        entitlement = self._entitlements.get(user_id)
+        if entitlement and entitlement.expires_at > self.clock():
+            return entitlement
+
+        loop = asyncio.get_running_loop()
+        pending = self._entitlement_loads.get(user_id)
+        if pending is None or pending[0] is not loop:
+            future = loop.create_future()
+            self._entitlement_loads[user_id] = (loop, future)
+            generation = self._entitlement_generation.get(user_id, 0)
+            try:
+                is_super_admin, subscription = await asyncio.to_thread(self._load_entitlement, user_id)
+                entitlement = Entitlement(is_super_admin, subscription, self.clock() + self.entitlement_ttl_seconds)
+                if self._entitlement_generation.get(user_id, 0) == generation:  # Not invalidated mid-lookup
+                    self._entitlements[user_id] = entitlement
+                future.set_result(entitlement)
+            except Exception as e:
+                future.set_exception(e)
+                future.exception()  # Mark retrieved when no other caller was waiting
+                raise
+            finally:
+                if self._entitlement_loads.get(user_id, (None, None))[1] is future:
+                    del self._entitlement_loads[user_id]
+            return entitlement
+        return await asyncio.shield(pending[1])
+
+    def invalidate_user(self, user_id: str):
+        """Drop a user's cached entitlement; call on subscription, plan or role changes."""
+        self._entitlement_generation[user_id] = self._entitlement_generation.get(user_id, 0) + 1
+        self._entitlements.pop(user_id, None)
+        self._entitlement_loads.pop(user_id, None)
+
+    async def _is_super_admin(self, user_id: str) -> bool:
+        return (await self.get_entitlement(user_id)).is_super_admin
+
     async def get_user_plan(self, user_id: str) -> Plan:
         # In a real system, this would fetch the user's specific plan from a database
         # For now, we'll simulate by assigning based on user_id or default to 'Starter'
         # and use the plans fetched from API or default hardcoded ones.
         
-        if not self._cached_plans:
-            self._cached_plans = await self._fetch_plans_from_api()
-            if not self._cached_plans:
-                self._cached_plans = get_default_plans() # Fallback to hardcoded defaults
+        plans = await self.get_plans()
 
         # Simulate user plan assignment and grace period
-        user_sub = get_user_subscription(user_id) # This function needs to be updated to return grace_expires_at
+        user_sub = (await self.get_entitlement(user_id)).subscription
         
         # Find the plan based on user_sub.plan_name
-        current_plan = next((p for p in self._cached_plans if p.name == user_sub.plan_name), None)
+        current_plan = next((p for p in plans if p.name == user_sub.plan_name), None)
         if not current_plan:
             print(f"Warning: Plan '{user_sub.plan_name}' not found. Returning Starter plan.")
-            current_plan = next(p for p in self._cached_plans if p.name == "Starter")
+            current_plan = next(p for p in plans if p.name == "Starter")
 
         # Simulate grace period logic
         if not user_sub.is_active and current_plan.grace_period_hours > 0:
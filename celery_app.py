@@ -4,11 +4,14 @@ from config_loader import get_config
 
 config = get_config()
 
+# Fall back to the local default when config.yaml has no redis section (DotMap yields an empty map, not a URL)
+REDIS_URL = config.redis.url if isinstance(config.redis.url, str) else "redis://localhost:6379/0"
+
 # Celery App Instance
 app = Celery(
     'shujaa_studio',
-    broker=config.redis.url, # Assuming Redis is configured in config.yaml
-    backend=config.redis.url # Using Redis as backend for result storage
+    broker=REDIS_URL, # Assuming Redis is configured in config.yaml
+    backend=REDIS_URL # Using Redis as backend for result storage
 )
 
 # Define Priority Queues
@@ -43,6 +46,10 @@ app.conf.task_routes = {
 app.conf.task_acks_late = True # Acknowledge task after it's done
 app.conf.task_reject_on_worker_lost = True # Requeue task if worker dies
 
+# Eager mode runs tasks in-process without a broker (local development and tests)
+app.conf.task_always_eager = bool(config.jobs.get('celery_eager', False))
+app.conf.task_eager_propagates = False
+
 # Auto-discover tasks in specified modules (e.g., 'backend.core.jobs')
 app.autodiscover_tasks(['backend.core'])
 
@@ -147,6 +147,17 @@ class ConfigLoader:
                 # Override with environment variable
                 config_map[key] = os.environ[env_var_name]
 
+    def load_section(self, section, config_path="config.yaml"):
+        """
+        // [TASK]: Re-read one top-level section for hot reload
+        // [GOAL]: Apply the same env overrides and secret resolution as startup, so a reload never reverts them
+        """
+        with open(config_path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+        section_map = DotMap({section: data.get(section) or {}})
+        self._process_config(section_map)
+        return section_map[section]
+
     def get_config(self):
         return self._config
 
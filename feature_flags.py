@@ -1,16 +1,139 @@
-from config_loader import get_config
-from logging_setup import get_logger
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass
 from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Mapping, Optional
+
+from config_loader import ConfigLoader, get_config
+from logging_setup import get_logger
 
 logger = get_logger(__name__)
 config = get_config()
 
+
+@lru_cache(maxsize=65536)
+def rollout_bucket(user_id: str) -> int:
+    """Stable 0-99 rollout bucket for a user (shared by all flags, as before)."""
+    return int(hashlib.sha256(user_id.encode()).hexdigest(), 16) % 100
+
+
+def _as_bool(value: Any) -> bool:
+    # Environment overrides arrive as strings; "false" must not be truthy
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _as_set(values: Any) -> Optional[FrozenSet[str]]:
+    if not values:
+        return None
+    if isinstance(values, str):
+        values = [v.strip() for v in values.split(",") if v.strip()]
+    return frozenset(str(v) for v in values)
+
+
+@dataclass(frozen=True)
+class FlagRule:
+    """
+    // [TASK]: One feature flag compiled for evaluation
+    // [GOAL]: Set membership and a precomputed bucket threshold instead of list scans and hashing
+    """
+    name: str
+    enabled: bool
+    rollout_percentage: Optional[float] = None
+    users: Optional[FrozenSet[str]] = None
+    tenants: Optional[FrozenSet[str]] = None
+
+    @classmethod
+    def compile(cls, name: str, flag_config: Mapping[str, Any]) -> "FlagRule":
+        rollout = flag_config.get("rollout_percentage")
+        return cls(
+            name=name,
+            enabled=_as_bool(flag_config.get("enabled", False)),
+            rollout_percentage=float(rollout) if rollout not in (None, "") else None,
+            users=_as_set(flag_config.get("users")),
+            tenants=_as_set(flag_config.get("tenants")),
+        )
+
+    def evaluate(self, user_id: Optional[str], tenant_id: Optional[str], bucket: Optional[int]) -> bool:
+        # users/tenants narrow an enabled flag; they never enable a disabled one
+        if not self.enabled:
+            return False
+        if self.rollout_percentage is not None and bucket is not None and bucket >= self.rollout_percentage:
+            return False # User is not in the rollout group
+        if user_id and self.users is not None and user_id not in self.users:
+            return False
+        if tenant_id and self.tenants is not None and tenant_id not in self.tenants:
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class FlagSnapshot:
+    """Immutable compiled flag set; replaced wholesale on reload so readers never see a mix."""
+    rules: Dict[str, FlagRule]
+    version: int
+    loaded_at: float
+
+    @classmethod
+    def compile(cls, flags: Mapping[str, Any], version: int) -> "FlagSnapshot":
+        rules = {}
+        for name, flag_config in (flags or {}).items():
+            if isinstance(flag_config, Mapping):
+                rules[name] = FlagRule.compile(name, flag_config)
+            else:
+                logger.warning(f"Feature flag '{name}' has no settings block. Treating it as disabled.")
+                rules[name] = FlagRule(name, False)
+        return cls(rules, version, time.time())
+
+
 class FeatureFlagManager:
-    def __init__(self):
-        self._flags = config.get("feature_flags", {})
-        logger.info(f"FeatureFlagManager initialized with flags: {self._flags}")
+    def __init__(self, flags: Optional[Mapping[str, Any]] = None):
+        self._snapshot = FlagSnapshot.compile({}, 0)
+        self._warned = set()
+        self.reload(flags if flags is not None else config.get("feature_flags", {}))
+        logger.info(f"FeatureFlagManager initialized with flags: {sorted(self._snapshot.rules)}")
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def reload(self, flags: Mapping[str, Any]) -> FlagSnapshot:
+        """
+        // [TASK]: Swap in a new flag configuration without a restart
+        // [GOAL]: Compile off to the side, then publish with one reference assignment
+        """
+        snapshot = FlagSnapshot.compile(flags, self._snapshot.version + 1)
+        self._snapshot = snapshot
+        self._warned = set()
+        logger.info(f"Feature flags reloaded (version {snapshot.version}): {sorted(snapshot.rules)}")
+        return snapshot
+
+    def reload_from_file(self, config_path: str = "config.yaml") -> FlagSnapshot:
+        """Re-reads only the feature_flags section through ConfigLoader, keeping SHUJAA_FEATURE_FLAGS_* overrides."""
+        return self.reload(ConfigLoader().load_section("feature_flags", config_path))
+
+    async def watch(self, config_path: str = "config.yaml", interval_seconds: float = 5.0):
+        """Reloads whenever the config file's mtime changes. Run as a background task."""
+        last_mtime = os.path.getmtime(config_path)
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                mtime = os.path.getmtime(config_path)
+                if mtime != last_mtime:
+                    last_mtime = mtime
+                    await asyncio.to_thread(self.reload_from_file, config_path)
+            except Exception as e:
+                # A half-written or invalid file keeps the previous snapshot in force
+                logger.error(f"Feature flag reload from {config_path} failed: {e}")
+
+    def _warn_once(self, key: tuple, message: str):
+        if key not in self._warned:
+            self._warned.add(key)
+            logger.warning(message)
 
-    @lru_cache(maxsize=128)
     def is_enabled(self, flag_name: str, user_id: str = None, tenant_id: str = None) -> bool:
         """
         Checks if a feature flag is enabled.
@@ -18,58 +141,71 @@ class FeatureFlagManager:
         // [GOAL]: Control feature rollout based on configuration
         // [ELITE_CURSOR_SNIPPET]: aihandle
         """
-        flag_config = self._flags.get(flag_name)
-        if flag_config is None:
-            logger.warning(f"Feature flag '{flag_name}' not found. Defaulting to disabled.")
+        rule = self._snapshot.rules.get(flag_name)
+        if rule is None:
+            self._warn_once(("missing", flag_name), f"Feature flag '{flag_name}' not found. Defaulting to disabled.")
             return False
+        if rule.rollout_percentage is not None and not user_id:
+            self._warn_once(("no_user", flag_name), f"Feature flag '{flag_name}' has rollout_percentage but no user_id provided. Rollout not applied.")
+        return rule.evaluate(user_id, tenant_id, rollout_bucket(user_id) if user_id else None)
 
-        enabled = flag_config.get("enabled", False)
-        
-        # Check for rollout percentage
-        rollout_percentage = flag_config.get("rollout_percentage")
-        if rollout_percentage is not None:
-            if user_id:
-                # Simple hash-based rollout for user_id
-                import hashlib
-                hash_value = int(hashlib.sha256(user_id.encode()).hexdigest(), 16) % 100
-                if hash_value >= rollout_percentage:
-                    enabled = False # User is not in the rollout group
-            else:
-                logger.warning(f"Feature flag '{flag_name}' has rollout_percentage but no user_id provided. Rollout not applied.")
+    def evaluate_all(self, user_id: str = None, tenant_id: str = None) -> Dict[str, bool]:
+        """Every flag for one request context, from a single snapshot and a single bucket lookup."""
+        snapshot = self._snapshot
+        bucket = rollout_bucket(user_id) if user_id else None
+        return {name: rule.evaluate(user_id, tenant_id, bucket) for name, rule in snapshot.rules.items()}
+
+
+def benchmark_flags(evaluations: int = 2_000_000, users: int = 100_000, tenants: int = 1_000) -> Dict[str, float]:
+    """Evaluation throughput across many distinct users, for single-flag checks and evaluate_all."""
+    flags = {
+        "rollout": {"enabled": True, "rollout_percentage": 30},
+        "allowlist": {"enabled": True, "users": [f"user_{i}" for i in range(0, users, 7)]},
+        "tenants": {"enabled": True, "tenants": [f"tenant_{i}" for i in range(0, tenants, 3)]},
+        "off": {"enabled": False},
+    }
+    manager = FeatureFlagManager(flags)
+    names = list(flags)
+    user_ids = [f"user_{i}" for i in range(users)]
+    tenant_ids = [f"tenant_{i}" for i in range(tenants)]
 
-        # Check for specific users/tenants
-        if user_id and flag_config.get("users"):
-            if user_id not in flag_config["users"]:
-                enabled = False
-        if tenant_id and flag_config.get("tenants"):
-            if tenant_id not in flag_config["tenants"]:
-                enabled = False
+    rollout_bucket.cache_clear()
+    started = time.perf_counter()
+    for i in range(evaluations):
+        manager.is_enabled(names[i & 3], user_ids[i % users], tenant_ids[i % tenants])
+    single = time.perf_counter() - started
+
+    contexts = evaluations // len(names)
+    started = time.perf_counter()
+    for i in range(contexts):
+        manager.evaluate_all(user_ids[i % users], tenant_ids[i % tenants])
+    bulk = time.perf_counter() - started
+    return {
+        "is_enabled_per_s": round(evaluations / single),
+        "is_enabled_ns": round(single / evaluations * 1e9, 1),
+        "evaluate_all_flags_per_s": round(contexts * len(names) / bulk),
+        "evaluate_all_ns_per_context": round(bulk / contexts * 1e9, 1),
+    }
 
-        logger.debug(f"Feature flag '{flag_name}' is_enabled: {enabled} for user {user_id}, tenant {tenant_id}")
-        return enabled
 
 # Initialize the manager
 feature_flag_manager = FeatureFlagManager()
 
 # Example usage (for testing)
 if __name__ == "__main__":
-    # Mock config for testing
-    class MockFeatureFlagsConfig:
-        feature_flags = {
-            "new_ui": {"enabled": True, "rollout_percentage": 50},
-            "beta_feature": {"enabled": False, "users": ["user123"]},
-            "enterprise_dashboard": {"enabled": True, "tenants": ["enterprise_corp"]},
-            "disabled_feature": {"enabled": False}
-        }
-    class MockConfig:
-        def get(self, key, default=None):
-            if key == "feature_flags":
-                return MockFeatureFlagsConfig.feature_flags
-            return default
-    
-    # Temporarily override global config for testing
-    original_config = config
-    config = MockConfig()
+    import json
+    import sys
+
+    if "--benchmark" in sys.argv:
+        print(json.dumps(benchmark_flags(), indent=2))
+        sys.exit(0)
+
+    feature_flag_manager.reload({
+        "new_ui": {"enabled": True, "rollout_percentage": 50},
+        "beta_feature": {"enabled": False, "users": ["user123"]},
+        "enterprise_dashboard": {"enabled": True, "tenants": ["enterprise_corp"]},
+        "disabled_feature": {"enabled": False}
+    })
 
     print(f"New UI enabled for user_a (rollout 50%): {feature_flag_manager.is_enabled('new_ui', user_id='user_a')}")
     print(f"New UI enabled for user_b (rollout 50%): {feature_flag_manager.is_enabled('new_ui', user_id='user_b')}")
@@ -78,6 +214,4 @@ if __name__ == "__main__":
     print(f"Enterprise dashboard for enterprise_corp: {feature_flag_manager.is_enabled('enterprise_dashboard', tenant_id='enterprise_corp')}")
     print(f"Enterprise dashboard for small_biz: {feature_flag_manager.is_enabled('enterprise_dashboard', tenant_id='small_biz')}")
     print(f"Disabled feature: {feature_flag_manager.is_enabled('disabled_feature')}")
-
-    # Restore original config
-    config = original_config
\ No newline at end of file
+    print(f"All flags for user_a: {feature_flag_manager.evaluate_all(user_id='user_a')}")
@@ -13,10 +13,14 @@ Seamless local/cloud GPU processing with intelligent resource management
 import os
 import time
 import json
+import heapq
 import asyncio
+import itertools
+import statistics
 import subprocess
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Callable
+from typing import Dict, List, Optional, Union, Callable, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 import psutil
@@ -60,6 +64,11 @@ class ProcessingMode(Enum):
     HYBRID = "hybrid"
 
 
+# TaskProfile.estimated_time is measured on a resource with this performance score
+REFERENCE_PERFORMANCE_SCORE = 100.0
+CPU_PERFORMANCE_SCORE = 20.0
+
+
 @dataclass
 class GPUResource:
     """GPU resource information"""
@@ -84,6 +93,9 @@ class TaskProfile:
     priority: int
     can_use_cpu: bool = True
     preferred_gpu_memory: float = 4.0
+    model_name: Optional[str] = None  # Model the task needs loaded; resources where it is warm skip model_load_time
+    model_load_time: float = 0.0
+    max_cost: Optional[float] = None  # Per-task budget in $, overrides the manager's cost_budget_per_task
 
 
 class HybridGPUManager:
@@ -93,18 +105,44 @@ class HybridGPUManager:
     // [SNIPPET]: thinkwithai + surgicalfix + perfcheck + costaware
     """
 
-    def __init__(self, config_path: Optional[str] = None, cost_optimization_strategy: str = "balanced"):
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        cost_optimization_strategy: str = "balanced",
+        cost_budget_per_task: Optional[float] = None,
+        performance_log_size: int = 1000,
+        duration_history_size: int = 50,
+        max_warm_models: int = 3,
+        cpu_slots: Optional[int] = None,
+        local_gpu: Optional[GPUResource] = None,
+        cloud_providers: Optional[List[Dict]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         self.config_path = config_path or "config.yaml"
         self.session_id = str(int(time.time()))
         self.processing_stats = {"local_gpu": 0, "local_cpu": 0, "cloud_gpu": 0}
-        self.cost_optimization_strategy = cost_optimization_strategy # new attribute
+        self.cost_optimization_strategy = cost_optimization_strategy
+        self.cost_budget_per_task = cost_budget_per_task
+        self.clock = clock
 
-        self.local_gpu = self._detect_local_gpu()
-        self.cloud_providers = self._load_cloud_config()
+        self.local_gpu = local_gpu or self._detect_local_gpu()
+        self.cloud_providers = cloud_providers if cloud_providers is not None else self._load_cloud_config()
+        self.cpu_slots = cpu_slots or max(1, (os.cpu_count() or 2) // 2)
         self.task_queue = []
         self.active_tasks = {}
-
-        self.performance_log = []
+        self._task_counter = itertools.count()
+
+        # Scheduler state: in-flight tasks (task_id -> expected end) per resource, duration
+        # samples per (task_type, resource) plus speed-normalised samples per task_type,
+        # and an LRU of warm models per resource.
+        self.in_flight: Dict[str, Dict[str, float]] = {}
+        self.duration_history: Dict[Tuple[str, str], deque] = {}
+        self.reference_durations: Dict[str, deque] = {}
+        self.duration_history_size = duration_history_size
+        self.warm_models: Dict[str, OrderedDict] = {}
+        self.max_warm_models = max_warm_models
+
+        self.performance_log = deque(maxlen=performance_log_size)
         self.cost_tracking = {"total_cost": 0.0}
 
         logger.info(f"🚀 Hybrid GPU Manager initialized")
@@ -166,21 +204,13 @@ class HybridGPUManager:
             logger.warning(f"Failed to save default config: {e}")
         return default_providers
 
-    def select_best_resource(self, task_profile: TaskProfile) -> Dict:
-        """
-        Selects the best available resource (local or cloud) based on task requirements and cost.
-        """
-        best_resource = sorted(eligible_resources, key=lambda x: x["cost"])[0]
-        logger.info(f"🎯 Selected best resource: {best_resource['name']} from {best_resource['provider']} at ${best_resource['cost']:.2f}/hr")
-        return best_resource
-
     def _get_eligible_resources(self, task_profile: TaskProfile) -> List[Dict]:
         eligible_resources = []
         if self.local_gpu.available and self.local_gpu.memory_free >= task_profile.estimated_memory:
             eligible_resources.append({
                 "name": self.local_gpu.name, "mode": ProcessingMode.LOCAL_GPU,
                 "cost": self.local_gpu.cost_per_hour, "provider": "local",
-                "performance_score": self.local_gpu.performance_score
+                "performance_score": self.local_gpu.performance_score, "slots": 1
             })
 
         for provider in self.cloud_providers:
@@ -191,27 +221,85 @@ class HybridGPUManager:
                     eligible_resources.append({
                         "name": gpu_type, "mode": ProcessingMode.CLOUD_GPU,
                         "cost": specs["cost_per_hour"], "provider": provider["name"],
-                        "performance_score": specs["performance_score"]
+                        "performance_score": specs["performance_score"],
+                        "slots": specs.get("max_concurrency", 1)
                     })
         return eligible_resources
 
+    def _cpu_resource(self) -> Dict:
+        return {"name": "cpu", "mode": ProcessingMode.LOCAL_CPU, "cost": 0, "provider": "local", "performance_score": 0, "slots": self.cpu_slots}
+
+    @staticmethod
+    def resource_key(resource: Dict) -> str:
+        return f"{resource['provider']}:{resource['name']}"
+
+    @staticmethod
+    def resource_speed(resource: Dict) -> float:
+        if resource["mode"] == ProcessingMode.LOCAL_CPU:
+            return CPU_PERFORMANCE_SCORE
+        return max(resource.get("performance_score") or 0.0, 1.0)
+
+    def estimate_duration(self, task_profile: TaskProfile, resource: Dict) -> float:
+        """
+        Expected run time (excluding model load) of a task on a resource: the median of observed
+        runs there, else observations from other resources scaled by speed, else the profile estimate.
+        """
+        samples = self.duration_history.get((task_profile.task_type, self.resource_key(resource)))
+        if samples:
+            return statistics.median(samples)
+        reference_samples = self.reference_durations.get(task_profile.task_type)
+        reference_time = statistics.median(reference_samples) if reference_samples else task_profile.estimated_time
+        return reference_time * REFERENCE_PERFORMANCE_SCORE / self.resource_speed(resource)
+
+    def estimate_wait(self, resource: Dict) -> float:
+        """Expected time until a slot frees up on the resource, from its in-flight tasks."""
+        expected_ends = sorted(self.in_flight.get(self.resource_key(resource), {}).values())
+        slots = resource.get("slots", 1)
+        if len(expected_ends) < slots:
+            return 0.0
+        return max(expected_ends[len(expected_ends) - slots] - self.clock(), 0.0)
+
+    def is_model_warm(self, resource: Dict, model_name: Optional[str]) -> bool:
+        return model_name is None or model_name in self.warm_models.get(self.resource_key(resource), {})
+
+    def _annotate_estimates(self, task_profile: TaskProfile, resource: Dict) -> Dict:
+        load_time = 0.0 if self.is_model_warm(resource, task_profile.model_name) else task_profile.model_load_time
+        run_time = self.estimate_duration(task_profile, resource)
+        resource["key"] = self.resource_key(resource)
+        resource["expected_duration"] = load_time + run_time
+        resource["expected_completion"] = self.estimate_wait(resource) + load_time + run_time
+        resource["expected_cost"] = resource["cost"] * (load_time + run_time) / 3600
+        return resource
+
+    def _select_expected_completion(self, task_profile: TaskProfile, candidates: List[Dict]) -> Dict:
+        budget = task_profile.max_cost if task_profile.max_cost is not None else self.cost_budget_per_task
+        affordable = [r for r in candidates if budget is None or r["expected_cost"] <= budget]
+        if not affordable:
+            logger.warning(f"No resource fits the ${budget:.4f} budget for {task_profile.task_type}, using the cheapest")
+            return min(candidates, key=lambda r: (r["expected_cost"], r["expected_completion"]))
+        return min(affordable, key=lambda r: (r["expected_completion"], r["expected_cost"]))
+
     def select_best_resource(self, task_profile: TaskProfile) -> Dict:
         """
         Selects the best available resource (local or cloud) based on task requirements and cost.
         """
-        eligible_resources = self._get_eligible_resources(task_profile)
+        eligible_resources = [self._annotate_estimates(task_profile, r) for r in self._get_eligible_resources(task_profile)]
 
         if not eligible_resources:
             if task_profile.can_use_cpu:
                 logger.info("No suitable GPU found, falling back to Local CPU.")
-                return {"name": "cpu", "mode": ProcessingMode.LOCAL_CPU, "cost": 0, "provider": "local", "performance_score": 0} # Add performance_score
+                return self._annotate_estimates(task_profile, self._cpu_resource())
             else:
                 raise RuntimeError(f"No resource found that meets memory requirement of {task_profile.estimated_memory}GB")
 
-        if self.cost_optimization_strategy == "low_cost":
+        if self.cost_optimization_strategy == "expected_completion":
+            # Minimise queue wait + model load + run time within the cost budget; CPU competes too
+            candidates = eligible_resources + ([self._annotate_estimates(task_profile, self._cpu_resource())] if task_profile.can_use_cpu else [])
+            best_resource = self._select_expected_completion(task_profile, candidates)
+        elif self.cost_optimization_strategy == "low_cost":
             # Prioritize CPU if possible and cost is paramount
             if task_profile.can_use_cpu:
-                return {"name": "cpu", "mode": ProcessingMode.LOCAL_CPU, "cost": 0, "provider": "local", "performance_score": 0} # Add performance_score
+                return self._annotate_estimates(task_profile, self._cpu_resource())
             best_resource = sorted(eligible_resources, key=lambda x: x["cost"])[0]
         elif self.cost_optimization_strategy == "balanced":
             # Balance between cost and performance (e.g., prefer local GPU if available)
@@ -229,14 +317,42 @@ class HybridGPUManager:
         logger.info(f"🎯 Selected best resource: {best_resource['name']} from {best_resource['provider']} at ${best_resource['cost']:.2f}/hr (Strategy: {self.cost_optimization_strategy}, Performance Score: {best_resource.get('performance_score', 'N/A')})")
         return best_resource
 
+    def _begin_task(self, task_id: str, resource: Dict, task_profile: TaskProfile):
+        """
+        Reserves an in-flight slot and marks the task's model warm, since it is loaded on the resource from here on.
+        """
+        self.in_flight.setdefault(resource["key"], {})[task_id] = self.clock() + resource["expected_completion"]
+        if task_profile.model_name:
+            warm = self.warm_models.setdefault(resource["key"], OrderedDict())
+            warm[task_profile.model_name] = True
+            warm.move_to_end(task_profile.model_name)
+            while len(warm) > self.max_warm_models:
+                warm.popitem(last=False)
+
+    def _finish_task(self, task_id: str, resource: Dict, task_profile: TaskProfile, run_time: Optional[float]):
+        """
+        Releases the in-flight slot and, on success (run_time given), records the run duration.
+        """
+        self.in_flight.get(resource["key"], {}).pop(task_id, None)
+        if run_time is None:
+            return
+        history = self.duration_history.setdefault((task_profile.task_type, resource["key"]), deque(maxlen=self.duration_history_size))
+        history.append(run_time)
+        reference = self.reference_durations.setdefault(task_profile.task_type, deque(maxlen=self.duration_history_size))
+        reference.append(run_time * self.resource_speed(resource) / REFERENCE_PERFORMANCE_SCORE)
+
     async def process_task(self, task_profile: TaskProfile, task_function: Callable, *args, **kwargs):
-        task_id = f"task_{int(time.time())}_{len(self.active_tasks)}"
+        task_id = f"task_{int(time.time())}_{next(self._task_counter)}"
         start_time = time.time()
+        selected_resource = None
+        run_time = None
 
         try:
             selected_resource = self.select_best_resource(task_profile)
             mode = selected_resource["mode"]
-            
+            load_time = 0.0 if self.is_model_warm(selected_resource, task_profile.model_name) else task_profile.model_load_time
+            self._begin_task(task_id, selected_resource, task_profile)
+
             result = None
             if mode == ProcessingMode.LOCAL_GPU:
                 result = await self._execute_local_gpu(task_function, *args, **kwargs)
@@ -246,6 +362,7 @@ class HybridGPUManager:
                 result = await self._execute_cloud_gpu(task_profile, task_function, selected_resource, *args, **kwargs)
 
             processing_time_sec = time.time() - start_time
+            run_time = max(processing_time_sec - load_time, 0.0)
             task_cost = selected_resource["cost"] * (processing_time_sec / 3600)
             provider = selected_resource["provider"]
             
@@ -253,10 +370,16 @@ class HybridGPUManager:
             self.cost_tracking["total_cost"] += task_cost
             self.processing_stats[mode.value] += 1
 
+            # Entries double as a replayable trace for GPUSchedulerSimulator
             self.performance_log.append({
                 "task_id": task_id, "mode": mode.value, "provider": provider,
                 "resource": selected_resource['name'], "processing_time": processing_time_sec,
                 "cost": task_cost, "success": result is not None, "timestamp": time.time(),
+                "started_at": start_time, "task_type": task_profile.task_type,
+                "estimated_memory": task_profile.estimated_memory, "can_use_cpu": task_profile.can_use_cpu,
+                "model_name": task_profile.model_name, "model_load_time": task_profile.model_load_time,
+                "cold_start": load_time > 0,
+                "reference_time": run_time * self.resource_speed(selected_resource) / REFERENCE_PERFORMANCE_SCORE,
             })
 
             logger.info(f"✅ Task {task_id} ({task_profile.task_type}) completed in {processing_time_sec:.2f}s on {provider}:{selected_resource['name']} (Cost: ${task_cost:.4f})")
@@ -271,6 +394,9 @@ class HybridGPUManager:
                 except Exception as fallback_error:
                     logger.error(f"❌ Fallback also failed: {fallback_error}")
             raise e
+        finally:
+            if selected_resource is not None and "key" in selected_resource:
+                self._finish_task(task_id, selected_resource, task_profile, run_time)
 
     async def _execute_local_gpu(self, task_function: Callable, *args, **kwargs):
         if not (TORCH_AVAILABLE and torch.cuda.is_available()):
@@ -295,7 +421,9 @@ class HybridGPUManager:
             "cost_tracking": self.cost_tracking,
             "local_gpu_status": asdict(self.local_gpu),
             "session_id": self.session_id,
-            "performance_log": self.performance_log
+            "in_flight": {key: len(tasks) for key, tasks in self.in_flight.items()},
+            "warm_models": {key: list(models) for key, models in self.warm_models.items()},
+            "performance_log": list(self.performance_log)
         }
 
     def update_cloud_costs(self, new_cloud_config: List[Dict]):
@@ -329,6 +457,86 @@ class HybridGPUManager:
         }
 
 
+class GPUSchedulerSimulator:
+    """
+    // [TASK]: Offline replay of recorded task traces against scheduling strategies
+    // [GOAL]: Compare strategies on real workloads without touching GPUs or cloud providers
+    // [SNIPPET]: perfcheck + costaware
+
+    Trace entries use the performance_log format (started_at, task_type, reference_time,
+    estimated_memory, can_use_cpu, model_name, model_load_time). Each resource runs its
+    tasks FIFO across its slots on a simulated clock.
+    """
+
+    def __init__(self, local_gpu: Optional[GPUResource] = None, cloud_providers: Optional[List[Dict]] = None, **manager_kwargs):
+        self.local_gpu = local_gpu or GPUResource("none", 0, 0, 0, 0, False)
+        self.cloud_providers = cloud_providers
+        self.manager_kwargs = manager_kwargs
+
+    def run(self, trace: List[Dict], strategy: str = "expected_completion") -> Dict:
+        now = [0.0]
+        manager = HybridGPUManager(
+            cost_optimization_strategy=strategy, local_gpu=self.local_gpu,
+            cloud_providers=self.cloud_providers, clock=lambda: now[0], **self.manager_kwargs
+        )
+        tasks = sorted(trace, key=lambda entry: entry.get("started_at", 0.0))
+        origin = tasks[0].get("started_at", 0.0) if tasks else 0.0
+        slot_free_at: Dict[str, List[float]] = {}
+        running = []  # heap of (end, seq, task_id, resource, profile, run_time)
+        completion_times, total_cost, cold_starts, placements = [], 0.0, 0, {}
+
+        def complete_until(until: float):
+            while running and running[0][0] <= until:
+                end, _, task_id, resource, profile, run_time = heapq.heappop(running)
+                now[0] = end
+                manager._finish_task(task_id, resource, profile, run_time)
+
+        for seq, entry in enumerate(tasks):
+            arrival = entry.get("started_at", 0.0) - origin
+            complete_until(arrival)
+            now[0] = arrival
+
+            profile = TaskProfile(
+                task_type=entry["task_type"], estimated_memory=entry.get("estimated_memory", 0.0),
+                estimated_time=entry["reference_time"], priority=entry.get("priority", 5),
+                can_use_cpu=entry.get("can_use_cpu", True), model_name=entry.get("model_name"),
+                model_load_time=entry.get("model_load_time", 0.0),
+            )
+            resource = manager.select_best_resource(profile)
+            task_id = f"sim_{seq}"
+            cold = not manager.is_model_warm(resource, profile.model_name)
+            run_time = entry["reference_time"] * REFERENCE_PERFORMANCE_SCORE / manager.resource_speed(resource)
+            duration = run_time + (profile.model_load_time if cold else 0.0)
+
+            slots = slot_free_at.setdefault(resource["key"], [0.0] * resource.get("slots", 1))
+            start = max(arrival, heapq.heappop(slots))
+            heapq.heappush(slots, start + duration)
+            manager._begin_task(task_id, resource, profile)
+            heapq.heappush(running, (start + duration, seq, task_id, resource, profile, run_time))
+
+            completion_times.append(start + duration - arrival)
+            total_cost += resource["cost"] * duration / 3600
+            cold_starts += cold
+            placements[resource["key"]] = placements.get(resource["key"], 0) + 1
+
+        complete_until(float("inf"))
+        completion_times.sort()
+        return {
+            "strategy": strategy,
+            "tasks": len(tasks),
+            "makespan": now[0],
+            "mean_completion_time": statistics.fmean(completion_times) if completion_times else 0.0,
+            "p95_completion_time": completion_times[int(0.95 * (len(completion_times) - 1))] if completion_times else 0.0,
+            "total_cost": total_cost,
+            "cold_starts": cold_starts,
+            "placements": placements,
+        }
+
+    def compare(self, trace: List[Dict], strategies: Optional[List[str]] = None) -> Dict[str, Dict]:
+        strategies = strategies or ["expected_completion", "balanced", "low_cost", "high_performance"]
+        return {strategy: self.run(trace, strategy) for strategy in strategies}
+
+
 # Integration helper for existing Shujaa pipeline
 class ShujaaGPUIntegration:
     """
@@ -338,7 +546,8 @@ class ShujaaGPUIntegration:
     """
 
     def __init__(self):
-        self.gpu_manager = HybridGPUManager()
+        # Pipeline tasks queue behind each other, so place them by expected completion time
+        self.gpu_manager = HybridGPUManager(cost_optimization_strategy="expected_completion")
         logger.info("🎬 Shujaa GPU Integration ready")
 
     async def accelerated_image_generation(
@@ -457,4 +666,11 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import sys
+
+    if len(sys.argv) == 3 and sys.argv[1] == "--simulate":
+        # Replay a recorded trace (e.g. a dumped performance_log) against every strategy
+        with open(sys.argv[2]) as f:
+            print(json.dumps(GPUSchedulerSimulator().compare(json.load(f)), indent=2))
+    else:
+        asyncio.run(main())
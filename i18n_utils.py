@@ -1,47 +1,166 @@
-from babel import Locale
 from babel.messages.pofile import read_po
-from typing import Dict, Any, Optional
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Any, Iterable, Mapping, Optional, Tuple
 from config_loader import get_config
 from logging_setup import get_logger
 from functools import lru_cache
+import asyncio
+import marshal
 import os
+import time
 from unittest.mock import MagicMock # Elite Cursor Snippet: MagicMock_import
 
 logger = get_logger(__name__)
 config = get_config()
 
-# Placeholder for loaded translations
-_translations: Dict[str, Dict[str, str]] = {}
+TRANSLATIONS_DIR = os.path.join(os.path.dirname(__file__), "translations")
+CACHE_FORMAT_VERSION = 1
 
-def load_translations(lang_code: str):
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    // [TASK]: One locale's messages, compiled once
+    // [GOAL]: Read-only dict lookups per request; no .po parsing on the hot path
+    """
+    locale: str
+    messages: Mapping[str, str]
+    source_key: Optional[Tuple[int, int]] # (mtime_ns, size) of the .po it was built from
+
+
+def _po_messages(po_file_path: str) -> Dict[str, str]:
+    with open(po_file_path, "r", encoding="utf-8") as f:
+        catalog = read_po(f)
+    messages = {}
+    for message in catalog:
+        # Skip the header entry, fuzzy guesses and untranslated strings so lookups fall back to the id
+        if not message.id or message.fuzzy:
+            continue
+        message_id = message.id[0] if isinstance(message.id, (tuple, list)) else message.id
+        translated = message.string[0] if isinstance(message.string, (tuple, list)) else message.string
+        if translated:
+            messages[message_id] = translated
+    return messages
+
+
+class TranslationCatalogs:
+    """
+    Compiled catalogs per locale. Each .po is parsed at most once per change: the result is kept
+    in memory and, when cache_files is on, in a marshal file next to it keyed by the source's
+    mtime and size. reload() swaps catalogs in with a single dict assignment, so concurrent
+    lookups always see either the old or the new catalog.
+    """
+
+    def __init__(self, translations_dir: str = TRANSLATIONS_DIR, cache_files: Optional[bool] = None):
+        settings = config.i18n if isinstance(config.i18n, dict) else {}
+        self.translations_dir = translations_dir
+        self.cache_files = settings.get("catalog_cache_files", True) if cache_files is None else cache_files
+        self._catalogs: Dict[str, Catalog] = {}
+
+    def po_path(self, lang_code: str) -> str:
+        return os.path.join(self.translations_dir, lang_code, "LC_MESSAGES", "messages.po")
+
+    def _source_key(self, po_file_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(po_file_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_cache(self, cache_path: str, source_key: Tuple[int, int]) -> Optional[Dict[str, str]]:
+        try:
+            with open(cache_path, "rb") as f:
+                version, key, messages = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != CACHE_FORMAT_VERSION or tuple(key) != source_key or not isinstance(messages, dict):
+            return None
+        return messages
+
+    def _write_cache(self, cache_path: str, source_key: Tuple[int, int], messages: Dict[str, str]):
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                marshal.dump((CACHE_FORMAT_VERSION, source_key, messages), f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # Read-only deployments still work; they just parse the .po on start-up
+            logger.debug(f"Could not write translation cache {cache_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def compile(self, lang_code: str) -> Catalog:
+        po_file_path = self.po_path(lang_code)
+        source_key = self._source_key(po_file_path)
+        if source_key is None:
+            logger.warning(f"Translation file not found for {lang_code} at {po_file_path}. Using default.")
+            return Catalog(lang_code, MappingProxyType({}), None)
+
+        cache_path = po_file_path[:-3] + ".cache"
+        messages = self._read_cache(cache_path, source_key) if self.cache_files else None
+        if messages is None:
+            try:
+                messages = _po_messages(po_file_path)
+            except Exception as e:
+                logger.error(f"Failed to load translations for {lang_code}: {e}")
+                return Catalog(lang_code, MappingProxyType({}), source_key)
+            if self.cache_files:
+                self._write_cache(cache_path, source_key, messages)
+        logger.info(f"Loaded {len(messages)} translations for {lang_code}.")
+        return Catalog(lang_code, MappingProxyType(messages), source_key)
+
+    def get(self, lang_code: str) -> Catalog:
+        catalog = self._catalogs.get(lang_code)
+        if catalog is None:
+            catalog = self.compile(lang_code)
+            # Missing locales are remembered too, so an unknown locale warns once, not per call
+            self._catalogs = {**self._catalogs, lang_code: catalog}
+        return catalog
+
+    def reload(self, lang_codes: Optional[Iterable[str]] = None) -> Dict[str, Catalog]:
+        """Recompile the given locales (default: every loaded one) whose .po changed."""
+        catalogs = dict(self._catalogs)
+        for lang_code in (lang_codes if lang_codes is not None else list(catalogs)):
+            current = catalogs.get(lang_code)
+            if current is None or current.source_key != self._source_key(self.po_path(lang_code)):
+                catalogs[lang_code] = self.compile(lang_code)
+        self._catalogs = catalogs
+        return catalogs
+
+    def clear(self):
+        self._catalogs = {}
+
+    async def watch(self, interval_seconds: float = 5.0):
+        """Hot-reloads edited catalogs. Run as a background task."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"Translation reload failed: {e}")
+
+
+translation_catalogs = TranslationCatalogs()
+
+
+def load_translations(lang_code: str) -> Mapping[str, str]:
     """
     Loads translations for a given language code.
     // [TASK]: Load translations from .po files
     // [GOAL]: Provide translated strings for the application
     // [ELITE_CURSOR_SNIPPET]: doccode
     """
-    if lang_code in _translations:
-        return _translations[lang_code]
+    return translation_catalogs.get(lang_code).messages
 
-    translations_dir = os.path.join(os.path.dirname(__file__), "translations")
-    locale_dir = os.path.join(translations_dir, lang_code, "LC_MESSAGES")
-    po_file_path = os.path.join(locale_dir, "messages.po")
 
-    if not os.path.exists(po_file_path):
-        logger.warning(f"Translation file not found for {lang_code} at {po_file_path}. Using default.")
-        return {}
+def translate(message_id: str, locale: str = "en") -> str:
+    """Message lookup only; the template is returned uninterpolated."""
+    return translation_catalogs.get(locale).messages.get(message_id, message_id) # Fallback to message_id if not found
 
-    try:
-        with open(po_file_path, "r", encoding="utf-8") as f:
-            catalog = read_po(f)
-            _translations[lang_code] = {message.id: str(message.string) for message in catalog}
-            logger.info(f"Loaded {len(_translations[lang_code])} translations for {lang_code}.")
-            return _translations[lang_code]
-    except Exception as e:
-        logger.error(f"Failed to load translations for {lang_code}: {e}")
-        return {}
 
-@lru_cache(maxsize=128)
 def gettext(message_id: str, locale: str = "en", **variables: Any) -> str:
     """
     Translates a message ID into the target locale.
@@ -49,18 +168,44 @@ def gettext(message_id: str, locale: str = "en", **variables: Any) -> str:
     // [GOAL]: Provide a simple translation function
     // [ELITE_CURSOR_SNIPPET]: doccode
     """
-    translations = load_translations(locale)
-    translated_message = translations.get(message_id, message_id) # Fallback to message_id if not found
+    translated_message = translate(message_id, locale)
 
-    # Apply variables if any
+    # Apply variables if any. Not memoised: the lookup is a dict hit and values may be unhashable.
     if variables:
         try:
             return translated_message.format(**variables)
-        except KeyError as e:
+        except (KeyError, IndexError) as e:
             logger.warning(f"Missing variable {e} in translation for '{message_id}' ({locale}).")
             return translated_message # Return untranslated if variables don't match
     return translated_message
 
+
+@lru_cache(maxsize=2048)
+def negotiate_locale(accept_language: str, supported_languages: Tuple[str, ...], default_language: str) -> str:
+    """
+    Picks the highest-weighted supported language from an Accept-Language value
+    (e.g. "en-US,en;q=0.9,fr;q=0.8"). Memoised per header: browsers send a handful of distinct values.
+    """
+    ranked = []
+    for position, part in enumerate(accept_language[:512].split(",")):
+        tag, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        language = tag.strip().replace("_", "-").split("-")[0].lower()
+        if language and language != "*" and quality > 0:
+            ranked.append((-quality, position, language))
+    for _, _, language in sorted(ranked):
+        if language in supported_languages:
+            return language
+    return default_language
+
+
 def get_locale_from_request(request: Any) -> str:
     """
     Detects the preferred locale from the request (e.g., Accept-Language header).
@@ -75,20 +220,12 @@ def get_locale_from_request(request: Any) -> str:
     #     return tenant_locale
 
     # Fallback to Accept-Language header
+    default_language = config.i18n.default_language # Default language from config
     accept_language = request.headers.get("Accept-Language")
     if accept_language:
-        try:
-            # Parse Accept-Language header (e.g., "en-US,en;q=0.9,fr;q=0.8")
-            locales = Locale.parse(accept_language, sep=',')
-            # Return the first preferred language that we support
-            supported_languages = config.i18n.supported_languages # e.g., ["en", "sw", "fr"]
-            for locale in locales:
-                if locale.language in supported_languages:
-                    return locale.language
-        except Exception as e:
-            logger.warning(f"Failed to parse Accept-Language header: {e}")
-    
-    return config.i18n.default_language # Default language from config
+        supported_languages = config.i18n.supported_languages # e.g., ["en", "sw", "fr"]
+        return negotiate_locale(accept_language, tuple(supported_languages), default_language)
+    return default_language
 
 # Placeholder for tenant-specific locale from DB (needs actual DB integration)
 def get_tenant_locale_from_db(tenant_id: str) -> Optional[str]:
@@ -102,8 +239,72 @@ def get_tenant_locale_from_db(tenant_id: str) -> Optional[str]:
     # For demonstration, we return None, meaning no tenant-specific override.
     return None
 
+def benchmark_i18n(locales: int = 30, templates: int = 300, requests: int = 20000,
+                   messages_per_request: int = 5) -> Dict[str, float]:
+    """
+    Per-request localisation cost (negotiate a locale, render several templates with variables)
+    across many locales, plus catalog build time from .po versus from the binary cache.
+    """
+    import random
+    import tempfile
+
+    global translation_catalogs
+    lang_codes = [f"l{i:02d}" for i in range(locales)]
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as translations_dir:
+        for lang_code in lang_codes:
+            locale_dir = os.path.join(translations_dir, lang_code, "LC_MESSAGES")
+            os.makedirs(locale_dir)
+            with open(os.path.join(locale_dir, "messages.po"), "w", encoding="utf-8") as f:
+                for i in range(templates):
+                    f.write(f'msgid "msg_{i}"\nmsgstr "[{lang_code}] message {i} for {{name}} ({{count}})"\n\n')
+
+        started = time.perf_counter()
+        TranslationCatalogs(translations_dir, cache_files=True).reload(lang_codes)
+        from_po = time.perf_counter() - started
+        started = time.perf_counter()
+        store = TranslationCatalogs(translations_dir, cache_files=True)
+        store.reload(lang_codes)
+        from_cache = time.perf_counter() - started
+
+        supported = tuple(lang_codes)
+        headers = [f"{code}-XX,{code};q=0.9,en;q=0.8" for code in lang_codes] + \
+                  [f"xx,{code};q=0.5,*;q=0.1" for code in lang_codes]
+        plan = [(rng.choice(headers), [f"msg_{rng.randrange(templates)}" for _ in range(messages_per_request)])
+                for _ in range(requests)]
+
+        def run(negotiate) -> float:
+            started = time.perf_counter()
+            for header, message_ids in plan:
+                locale = negotiate(header, supported, "en")
+                for message_id in message_ids:
+                    gettext(message_id, locale=locale, name="Amani", count=3)
+            return (time.perf_counter() - started) / requests * 1e6
+
+        previous, translation_catalogs = translation_catalogs, store
+        try:
+            negotiate_locale.cache_clear()
+            memoised_us = run(negotiate_locale)
+            unmemoised_us = run(negotiate_locale.__wrapped__)
+        finally:
+            translation_catalogs = previous
+    return {
+        "compile_from_po_ms_per_locale": round(from_po / locales * 1e3, 3),
+        "load_from_cache_ms_per_locale": round(from_cache / locales * 1e3, 3),
+        "request_us": round(memoised_us, 2),
+        "request_unmemoised_negotiation_us": round(unmemoised_us, 2),
+    }
+
+
 # Example usage (for testing)
 if __name__ == "__main__":
+    import json
+    import sys
+
+    if "--benchmark" in sys.argv:
+        print(json.dumps(benchmark_i18n(), indent=2))
+        sys.exit(0)
+
     # Create dummy translation files for testing
     os.makedirs("translations/en/LC_MESSAGES", exist_ok=True)
     with open("translations/en/LC_MESSAGES/messages.po", "w", encoding="utf-8") as f:
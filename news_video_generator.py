@@ -30,6 +30,7 @@ from utils.parallel_processing import ParallelProcessor # Import ParallelProcess
 from error_utils import log_and_raise, retry_on_exception
 from enhanced_model_router import EnhancedModelRouter, GenerationRequest
 from logging_setup import get_logger, setup_logging
+from scene_asset_store import asset_key, model_fingerprint, scene_asset_store
 
 from dotenv import load_dotenv
 
@@ -127,6 +128,12 @@ async def generate_image(scene_text, output_path, enhanced_router: Any, dialect:
         type="image",
         dialect=dialect
     )
+    # Placeholders are never stored, so a retry after a router failure asks the router again
+    cache_key = asset_key("image", prompt=scene_text, dialect=dialect, quality=request.quality, seed=None,
+                          resolution=config.video.output_resolution, model=model_fingerprint("image_generation"))
+    if scene_asset_store.fetch(cache_key, output_path):
+        logger.info(f"  Image reused from asset store: {output_path}")
+        return output_path
     
     result = await enhanced_router.route_generation(request)
     
@@ -141,11 +148,13 @@ async def generate_image(scene_text, output_path, enhanced_router: Any, dialect:
             image_bytes = base64.b64decode(encoded)
             with open(output_path, "wb") as f:
                 f.write(image_bytes)
+            scene_asset_store.put(cache_key, output_path)
             logger.info(f"  Image generated via router: {output_path}")
             return output_path
         elif os.path.exists(result.content_url): # If router returns a path to a temp file
             import shutil
             shutil.copy(result.content_url, output_path)
+            scene_asset_store.put(cache_key, output_path)
             logger.info(f"  Image copied from router temp path: {output_path}")
             return output_path
         else: # Fallback to placeholder if router returns a URL that needs fetching or other format
@@ -232,6 +241,11 @@ async def generate_voiceover_from_text(text, output_file, enhanced_router: Any,
         type="audio",
         dialect=dialect
     )
+    cache_key = asset_key("tts", text=text, dialect=dialect, quality=request.quality, voice=None,
+                          model=model_fingerprint("voice_synthesis"))
+    if scene_asset_store.fetch(cache_key, output_file):
+        logger.info(f"Voiceover reused from asset store: {output_file}")
+        return output_file
     
     result = await enhanced_router.route_generation(request)
     
@@ -243,11 +257,13 @@ async def generate_voiceover_from_text(text, output_file, enhanced_router: Any,
             audio_bytes = base64.b64decode(encoded)
             with open(output_file, "wb") as f:
                 f.write(audio_bytes)
+            scene_asset_store.put(cache_key, output_file)
             logger.info(f"Voiceover generated via router: {output_file}")
             return output_file
         elif os.path.exists(result.content_url): # If router returns a path to a temp file
             import shutil
             shutil.copy(result.content_url, output_file)
+            scene_asset_store.put(cache_key, output_file)
             logger.info(f"Voiceover copied from router temp path: {output_file}")
             return output_file
         else: # Fallback to gTTS if router returns a URL that needs fetching or other format
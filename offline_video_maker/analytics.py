@@ -3,42 +3,43 @@
 Shujaa Studio - Analytics & Performance Monitoring
 
 Lightweight analytics for generation timing, error rates, and resource usage.
-Safe defaults: logs to JSONL in ./debug_logs/shujaa_analytics.jsonl
+Safe defaults: logs to JSONL in ./debug_logs/shujaa_analytics.jsonl (see metrics.analytics_log).
+Events are buffered and written by a background thread, so logging never waits on disk.
 """
 
-import json
-import os
 import time
-from pathlib import Path
 from typing import Any, Dict, Callable
 
-LOG_DIR = Path("debug_logs")
-LOG_DIR.mkdir(exist_ok=True)
-LOG_FILE = LOG_DIR / "shujaa_analytics.jsonl"
+from pipeline_metrics import event_writer
+
+LOG_FILE = event_writer.path
 
 
 def log_event(event: Dict[str, Any]) -> None:
     try:
-        event = {**event, "ts": time.time()}
-        with LOG_FILE.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        event_writer.write({**event, "ts": time.time()})
     except Exception:
         # Never fail main pipeline due to analytics
         pass
 
 
+def flush() -> int:
+    """Writes buffered events now (tests, shutdown hooks)."""
+    return event_writer.flush()
+
+
 def timed(name: str) -> Callable:
     """Decorator to time functions and log duration."""
     def decorator(func: Callable) -> Callable:
         def wrapper(*args, **kwargs):
-            start = time.time()
+            start = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                duration = time.time() - start
+                duration = time.perf_counter() - start
                 log_event({"type": "timing", "name": name, "duration_s": round(duration, 3)})
                 return result
             except Exception as e:
-                duration = time.time() - start
+                duration = time.perf_counter() - start
                 log_event({
                     "type": "error", "name": name, "duration_s": round(duration, 3), "error": str(e)
                 })
@@ -15,6 +15,7 @@ Elite AI-Powered Video Generation with Kenya-First Storytelling
 
 import os
 import sys
+import shutil
 from logging_setup import get_logger; logger=get_logger(__name__)
 import subprocess
 import json
@@ -23,10 +24,11 @@ from pathlib import Path
 from time import sleep
 import tempfile
 import asyncio
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 
 from config_loader import get_config
 from ai_model_manager import generate_text, generate_image as ai_generate_image, text_to_speech, speech_to_text
+from enhanced_model_router import GenerationRequest
 from error_utils import log_and_raise, retry_on_exception
 
 config = get_config()
@@ -47,7 +49,11 @@ except Exception:
 
 # Performance and concurrency enhancements (non-breaking integrations)
 from .analytics import log_event, timed, mark_stage
+from pipeline_metrics import pipeline_metrics, set_stage_backend
+from scene_asset_store import asset_key, model_fingerprint, scene_asset_store
 from .model_cache import initialize_cache, model_cache
+from .render_manifest import (RenderManifest, SceneEntry, load_scene_breakdown, probe_duration, save_scene_breakdown,
+                              scene_fingerprint, script_lines, validate_project_id)
 try:
     from utils.parallel_processing import ParallelProcessor, SceneProcessor
 except Exception:
@@ -58,6 +64,17 @@ from .social_optimizer import generate_all as generate_social_all
 # SDXL and AI imports for Combo Pack C
 pass
 
+PIPELINE_NAME = "offline_video_maker" # Prometheus `pipeline` label
+
+# Encoding of a single scene clip (still image + narration)
+SCENE_CODEC_ARGS = ("-c:v", "libx264", "-tune", "stillimage", "-c:a", "aac", "-b:a", "192k", "-pix_fmt", "yuv420p", "-shortest")
+# Per-segment versions of create_multiple_formats' resize/centre-crop, for incremental project exports
+SEGMENT_FORMATS = {
+    "landscape": "scale=1920:1080",
+    "portrait": "scale=-2:1920,crop=1080:1920",
+    "square": "scale=-2:1080,crop=1080:1080",
+}
+
 
 class OfflineVideoMaker:
     """
@@ -83,6 +100,7 @@ class OfflineVideoMaker:
         # Feature toggles (env-driven)
         self.enable_parallel = os.environ.get("SHUJAA_PARALLEL", "false").lower() == "true"
         self.enable_social = os.environ.get("SHUJAA_SOCIAL", "true").lower() != "false"
+        self.current_scenes: List[Dict[str, Any]] = []  # Scenes of the last render; their text is the narration script
 
         # Initialize SDXL pipeline for Combo Pack C
         self.sdxl_pipeline = None # Will be loaded via ai_model_manager if needed
@@ -195,6 +213,7 @@ class OfflineVideoMaker:
             logger.warning(f"Failed to import MusicEngine: {e}")
             return False
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "tts", backend="router")
     async def generate_voice(self, scene: Dict[str, str], enhanced_router: Any, dialect: Optional[str] = None) -> Path:
         """
         // [TASK]: Generate voiceover for a scene using enhanced_router
@@ -211,6 +230,12 @@ class OfflineVideoMaker:
             type="audio",
             dialect=dialect
         )
+        cache_key = asset_key("tts", text=text_to_speak, dialect=dialect, quality=request.quality,
+                              voice=scene.get("voice"), model=model_fingerprint("voice_synthesis"))
+        if scene_asset_store.fetch(cache_key, output_file):
+            set_stage_backend("asset_store")
+            logger.info(f"[CACHE] Voice reused from asset store: {output_file}")
+            return output_file
 
         result = await enhanced_router.route_generation(request)
 
@@ -221,11 +246,13 @@ class OfflineVideoMaker:
                 audio_bytes = base64.b64decode(encoded)
                 with open(output_file, "wb") as f:
                     f.write(audio_bytes)
+                scene_asset_store.put(cache_key, output_file)
                 logger.info(f"[SUCCESS] Voice generated via router: {output_file}")
                 return output_file
             elif os.path.exists(result.content_url):
                 import shutil
                 shutil.copy(result.content_url, output_file)
+                scene_asset_store.put(cache_key, output_file)
                 logger.info(f"[SUCCESS] Voice copied from router temp path: {output_file}")
                 return output_file
             else:
@@ -237,6 +264,7 @@ class OfflineVideoMaker:
             self._generate_fallback_voice(text_to_speak, output_file)
             return output_file
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "script_parsing", backend="router")
     def generate_story_breakdown(self, prompt: str, enhanced_router: Any, dialect: Optional[str] = None) -> List[Dict[str, str]]:
         """
         // [TASK]: Break down user prompt into intelligent scenes using AI
@@ -323,6 +351,7 @@ class OfflineVideoMaker:
 
     def _create_intelligent_scenes_fallback(self, prompt: str) -> List[Dict[str, str]]:
         """Fallback to original scene creation logic if AI generation fails."""
+        set_stage_backend("heuristic")
         # Original logic from _create_intelligent_scenes
         story_length = len(prompt.split())
         if story_length < 20:
@@ -447,6 +476,7 @@ class OfflineVideoMaker:
         else:
             return f"{base_visual}the key events of this part of our story, set in vibrant Kenyan landscape"
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "subtitles", backend="router")
     async def generate_captions_from_audio(self, audio_file: Path, enhanced_router: Any, dialect: Optional[str] = None) -> str:
         """
         // [TASK]: Generate captions from audio using enhanced_router
@@ -477,6 +507,7 @@ class OfflineVideoMaker:
         // [GOAL]: Ensure voice generation always works
         // [SNIPPET]: surgicalfix
         """
+        set_stage_backend("fallback_tts")
         try:
             # Try using system TTS (Windows SAPI)
             if os.name == "nt":  # Windows
@@ -507,6 +538,7 @@ class OfflineVideoMaker:
         except Exception as e:
             log_and_raise(e, f"Fallback TTS failed for {output_file}")
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "image_generation", backend="router")
     async def generate_image(self, scene: Dict[str, str], enhanced_router: Any, dialect: Optional[str] = None) -> Path:
         """
         // [TASK]: Generate images using enhanced_router
@@ -526,6 +558,13 @@ class OfflineVideoMaker:
             type="image",
             dialect=dialect
         )
+        cache_key = asset_key("image", prompt=description, dialect=dialect, quality=request.quality,
+                              seed=scene.get("seed"), resolution=config.video.output_resolution,
+                              model=model_fingerprint("image_generation"))
+        if scene_asset_store.fetch(cache_key, image_file):
+            set_stage_backend("asset_store")
+            print(f"[CACHE] Image reused from asset store: {image_file}")
+            return image_file
         
         result = await enhanced_router.route_generation(request)
         
@@ -536,11 +575,13 @@ class OfflineVideoMaker:
                 image_bytes = base64.b64decode(encoded)
                 with open(image_file, "wb") as f:
                     f.write(image_bytes)
+                scene_asset_store.put(cache_key, image_file)
                 print(f"[SUCCESS] ✅ Image generated via router: {image_file}")
                 return image_file
             elif os.path.exists(result.content_url):
                 import shutil
                 shutil.copy(result.content_url, image_file)
+                scene_asset_store.put(cache_key, image_file)
                 print(f"[SUCCESS] ✅ Image copied from router temp path: {image_file}")
                 return image_file
             else:
@@ -656,6 +697,7 @@ class OfflineVideoMaker:
         // [GOAL]: Ensure image generation always works
         // [SNIPPET]: surgicalfix
         """
+        set_stage_backend("placeholder")
         if self.default_image.exists():
             # Copy existing default image
             subprocess.run(
@@ -712,6 +754,7 @@ class OfflineVideoMaker:
                     check=True,
                 )
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "scene_render", backend="ffmpeg")
     def create_scene_video(
         self, scene: Dict[str, str], audio_file: Path, image_file: Path
     ) -> Path:
@@ -725,6 +768,14 @@ class OfflineVideoMaker:
 
         logger.info(f"[VIDEO] Creating video scene: {scene_id}")
 
+        codec_args = list(SCENE_CODEC_ARGS)
+        # Inputs are keyed by content, so a clip from an earlier run with the same image and audio is reused
+        cache_key = asset_key("scene_render", image=Path(image_file), audio=Path(audio_file), codec=codec_args)
+        if scene_asset_store.fetch(cache_key, video_file):
+            set_stage_backend("asset_store")
+            logger.info(f"[CACHE] Scene video reused from asset store: {video_file}")
+            return video_file
+
         # Use ffmpeg to combine image and audio
         ffmpeg_cmd = [
             "ffmpeg",
@@ -735,17 +786,7 @@ class OfflineVideoMaker:
             str(image_file),
             "-i",
             str(audio_file),
-            "-c:v",
-            "libx264",
-            "-tune",
-            "stillimage",
-            "-c:a",
-            "aac",
-            "-b:a",
-            "192k",
-            "-pix_fmt",
-            "yuv420p",
-            "-shortest",
+            *codec_args,
             str(video_file),
         ]
 
@@ -758,11 +799,13 @@ class OfflineVideoMaker:
             logger.info(f"[SUCCESS] Scene video created: {video_file}")
         except subprocess.CalledProcessError as e:
             log_and_raise(e, f"FFmpeg failed for scene {scene_id}: {e.stderr}")
+        scene_asset_store.put(cache_key, video_file)
 
         return video_file
 
         return video_file
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "merge", backend="moviepy")
     def merge_scenes(self, scene_videos: List[Path]) -> Path:
         """
         // [TASK]: Merge all scene videos with professional transitions
@@ -821,6 +864,7 @@ class OfflineVideoMaker:
         except Exception as e:
             logger.warning(f"[WARNING] MoviePy merge failed: {e}")
             logger.info("[FALLBACK] Using basic ffmpeg concatenation...")
+            set_stage_backend("ffmpeg")
 
             # Fallback to basic ffmpeg merge
             concat_file = self.temp_dir / "scenes_list.txt"
@@ -850,6 +894,7 @@ class OfflineVideoMaker:
 
         return final_output
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "export", backend="moviepy")
     def create_multiple_formats(self, final_video: Path) -> Dict[str, Path]:
         """
         // [TASK]: Create multiple aspect ratio versions for social media
@@ -925,11 +970,241 @@ class OfflineVideoMaker:
 
         return formats
 
-    def generate_video(self, prompt: str, aspect_ratio: str = "all", enhanced_router: Any = None, dialect: Optional[str] = None, parallel_processor: Any = None, scene_processor: Any = None) -> Path:
+    @pipeline_metrics.instrument(PIPELINE_NAME, "merge", backend="ffmpeg_copy")
+    def concat_segments(self, segments: List[Tuple[Path, Optional[float]]], output: Path) -> Path:
+        """
+        // [TASK]: Join already-encoded segments without re-encoding them
+        // [GOAL]: A project re-render only pays for its changed scenes; the rest are stream-copied
+        Known segment durations are written into the concat list so the output timeline is their exact sum.
+        """
+        concat_file = output.with_name(f".{output.stem}_segments.txt")
+        with open(concat_file, "w", encoding="utf-8") as f:
+            for segment, duration in segments:
+                f.write(f"file '{Path(segment).absolute()}'\n")
+                if duration:
+                    f.write(f"duration {duration:.6f}\n")
+
+        # Written beside the target and swapped in, so a failed merge keeps the previous render
+        partial = output.with_name(f".{output.stem}.partial{output.suffix}")
+        merge_cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_file), "-c", "copy", str(partial)]
+        try:
+            subprocess.run(merge_cmd, capture_output=True, text=True, check=True)
+            os.replace(partial, output)
+        except subprocess.CalledProcessError as e:
+            log_and_raise(e, f"FFmpeg stream-copy merge failed: {e.stderr}")
+        finally:
+            concat_file.unlink(missing_ok=True)
+            partial.unlink(missing_ok=True)
+        logger.info(f"[MERGE] Stream-copied {len(segments)} segments into {output.name}")
+        return output
+
+    @pipeline_metrics.instrument(PIPELINE_NAME, "export", backend="ffmpeg")
+    def export_segment_format(self, clip: Path, format_name: str, output: Path) -> Path:
+        """
+        // [TASK]: Render one scene clip in one social format
+        // [GOAL]: Format exports are per segment, so unchanged scenes keep their encoded versions
+        """
+        export_cmd = [
+            "ffmpeg", "-y", "-i", str(clip), "-vf", SEGMENT_FORMATS[format_name],
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "copy", str(output),
+        ]
+        try:
+            subprocess.run(export_cmd, capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            log_and_raise(e, f"FFmpeg {format_name} export failed for {clip.name}: {e.stderr}")
+        return output
+
+    def _scene_render_settings(self, dialect: Optional[str]) -> Dict[str, Any]:
+        """Everything besides the scene itself that changes a rendered clip."""
+        return {
+            "pipeline": PIPELINE_NAME,
+            "dialect": dialect,
+            "voice_model": model_fingerprint("voice_synthesis"),
+            "image_model": model_fingerprint("image_generation"),
+            "resolution": config.video.output_resolution,
+            "codec": list(SCENE_CODEC_ARGS),
+            "effects": self._effects_available(),
+        }
+
+    @staticmethod
+    def _effects_available() -> bool:
+        try:
+            from moviepy.editor import VideoFileClip  # add_professional_effects is a no-op without it
+            return True
+        except ImportError:
+            return False
+
+    @staticmethod
+    def _prepare_scenes(scenes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies scenes in script order with fresh ids and positions; explicit scenes only need a text."""
+        prepared = []
+        for number, scene in enumerate(scenes, start=1):
+            if not scene.get("text"):
+                raise ValueError(f"Scene {number} has no text")
+            scene = dict(scene)
+            scene.setdefault("description", scene["text"])
+            scene.setdefault("duration", max(3.0, min(8.0, len(scene["text"].split()) * 0.3)))
+            scene.update(id=f"scene{number}", scene_number=number, total_scenes=len(scenes))
+            prepared.append(scene)
+        return prepared
+
+    def project_scenes(self, project_id: str, script: str, enhanced_router: Any,
+                       dialect: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        // [TASK]: Scene breakdown of a project script, reusing the stored split of every unchanged line
+        // [GOAL]: Only edited lines go back to the LLM, so a non-deterministic router cannot change the scenes of lines nobody touched
+        """
+        project_id = validate_project_id(project_id)
+        project_dir = self.output_dir / "projects" / project_id
+        project_dir.mkdir(parents=True, exist_ok=True)
+
+        stored = load_scene_breakdown(project_dir, dialect)
+        ordered = script_lines(script)
+        lines = {}
+        for line in ordered:
+            if line not in lines:
+                lines[line] = stored[line] if line in stored else self.generate_story_breakdown(line, enhanced_router, dialect)
+        logger.info(f"[PROJECT] {project_id}: re-split {sum(line not in stored for line in lines)} of {len(lines)} script lines")
+        save_scene_breakdown(project_dir, lines, dialect)
+        return self._prepare_scenes([scene for line in ordered for scene in lines[line]])
+
+    def render_project(self, project_id: str, scenes: List[Dict[str, str]], aspect_ratio: str = "all",
+                       enhanced_router: Any = None, dialect: Optional[str] = None,
+                       parallel_processor: Any = None, scene_processor: Any = None) -> Path:
+        """
+        // [TASK]: Incremental render of a project against its render manifest
+        // [GOAL]: Editing one line of a script re-renders one scene, not the whole video
+
+        Scenes are matched to the last render by input fingerprint, so unchanged scenes are reused even
+        if they moved. Only new or changed scenes go through voice, image, render and effects; the final
+        video and each format are stream-copy concatenations of per-scene segments. Project videos use
+        hard cuts: crossfades would re-encode every boundary.
+        """
+        project_id = validate_project_id(project_id)
+        project_dir = self.output_dir / "projects" / project_id
+        (project_dir / "scenes").mkdir(parents=True, exist_ok=True)
+
+        reusable = RenderManifest.load(project_dir, project_id).reusable(project_dir)
+        settings = self._scene_render_settings(dialect)
+        fingerprints = [scene_fingerprint(scene, **settings) for scene in scenes]
+        changed = {}
+        for scene, fingerprint in zip(scenes, fingerprints):
+            if fingerprint not in reusable:
+                changed.setdefault(fingerprint, scene)  # A scene repeated in the script renders once
+        logger.info(f"[PROJECT] {project_id}: {len(scenes) - len(changed)} of {len(scenes)} scenes unchanged, "
+                    f"rendering {len(changed)}")
+
+        if changed:
+            clips = self._render_scenes(list(changed.values()), enhanced_router, dialect, parallel_processor, scene_processor)
+            if len(clips) != len(changed):
+                log_and_raise(RuntimeError(f"{len(changed) - len(clips)} scenes failed to render"),
+                              f"Project {project_id} render incomplete")
+            for fingerprint, rendered in zip(changed, clips):
+                clip = project_dir / "scenes" / f"{fingerprint[:16]}.mp4"
+                shutil.copyfile(rendered, clip)
+                reusable[fingerprint] = SceneEntry(fingerprint, clip.relative_to(project_dir).as_posix(), probe_duration(clip))
+
+        manifest = RenderManifest(project_id, scenes=[reusable[fingerprint] for fingerprint in fingerprints])
+        final_video = self.concat_segments([(project_dir / e.clip, e.duration) for e in manifest.scenes],
+                                           project_dir / f"{project_id}.mp4")
+        manifest.final = final_video.name
+
+        if aspect_ratio == "all":
+            logger.info("\n[FORMATS] 🎬 Creating multi-platform versions...")
+            for format_name in SEGMENT_FORMATS:
+                for entry in {e.fingerprint: e for e in manifest.scenes}.values():
+                    if format_name not in entry.formats:
+                        part = project_dir / "scenes" / f"{entry.fingerprint[:16]}_{format_name}.mp4"
+                        self.export_segment_format(project_dir / entry.clip, format_name, part)
+                        entry.formats[format_name] = part.relative_to(project_dir).as_posix()
+                format_video = self.concat_segments(
+                    [(project_dir / e.formats[format_name], e.duration) for e in manifest.scenes],
+                    project_dir / f"{project_id}_{format_name}.mp4")
+                manifest.formats[format_name] = format_video.name
+        for format_name in SEGMENT_FORMATS:
+            if format_name not in manifest.formats:  # Left over from an earlier "all" render; now out of date
+                (project_dir / f"{project_id}_{format_name}.mp4").unlink(missing_ok=True)
+
+        durations = [entry.duration for entry in manifest.scenes]
+        manifest.duration = round(sum(durations), 6) if all(d is not None for d in durations) else None
+        manifest.save(project_dir)
+        manifest.prune(project_dir)
+        return final_video
+
+    def _render_scenes(self, scenes: List[Dict[str, str]], enhanced_router: Any, dialect: Optional[str],
+                       parallel_processor: Any = None, scene_processor: Any = None) -> List[Path]:
+        """
+        // [TASK]: Turn scenes into finished scene clips (voice, image, render, effects)
+        // [GOAL]: One code path for full renders and for the changed scenes of a project re-render
+        """
+        scene_videos = []
+        # Use passed parallel_processor, or create if not provided (for standalone testing)
+        _parallel_processor = parallel_processor or ParallelProcessor()
+        _scene_processor = scene_processor or SceneProcessor() # Use passed scene_processor
+
+        if self.enable_parallel: # Simplified condition
+            logger.info("\n[PARALLEL] ⚡ Parallel scene processing enabled")
+
+            # A SceneProcessor can only voice and draw scenes when it was given a router; otherwise use this
+            # pipeline's own stages, which take the router per call and reuse the asset store
+            use_processor = getattr(_scene_processor, "enhanced_router", None) is not None
+
+            # Define the async worker for a single scene
+            async def scene_worker(scene_data):
+                loop = asyncio.get_running_loop()
+                try:
+                    if use_processor:
+                        # process_voice/process_image are coroutines; await them rather than handing them to an executor
+                        with pipeline_metrics.stage(PIPELINE_NAME, "tts", backend="scene_processor") as stage:
+                            audio_file = await _scene_processor.process_voice(scene_data["text"], scene_data["id"])
+                            stage.add_output(audio_file)
+                        with pipeline_metrics.stage(PIPELINE_NAME, "image_generation", backend="scene_processor") as stage:
+                            image_file = await _scene_processor.process_image(scene_data["description"], scene_data["id"])
+                            stage.add_output(image_file)
+                    else:
+                        audio_file, image_file = await asyncio.gather(
+                            self.generate_voice(scene_data, enhanced_router, dialect),
+                            self.generate_image(scene_data, enhanced_router, dialect),
+                        )
+                    # Run sync methods in an executor for concurrency
+                    video_file = await loop.run_in_executor(None, self.create_scene_video, scene_data, audio_file, image_file)
+                    enhanced_video = await loop.run_in_executor(None, self.add_professional_effects, video_file, scene_data)
+                    return {"status": "completed", "video_path": enhanced_video}
+                except Exception as e:
+                    log_and_raise(e, f"Error processing scene {scene_data.get('id')}")
+
+            # Define the main async task to be run
+            async def run_parallel_processing(all_scenes):
+                return await _parallel_processor.run_parallel(all_scenes, scene_worker) # Use _parallel_processor
+
+            # Execute the async task from this synchronous method
+            results = asyncio.run(run_parallel_processing(scenes))
+
+            # Collect successful results
+            scene_videos = [res["video_path"] for res in results if res and res["status"] == "completed"]
+
+        else:
+            logger.info("\n[SEQUENTIAL] 🐌 Sequential scene processing enabled")
+            for scene in scenes:
+                logger.info(f"\n[SCENE] Processing {scene['id']}...")
+                audio_file = asyncio.run(self.generate_voice(scene, enhanced_router, dialect))
+                image_file = asyncio.run(self.generate_image(scene, enhanced_router, dialect))
+                video_file = self.create_scene_video(scene, audio_file, image_file)
+                enhanced_video = self.add_professional_effects(video_file, scene)
+                scene_videos.append(enhanced_video)
+
+        return scene_videos
+
+    @pipeline_metrics.instrument_run(PIPELINE_NAME)
+    def generate_video(self, prompt: str, aspect_ratio: str = "all", enhanced_router: Any = None, dialect: Optional[str] = None, parallel_processor: Any = None, scene_processor: Any = None, project_id: Optional[str] = None,
+                       scenes: Optional[List[Dict[str, Any]]] = None) -> Path:
         """
         // [TASK]: Main pipeline - prompt to video
         // [GOAL]: Complete end-to-end video generation with parallel processing
         // [SNIPPET]: thinkwithai + taskchain
+        With a project_id, the render is incremental: see render_project. The prompt is then the project
+        script, and only its edited lines are split into scenes again (see project_scenes). An explicit
+        scenes list skips the LLM breakdown altogether.
         """
         logger.info(f"\n[START] Shujaa Studio Video Generation Pipeline")
         logger.info(f"[PROMPT] {prompt}")
@@ -937,60 +1212,34 @@ class OfflineVideoMaker:
 
         try:
             # Step 1: Generate story breakdown
-            scenes = self.generate_story_breakdown(prompt, enhanced_router, dialect)
-
-            # Step 2: Process each scene (optionally in parallel)
-            scene_videos = []
-            # Use passed parallel_processor, or create if not provided (for standalone testing)
-            _parallel_processor = parallel_processor or ParallelProcessor()
-            _scene_processor = scene_processor or SceneProcessor() # Use passed scene_processor
-
-            if self.enable_parallel: # Simplified condition
-                logger.info("\n[PARALLEL] ⚡ Parallel scene processing enabled")
-
-                # Define the async worker for a single scene
-                async def scene_worker(scene_data):
-                    loop = asyncio.get_running_loop()
-                    try:
-                        # Run sync methods in an executor for concurrency
-                        audio_file = await loop.run_in_executor(None, _scene_processor.process_voice, scene_data["text"], scene_data["id"]) # Use _scene_processor
-                        image_file = await loop.run_in_executor(None, _scene_processor.process_image, scene_data["image_prompt"], scene_data["id"]) # Use _scene_processor
-                        video_file = await loop.run_in_executor(None, self.create_scene_video, scene_data, audio_file, image_file)
-                        enhanced_video = await loop.run_in_executor(None, self.add_professional_effects, video_file, scene_data)
-                        return {"status": "completed", "video_path": enhanced_video}
-                    except Exception as e:
-                        log_and_raise(e, f"Error processing scene {scene_data.get('id')}")
-
-                # Define the main async task to be run
-                async def run_parallel_processing(all_scenes):
-                    return await _parallel_processor.run_parallel(all_scenes, scene_worker) # Use _parallel_processor
-
-                # Execute the async task from this synchronous method
-                results = asyncio.run(run_parallel_processing(scenes))
-
-                # Collect successful results
-                scene_videos = [res["video_path"] for res in results if res and res["status"] == "completed"]
+            if scenes is not None:
+                scenes = self._prepare_scenes(scenes)
+            elif project_id:
+                scenes = self.project_scenes(project_id, prompt, enhanced_router, dialect)
+            else:
+                scenes = self.generate_story_breakdown(prompt, enhanced_router, dialect)
+            if not scenes:
+                raise ValueError("The script has no scenes to render")
+            self.current_scenes = scenes
 
+            if project_id:
+                # Steps 2-4, reusing every unchanged scene from the project's last render
+                final_video = self.render_project(project_id, scenes, aspect_ratio, enhanced_router, dialect,
+                                                  parallel_processor, scene_processor)
             else:
-                logger.info("\n[SEQUENTIAL] 🐌 Sequential scene processing enabled")
-                for scene in scenes:
-                    logger.info(f"\n[SCENE] Processing {scene['id']}...")
-                    audio_file = asyncio.run(self.generate_voice(scene, enhanced_router, dialect))
-                    image_file = asyncio.run(self.generate_image(scene, enhanced_router, dialect))
-                    video_file = self.create_scene_video(scene, audio_file, image_file)
-                    enhanced_video = self.add_professional_effects(video_file, scene)
-                    scene_videos.append(enhanced_video)
-
-            if not scene_videos:
-                log_and_raise(RuntimeError("Video generation failed as no scenes could be created."), "No scenes processed successfully. Aborting video creation.")
-
-            # Step 3: Merge all scenes with transitions
-            final_video = self.merge_scenes(scene_videos)
-
-            # Step 4: Create multiple aspect ratio versions (InVideo style)
-            if aspect_ratio == "all":
-                logger.info("\n[FORMATS] 🎬 Creating multi-platform versions...")
-                self.create_multiple_formats(final_video)
+                # Step 2: Process each scene (optionally in parallel)
+                scene_videos = self._render_scenes(scenes, enhanced_router, dialect, parallel_processor, scene_processor)
+
+                if not scene_videos:
+                    log_and_raise(RuntimeError("Video generation failed as no scenes could be created."), "No scenes processed successfully. Aborting video creation.")
+
+                # Step 3: Merge all scenes with transitions
+                final_video = self.merge_scenes(scene_videos)
+
+                # Step 4: Create multiple aspect ratio versions (InVideo style)
+                if aspect_ratio == "all":
+                    logger.info("\n[FORMATS] 🎬 Creating multi-platform versions...")
+                    self.create_multiple_formats(final_video)
 
             logger.info("\n" + "=" * 60)
             logger.info(f"\n[COMPLETE] 🎉 Video generation successful!")
@@ -1012,6 +1261,7 @@ class OfflineVideoMaker:
         except Exception as e:
             log_and_raise(e, f"Video generation failed")
 
+    @pipeline_metrics.instrument(PIPELINE_NAME, "scene_render", backend="moviepy")
     def add_professional_effects(self, video_file: Path, scene: Dict[str, str]) -> Path:
         """
         // [TASK]: Add professional text overlays and effects
@@ -1119,7 +1369,8 @@ def main(**kwargs):
     # Initialize and run video maker
     try:
         video_maker = OfflineVideoMaker()
-        final_video = video_maker.generate_video(prompt, enhanced_router=enhanced_router, dialect=dialect)
+        final_video = video_maker.generate_video(prompt, enhanced_router=enhanced_router, dialect=dialect,
+                                                 project_id=kwargs.get("project_id"), scenes=kwargs.get("scenes"))
         logger.info(f"[DONE] Video saved to: {final_video}")
         return
     except Exception as e:
@@ -3,9 +3,9 @@
 Media processing, subtitle generation, and mobile export utilities
 """
 
-from .media_utils import MediaUtils
+from .media_utils import MediaUtils, RenderPlan, OutputPreset
 from .subtitle_engine import SubtitleEngine
 from .music_integration import MusicIntegration
 from .vertical_export import VerticalExport
 
-__all__ = ['MediaUtils', 'SubtitleEngine', 'MusicIntegration', 'VerticalExport']
+__all__ = ['MediaUtils', 'RenderPlan', 'OutputPreset', 'SubtitleEngine', 'MusicIntegration', 'VerticalExport']
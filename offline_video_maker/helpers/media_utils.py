@@ -12,13 +12,198 @@ Audio mixing, subtitle burning, vertical padding, and scene video creation
 import subprocess
 import os
 import logging
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Union
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class OutputPreset:
+    """Encoding for one render output; `scale` resizes only this output's branch of the graph,
+    and `pad` (a colour) letterboxes it to that size instead of stretching"""
+    video_args: Tuple[str, ...] = ()
+    audio_args: Tuple[str, ...] = ()
+    scale: Optional[Tuple[int, int]] = None
+    pad: Optional[str] = None
+
+
+PRESETS = {
+    "master": OutputPreset(("-c:v", "libx264", "-pix_fmt", "yuv420p"), ("-c:a", "aac", "-b:a", "192k")),
+    "audio": OutputPreset((), ("-c:a", "aac", "-b:a", "192k")),
+    "whatsapp": OutputPreset(
+        ("-c:v", "libx264", "-preset", "veryfast", "-crf", "28", "-b:v", "800k"),
+        ("-c:a", "aac", "-b:a", "96k"),
+        scale=(720, 1280),
+    ),
+    "tiktok": OutputPreset(
+        ("-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-b:v", "2500k"),
+        ("-c:a", "aac", "-b:a", "128k"),
+        scale=(1080, 1920),
+    ),
+}
+
+
+def subtitles_filter(srt_path: str, font_size: int = 36, font_name: str = "Arial") -> str:
+    # Escape the SRT path for FFmpeg
+    srt_escaped = srt_path.replace("\\", "/").replace(":", "\\:")
+    return f"subtitles={srt_escaped}:force_style='FontName={font_name},FontSize={font_size},PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2'"
+
+
+class RenderPlan:
+    """
+    // [TASK]: Accumulate scene, mix, subtitle and preset steps into one ffmpeg invocation
+    // [GOAL]: One decode and one encode per output instead of a re-encode per step
+
+    plan = (RenderPlan().scene(img).narration(voice).music(bed).subtitles(srt)
+            .output("final.mp4").output("wa.mp4", "whatsapp").output("tt.mp4", "tiktok"))
+    plan.render()
+
+    The filtered video/audio are split once per output, so every preset is encoded from the
+    same decoded frames rather than from another preset's encode.
+    """
+
+    def __init__(self):
+        self.inputs: List[List[str]] = []
+        self.video_index: Optional[int] = None
+        self.still_image = False
+        self.duration: Optional[float] = None
+        self.narration_input: Optional[Tuple[int, float]] = None
+        self.music_input: Optional[Tuple[int, float]] = None
+        self.subtitle_filter: Optional[str] = None
+        self.outputs: List[Tuple[str, OutputPreset]] = []
+
+    def _add_input(self, *args: str) -> int:
+        self.inputs.append(list(args))
+        return len(self.inputs) - 1
+
+    def scene(self, img_path: str, duration: Optional[float] = None) -> "RenderPlan":
+        """Still image held for the length of the audio (or `duration`)"""
+        self.video_index = self._add_input("-loop", "1", "-i", img_path)
+        self.still_image = True
+        self.duration = duration
+        return self
+
+    def video(self, video_path: str) -> "RenderPlan":
+        """Existing video; its own audio is kept unless narration is added"""
+        self.video_index = self._add_input("-i", video_path)
+        return self
+
+    def narration(self, audio_path: str, volume: float = 1.0) -> "RenderPlan":
+        self.narration_input = (self._add_input("-i", audio_path), volume)
+        return self
+
+    def music(self, music_path: str, volume: float = 0.3) -> "RenderPlan":
+        self.music_input = (self._add_input("-i", music_path), volume)
+        return self
+
+    def subtitles(self, srt_path: str, font_size: int = 36, font_name: str = "Arial") -> "RenderPlan":
+        self.subtitle_filter = subtitles_filter(srt_path, font_size, font_name)
+        return self
+
+    def output(self, path: str, preset: Union[str, OutputPreset] = "master") -> "RenderPlan":
+        self.outputs.append((path, PRESETS[preset] if isinstance(preset, str) else preset))
+        return self
+
+    def _audio_source(self, filters: List[str]) -> Tuple[Optional[str], bool]:
+        """(map target, is_filter_label) for the plan's audio"""
+        if self.narration_input and self.music_input:
+            (n, n_vol), (m, m_vol) = self.narration_input, self.music_input
+            filters.append(f"[{n}:a]volume={n_vol}[n];[{m}:a]volume={m_vol}[m];[n][m]amix=inputs=2:duration=shortest:dropout_transition=2[a]")
+            return "a", True
+        source = self.narration_input or self.music_input
+        if source:
+            index, volume = source
+            if volume != 1.0:
+                filters.append(f"[{index}:a]volume={volume}[a]")
+                return "a", True
+            return f"{index}:a", False
+        if self.video_index is not None and not self.still_image:
+            return f"{self.video_index}:a?", False
+        return None, False
+
+    @staticmethod
+    def _branches(source: str, labelled: bool, count: int, split: str, prefix: str, filters: List[str]) -> List[str]:
+        """One map target per output; filter labels can only be consumed once, so split them"""
+        if not labelled:
+            return [source] * count
+        if count == 1:
+            return [f"[{source}]"]
+        labels = [f"{prefix}{i}" for i in range(count)]
+        filters.append(f"[{source}]{split}={count}" + "".join(f"[{label}]" for label in labels))
+        return [f"[{label}]" for label in labels]
+
+    def build_command(self) -> List[str]:
+        if not self.outputs:
+            raise ValueError("Render plan has no outputs")
+        if self.video_index is None and self.narration_input is None and self.music_input is None:
+            raise ValueError("Render plan has no inputs")
+
+        filters: List[str] = []
+        audio, audio_labelled = self._audio_source(filters)
+        audio_maps = self._branches(audio, audio_labelled, len(self.outputs), "asplit", "aout", filters) if audio else [None] * len(self.outputs)
+
+        video_maps: List[Optional[str]] = [None] * len(self.outputs)
+        if self.video_index is not None:
+            needs_filter = self.subtitle_filter or any(preset.scale for _, preset in self.outputs)
+            if needs_filter:
+                filters.append(f"[{self.video_index}:v]{self.subtitle_filter or 'null'}[vbase]")
+                video_maps = self._branches("vbase", True, len(self.outputs), "split", "vsplit", filters)
+            else:
+                video_maps = [f"{self.video_index}:v"] * len(self.outputs)
+            for i, (_, preset) in enumerate(self.outputs):
+                if preset.scale:
+                    width, height = preset.scale
+                    resize = f"scale={width}:{height}"
+                    if preset.pad:
+                        resize += f":force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:{preset.pad}"
+                    filters.append(f"{video_maps[i]}{resize}[vout{i}]")
+                    video_maps[i] = f"[vout{i}]"
+
+        cmd = ["ffmpeg", "-y"]
+        for input_args in self.inputs:
+            cmd.extend(input_args)
+        if filters:
+            cmd.extend(["-filter_complex", ";".join(filters)])
+
+        for (path, preset), video_map, audio_map in zip(self.outputs, video_maps, audio_maps):
+            if audio_labelled and "copy" in preset.audio_args:
+                raise ValueError(f"Cannot stream-copy filtered audio into {path}")
+            if video_map:
+                cmd.extend(["-map", video_map, *preset.video_args])
+                if self.still_image and "libx264" in preset.video_args:
+                    cmd.extend(["-tune", "stillimage"])
+            if audio_map:
+                cmd.extend(["-map", audio_map, *preset.audio_args])
+            if self.still_image:
+                cmd.append("-shortest")
+            if self.duration:
+                cmd.extend(["-t", str(self.duration)])
+            cmd.append(path)
+        return cmd
+
+    def run(self) -> subprocess.CompletedProcess:
+        """Run the whole plan as a single ffmpeg process; raises CalledProcessError on failure"""
+        return subprocess.run(self.build_command(), capture_output=True, text=True, check=True)
+
+    def render(self) -> bool:
+        try:
+            logger.info(f"[RENDER] Single-pass render → {', '.join(path for path, _ in self.outputs)}")
+            self.run()
+            logger.info(f"[RENDER] ✅ Render successful")
+            return True
+
+        except subprocess.CalledProcessError as e:
+            logger.error(f"[RENDER] ❌ Render failed: {e}")
+            logger.error(f"[RENDER] FFmpeg error: {e.stderr}")
+            return False
+        except Exception as e:
+            logger.error(f"[RENDER] ❌ Unexpected error: {e}")
+            return False
+
+
 class MediaUtils:
     """Professional media processing utilities for Combo Pack D"""
     
@@ -26,6 +211,10 @@ class MediaUtils:
         self.temp_dir = Path("temp")
         self.temp_dir.mkdir(exist_ok=True)
         logger.info("[MEDIA] Media utilities initialized")
+
+    def render_plan(self) -> RenderPlan:
+        """Compose mix/scene/subtitle/preset steps and render them in one ffmpeg pass"""
+        return RenderPlan()
     
     def mix_audio(self, narration_path: str, music_path: str, out_path: str, 
                   music_vol: float = 0.3, narration_vol: float = 1.0) -> bool:
@@ -54,20 +243,8 @@ class MediaUtils:
                 logger.error(f"[AUDIO] Music file not found: {music_path}")
                 return False
             
-            # FFmpeg command for audio mixing
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", narration_path,
-                "-i", music_path,
-                "-filter_complex",
-                f"[0:a]volume={narration_vol}[n];[1:a]volume={music_vol}[m];[n][m]amix=inputs=2:duration=shortest:dropout_transition=2[a]",
-                "-map", "[a]",
-                "-c:a", "aac",
-                "-b:a", "192k",
-                out_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            plan = self.render_plan().narration(narration_path, narration_vol).music(music_path, music_vol)
+            plan.output(out_path, "audio").run()
             logger.info(f"[AUDIO] ✅ Audio mixing successful")
             return True
             
@@ -106,19 +283,8 @@ class MediaUtils:
                 logger.error(f"[SUBTITLES] SRT file not found: {srt_path}")
                 return False
             
-            # Escape the SRT path for FFmpeg
-            srt_escaped = srt_path.replace("\\", "/").replace(":", "\\:")
-            
-            # FFmpeg command for subtitle burning
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", video_in,
-                "-vf", f"subtitles={srt_escaped}:force_style='FontName={font_name},FontSize={font_size},PrimaryColour=&Hffffff,OutlineColour=&H000000,Outline=2'",
-                "-c:a", "copy",
-                video_out
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            plan = self.render_plan().video(video_in).subtitles(srt_path, font_size, font_name)
+            plan.output(video_out, OutputPreset(audio_args=("-c:a", "copy"))).run()
             logger.info(f"[SUBTITLES] ✅ Subtitle burning successful")
             return True
             
@@ -199,27 +365,7 @@ class MediaUtils:
                 logger.error(f"[SCENE] Audio file not found: {audio_path}")
                 return False
             
-            # Build FFmpeg command
-            cmd = [
-                "ffmpeg", "-y",
-                "-loop", "1",
-                "-i", img_path,
-                "-i", audio_path,
-                "-c:v", "libx264",
-                "-tune", "stillimage",
-                "-c:a", "aac",
-                "-b:a", "192k",
-                "-pix_fmt", "yuv420p",
-                "-shortest"
-            ]
-            
-            # Add duration if specified
-            if duration:
-                cmd.extend(["-t", str(duration)])
-            
-            cmd.append(out_mp4)
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            self.render_plan().scene(img_path, duration).narration(audio_path).output(out_mp4).run()
             logger.info(f"[SCENE] ✅ Scene video creation successful")
             return True
             
@@ -245,20 +391,7 @@ class MediaUtils:
         try:
             logger.info(f"[WHATSAPP] Creating WhatsApp preset → {output_video}")
             
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", input_video,
-                "-vf", "scale=720:1280",
-                "-c:v", "libx264",
-                "-preset", "veryfast",
-                "-crf", "28",
-                "-b:v", "800k",
-                "-c:a", "aac",
-                "-b:a", "96k",
-                output_video
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            self.render_plan().video(input_video).output(output_video, "whatsapp").run()
             logger.info(f"[WHATSAPP] ✅ WhatsApp preset creation successful")
             return True
             
@@ -280,20 +413,7 @@ class MediaUtils:
         try:
             logger.info(f"[TIKTOK] Creating TikTok preset → {output_video}")
             
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", input_video,
-                "-vf", "scale=1080:1920",
-                "-c:v", "libx264",
-                "-preset", "veryfast",
-                "-crf", "23",
-                "-b:v", "2500k",
-                "-c:a", "aac",
-                "-b:a", "128k",
-                output_video
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            self.render_plan().video(input_video).output(output_video, "tiktok").run()
             logger.info(f"[TIKTOK] ✅ TikTok preset creation successful")
             return True
             
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+🎯 Script Aligner - Subtitle timing for narration with a known script
+
+// [TASK]: Align known script sentences to narration audio without ASR
+// [GOAL]: SRT/VTT timestamps on CPU in milliseconds instead of a Whisper pass
+// [SNIPPET]: surgicalfix + perfcheck
+// [CONTEXT]: The pipeline synthesizes narration itself, so the text is already known
+"""
+
+import math
+import wave
+import array
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+from ..voice_engine import split_sentences
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.01
+
+
+def read_pcm_mono(audio_path: str, sample_rate: Optional[int] = None) -> Tuple[array.array, int]:
+    """
+    Read audio as mono 16-bit samples. Non-PCM input, or PCM at a rate other than `sample_rate`
+    when one is required, is converted with ffmpeg first.
+    """
+    try:
+        with wave.open(audio_path, "rb") as wav:
+            if wav.getsampwidth() == 2 and sample_rate in (None, wav.getframerate()):
+                return _downmix(wav.readframes(wav.getnframes()), wav.getnchannels()), wav.getframerate()
+    except (wave.Error, EOFError):
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pcm_path = str(Path(tmp) / "audio.wav")
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-i", audio_path, "-ac", "1", "-ar", str(sample_rate or 16000), "-sample_fmt", "s16", pcm_path],
+            check=True,
+        )
+        with wave.open(pcm_path, "rb") as wav:
+            return _downmix(wav.readframes(wav.getnframes()), 1), wav.getframerate()
+
+
+def _downmix(raw: bytes, channels: int) -> array.array:
+    samples = array.array("h", raw)
+    if channels == 1:
+        return samples
+    return array.array("h", (sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)))
+
+
+def frame_energies(samples: array.array, sample_rate: int) -> List[float]:
+    """RMS energy per FRAME_SECONDS frame."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    energies = []
+    for start in range(0, len(samples), frame):
+        chunk = samples[start:start + frame]
+        energies.append(math.sqrt(sum(s * s for s in chunk) / len(chunk)))
+    return energies
+
+
+def voice_activity(energies: List[float]) -> List[bool]:
+    """Per-frame speech flags from an adaptive threshold between the noise floor and speech peaks."""
+    if not energies:
+        return []
+    ordered = sorted(energies)
+    noise = ordered[int(0.1 * (len(ordered) - 1))]
+    peak = ordered[int(0.95 * (len(ordered) - 1))]
+    if peak < 50:  # Digital silence
+        return [False] * len(energies)
+    if peak <= noise * 1.5:  # Flat signal: continuous speech when loud, constant hiss otherwise
+        return [noise >= 500] * len(energies)
+    threshold = noise + 0.1 * (peak - noise)
+    return [e > threshold for e in energies]
+
+
+def find_pauses(speech: List[bool], min_pause_seconds: float) -> List[Tuple[float, float]]:
+    """Silent runs of at least min_pause_seconds as (start, end) seconds."""
+    pauses, run_start = [], None
+    min_frames = int(min_pause_seconds / FRAME_SECONDS)
+    for i, active in enumerate(speech + [True]):
+        if not active and run_start is None:
+            run_start = i
+        elif active and run_start is not None:
+            if i - run_start >= min_frames:
+                pauses.append((run_start * FRAME_SECONDS, i * FRAME_SECONDS))
+            run_start = None
+    return pauses
+
+
+class ScriptAligner:
+    """
+    // [TASK]: Energy/VAD-based forced alignment of script sentences
+    // [GOAL]: Snap expected sentence boundaries onto detected pauses
+
+    Expected boundaries come from per-sentence TTS durations when known, otherwise from sentence
+    length. Each expected boundary is matched (in order) to the nearest detected pause; if no pause
+    is close enough the expected time is used.
+    """
+
+    def __init__(self, min_pause_seconds: float = 0.12, max_chars_per_cue: int = 84, exact_duration_tolerance: float = 0.02):
+        self.min_pause_seconds = min_pause_seconds
+        self.max_chars_per_cue = max_chars_per_cue
+        self.exact_duration_tolerance = exact_duration_tolerance
+
+    def align(self, audio_path: str, script_text: str, sentence_durations: Optional[List[float]] = None) -> Optional[List[Dict]]:
+        """
+        Returns subtitle segments ({start, end, text}) or None when the audio cannot be aligned.
+        """
+        sentences = split_sentences(script_text)
+        if not sentences:
+            return None
+        if sentence_durations is not None and len(sentence_durations) != len(sentences):
+            logger.warning("[ALIGN] Sentence durations do not match the script, ignoring them")
+            sentence_durations = None
+
+        samples, sample_rate = read_pcm_mono(audio_path)
+        total = len(samples) / sample_rate if sample_rate else 0.0
+        if total <= 0:
+            return None
+
+        # TTS output concatenated sample-accurately: recorded durations are the exact timings
+        if sentence_durations and abs(sum(sentence_durations) - total) <= self.exact_duration_tolerance * total:
+            bounds, t = [], 0.0
+            for duration in sentence_durations:
+                bounds.append((t, t + duration))
+                t += duration
+            return self._to_cues(sentences, bounds)
+
+        energies = frame_energies(samples, sample_rate)
+        speech = voice_activity(energies)
+        if not any(speech):
+            logger.warning("[ALIGN] No speech detected")
+            return None
+        first = speech.index(True)
+        last = len(speech) - 1 - speech[::-1].index(True)
+        speech_start, speech_end = first * FRAME_SECONDS, (last + 1) * FRAME_SECONDS
+        pauses = [p for p in find_pauses(speech, self.min_pause_seconds) if speech_start < p[0] and p[1] < speech_end]
+
+        weights = sentence_durations or [max(len(s), 1) for s in sentences]
+        scale = (speech_end - speech_start) / sum(weights)
+        expected, t = [], speech_start
+        for weight in weights[:-1]:
+            t += weight * scale
+            expected.append(t)
+
+        cuts = self._match_boundaries(expected, pauses, [w * scale for w in weights])
+        bounds = []
+        start = speech_start
+        for pause_start, pause_end in cuts:
+            bounds.append((start, pause_start))
+            start = pause_end
+        bounds.append((start, speech_end))
+        return self._to_cues(sentences, bounds)
+
+    def _match_boundaries(self, expected: List[float], pauses: List[Tuple[float, float]], durations: List[float]) -> List[Tuple[float, float]]:
+        """
+        Monotonic DP assigning each expected boundary a distinct pause (or its expected time),
+        minimising total distance; unmatched boundaries cost their search window.
+        """
+        n, m = len(expected), len(pauses)
+        if n == 0:
+            return []
+        windows = [max(0.5, 0.5 * min(durations[i], durations[i + 1])) for i in range(n)]
+        INF = float("inf")
+        # best[i][j]: cost of placing boundaries 0..i-1 using only pauses before index j
+        best = [[INF] * (m + 1) for _ in range(n + 1)]
+        choice = [[None] * (m + 1) for _ in range(n + 1)]
+        best[0] = [0.0] * (m + 1)
+        for i in range(1, n + 1):
+            e, window = expected[i - 1], windows[i - 1]
+            for j in range(m + 1):
+                # Boundary i-1 uses no pause
+                cost, pick = best[i - 1][j] + window, ("expected", j)
+                if j > 0:
+                    # Carry forward: pauses before j-1 only
+                    if best[i][j - 1] < cost:
+                        cost, pick = best[i][j - 1], choice[i][j - 1]
+                    mid = sum(pauses[j - 1]) / 2
+                    if abs(mid - e) <= window and best[i - 1][j - 1] + abs(mid - e) < cost:
+                        cost, pick = best[i - 1][j - 1] + abs(mid - e), ("pause", j - 1)
+                best[i][j], choice[i][j] = cost, pick
+
+        cuts, j = [], m
+        for i in range(n, 0, -1):
+            kind, index = choice[i][j]
+            if kind == "pause":
+                cuts.append(pauses[index])
+                j = index
+            else:
+                cuts.append((expected[i - 1], expected[i - 1]))
+                j = index
+        return cuts[::-1]
+
+    def _to_cues(self, sentences: List[str], bounds: List[Tuple[float, float]]) -> List[Dict]:
+        """One cue per sentence; long sentences are split on words with time shared by length."""
+        cues = []
+        for text, (start, end) in zip(sentences, bounds):
+            chunks = self._chunk(text)
+            total_chars = sum(len(c) for c in chunks)
+            t = start
+            for chunk in chunks:
+                chunk_end = t + (end - start) * len(chunk) / total_chars
+                cues.append({"start": round(t, 3), "end": round(chunk_end, 3), "text": chunk})
+                t = chunk_end
+        return cues
+
+    def _chunk(self, text: str) -> List[str]:
+        if len(text) <= self.max_chars_per_cue:
+            return [text]
+        chunks, current = [], []
+        for word in text.split():
+            if current and len(" ".join(current + [word])) > self.max_chars_per_cue:
+                chunks.append(" ".join(current))
+                current = []
+            current.append(word)
+        chunks.append(" ".join(current))
+        return chunks
@@ -16,6 +16,10 @@ from typing import List, Dict, Optional, Tuple
 import tempfile
 import subprocess
 
+from .script_aligner import ScriptAligner
+from .transcription_service import TranscriptionService, get_transcription_service
+from ..voice_engine import load_sentence_timings
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -23,39 +27,21 @@ logger = logging.getLogger(__name__)
 class SubtitleEngine:
     """Professional subtitle generation using Whisper"""
     
-    def __init__(self):
+    def __init__(self, aligner: Optional[ScriptAligner] = None, transcription_service: Optional[TranscriptionService] = None):
         self.temp_dir = Path("temp")
         self.temp_dir.mkdir(exist_ok=True)
+        self.aligner = aligner or ScriptAligner()
         
-        # Initialize Whisper models
-        self.whisper_model = None
-        self.faster_whisper_model = None
-        
-        # Try to load faster-whisper first (more efficient)
-        try:
-            from faster_whisper import WhisperModel
-            self.faster_whisper_model = WhisperModel("small", device="auto")
-            self.use_faster_whisper = True
-            logger.info("[SUBTITLES] ✅ Faster-Whisper model loaded")
-        except ImportError:
-            logger.warning("[SUBTITLES] Faster-Whisper not available, trying OpenAI Whisper")
-            self.use_faster_whisper = False
-            
-            # Fallback to OpenAI Whisper
-            try:
-                import whisper
-                self.whisper_model = whisper.load_model("small")
-                logger.info("[SUBTITLES] ✅ OpenAI Whisper model loaded")
-            except ImportError:
-                logger.error("[SUBTITLES] ❌ No Whisper models available")
-                self.whisper_model = None
+        # ASR goes through the process-wide service: one Whisper model, batched across engines
+        self.transcription_service = transcription_service or get_transcription_service()
     
-    def transcribe_audio(self, audio_path: str) -> Optional[List[Dict]]:
+    def transcribe_audio(self, audio_path: str, language: Optional[str] = None) -> Optional[List[Dict]]:
         """
         Transcribe audio file to text with timestamps
         
         Args:
             audio_path: Path to audio file
+            language: Spoken language; defaults to the transcription service's model setting
             
         Returns:
             List of segments with text and timestamps, or None if failed
@@ -67,53 +53,14 @@ class SubtitleEngine:
                 logger.error(f"[SUBTITLES] Audio file not found: {audio_path}")
                 return None
             
-            if self.use_faster_whisper and self.faster_whisper_model:
-                return self._transcribe_with_faster_whisper(audio_path)
-            elif self.whisper_model:
-                return self._transcribe_with_openai_whisper(audio_path)
-            else:
-                logger.error("[SUBTITLES] No Whisper model available")
-                return None
+            segments = self.transcription_service.transcribe(audio_path, language=language)
+            logger.info(f"[SUBTITLES] ✅ Transcribed {len(segments)} segments")
+            return segments
                 
         except Exception as e:
             logger.error(f"[SUBTITLES] ❌ Transcription failed: {e}")
             return None
     
-    def _transcribe_with_faster_whisper(self, audio_path: str) -> List[Dict]:
-        """Transcribe using faster-whisper"""
-        segments = []
-        
-        segments_iter, info = self.faster_whisper_model.transcribe(
-            audio_path,
-            beam_size=5,
-            language="en"  # Can be auto-detected or set to specific language
-        )
-        
-        for segment in segments_iter:
-            segments.append({
-                'start': segment.start,
-                'end': segment.end,
-                'text': segment.text.strip()
-            })
-        
-        logger.info(f"[SUBTITLES] ✅ Transcribed {len(segments)} segments")
-        return segments
-    
-    def _transcribe_with_openai_whisper(self, audio_path: str) -> List[Dict]:
-        """Transcribe using OpenAI Whisper"""
-        result = self.whisper_model.transcribe(audio_path)
-        
-        segments = []
-        for segment in result['segments']:
-            segments.append({
-                'start': segment['start'],
-                'end': segment['end'],
-                'text': segment['text'].strip()
-            })
-        
-        logger.info(f"[SUBTITLES] ✅ Transcribed {len(segments)} segments")
-        return segments
-    
     def generate_srt(self, segments: List[Dict], output_path: str) -> bool:
         """
         Generate SRT subtitle file from segments
@@ -148,12 +95,37 @@ class SubtitleEngine:
             logger.error(f"[SUBTITLES] ❌ SRT generation failed: {e}")
             return False
     
+    def generate_vtt(self, segments: List[Dict], output_path: str) -> bool:
+        """
+        Generate WebVTT subtitle file from segments
+        
+        Args:
+            segments: List of segments with start, end, text
+            output_path: Output VTT file path
+            
+        Returns:
+            bool: Success status
+        """
+        try:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write("WEBVTT\n\n")
+                for segment in segments:
+                    start_time = self._format_timestamp(segment['start']).replace(',', '.')
+                    end_time = self._format_timestamp(segment['end']).replace(',', '.')
+                    f.write(f"{start_time} --> {end_time}\n")
+                    f.write(f"{self._format_kenya_text(segment['text'])}\n\n")
+            return True
+            
+        except Exception as e:
+            logger.error(f"[SUBTITLES] ❌ VTT generation failed: {e}")
+            return False
+    
     def _format_timestamp(self, seconds: float) -> str:
         """Format timestamp for SRT format (HH:MM:SS,mmm)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millisecs = int((seconds % 1) * 1000)
+        total_ms = int(round(seconds * 1000))  # Round, so 4.1s is 4,100 rather than 4,099
+        hours, total_ms = divmod(total_ms, 3_600_000)
+        minutes, total_ms = divmod(total_ms, 60_000)
+        secs, millisecs = divmod(total_ms, 1000)
         
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millisecs:03d}"
     
@@ -194,13 +166,46 @@ class SubtitleEngine:
         
         return text
     
-    def generate_subtitles_from_audio(self, audio_path: str, output_srt: str) -> bool:
+    def align_script(self, audio_path: str, script_text: Optional[str] = None,
+                     sentence_durations: Optional[List[float]] = None) -> Optional[List[Dict]]:
+        """
+        Align a known script to narration audio without ASR
+        
+        Args:
+            audio_path: Narration audio file path
+            script_text: Narration script; defaults to the sentences recorded by VoiceEngine
+            sentence_durations: Per-sentence TTS durations; defaults to the recorded ones
+            
+        Returns:
+            List of segments with text and timestamps, or None if alignment is not possible
+        """
+        timings = load_sentence_timings(Path(audio_path))
+        if script_text is None and timings:
+            script_text = " ".join(t["text"] for t in timings)
+        if not script_text:
+            return None
+        if sentence_durations is None and timings and " ".join(t["text"] for t in timings) == " ".join(script_text.split()):
+            sentence_durations = [t["duration"] for t in timings]
+
+        try:
+            segments = self.aligner.align(audio_path, script_text, sentence_durations)
+        except Exception as e:
+            logger.warning(f"[SUBTITLES] Script alignment failed: {e}")
+            return None
+        if segments:
+            logger.info(f"[SUBTITLES] ✅ Aligned {len(segments)} segments to the script")
+        return segments
+
+    def generate_subtitles_from_audio(self, audio_path: str, output_srt: str, script_text: Optional[str] = None,
+                                      sentence_durations: Optional[List[float]] = None) -> bool:
         """
         Complete subtitle generation pipeline from audio to SRT
         
         Args:
             audio_path: Input audio file path
             output_srt: Output SRT file path
+            script_text: Known narration script; enables alignment instead of transcription
+            sentence_durations: Per-sentence TTS durations for the script
             
         Returns:
             bool: Success status
@@ -208,8 +213,10 @@ class SubtitleEngine:
         try:
             logger.info(f"[SUBTITLES] Starting subtitle generation pipeline")
             
-            # Step 1: Transcribe audio
-            segments = self.transcribe_audio(audio_path)
+            # Step 1: Align the known script, falling back to full transcription
+            segments = self.align_script(audio_path, script_text, sentence_durations)
+            if not segments:
+                segments = self.transcribe_audio(audio_path)
             if not segments:
                 logger.error("[SUBTITLES] ❌ Transcription failed")
                 return False
@@ -261,6 +268,11 @@ class SubtitleEngine:
             return False
     
     def is_available(self) -> bool:
-        """Check if subtitle generation is available"""
-        return (self.use_faster_whisper and self.faster_whisper_model is not None) or \
-               (self.whisper_model is not None)
+        """Check if ASR subtitle generation is available (script alignment always is)"""
+        return self.transcription_service.is_available()
+
+    def can_align(self, script_text: Optional[str] = None, audio_path: Optional[str] = None) -> bool:
+        """Check if subtitles can come from script alignment: a script is known, or VoiceEngine recorded one for the audio"""
+        if script_text and script_text.strip():
+            return True
+        return bool(audio_path) and load_sentence_timings(Path(audio_path)) is not None
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+🎙️ Transcription Service - One shared Whisper model for every subtitle request
+
+// [TASK]: Process-wide, chunked and batched Whisper transcription
+// [GOAL]: Load the model once, batch chunks across concurrent requests, never transcribe a file twice
+// [SNIPPET]: surgicalfix + perfcheck
+// [CONTEXT]: Subtitle ASR fallback for batch_generator, UI and pipeline callers
+"""
+
+import json
+import queue
+import array
+import hashlib
+import logging
+import threading
+import importlib.util
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+from typing import List, Dict, Optional, Protocol
+
+from .script_aligner import FRAME_SECONDS, read_pcm_mono, frame_energies, voice_activity, find_pauses
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_WINDOW_SECONDS = 30.0  # One decoder window; longer chunks cannot go through a padded mel batch
+WHISPER_TIME_PRECISION = 0.02  # Seconds per timestamp token
+
+
+@dataclass
+class AudioChunk:
+    samples: array.array  # mono 16-bit PCM at WHISPER_SAMPLE_RATE
+    offset: float  # seconds from the start of the source audio
+    language: Optional[str] = None  # None: the transcriber's default
+    task: Optional[str] = None  # "transcribe" or "translate"; None: the transcriber's default
+
+
+class Transcriber(Protocol):
+    def transcribe_batch(self, chunks: List[AudioChunk]) -> List[List[Dict]]:
+        """Segments ({start, end, text}, relative to each chunk) for every chunk."""
+        ...
+
+    def is_available(self) -> bool:
+        ...
+
+
+def _segments_from_tokens(tokens: List[int], tokenizer, duration: float) -> List[Dict]:
+    """Splits a decoded token sequence at its timestamp tokens (<|t0|> text <|t1|><|t1|> text <|t2|> ...)."""
+    segments, start, text_tokens = [], None, []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+        timestamp = (token - tokenizer.timestamp_begin) * WHISPER_TIME_PRECISION
+        if start is not None and text_tokens:
+            segments.append({"start": start, "end": timestamp, "text": tokenizer.decode(text_tokens).strip()})
+            start, text_tokens = None, []
+        elif start is None:
+            start = timestamp
+    if text_tokens:
+        segments.append({"start": start or 0.0, "end": duration, "text": tokenizer.decode(text_tokens).strip()})
+    return [segment for segment in segments if segment["text"]]
+
+
+class WhisperTranscriber:
+    """
+    Whisper loaded on first use. Each batch of chunks runs as one batched inference:
+    faster-whisper's BatchedInferencePipeline over the concatenated chunks (one clip per chunk), or
+    openai-whisper's decode() over a padded mel batch. Older faster-whisper without the batched
+    pipeline transcribes chunk by chunk.
+    """
+
+    def __init__(self, model_size: str = "small", language: str = "en", beam_size: int = 5, task: str = "transcribe"):
+        self.model_size = model_size
+        self.language = language
+        self.beam_size = beam_size
+        self.task = task
+        self._model = None
+        self._batched = None
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return importlib.util.find_spec("faster_whisper") is not None or importlib.util.find_spec("whisper") is not None
+
+    def _load(self):
+        with self._lock:
+            if self._backend:
+                return
+            try:
+                from faster_whisper import WhisperModel
+                self._model = WhisperModel(self.model_size, device="auto")
+                self._backend = "faster_whisper"
+                try:
+                    from faster_whisper import BatchedInferencePipeline
+                    self._batched = BatchedInferencePipeline(model=self._model)
+                except ImportError:
+                    self._batched = None
+                logger.info("[TRANSCRIBE] ✅ Faster-Whisper model loaded")
+            except ImportError:
+                logger.warning("[TRANSCRIBE] Faster-Whisper not available, trying OpenAI Whisper")
+                import whisper
+                self._model = whisper.load_model(self.model_size)
+                self._backend = "whisper"
+                logger.info("[TRANSCRIBE] ✅ OpenAI Whisper model loaded")
+
+    def cache_identity(self) -> Dict[str, str]:
+        """Settings that change the transcript; part of every result cache key."""
+        return {"model": f"whisper-{self.model_size}", "language": self.language, "task": self.task}
+
+    def transcribe_batch(self, chunks: List[AudioChunk]) -> List[List[Dict]]:
+        import numpy as np
+
+        self._load()
+        results: List[Optional[List[Dict]]] = [None] * len(chunks)
+        # One batched call per (language, task); chunks from different requests may differ
+        settings = lambda i: (chunks[i].language or self.language, chunks[i].task or self.task)
+        for (language, task), indexes in groupby(sorted(range(len(chunks)), key=settings), key=settings):
+            indexes = list(indexes)
+            audios = [np.frombuffer(chunks[i].samples.tobytes(), dtype=np.int16).astype(np.float32) / 32768.0 for i in indexes]
+            if self._backend == "faster_whisper" and self._batched is not None:
+                group = self._transcribe_clips(audios, language, task)
+            elif self._backend == "whisper" and all(len(a) <= WHISPER_WINDOW_SECONDS * WHISPER_SAMPLE_RATE for a in audios):
+                group = self._decode_mel_batch(audios, language, task)
+            else:
+                group = [self._transcribe_one(audio, language, task) for audio in audios]
+            for i, segments in zip(indexes, group):
+                results[i] = segments
+        return results
+
+    def _transcribe_clips(self, audios, language: str, task: str) -> List[List[Dict]]:
+        """One BatchedInferencePipeline call: chunks are concatenated and each is one clip of the batch."""
+        import numpy as np
+
+        bounds, position = [], 0.0
+        for audio in audios:
+            duration = len(audio) / WHISPER_SAMPLE_RATE
+            bounds.append((position, position + duration))
+            position += duration
+        segments, _ = self._batched.transcribe(
+            np.concatenate(audios), language=language, task=task, beam_size=self.beam_size,
+            batch_size=len(audios), vad_filter=False,
+            clip_timestamps=[{"start": start, "end": end} for start, end in bounds],
+        )
+        results = [[] for _ in audios]
+        for segment in segments:
+            # Segments come back in concatenated time; each belongs to the clip its start falls in
+            index = next((i for i, (_, end) in enumerate(bounds) if segment.start < end), len(bounds) - 1)
+            clip_start, clip_end = bounds[index]
+            results[index].append({
+                "start": max(segment.start - clip_start, 0.0),
+                "end": min(segment.end, clip_end) - clip_start,
+                "text": segment.text.strip(),
+            })
+        return results
+
+    def _decode_mel_batch(self, audios, language: str, task: str) -> List[List[Dict]]:
+        """openai-whisper: pad every chunk to one 30s window and decode the mel batch in a single pass."""
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        model = self._model
+        mel = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), model.dims.n_mels) for audio in audios])
+        options = whisper.DecodingOptions(language=language, task=task, beam_size=self.beam_size,
+                                          without_timestamps=False, fp16=model.device.type == "cuda")
+        decoded = whisper.decode(model, mel.to(model.device), options)
+        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language=language, task=task)
+        return [_segments_from_tokens(result.tokens, tokenizer, len(audio) / WHISPER_SAMPLE_RATE)
+                for result, audio in zip(decoded, audios)]
+
+    def _transcribe_one(self, audio, language: str, task: str) -> List[Dict]:
+        if self._backend == "faster_whisper":
+            segments, _ = self._model.transcribe(audio, beam_size=self.beam_size, language=language, task=task)
+            return [{"start": s.start, "end": s.end, "text": s.text.strip()} for s in segments]
+        result = self._model.transcribe(audio, language=language, task=task)
+        return [{"start": s["start"], "end": s["end"], "text": s["text"].strip()} for s in result["segments"]]
+
+
+@dataclass
+class _ChunkRequest:
+    chunk: AudioChunk
+    future: Future
+
+
+class TranscriptionService:
+    """
+    // [TASK]: Shared transcription queue in front of a single model
+    // [GOAL]: Batch VAD-bounded chunks from concurrent requests and stitch timestamps per request
+
+    transcribe() keys each request by the file's content hash plus the model, language and task;
+    a repeated key is served from the result cache (a bounded LRU in memory, plus disk) or joins the
+    in-flight transcription. Otherwise the audio is cut at pauses into chunks of at most
+    max_chunk_seconds and queued; one worker thread gathers up to max_batch_size chunks (waiting at
+    most max_wait_ms) per transcriber call.
+    """
+
+    def __init__(self, transcriber: Optional[Transcriber] = None, max_batch_size: int = 8, max_wait_ms: float = 50.0,
+                 max_chunk_seconds: float = 30.0, min_pause_seconds: float = 0.3, cache_dir: Optional[str] = "temp/transcripts",
+                 max_cached_results: int = 256):
+        self.transcriber = transcriber or WhisperTranscriber()
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_chunk_seconds = max_chunk_seconds
+        self.min_pause_seconds = min_pause_seconds
+        self.max_cached_results = max_cached_results
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._queue: "queue.Queue[_ChunkRequest]" = queue.Queue()
+        self._results: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "chunks": 0, "batches": 0, "batch_sizes": []}
+
+    def is_available(self) -> bool:
+        return self.transcriber.is_available()
+
+    def transcribe(self, audio_path: str, language: Optional[str] = None, task: Optional[str] = None) -> List[Dict]:
+        """
+        Segments ({start, end, text}) for the whole file, in source-audio time. language and task
+        override the transcriber's defaults for this request.
+        """
+        digest = self._cache_key(self._content_hash(audio_path), language, task)
+        with self._lock:
+            self.stats["requests"] += 1
+            cached = self._remember(digest) or self._load_cached(digest)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+            pending = self._inflight.get(digest)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[digest] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return pending.result()
+
+        try:
+            segments = self._transcribe_uncached(audio_path, language, task)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(digest, None)
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            self._remember(digest, segments)
+            self._inflight.pop(digest, None)
+        self._store_cached(digest, segments)
+        pending.set_result(segments)
+        return segments
+
+    def _transcribe_uncached(self, audio_path: str, language: Optional[str], task: Optional[str]) -> List[Dict]:
+        samples, _ = read_pcm_mono(audio_path, WHISPER_SAMPLE_RATE)
+        chunks = self.split_chunks(samples)
+        for chunk in chunks:
+            chunk.language, chunk.task = language, task
+        requests = [_ChunkRequest(chunk, Future()) for chunk in chunks]
+        self._ensure_worker()
+        for request in requests:
+            self._queue.put(request)
+
+        segments = []
+        for request in requests:
+            for segment in request.future.result():
+                segments.append({
+                    "start": round(segment["start"] + request.chunk.offset, 3),
+                    "end": round(segment["end"] + request.chunk.offset, 3),
+                    "text": segment["text"],
+                })
+        logger.info(f"[TRANSCRIBE] ✅ {audio_path}: {len(segments)} segments from {len(chunks)} chunks")
+        return segments
+
+    def split_chunks(self, samples: array.array) -> List[AudioChunk]:
+        """Cut audio at pauses into speech chunks no longer than max_chunk_seconds; silence is dropped."""
+        speech = voice_activity(frame_energies(samples, WHISPER_SAMPLE_RATE))
+        if not any(speech):
+            return []
+        first = speech.index(True) * FRAME_SECONDS
+        last = (len(speech) - speech[::-1].index(True)) * FRAME_SECONDS
+        pauses = find_pauses(speech, self.min_pause_seconds)
+
+        spans, start = [], first
+        while last - start > self.max_chunk_seconds:
+            limit = start + self.max_chunk_seconds
+            inside = [p for p in pauses if start < p[0] and p[1] <= limit]
+            if inside:
+                pause_start, pause_end = inside[-1]  # Latest pause that keeps the chunk under the limit
+                spans.append((start, pause_start))
+                start = pause_end
+            else:
+                spans.append((start, limit))
+                start = limit
+        spans.append((start, last))
+
+        chunks = []
+        for span_start, span_end in spans:
+            begin = int(span_start * WHISPER_SAMPLE_RATE)
+            end = int(span_end * WHISPER_SAMPLE_RATE)
+            if end > begin:
+                chunks.append(AudioChunk(samples[begin:end], span_start))
+        return chunks
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name="transcription-worker", daemon=True)
+                self._worker.start()
+
+    def _run_worker(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=deadline))
+                except queue.Empty:
+                    break
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_ChunkRequest]):
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["chunks"] += len(batch)
+            self.stats["batch_sizes"].append(len(batch))
+            del self.stats["batch_sizes"][:-100]
+        try:
+            results = list(self.transcriber.transcribe_batch([request.chunk for request in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch of {len(batch)} chunks returned {len(results)} results")
+        except Exception as e:
+            logger.error(f"[TRANSCRIBE] ❌ Batch of {len(batch)} chunks failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, segments in zip(batch, results):
+            request.future.set_result(segments)
+
+    def _cache_key(self, content_hash: str, language: Optional[str], task: Optional[str]) -> str:
+        """Content hash plus everything that changes the transcript: model, language and task."""
+        identity = getattr(self.transcriber, "cache_identity", dict)()
+        identity = dict(identity, language=language or identity.get("language"), task=task or identity.get("task"))
+        settings = json.dumps(identity, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}:{settings}".encode("utf-8")).hexdigest()
+
+    def _remember(self, digest: str, segments: Optional[List[Dict]] = None) -> Optional[List[Dict]]:
+        """LRU access to the in-memory results (caller holds the lock); stores when segments are given."""
+        if segments is None:
+            segments = self._results.get(digest)
+            if segments is not None:
+                self._results.move_to_end(digest)
+            return segments
+        self._results[digest] = segments
+        self._results.move_to_end(digest)
+        while len(self._results) > self.max_cached_results:
+            self._results.popitem(last=False)
+        return segments
+
+    @staticmethod
+    def _content_hash(audio_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(audio_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _load_cached(self, digest: str) -> Optional[List[Dict]]:
+        if not self.cache_dir:
+            return None
+        path = self.cache_dir / f"{digest}.json"
+        if not path.exists():
+            return None
+        return self._remember(digest, json.loads(path.read_text(encoding="utf-8")))
+
+    def _store_cached(self, digest: str, segments: List[Dict]):
+        if self.cache_dir:
+            tmp = self.cache_dir / f"{digest}.json.tmp"
+            tmp.write_text(json.dumps(segments), encoding="utf-8")
+            tmp.replace(self.cache_dir / f"{digest}.json")
+
+
+_service: Optional[TranscriptionService] = None
+_service_lock = threading.Lock()
+
+
+def get_transcription_service() -> TranscriptionService:
+    """Process-wide service so every SubtitleEngine shares one model and one batch queue."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TranscriptionService()
+        return _service
@@ -15,6 +15,8 @@ from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import subprocess
 
+from .media_utils import OutputPreset
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -155,18 +157,7 @@ class VerticalExport:
             ]
             
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            
-            # Check file size
-            file_size = os.path.getsize(output_video)
-            max_size = platform_config["max_file_size"]
-            
-            if file_size > max_size:
-                logger.warning(f"[VERTICAL] File size ({file_size/1024/1024:.1f}MB) exceeds {platform} limit ({max_size/1024/1024:.1f}MB)")
-                # Attempt compression
-                return self._compress_for_platform(output_video, platform)
-            
-            logger.info(f"[VERTICAL] ✅ Vertical conversion successful ({file_size/1024/1024:.1f}MB)")
-            return True
+            return self.enforce_size_limit(output_video, platform)
             
         except subprocess.CalledProcessError as e:
             logger.error(f"[VERTICAL] ❌ Conversion failed: {e}")
@@ -176,6 +167,53 @@ class VerticalExport:
             logger.error(f"[VERTICAL] ❌ Unexpected error: {e}")
             return False
     
+    def output_preset(self, platform: str, background_color: str = "black") -> OutputPreset:
+        """
+        Platform encode settings as a RenderPlan output, letterboxed to the platform resolution
+        
+        Args:
+            platform: Target platform
+            background_color: Background color for padding
+            
+        Returns:
+            OutputPreset for RenderPlan.output()
+        """
+        platform_config = self.platforms[platform]
+        return OutputPreset(
+            video_args=(
+                "-c:v", platform_config["video_codec"],
+                "-preset", "veryfast",
+                "-crf", str(platform_config["crf"]),
+                "-b:v", platform_config["video_bitrate"],
+                "-movflags", "+faststart",
+            ),
+            audio_args=("-c:a", platform_config["audio_codec"], "-b:a", platform_config["audio_bitrate"]),
+            scale=platform_config["resolution"],
+            pad=background_color,
+        )
+    
+    def enforce_size_limit(self, video_path: str, platform: str) -> bool:
+        """
+        Compress an exported video that exceeds the platform file size limit
+        
+        Args:
+            video_path: Exported video path
+            platform: Target platform
+            
+        Returns:
+            bool: Success status
+        """
+        file_size = os.path.getsize(video_path)
+        max_size = self.platforms[platform]["max_file_size"]
+        
+        if file_size > max_size:
+            logger.warning(f"[VERTICAL] File size ({file_size/1024/1024:.1f}MB) exceeds {platform} limit ({max_size/1024/1024:.1f}MB)")
+            # Attempt compression
+            return self._compress_for_platform(video_path, platform)
+        
+        logger.info(f"[VERTICAL] ✅ Vertical conversion successful ({file_size/1024/1024:.1f}MB)")
+        return True
+    
     def _compress_for_platform(self, video_path: str, platform: str) -> bool:
         """
         Compress video to meet platform file size requirements
@@ -14,24 +14,117 @@ import json
 import time
 import psutil
 import threading
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Optional, Any, List
-import torch
+from typing import Dict, Optional, Any, List, Callable
 import gc
 
+try:
+    import torch
+
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+GB = 1024**3
+
+# Expected resident sizes: used to make room before a load, and as the footprint of models that cannot be measured
+DEFAULT_MODEL_SIZES = {
+    "sdxl": int(7.0 * GB),
+    "whisper-tiny": int(0.15 * GB),
+    "whisper-base": int(0.3 * GB),
+    "whisper-small": int(1.0 * GB),
+    "whisper-medium": int(3.0 * GB),
+    "whisper-large": int(6.0 * GB),
+    "bark": int(5.0 * GB),
+}
+
+
+def estimate_model_size(model: Any) -> Optional[int]:
+    """
+    Measured resident size in bytes of a loaded model: tensor bytes of a torch module (parameters and
+    buffers), the sum over a diffusers pipeline's components, or an array's nbytes. None when the
+    model exposes none of these.
+    """
+    if hasattr(model, "nbytes"):
+        return int(model.nbytes)
+    if hasattr(model, "parameters"):
+        try:
+            tensors = list(model.parameters()) + list(getattr(model, "buffers", lambda: [])())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            pass
+    components = getattr(model, "components", None)
+    if isinstance(components, dict):
+        sizes = [estimate_model_size(c) for c in components.values() if c is not None]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    return None
+
+
+def _is_out_of_memory(error: BaseException) -> bool:
+    # torch raises OutOfMemoryError (a RuntimeError) when device memory runs out
+    return isinstance(error, MemoryError) or type(error).__name__ == "OutOfMemoryError"
+
+
+@dataclass
+class CacheEntry:
+    name: str
+    model: Any
+    size_bytes: int
+    load_time: float = 0.0
+    pinned: bool = False
+    refcount: int = 0
+    hits: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ModelHandle:
+    """
+    Ref-counted lease on a cached model; the model cannot be evicted until the handle is released.
+    Use as a context manager: `with model_cache.acquire("sdxl") as pipeline: ...`
+    """
+
+    def __init__(self, cache: "ModelCache", entry: CacheEntry):
+        self._cache = cache
+        self._entry = entry
+        self.name = entry.name
+        self.model = entry.model
+
+    def release(self):
+        if self._entry is not None:
+            self._cache._release(self._entry)
+            self._entry = None
+
+    def __enter__(self):
+        return self.model
+
+    def __exit__(self, *exc):
+        self.release()
+
+
 class ModelCache:
     """
     // [TASK]: Intelligent model caching and memory management
     // [GOAL]: Pre-load models, manage GPU memory, optimize performance
     // [SNIPPET]: surgicalfix + refactorclean
+
+    Models are accounted against a byte budget. Loading past the budget evicts unpinned,
+    unreferenced models by LRU (or LFU) order; models held through acquire() are never evicted.
     """
     
-    def __init__(self):
-        self.cache = {}
+    def __init__(
+        self,
+        memory_budget_bytes: Optional[int] = None,
+        eviction_policy: str = "lru",
+        loaders: Optional[Dict[str, Callable[[], Any]]] = None,
+        model_sizes: Optional[Dict[str, int]] = None,
+        cache_dir: str = "models/cache",
+    ):
+        self.cache: Dict[str, CacheEntry] = {}
         self.load_times = {}
-        self.usage_stats = {}
         self.max_memory_gb = self._get_available_memory()
-        self.cache_dir = Path("models/cache")
+        self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
         # Cache configuration
@@ -40,17 +133,29 @@ class ModelCache:
             "voice_priority": "medium", 
             "whisper_priority": "low",
             "preload_on_startup": True,
-            "memory_threshold": 0.8  # 80% memory usage threshold
+            "memory_threshold": 0.8,  # 80% memory usage threshold
+            "pinned_models": [],
         }
+        self.memory_budget_bytes = memory_budget_bytes or int(self.max_memory_gb * self.config["memory_threshold"] * GB)
+        self.eviction_policy = eviction_policy
+        self.loaders: Dict[str, Callable[[], Any]] = {"sdxl": self._load_sdxl_model, "bark": self._load_bark_model}
+        self.loaders.update(loaders or {})
+        self.model_sizes = {**DEFAULT_MODEL_SIZES, **(model_sizes or {})}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "load_failures": 0, "rejected_loads": 0}
+
+        self._lock = threading.RLock()
+        self._loading: Dict[str, threading.Event] = {}
+        self._reserved: Dict[str, int] = {}  # Expected bytes of loads in progress
+        self._pinned = set(self.config["pinned_models"])
         
-        print(f"[CACHE] Model cache initialized - {self.max_memory_gb:.1f}GB available")
+        print(f"[CACHE] Model cache initialized - {self.max_memory_gb:.1f}GB available, {self.memory_budget_bytes / GB:.1f}GB budget")
     
     def _get_available_memory(self) -> float:
         """Get available system memory in GB"""
-        if torch.cuda.is_available():
-            gpu_memory = torch.cuda.get_device_properties(0).total_memory / (1024**3)
-            return min(gpu_memory * 0.7, psutil.virtual_memory().available / (1024**3))
-        return psutil.virtual_memory().available / (1024**3)
+        if TORCH_AVAILABLE and torch.cuda.is_available():
+            gpu_memory = torch.cuda.get_device_properties(0).total_memory / GB
+            return min(gpu_memory * 0.7, psutil.virtual_memory().available / GB)
+        return psutil.virtual_memory().available / GB
     
     def preload_models(self, models_to_load: List[str] = None):
         """
@@ -64,25 +169,18 @@ class ModelCache:
         print("[CACHE] Pre-loading models for faster generation...")
         
         for model_name in models_to_load:
+            model_type = "whisper" if model_name.startswith("whisper") else model_name
+            if not self._should_load_model(model_type):
+                continue
             try:
-                start_time = time.time()
-                
-                if model_name == "sdxl" and self._should_load_model("sdxl"):
-                    self._load_sdxl_model()
-                elif model_name.startswith("whisper") and self._should_load_model("whisper"):
-                    self._load_whisper_model(model_name.split("-")[1] if "-" in model_name else "small")
-                elif model_name == "bark" and self._should_load_model("bark"):
-                    self._load_bark_model()
-                
-                load_time = time.time() - start_time
-                self.load_times[model_name] = load_time
-                print(f"[CACHE] ✅ {model_name} loaded in {load_time:.1f}s")
-                
+                with self.acquire(model_name):
+                    pass
+                print(f"[CACHE] ✅ {model_name} loaded in {self.load_times.get(model_name, 0.0):.1f}s")
             except Exception as e:
                 print(f"[CACHE] ⚠️ Failed to preload {model_name}: {e}")
     
     def _should_load_model(self, model_type: str) -> bool:
-        """Check if model should be loaded based on memory and priority"""
+        """Check if model should be pre-loaded based on system memory and priority"""
         current_memory = psutil.virtual_memory().percent / 100
         
         if current_memory > self.config["memory_threshold"]:
@@ -98,119 +196,253 @@ class ModelCache:
             return True
         
         return False
+
+    def _get_loader(self, model_name: str) -> Optional[Callable[[], Any]]:
+        if model_name in self.loaders:
+            return self.loaders[model_name]
+        if model_name.startswith("whisper"):
+            size = model_name.split("-")[1] if "-" in model_name else "small"
+            return lambda: self._load_whisper_model(size)
+        return None
     
     def _load_sdxl_model(self):
-        """Load SDXL model into cache"""
-        try:
-            from diffusers import StableDiffusionXLPipeline
-            
-            if "sdxl" not in self.cache:
-                dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-                pipeline = StableDiffusionXLPipeline.from_pretrained(
-                    "stabilityai/stable-diffusion-xl-base-1.0",
-                    torch_dtype=dtype,
-                    use_safetensors=True
-                )
-                
-                if torch.cuda.is_available():
-                    pipeline = pipeline.to("cuda")
-                    # Enable memory efficient attention where available
-                    try:
-                        if hasattr(pipeline, "enable_memory_efficient_attention"):
-                            pipeline.enable_memory_efficient_attention()
-                    except Exception as _:
-                        pass
-                    try:
-                        if hasattr(pipeline, "enable_xformers_memory_efficient_attention"):
-                            pipeline.enable_xformers_memory_efficient_attention()
-                    except Exception as _:
-                        pass
-                
-                self.cache["sdxl"] = pipeline
-                self.usage_stats["sdxl"] = {"loads": 0, "generations": 0}
-                
-        except Exception as e:
-            print(f"[CACHE] SDXL load failed: {e}")
+        """Load SDXL pipeline"""
+        from diffusers import StableDiffusionXLPipeline
+        
+        dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        pipeline = StableDiffusionXLPipeline.from_pretrained(
+            "stabilityai/stable-diffusion-xl-base-1.0",
+            torch_dtype=dtype,
+            use_safetensors=True
+        )
+        
+        if torch.cuda.is_available():
+            pipeline = pipeline.to("cuda")
+            # Enable memory efficient attention where available
+            try:
+                if hasattr(pipeline, "enable_memory_efficient_attention"):
+                    pipeline.enable_memory_efficient_attention()
+            except Exception as _:
+                pass
+            try:
+                if hasattr(pipeline, "enable_xformers_memory_efficient_attention"):
+                    pipeline.enable_xformers_memory_efficient_attention()
+            except Exception as _:
+                pass
+        return pipeline
     
     def _load_whisper_model(self, size: str = "small"):
-        """Load Whisper model into cache"""
-        try:
-            import whisper
-            
-            model_key = f"whisper-{size}"
-            if model_key not in self.cache:
-                model = whisper.load_model(size)
-                self.cache[model_key] = model
-                self.usage_stats[model_key] = {"loads": 0, "transcriptions": 0}
-                
-        except Exception as e:
-            print(f"[CACHE] Whisper load failed: {e}")
+        """Load Whisper model"""
+        import whisper
+
+        return whisper.load_model(size)
     
     def _load_bark_model(self):
-        """Load Bark model into cache"""
+        """Load Bark model"""
+        # Bark model loading would go here
+        # This is a placeholder for when Bark is properly integrated
+        return "bark_model_placeholder"
+
+    def acquire(self, model_name: str) -> ModelHandle:
+        """
+        // [TASK]: Lease a cached model, loading it within the memory budget on a miss
+        // [GOAL]: Models in use are never evicted mid-inference
+        // [SNIPPET]: surgicalfix
+
+        Raises KeyError for unknown models and MemoryError when the budget cannot be met.
+        """
+        while True:
+            with self._lock:
+                entry = self.cache.get(model_name)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                    entry.hits += 1
+                    entry.refcount += 1
+                    entry.last_used = time.monotonic()
+                    return ModelHandle(self, entry)
+                loading = self._loading.get(model_name)
+                if loading is None:
+                    self._loading[model_name] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+            loading.wait()  # Another thread is loading this model; retry as a hit
+
         try:
-            # Bark model loading would go here
-            # This is a placeholder for when Bark is properly integrated
-            self.cache["bark"] = "bark_model_placeholder"
-            self.usage_stats["bark"] = {"loads": 0, "generations": 0}
-            
+            return self._load_entry(model_name)
+        finally:
+            with self._lock:
+                self._loading.pop(model_name).set()
+
+    def _load_entry(self, model_name: str) -> ModelHandle:
+        loader = self._get_loader(model_name)
+        if loader is None:
+            raise KeyError(f"No loader registered for model '{model_name}'")
+
+        expected_bytes = self.model_sizes.get(model_name, 0)
+        with self._lock:
+            self._make_room(expected_bytes, model_name)
+            self._reserved[model_name] = expected_bytes
+
+        print(f"[CACHE] Loading {model_name}...")
+        start_time = time.time()
+        try:
+            model = loader()
         except Exception as e:
-            print(f"[CACHE] Bark load failed: {e}")
+            with self._lock:
+                self.stats["load_failures"] += 1
+            if _is_out_of_memory(e) and not isinstance(e, MemoryError):
+                raise MemoryError(f"Out of memory loading {model_name}: {e}") from e
+            raise
+        finally:
+            with self._lock:
+                self._reserved.pop(model_name, None)
+        load_time = time.time() - start_time
+
+        # Measure the real footprint; the size table only covers models that cannot be measured
+        measured = estimate_model_size(model)
+        size_bytes = measured if measured else self.model_sizes.get(model_name, 0)
+        with self._lock:
+            entry = CacheEntry(model_name, model, size_bytes, load_time=load_time, pinned=model_name in self._pinned, refcount=1)
+            self.cache[model_name] = entry
+            self.load_times[model_name] = load_time
+            try:
+                # The real footprint may exceed the estimate; the new entry is held, so it is not a candidate
+                self._make_room(0, model_name)
+            except MemoryError:
+                del self.cache[model_name]
+                raise
+        return ModelHandle(self, entry)
+
+    def _release(self, entry: CacheEntry):
+        with self._lock:
+            entry.refcount = max(entry.refcount - 1, 0)
+            entry.last_used = time.monotonic()
+
+    def _used_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self.cache.values()) + sum(self._reserved.values())
+
+    def _make_room(self, incoming_bytes: int, model_name: str):
+        """Evicts unpinned, unreferenced models until `incoming_bytes` fits. Caller holds the lock."""
+        overflow = self._used_bytes() + incoming_bytes - self.memory_budget_bytes
+        if overflow <= 0:
+            return
+
+        if self.eviction_policy == "lfu":
+            order = lambda e: (e.hits, e.last_used)
+        else:
+            order = lambda e: e.last_used
+        candidates = sorted((e for e in self.cache.values() if not e.pinned and e.refcount == 0), key=order)
+        if sum(e.size_bytes for e in candidates) < overflow:
+            self.stats["rejected_loads"] += 1
+            raise MemoryError(
+                f"Cannot fit {model_name}: {overflow / GB:.2f}GB over the {self.memory_budget_bytes / GB:.1f}GB budget "
+                f"with in-use/pinned models {[e.name for e in self.cache.values() if e not in candidates]}"
+            )
+
+        for entry in candidates:
+            if overflow <= 0:
+                break
+            del self.cache[entry.name]
+            overflow -= entry.size_bytes
+            self.stats["evictions"] += 1
+            print(f"[CACHE] Evicted {entry.name} ({entry.size_bytes / GB:.2f}GB) to make room for {model_name}")
+        self._free_memory()
+
+    def evict_idle(self) -> int:
+        """Evicts every unpinned model that is not in use; returns how many were removed."""
+        with self._lock:
+            idle = [name for name, e in self.cache.items() if not e.pinned and e.refcount == 0]
+            for name in idle:
+                del self.cache[name]
+            self.stats["evictions"] += len(idle)
+        if idle:
+            print(f"[CACHE] Evicted idle models {idle} to recover memory")
+            self._free_memory()
+        return len(idle)
+
+    def pin(self, model_name: str):
+        """Keep a hot model resident; pinned models are never evicted."""
+        with self._lock:
+            self._pinned.add(model_name)
+            if model_name in self.cache:
+                self.cache[model_name].pinned = True
+
+    def unpin(self, model_name: str):
+        with self._lock:
+            self._pinned.discard(model_name)
+            if model_name in self.cache:
+                self.cache[model_name].pinned = False
     
     def get_model(self, model_name: str) -> Optional[Any]:
         """
         // [TASK]: Retrieve cached model or load on demand
         // [GOAL]: Provide fast model access with fallback loading
         // [SNIPPET]: surgicalfix
+
+        Does not hold a reference; prefer acquire() for work that must not race an eviction.
+        Unknown or failing models return None. Running out of memory evicts every idle model and
+        retries once; a second MemoryError is raised to the caller.
         """
-        if model_name in self.cache:
-            self.usage_stats[model_name]["loads"] += 1
-            return self.cache[model_name]
-        
-        # Load on demand if not cached
-        print(f"[CACHE] Loading {model_name} on demand...")
-        
-        if model_name == "sdxl":
-            self._load_sdxl_model()
-        elif model_name.startswith("whisper"):
-            size = model_name.split("-")[1] if "-" in model_name else "small"
-            self._load_whisper_model(size)
-        elif model_name == "bark":
-            self._load_bark_model()
-        
-        return self.cache.get(model_name)
+        try:
+            handle = self.acquire(model_name)
+        except MemoryError as e:
+            print(f"[CACHE] Out of memory loading {model_name} ({e}); evicting idle models and retrying")
+            self.evict_idle()
+            handle = self.acquire(model_name)
+        except Exception as e:
+            print(f"[CACHE] {model_name} unavailable: {e}")
+            return None
+        handle.release()
+        return handle.model
     
     def clear_cache(self, model_name: str = None):
-        """Clear specific model or entire cache"""
-        if model_name:
-            if model_name in self.cache:
-                del self.cache[model_name]
-                print(f"[CACHE] Cleared {model_name}")
-        else:
-            self.cache.clear()
-            print("[CACHE] Cleared all cached models")
-        
+        """Clear specific model or entire cache; models currently in use are kept"""
+        with self._lock:
+            names = [model_name] if model_name else list(self.cache)
+            for name in names:
+                entry = self.cache.get(name)
+                if entry is None:
+                    continue
+                if entry.refcount:
+                    print(f"[CACHE] {name} is in use, not clearing")
+                    continue
+                del self.cache[name]
+                print(f"[CACHE] Cleared {name}")
+        self._free_memory()
+
+    def _free_memory(self):
         # Force garbage collection
         gc.collect()
-        if torch.cuda.is_available():
+        if TORCH_AVAILABLE and torch.cuda.is_available():
             torch.cuda.empty_cache()
     
     def get_cache_stats(self) -> Dict:
         """Get cache performance statistics"""
-        stats = {
-            "cached_models": list(self.cache.keys()),
-            "memory_usage_gb": self._get_memory_usage(),
-            "load_times": self.load_times,
-            "usage_stats": self.usage_stats,
-            "cache_hits": sum(stats.get("loads", 0) for stats in self.usage_stats.values())
-        }
-        return stats
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "cached_models": list(self.cache.keys()),
+                "memory_usage_gb": self._get_memory_usage(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "cached_bytes": self._used_bytes(),
+                "load_times": self.load_times,
+                "usage_stats": {
+                    name: {"hits": e.hits, "size_bytes": e.size_bytes, "refcount": e.refcount, "pinned": e.pinned}
+                    for name, e in self.cache.items()
+                },
+                "cache_hits": self.stats["hits"],
+                "cache_misses": self.stats["misses"],
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "evictions": self.stats["evictions"],
+                "load_failures": self.stats["load_failures"],
+                "rejected_loads": self.stats["rejected_loads"],
+            }
     
     def _get_memory_usage(self) -> float:
         """Get current memory usage in GB"""
-        if torch.cuda.is_available():
-            return torch.cuda.memory_allocated() / (1024**3)
-        return psutil.Process().memory_info().rss / (1024**3)
+        if TORCH_AVAILABLE and torch.cuda.is_available():
+            return torch.cuda.memory_allocated() / GB
+        return psutil.Process().memory_info().rss / GB
 
 # Global cache instance
 model_cache = ModelCache()
@@ -2,35 +2,79 @@
 """
 🎵 Music Engine - Background Music for Professional Videos
 Royalty-free music system for InVideo competition
+
+// [TASK]: Cached, duration-bucketed music beds mixed natively by ffmpeg
+// [GOAL]: Music prep costs a file lookup per video; mixing streams instead of decoding into Python
+// [SNIPPET]: surgicalfix + perfcheck
 """
 
 import os
+import math
+import wave
+import array
 import random
+import shutil
+import hashlib
 import logging
-from pathlib import Path
-from typing import Optional, List, Dict
+import subprocess
 import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple
 
-# Audio processing
-try:
-    from moviepy.audio.io.AudioFileClip import AudioFileClip
-    from moviepy.audio.AudioClip import CompositeAudioClip, concatenate_audioclips
-
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    MOVIEPY_AVAILABLE = False
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Ducking: music drops under narration and recovers in the gaps
+DUCKING_FILTER = "sidechaincompress=threshold=0.03:ratio=8:attack=20:release=400"
+
+
+def crossfade_loop(samples: array.array, channels: int, crossfade_frames: int) -> array.array:
+    """
+    Seamlessly loopable unit: the track minus its last `crossfade_frames`, with those tail frames
+    faded out over a fade-in of the head. Repeating the unit back to back has no seam clicks.
+    """
+    frames = len(samples) // channels
+    crossfade_frames = min(crossfade_frames, frames // 4)
+    if crossfade_frames <= 0:
+        return array.array("h", samples)
+    unit = array.array("h", samples[: (frames - crossfade_frames) * channels])
+    tail = (frames - crossfade_frames) * channels
+    for frame in range(crossfade_frames):
+        fade_in = frame / crossfade_frames
+        for c in range(channels):
+            i = frame * channels + c
+            mixed = unit[i] * fade_in + samples[tail + i] * (1 - fade_in)
+            unit[i] = max(-32768, min(32767, int(round(mixed))))
+    return unit
+
 
 class MusicEngine:
     """Background music system for video generation"""
 
-    def __init__(self, music_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        music_dir: Optional[Path] = None,
+        bucket_seconds: float = 15.0,
+        crossfade_seconds: float = 0.5,
+        music_volume: float = 0.2,
+        max_cache_bytes: int = 512 * 1024 * 1024,
+    ):
         self.music_dir = music_dir or Path("music_library")
         self.music_dir.mkdir(exist_ok=True)
 
+        # Beds are rendered once per (track, duration bucket) and trimmed to the voice while mixing
+        self.bucket_seconds = bucket_seconds
+        self.crossfade_seconds = crossfade_seconds
+        self.music_volume = music_volume
+        self.max_cache_bytes = max_cache_bytes
+        self.bed_dir = self.music_dir / "beds"
+        self.bed_dir.mkdir(exist_ok=True)
+        self.stats = {"bed_hits": 0, "bed_renders": 0, "loop_renders": 0, "evictions": 0}
+
         # Music categories for different moods
         self.categories = {
             "inspirational": ["uplifting", "motivational", "success"],
@@ -142,10 +186,6 @@ class MusicEngine:
     def get_music_for_story(self, story_text: str, duration: float) -> Optional[Path]:
         """Get appropriate background music for story"""
 
-        if not MOVIEPY_AVAILABLE:
-            logger.warning("[MUSIC] MoviePy not available, skipping music")
-            return None
-
         # Analyze story for appropriate music category
         story_lower = story_text.lower()
 
@@ -172,7 +212,7 @@ class MusicEngine:
         return self._get_music_track(category, duration)
 
     def _get_music_track(self, category: str, duration: float) -> Optional[Path]:
-        """Get music track for specific category and duration"""
+        """Get a looped bed for the category at least `duration` seconds long (trimmed when mixing)"""
 
         # Find music files for category
         pattern_files = []
@@ -197,69 +237,132 @@ class MusicEngine:
         selected_track = random.choice(pattern_files)
 
         try:
-            # Load and adjust duration
-            audio_clip = AudioFileClip(str(selected_track))
-
-            if audio_clip.duration < duration:
-                # Loop the track if it's shorter than needed
-                loops_needed = int(duration / audio_clip.duration) + 1
-                audio_clip = concatenate_audioclips([audio_clip] * loops_needed)
-
-            # Trim to exact duration
-            audio_clip = audio_clip.subclipped(0, duration)
-
-            # Reduce volume for background music (20% of original)
-            audio_clip = audio_clip.with_volume_scaled(0.2)
-
-            # Save processed version
-            output_file = self.music_dir / f"processed_{category}_{int(duration)}s.wav"
-            audio_clip.write_audiofile(str(output_file))
-            audio_clip.close()
-
-            logger.info(f"[MUSIC] Prepared background music: {output_file.name}")
-            return output_file
-
+            bed = self.get_bed(selected_track, duration)
+            logger.info(f"[MUSIC] Prepared background music: {bed.name}")
+            return bed
         except Exception as e:
             logger.error(f"[MUSIC] Error processing music: {e}")
             return None
 
+    def bucket_duration(self, duration: float) -> int:
+        """Round up to the bucket grid so near-identical durations share one bed"""
+        return int(max(1, math.ceil(duration / self.bucket_seconds)) * self.bucket_seconds)
+
+    def _track_key(self, track: Path) -> str:
+        stat = track.stat()
+        identity = f"{track.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{self.crossfade_seconds}"
+        return f"{track.stem}_{hashlib.sha1(identity.encode()).hexdigest()[:12]}"
+
+    def get_bed(self, track: Path, duration: float) -> Path:
+        """Loopable bed for `track` covering `duration`, rendered at most once per duration bucket"""
+        bucket = self.bucket_duration(duration)
+        key = self._track_key(track)
+        bed = self.bed_dir / f"{key}_{bucket}s.wav"
+        if bed.exists():
+            self.stats["bed_hits"] += 1
+            os.utime(bed)  # LRU order for eviction
+            return bed
+
+        loop = self._get_loop_unit(track, key)
+        with wave.open(str(loop), "rb") as unit_wav:
+            params = unit_wav.getparams()
+            unit = unit_wav.readframes(unit_wav.getnframes())
+        frame_bytes = params.nchannels * params.sampwidth
+        remaining = int(bucket * params.framerate) * frame_bytes
+
+        tmp = bed.with_suffix(".wav.tmp")
+        with wave.open(str(tmp), "wb") as out:
+            out.setnchannels(params.nchannels)
+            out.setsampwidth(params.sampwidth)
+            out.setframerate(params.framerate)
+            while remaining > 0:
+                piece = unit[:remaining]
+                out.writeframes(piece)
+                remaining -= len(piece)
+        os.replace(tmp, bed)
+        self.stats["bed_renders"] += 1
+        self._enforce_cache_budget(keep={bed, loop})
+        return bed
+
+    def _get_loop_unit(self, track: Path, key: str) -> Path:
+        """Crossfaded loop unit, computed once per track version"""
+        loop = self.bed_dir / f"{key}_loop.wav"
+        if loop.exists():
+            os.utime(loop)
+            return loop
+
+        samples, channels, rate = self._read_track(track)
+        unit = crossfade_loop(samples, channels, int(self.crossfade_seconds * rate))
+        tmp = loop.with_suffix(".wav.tmp")
+        with wave.open(str(tmp), "wb") as out:
+            out.setnchannels(channels)
+            out.setsampwidth(2)
+            out.setframerate(rate)
+            out.writeframes(unit.tobytes())
+        os.replace(tmp, loop)
+        self.stats["loop_renders"] += 1
+        return loop
+
+    def _read_track(self, track: Path) -> Tuple[array.array, int, int]:
+        """16-bit PCM samples of the track; anything else is decoded with ffmpeg"""
+        try:
+            with wave.open(str(track), "rb") as wav:
+                if wav.getsampwidth() == 2:
+                    return array.array("h", wav.readframes(wav.getnframes())), wav.getnchannels(), wav.getframerate()
+        except (wave.Error, EOFError):
+            pass
+
+        if not FFMPEG_AVAILABLE:
+            raise RuntimeError(f"ffmpeg is required to decode {track.name}")
+        with tempfile.TemporaryDirectory() as tmp:
+            pcm = Path(tmp) / "track.wav"
+            subprocess.run(
+                ["ffmpeg", "-y", "-loglevel", "error", "-i", str(track), "-ac", "2", "-ar", "44100", "-sample_fmt", "s16", str(pcm)],
+                check=True,
+            )
+            with wave.open(str(pcm), "rb") as wav:
+                return array.array("h", wav.readframes(wav.getnframes())), wav.getnchannels(), wav.getframerate()
+
+    def _enforce_cache_budget(self, keep: set):
+        """Evict least recently used beds/loops until the cache fits max_cache_bytes"""
+        files = sorted(self.bed_dir.glob("*.wav"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in files)
+        for f in files:
+            if total <= self.max_cache_bytes:
+                break
+            if f in keep:
+                continue
+            total -= f.stat().st_size
+            f.unlink(missing_ok=True)
+            self.stats["evictions"] += 1
+
+    def mix_command(self, voice_file: Path, music_file: Path, output_file: Path) -> List[str]:
+        """One streaming ffmpeg graph: scale the bed, duck it under the voice, mix, stop with the voice"""
+        graph = (
+            "[0:a]asplit=2[voice][key];"
+            f"[1:a]volume={self.music_volume}[bed];"
+            f"[bed][key]{DUCKING_FILTER}[ducked];"
+            "[voice][ducked]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[out]"
+        )
+        return [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", str(voice_file), "-i", str(music_file),
+            "-filter_complex", graph, "-map", "[out]",
+            str(output_file),
+        ]
+
     def combine_voice_and_music(
         self, voice_file: Path, music_file: Path, output_file: Path
     ) -> bool:
         """Combine voice narration with background music"""
 
-        if not MOVIEPY_AVAILABLE:
-            logger.warning("[MUSIC] MoviePy not available, copying voice only")
-            import shutil
-
+        if not FFMPEG_AVAILABLE:
+            logger.warning("[MUSIC] ffmpeg not available, copying voice only")
             shutil.copy(voice_file, output_file)
             return True
 
         try:
-            # Load audio files
-            voice_clip = AudioFileClip(str(voice_file))
-            music_clip = AudioFileClip(str(music_file))
-
-            # Ensure music matches voice duration
-            if music_clip.duration != voice_clip.duration:
-                music_clip = music_clip.subclip(0, voice_clip.duration)
-
-            # Combine with voice prominent
-            final_audio = CompositeAudioClip(
-                [
-                    voice_clip.with_volume_scaled(1.0),  # Full volume voice
-                    music_clip.with_volume_scaled(0.15),  # Quiet background music
-                ]
-            )
-
-            # Save combined audio
-            final_audio.write_audiofile(str(output_file))
-
-            # Cleanup
-            voice_clip.close()
-            music_clip.close()
-            final_audio.close()
-
+            subprocess.run(self.mix_command(voice_file, music_file, output_file), check=True)
             logger.info(f"[MUSIC] Combined audio: {output_file.name}")
             return True
 
@@ -272,6 +375,40 @@ class MusicEngine:
         return list(self.categories.keys())
 
 
+def benchmark_music_prep(engine: MusicEngine, durations: List[float], category: str = "storytelling") -> Dict[str, float]:
+    """
+    Per-video music prep time and memory for `durations` (e.g. one per video in a batch).
+    Cold = first pass over an empty bed cache, warm = the same durations again.
+    Peak RSS is only reported where the Unix `resource` module exists.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        resource = None
+
+    def run() -> Tuple[float, int]:
+        tracemalloc.start()
+        started = time.perf_counter()
+        for duration in durations:
+            engine._get_music_track(category, duration)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    cold_s, cold_peak = run()
+    warm_s, warm_peak = run()
+    return {
+        "videos": len(durations),
+        "cold_ms_per_video": cold_s * 1000 / len(durations),
+        "warm_ms_per_video": warm_s * 1000 / len(durations),
+        "cold_peak_alloc_mb": cold_peak / 1e6,
+        "warm_peak_alloc_mb": warm_peak / 1e6,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None,
+        **engine.stats,
+    }
+
+
 # Test function
 def test_music_engine():
     """Test music engine functionality"""
@@ -290,6 +427,8 @@ def test_music_engine():
     else:
         print("❌ Music generation failed")
 
+    print(benchmark_music_prep(engine, [10.0, 10.4, 12.8, 31.0, 44.5, 58.0]))
+
 
 if __name__ == "__main__":
     test_music_engine()
@@ -0,0 +1,173 @@
+"""
+Per-project render manifest for incremental re-renders.
+
+// [TASK]: Record what each scene of a project was rendered from and where its clip lives
+// [GOAL]: After a script edit, only scenes whose inputs changed are rendered again
+
+The manifest is <project_dir>/render_manifest.json. Each scene entry holds the fingerprint of the
+scene's inputs (the asset_key of its text, visual description, voice, models and render settings),
+its clip and per-format segments (paths relative to the project directory) and its duration.
+
+Next to it, <project_dir>/scene_breakdown.json keeps the scenes each script line was split into, so a
+re-render only sends edited lines back to the LLM and unchanged lines keep their exact scene text.
+"""
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from logging_setup import get_logger
+from scene_asset_store import asset_key
+
+logger = get_logger(__name__)
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "render_manifest.json"
+BREAKDOWN_NAME = "scene_breakdown.json"
+# Scene fields that say where a scene sits in the script, not what it renders to
+POSITIONAL_KEYS = frozenset({"id", "scene_number", "total_scenes"})
+_PROJECT_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+def validate_project_id(project_id: str) -> str:
+    """Project ids become directory names; reject anything that could escape the projects directory."""
+    if not isinstance(project_id, str) or not _PROJECT_ID.fullmatch(project_id) or ".." in project_id:
+        raise ValueError(f"Invalid project id: {project_id!r}")
+    return project_id
+
+
+def scene_fingerprint(scene: Dict[str, Any], **settings: Any) -> str:
+    """Fingerprint of everything a scene's clip depends on: its content plus the pipeline's render settings."""
+    content = {key: value for key, value in scene.items() if key not in POSITIONAL_KEYS}
+    return asset_key("scene", scene=content, **settings)
+
+
+def script_lines(script: str) -> List[str]:
+    """The non-blank lines of a project script, stripped; each one is split into scenes on its own."""
+    return [line.strip() for line in script.splitlines() if line.strip()]
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]):
+    """Writes JSON via a temp file and rename, so an interrupted write leaves the previous file intact."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load_scene_breakdown(project_dir: Path, dialect: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Saved scenes by script line, or {} if missing, unreadable, from another version or another dialect."""
+    path = Path(project_dir) / BREAKDOWN_NAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != MANIFEST_VERSION or data.get("dialect") != dialect:
+            return {}
+        return {line: list(scenes) for line, scenes in data.get("lines", {}).items()}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"Ignoring unreadable scene breakdown {path}: {e}")
+        return {}
+
+
+def save_scene_breakdown(project_dir: Path, lines: Dict[str, List[Dict[str, Any]]], dialect: Optional[str] = None):
+    """Stores the scenes of the current script's lines; lines no longer in the script are dropped by the caller."""
+    _write_json_atomic(Path(project_dir) / BREAKDOWN_NAME,
+                       {"version": MANIFEST_VERSION, "dialect": dialect, "lines": lines})
+
+
+def probe_duration(path: Path) -> Optional[float]:
+    """Container duration in seconds via ffprobe, or None when it cannot be read."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(path)],
+            capture_output=True, text=True, check=True,
+        )
+        return round(float(result.stdout.strip()), 6)
+    except (OSError, ValueError, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not probe duration of {path}: {e}")
+        return None
+
+
+@dataclass
+class SceneEntry:
+    fingerprint: str
+    clip: str
+    duration: Optional[float] = None
+    formats: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class RenderManifest:
+    project_id: str
+    scenes: List[SceneEntry] = field(default_factory=list)
+    final: Optional[str] = None
+    formats: Dict[str, str] = field(default_factory=dict)
+    duration: Optional[float] = None
+    updated_at: float = 0.0
+
+    @classmethod
+    def load(cls, project_dir: Path, project_id: str) -> "RenderManifest":
+        """The saved manifest, or an empty one if it is missing, unreadable or from another version."""
+        path = Path(project_dir) / MANIFEST_NAME
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") != MANIFEST_VERSION:
+                logger.info(f"Ignoring render manifest {path} with version {data.get('version')}")
+                return cls(project_id)
+            return cls(
+                project_id=project_id,
+                scenes=[SceneEntry(**entry) for entry in data.get("scenes", [])],
+                final=data.get("final"),
+                formats=data.get("formats", {}),
+                duration=data.get("duration"),
+                updated_at=data.get("updated_at", 0.0),
+            )
+        except FileNotFoundError:
+            return cls(project_id)
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable render manifest {path}: {e}")
+            return cls(project_id)
+
+    def reusable(self, project_dir: Path) -> Dict[str, SceneEntry]:
+        """Entries by fingerprint whose clip is still on disk; per-format segments that vanished are dropped."""
+        project_dir = Path(project_dir)
+        entries = {}
+        for entry in self.scenes:
+            if not (project_dir / entry.clip).exists():
+                continue
+            entry.formats = {name: part for name, part in entry.formats.items() if (project_dir / part).exists()}
+            entries[entry.fingerprint] = entry
+        return entries
+
+    def save(self, project_dir: Path):
+        """Writes the manifest atomically, so an interrupted render leaves the previous one intact."""
+        self.updated_at = time.time()
+        _write_json_atomic(Path(project_dir) / MANIFEST_NAME, {"version": MANIFEST_VERSION, **asdict(self)})
+
+    def prune(self, project_dir: Path, subdir: str = "scenes") -> int:
+        """Deletes scene files no entry references any more; returns how many were removed."""
+        project_dir = Path(project_dir)
+        referenced = {entry.clip for entry in self.scenes}
+        referenced.update(part for entry in self.scenes for part in entry.formats.values())
+        removed = 0
+        for path in (project_dir / subdir).glob("*"):
+            if path.is_file() and path.relative_to(project_dir).as_posix() not in referenced:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not prune {path}: {e}")
+        return removed
@@ -5,23 +5,152 @@ Supports Edge TTS, Bark, and pyttsx3 fallback
 """
 
 import os
+import re
+import json
+import time
+import wave
+import shutil
 import asyncio
+import hashlib
 import tempfile
+import subprocess
+import unicodedata
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Awaitable
 import logging
 
+from config_loader import get_config
+from scene_asset_store import SceneAssetStore
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+config = get_config()
+_store_settings = config.asset_store if isinstance(config.asset_store, dict) else {}
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Every cached sentence is stored as mono 16-bit PCM at this rate so sentences concatenate sample-accurately
+SAMPLE_RATE = 24000
+
+# Per-sentence durations written next to each voice file, consumed by the subtitle aligner
+SENTENCE_TIMINGS_SUFFIX = ".sentences.json"
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def normalize_sentence(text: str) -> str:
+    """Canonical form used for cache keys: NFC unicode with collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split narration into sentences on terminal punctuation and line breaks."""
+    return [s for s in (normalize_sentence(part) for part in _SENTENCE_BOUNDARY.split(text)) if s]
+
+
+class SentenceAudioCache(SceneAssetStore):
+    """
+    Content-addressed store of synthesized sentences keyed by (engine, voice, normalized text),
+    shared across videos so repeated intros, outros and phrases are synthesized once. Size-bounded
+    like every asset store: least recently used sentences are evicted beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 2 * 1024 ** 3):
+        super().__init__(cache_dir, max_bytes=max_bytes)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def cache_dir(self) -> Path:
+        return self.root
+
+    @staticmethod
+    def key_for(engine: str, voice: str, text: str) -> str:
+        return hashlib.sha256(f"{engine}\0{voice}\0{normalize_sentence(text)}".encode("utf-8")).hexdigest()
+
+    def path_for(self, engine: str, voice: str, text: str) -> Path:
+        return self._path(self.key_for(engine, voice, text), ".wav")
+
+    def get(self, engine: str, voice: str, text: str) -> Optional[Path]:
+        return super().get(self.key_for(engine, voice, text), ".wav")
+
+    def put(self, engine: str, voice: str, text: str, wav_file: Path) -> Path:
+        path = super().put(self.key_for(engine, voice, text), wav_file, ".wav")
+        if path is None:
+            raise OSError(f"Could not cache synthesized sentence {text[:40]!r}")
+        return path
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def default_tts_cache_dir() -> Path:
+    """SHUJAA_TTS_CACHE_DIR, else asset_store.tts_root; a relative path is anchored at the project root, not the cwd."""
+    root = Path(os.environ.get("SHUJAA_TTS_CACHE_DIR") or _store_settings.get("tts_root", "asset_cache/tts_sentences"))
+    return root if root.is_absolute() else PROJECT_ROOT / root
+
+
+def to_pcm_wav(source: Path, destination: Path):
+    """Normalise engine output (MP3, WAV at any rate, AIFF) to mono 16-bit PCM WAV at SAMPLE_RATE."""
+    try:
+        with wave.open(str(source), "rb") as wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (1, 2, SAMPLE_RATE):
+                shutil.move(str(source), str(destination))
+                return
+    except (wave.Error, EOFError):
+        pass  # Not PCM WAV (e.g. Edge TTS MP3), decode with ffmpeg
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", str(source), "-ac", "1", "-ar", str(SAMPLE_RATE), "-sample_fmt", "s16", str(destination)],
+        check=True,
+    )
+
+
+def concat_wavs(wav_files: List[Path], output_file: Path):
+    """Join PCM WAVs with identical parameters frame-for-frame (no re-encode, no gaps)."""
+    with wave.open(str(output_file), "wb") as out:
+        params = None
+        for wav_file in wav_files:
+            with wave.open(str(wav_file), "rb") as wav:
+                if params is None:
+                    params = wav.getparams()
+                    out.setnchannels(params.nchannels)
+                    out.setsampwidth(params.sampwidth)
+                    out.setframerate(params.framerate)
+                elif (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (params.nchannels, params.sampwidth, params.framerate):
+                    raise ValueError(f"Cannot concatenate {wav_file}: audio parameters differ")
+                out.writeframes(wav.readframes(wav.getnframes()))
+
+
+def write_sentence_timings(audio_file: Path, sentences: List[str], sentence_files: List[Path]):
+    durations = []
+    for wav_file in sentence_files:
+        with wave.open(str(wav_file), "rb") as wav:
+            durations.append(wav.getnframes() / wav.getframerate())
+    timings = {"sentences": [{"text": text, "duration": duration} for text, duration in zip(sentences, durations)]}
+    Path(str(audio_file) + SENTENCE_TIMINGS_SUFFIX).write_text(json.dumps(timings), encoding="utf-8")
+
+
+def load_sentence_timings(audio_file: Path) -> Optional[List[Dict[str, Any]]]:
+    """Per-sentence [{text, duration}] recorded when the audio was synthesized, if available."""
+    path = Path(str(audio_file) + SENTENCE_TIMINGS_SUFFIX)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))["sentences"]
+
 
 class VoiceEngine:
     """Multi-engine voice synthesis system"""
 
-    def __init__(self, output_dir: Path):
+    def __init__(self, output_dir: Path, cache_dir: Optional[Path] = None, max_parallel_sentences: int = 4):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
+        self.sentence_cache = SentenceAudioCache(
+            cache_dir or default_tts_cache_dir(),
+            max_bytes=int(float(_store_settings.get("tts_max_gb", 2)) * 1024 ** 3),
+        )
+        self.max_parallel_sentences = max_parallel_sentences
+        self.stats = {"sentences": 0, "synthesized": 0, "synthesis_seconds": 0.0}
 
         # Voice engine priorities (best to fallback)
         self.engines = {
@@ -41,6 +170,14 @@ class VoiceEngine:
             "pyttsx3": ["english"],  # System default
         }
 
+        # Sentence synthesizers write one WAV per sentence; Bark and pyttsx3 hold one model/driver, so run serially
+        self.synthesizers: Dict[str, Callable[[str, str, Path], Awaitable[None]]] = {
+            "edge_tts": self._synthesize_edge_tts,
+            "bark": lambda text, voice, out: asyncio.to_thread(self._synthesize_bark, text, voice, out),
+            "pyttsx3": lambda text, voice, out: asyncio.to_thread(self._synthesize_pyttsx3, text, out),
+        }
+        self.engine_parallelism = {"bark": 1, "pyttsx3": 1}
+
         logger.info(
             f"[VOICE] Available engines: {list(k for k, v in self.engines.items() if v)}"
         )
@@ -77,24 +214,14 @@ class VoiceEngine:
 
         output_file = self.output_dir / f"voice_{scene_id}.wav"
 
-        # Try engines in order of preference
-        if self.engines["edge_tts"]:
-            try:
-                return await self._generate_edge_tts(text, output_file)
-            except Exception as e:
-                logger.warning(f"[VOICE] Edge TTS failed: {e}")
-
-        if self.engines["bark"]:
-            try:
-                return await self._generate_bark(text, output_file)
-            except Exception as e:
-                logger.warning(f"[VOICE] Bark failed: {e}")
-
-        if self.engines["pyttsx3"]:
+        # Try engines in order of preference; a scene is voiced by a single engine end to end
+        for engine, available in self.engines.items():
+            if not available:
+                continue
             try:
-                return self._generate_pyttsx3(text, output_file)
+                return await self._generate_with_engine(engine, text, output_file)
             except Exception as e:
-                logger.warning(f"[VOICE] pyttsx3 failed: {e}")
+                logger.warning(f"[VOICE] {engine} failed: {e}")
 
         logger.error("[VOICE] All voice engines failed!")
         return None
@@ -103,83 +230,103 @@ class VoiceEngine:
         """Generate voice (sync wrapper)"""
         return asyncio.run(self.generate_voice_async(text, scene_id))
 
-    async def _generate_edge_tts(self, text: str, output_file: Path) -> Path:
-        """Generate using Edge TTS (best quality)"""
+    async def _generate_with_engine(self, engine: str, text: str, output_file: Path) -> Path:
+        """
+        Synthesize each sentence (cache first, bounded parallelism on misses) and join them into output_file.
+        """
+        voice = self.kenyan_voices.get(engine, ["default"])[0]
+        sentences = split_sentences(text)
+        if not sentences:
+            raise ValueError("No text to synthesize")
+
+        limit = asyncio.Semaphore(self.engine_parallelism.get(engine, self.max_parallel_sentences))
+        pending: Dict[str, asyncio.Task] = {}  # Repeats within one scene share a synthesis
+
+        async def sentence_audio(sentence: str) -> Path:
+            cached = self.sentence_cache.get(engine, voice, sentence)
+            if cached:
+                return cached
+            async with limit:
+                return await self._synthesize_sentence(engine, voice, sentence)
+
+        for sentence in sentences:
+            if sentence not in pending:
+                pending[sentence] = asyncio.ensure_future(sentence_audio(sentence))
         try:
-            import edge_tts
-
-            # Use Kenya-first voice selection
-            voice = self.kenyan_voices["edge_tts"][0]
-
-            logger.info(f"[EDGE-TTS] Generating with voice: {voice}")
-
-            communicate = edge_tts.Communicate(text, voice)
-            await communicate.save(str(output_file))
-
-            logger.info(f"[EDGE-TTS] Generated: {output_file.name}")
-            return output_file
-
-        except Exception as e:
-            logger.error(f"[EDGE-TTS] Error: {e}")
+            await asyncio.gather(*pending.values())
+        except Exception:
+            for task in pending.values():
+                task.cancel()
             raise
 
-    async def _generate_bark(self, text: str, output_file: Path) -> Path:
-        """Generate using Bark (neural voice)"""
-        try:
-            from bark import generate_audio, SAMPLE_RATE
-            from scipy.io.wavfile import write as write_wav
-            import numpy as np
-
-            voice_preset = self.kenyan_voices["bark"][0]
-
-            logger.info(f"[BARK] Generating with preset: {voice_preset}")
+        self.stats["sentences"] += len(sentences)
+        sentence_files = [pending[sentence].result() for sentence in sentences]
+        concat_wavs(sentence_files, output_file)
+        write_sentence_timings(output_file, sentences, sentence_files)
+        logger.info(f"[VOICE] {engine} voiced {output_file.name} from {len(sentences)} sentences ({len(pending)} unique)")
+        return output_file
+
+    async def _synthesize_sentence(self, engine: str, voice: str, sentence: str) -> Path:
+        with tempfile.TemporaryDirectory() as tmp:  # put() copies into the store atomically
+            raw_file = Path(tmp) / "raw"
+            started = time.perf_counter()
+            await self.synthesizers[engine](sentence, voice, raw_file)
+            self.stats["synthesis_seconds"] += time.perf_counter() - started
+            self.stats["synthesized"] += 1
+
+            wav_file = Path(tmp) / "sentence.wav"
+            await asyncio.to_thread(to_pcm_wav, raw_file, wav_file)
+            return self.sentence_cache.put(engine, voice, sentence, wav_file)
+
+    async def _synthesize_edge_tts(self, text: str, voice: str, output_file: Path):
+        """Generate using Edge TTS (best quality)"""
+        import edge_tts
 
-            # Generate audio
-            audio_array = generate_audio(text, history_prompt=voice_preset)
+        communicate = edge_tts.Communicate(text, voice)
+        await communicate.save(str(output_file))
 
-            # Convert to int16 and save
-            audio_array = (audio_array * 32767).astype(np.int16)
-            write_wav(str(output_file), SAMPLE_RATE, audio_array)
+    def _synthesize_bark(self, text: str, voice_preset: str, output_file: Path):
+        """Generate using Bark (neural voice)"""
+        from bark import generate_audio, SAMPLE_RATE as BARK_SAMPLE_RATE
+        from scipy.io.wavfile import write as write_wav
+        import numpy as np
 
-            logger.info(f"[BARK] Generated: {output_file.name}")
-            return output_file
+        audio_array = generate_audio(text, history_prompt=voice_preset)
 
-        except Exception as e:
-            logger.error(f"[BARK] Error: {e}")
-            raise
+        # Convert to int16 and save
+        audio_array = (audio_array * 32767).astype(np.int16)
+        write_wav(str(output_file), BARK_SAMPLE_RATE, audio_array)
 
-    def _generate_pyttsx3(self, text: str, output_file: Path) -> Path:
+    def _synthesize_pyttsx3(self, text: str, output_file: Path):
         """Generate using pyttsx3 (fallback)"""
-        try:
-            import pyttsx3
-
-            logger.info("[PYTTSX3] Generating fallback voice...")
-
-            engine = pyttsx3.init()
-
-            # Set Kenya-appropriate voice properties
-            voices = engine.getProperty("voices")
-            if voices:
-                # Prefer female voices for storytelling
-                for voice in voices:
-                    if "female" in voice.name.lower() or "zira" in voice.name.lower():
-                        engine.setProperty("voice", voice.id)
-                        break
-
-            # Optimize for storytelling
-            engine.setProperty("rate", 160)  # Slightly slower for clarity
-            engine.setProperty("volume", 0.9)
-
-            # Save to file
-            engine.save_to_file(text, str(output_file))
-            engine.runAndWait()
-
-            logger.info(f"[PYTTSX3] Generated: {output_file.name}")
-            return output_file
-
-        except Exception as e:
-            logger.error(f"[PYTTSX3] Error: {e}")
-            raise
+        import pyttsx3
+
+        engine = pyttsx3.init()
+
+        # Set Kenya-appropriate voice properties
+        voices = engine.getProperty("voices")
+        if voices:
+            # Prefer female voices for storytelling
+            for voice in voices:
+                if "female" in voice.name.lower() or "zira" in voice.name.lower():
+                    engine.setProperty("voice", voice.id)
+                    break
+
+        # Optimize for storytelling
+        engine.setProperty("rate", 160)  # Slightly slower for clarity
+        engine.setProperty("volume", 0.9)
+
+        # Save to file
+        engine.save_to_file(text, str(output_file))
+        engine.runAndWait()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Sentence cache effectiveness for this engine instance"""
+        return {
+            **self.stats,
+            **self.sentence_cache.stats(),
+            "hit_rate": self.sentence_cache.hit_rate(),
+        }
 
     def get_available_engines(self) -> List[str]:
         """Get list of available voice engines"""
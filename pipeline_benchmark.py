@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Deterministic offline benchmark suite for the video pipelines.
+
+// [TASK]: Measure offline_video_maker, news_video_generator and cartoon_anime_pipeline repeatably
+// [GOAL]: Catch pipeline slowdowns before they ship, without GPUs, model downloads or network
+
+Image, TTS, ASR and LLM calls go to StubRouter: outputs are derived from the request text and
+each call burns a configurable amount of CPU, so every run does the same work. Everything else
+(ffmpeg, MoviePy, OpenCV, file I/O) runs for real. Each case runs in a fresh interpreter with
+its own working directory so peak RSS, subprocess counts and output sizes are not polluted by
+earlier cases.
+
+    python pipeline_benchmark.py run --scenes 2 5 10 --repeats 3 --out benchmark_baseline.json
+    python pipeline_benchmark.py run --compare benchmark_baseline.json --threshold 0.10
+    python pipeline_benchmark.py compare benchmark_baseline.json current.json
+    python pipeline_benchmark.py run --pipelines offline_video_maker --scenarios cold retry near_duplicate
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import zlib
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+REPO_ROOT = Path(__file__).resolve().parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+BASELINE_VERSION = 1
+PIPELINES = ("offline_video_maker", "news_video_generator", "cartoon_anime_pipeline")
+DEFAULT_SCENES = (2, 5, 10)
+# Asset store state before the measured run: empty, warmed by the identical video (a retry), or warmed
+# by the same video with its last scene rewritten (a near-duplicate from another user)
+SCENARIOS = ("cold", "retry", "near_duplicate")
+NEAR_DUPLICATE_SENTENCE = "A drone maps the flood plains of the Tana River before the rains"
+
+# Fixed script corpus; a case with N scenes uses the first N sentences (cycled)
+SCRIPT_SENTENCES = (
+    "A young engineer from Turkana repairs a solar pump for her village",
+    "Children in Kibera build a robot from recycled phone parts",
+    "A Maasai herder tracks rainfall with a simple mobile app",
+    "Farmers in Kisumu sell fish through a cooperative marketplace",
+    "Mount Kenya glows at sunrise above the tea plantations",
+    "A matatu driver in Nairobi plans routes around the evening traffic",
+    "Students in Mombasa record an oral history of the old town",
+    "A nurse in Eldoret delivers vaccines by motorbike",
+    "Coders in a Nakuru hub launch an app for local artisans",
+    "Grandmothers in Machakos teach a class on drought resistant crops",
+    "A football team from Kakamega trains on a dusty field at dusk",
+    "The whole community gathers to celebrate the new water tower",
+)
+
+
+def sentences_for(scenes: int, scenario: str = "cold") -> List[str]:
+    sentences = [SCRIPT_SENTENCES[i % len(SCRIPT_SENTENCES)] for i in range(scenes)]
+    if scenario == "near_duplicate":
+        sentences[-1] = NEAR_DUPLICATE_SENTENCE
+    return sentences
+
+
+def script_for(scenes: int, scenario: str = "cold") -> str:
+    return ". ".join(sentences_for(scenes, scenario)) + "."
+
+
+@dataclass
+class StubCosts:
+    """Simulated CPU cost per backend call, in milliseconds."""
+    llm_ms: float = 20.0
+    image_ms: float = 50.0
+    tts_ms: float = 30.0
+    asr_ms: float = 20.0
+
+
+def _burn(ms: float, seed: bytes):
+    """Busy CPU work for `ms` milliseconds (stands in for local model inference)."""
+    if ms <= 0:
+        return
+    deadline = time.perf_counter() + ms / 1000
+    digest = seed
+    while time.perf_counter() < deadline:
+        for _ in range(64):
+            digest = hashlib.sha256(digest).digest()
+
+
+def _png(width: int, height: int, seed: bytes) -> bytes:
+    """A solid-colour RGB PNG whose colour is derived from `seed`."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    row = b"\x00" + seed[:3] * width
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(row * height, 6)) + chunk(b"IEND", b""))
+
+
+def _wav(seconds: float, sample_rate: int = 22050) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+class StubRouter:
+    """
+    Drop-in for EnhancedModelRouter.route_generation. Responses depend only on the request, so
+    repeated runs produce byte-identical assets; `calls` counts requests per backend.
+    """
+
+    def __init__(self, sentences: List[str], costs: Optional[StubCosts] = None):
+        self.sentences = sentences
+        self.costs = costs or StubCosts()
+        self.calls = {"llm": 0, "image": 0, "tts": 0, "asr": 0}
+
+    async def route_generation(self, request: Any):
+        from enhanced_model_router import GenerationResult
+
+        seed = hashlib.sha256(f"{request.type}:{request.prompt}".encode()).digest()
+        if request.type == "image":
+            self.calls["image"] += 1
+            _burn(self.costs.image_ms, seed)
+            preferences = request.preferences or {}
+            image = _png(int(preferences.get("width", 1280)), int(preferences.get("height", 720)), seed)
+            return GenerationResult(True, content_url="data:image/png;base64," + base64.b64encode(image).decode())
+        if request.type == "audio":
+            self.calls["tts"] += 1
+            _burn(self.costs.tts_ms, seed)
+            seconds = max(1.0, min(8.0, len(request.prompt.split()) * 0.3))
+            return GenerationResult(True, content_url="data:audio/wav;base64," + base64.b64encode(_wav(seconds)).decode())
+        if request.prompt.startswith("Transcribe"):
+            self.calls["asr"] += 1
+            _burn(self.costs.asr_ms, seed)
+            return GenerationResult(True, metadata={"generated_text": " ".join(self.sentences[:2])})
+        self.calls["llm"] += 1
+        _burn(self.costs.llm_ms, seed)
+        # One line per scene in the "Scene N: text. Visual: description" shape the pipelines parse
+        lines = [f"Scene {i}: {sentence}. Visual: {sentence.lower()}, cinematic light"
+                 for i, sentence in enumerate(self.sentences, start=1)]
+        return GenerationResult(True, metadata={"generated_text": "\n".join(lines)})
+
+
+def _stage_hooks(pipeline: str, stack: ExitStack):
+    """Times the stages of pipelines that are not instrumented in-module, via pipeline_metrics."""
+    from pipeline_metrics import pipeline_metrics
+
+    def hook(owner, attr: str, stage: str, backend: str = "stub"):
+        stack.enter_context(patch.object(owner, attr, pipeline_metrics.instrument(pipeline, stage, backend)(getattr(owner, attr))))
+
+    if pipeline == "offline_video_maker":
+        from offline_video_maker import generate_video as offline
+        # Already instrumented; just keep the model cache from preloading real weights
+        stack.enter_context(patch.object(offline, "initialize_cache", lambda: None))
+    elif pipeline == "news_video_generator":
+        import news_video_generator as news
+        import ai_model_manager
+        stack.enter_context(patch.object(ai_model_manager, "init_hf_client", lambda *a, **k: None, create=True))
+        hook(news, "generate_scenes_from_text", "script_parsing")
+        hook(news, "generate_image", "image_generation")
+        hook(news, "generate_voiceover_from_text", "tts")
+        hook(news, "generate_captions_from_audio", "subtitles")
+        hook(news, "compile_video", "merge", backend="moviepy")
+    elif pipeline == "cartoon_anime_pipeline":
+        from cartoon_anime_pipeline import AfricanCartoonPipeline
+        hook(AfricanCartoonPipeline, "break_script_into_scenes", "script_parsing")
+        hook(AfricanCartoonPipeline, "generate_cartoon_scene", "image_generation")
+        hook(AfricanCartoonPipeline, "generate_african_tts", "tts")
+        hook(AfricanCartoonPipeline, "create_scene_animation", "scene_render", backend="opencv")
+        hook(AfricanCartoonPipeline, "export_for_mobile", "export", backend="ffmpeg")
+    else:
+        raise ValueError(f"Unknown pipeline: {pipeline}")
+
+
+def _invoke(pipeline: str, script: str, router: StubRouter, aspect_ratio: str):
+    if pipeline == "offline_video_maker":
+        from offline_video_maker.generate_video import OfflineVideoMaker
+        return OfflineVideoMaker().generate_video(script, aspect_ratio=aspect_ratio, enhanced_router=router)
+    if pipeline == "news_video_generator":
+        import news_video_generator
+        return asyncio.run(news_video_generator.main(prompt=script, enhanced_router=router))
+    import cartoon_anime_pipeline
+    return asyncio.run(cartoon_anime_pipeline.create_african_cartoon_video(script, enhanced_router=router))
+
+
+def _stage_seconds(pipeline: str) -> Dict[str, float]:
+    from pipeline_metrics import pipeline_metrics
+
+    totals: Dict[str, float] = {}
+    for metric in pipeline_metrics.stage_duration.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_sum") and sample.labels.get("pipeline") == pipeline:
+                stage = sample.labels["stage"]
+                totals[stage] = totals.get(stage, 0.0) + sample.value
+    return totals
+
+
+def _tree_bytes(root: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _max_rss_mb(children: bool = False) -> Optional[float]:
+    """Peak RSS of this process (or its reaped children); None on Windows, which has no `resource` module."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _warm_asset_store(pipeline: str, scenes: int, scenario: str, costs: Optional[StubCosts], aspect_ratio: str):
+    """Unmeasured run that leaves the asset store as an earlier video would have. Its failures are ignored."""
+    try:
+        _invoke(pipeline, script_for(scenes, scenario), StubRouter(sentences_for(scenes, scenario), costs), aspect_ratio)
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            raise
+
+
+def run_case(pipeline: str, scenes: int, costs: Optional[StubCosts] = None, aspect_ratio: str = "all",
+             workdir: Optional[Path] = None, scenario: str = "cold") -> Dict[str, Any]:
+    """
+    Runs one pipeline over the fixed script with `scenes` scenes in the current process and working
+    directory (run_benchmarks gives each case a fresh one). The scene asset store lives in the working
+    directory and starts in the state `scenario` describes. Failures are recorded, not raised.
+    """
+    from scene_asset_store import scene_asset_store
+
+    random.seed(0)
+    workdir = Path(workdir or os.getcwd())
+    router = StubRouter(sentences_for(scenes), costs)
+    spawned = []
+
+    class CountingPopen(subprocess.Popen):
+        def __init__(self, args, *rest, **kwargs):
+            spawned.append(args[0] if isinstance(args, (list, tuple)) and args else args)
+            super().__init__(args, *rest, **kwargs)
+
+    status, error = "ok", None
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(scene_asset_store, "root", workdir / "asset_store"))
+        stack.enter_context(patch.object(scene_asset_store, "_size", None))
+        rss_before_mb = _max_rss_mb()
+        stages_before = _stage_seconds(pipeline)
+        bytes_before = 0
+        hits_before, misses_before = scene_asset_store.hits, scene_asset_store.misses
+        started = time.perf_counter()
+        try:
+            _stage_hooks(pipeline, stack)  # Imports the pipeline; a missing dependency is a case error
+            if scenario != "cold":
+                _warm_asset_store(pipeline, scenes, scenario, costs, aspect_ratio)
+                random.seed(0)
+            stack.enter_context(patch.object(subprocess, "Popen", CountingPopen))
+            stages_before = _stage_seconds(pipeline)
+            bytes_before = _tree_bytes(workdir)
+            hits_before, misses_before = scene_asset_store.hits, scene_asset_store.misses
+            rss_before_mb = _max_rss_mb()
+            started = time.perf_counter()
+            _invoke(pipeline, script_for(scenes), router, aspect_ratio)
+        except BaseException as e:  # log_and_raise and CLI entrypoints may raise SystemExit
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            status, error = "error", f"{type(e).__name__}: {e}"[:500]
+        wall = time.perf_counter() - started
+    stages_after = _stage_seconds(pipeline)
+    return {
+        "pipeline": pipeline,
+        "scenes": scenes,
+        "scenario": scenario,
+        "status": status,
+        "error": error,
+        "wall_s": round(wall, 4),
+        "stages_s": {stage: round(seconds - stages_before.get(stage, 0.0), 4)
+                     for stage, seconds in sorted(stages_after.items()) if seconds > stages_before.get(stage, 0.0)},
+        "peak_rss_mb": _max_rss_mb(),
+        "rss_after_imports_mb": rss_before_mb,
+        "children_peak_rss_mb": _max_rss_mb(children=True),
+        "subprocesses": len(spawned),
+        "output_bytes": _tree_bytes(workdir) - bytes_before,
+        "backend_calls": dict(router.calls),
+        "asset_store": {"hits": scene_asset_store.hits - hits_before, "misses": scene_asset_store.misses - misses_before},
+    }
+
+
+# Modules each case imports; loaded from the repo root because several read relative paths at import time
+PIPELINE_MODULES = {
+    "offline_video_maker": ("offline_video_maker.generate_video",),
+    "news_video_generator": ("news_video_generator", "ai_model_manager"),
+    "cartoon_anime_pipeline": ("cartoon_anime_pipeline",),
+}
+
+
+def _enter_workdir(pipeline: str, workdir: Path):
+    """Loads config and the pipeline module from the repo root, then moves into the case's scratch directory."""
+    from config_loader import ConfigLoader
+    ConfigLoader(str(REPO_ROOT / "config.yaml"))
+    try:
+        for module in PIPELINE_MODULES[pipeline]:
+            importlib.import_module(module)
+    except ImportError:
+        pass  # Re-raised inside run_case, where it is recorded against the case
+    from pipeline_metrics import BufferedEventWriter, pipeline_metrics
+    # Keep emitting stage events (they are part of the measured cost) without appending to the real log
+    pipeline_metrics.event_writer = BufferedEventWriter(Path(os.devnull))
+    os.chdir(workdir)
+
+
+def _run_case_isolated(pipeline: str, scenes: int, costs: StubCosts, aspect_ratio: str, timeout: float,
+                       scenario: str = "cold") -> Dict[str, Any]:
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench_{pipeline}_"))
+    spec = {"pipeline": pipeline, "scenes": scenes, "costs": asdict(costs), "aspect_ratio": aspect_ratio,
+            "workdir": str(workdir), "scenario": scenario}
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")])),
+               SHUJAA_DISABLE_STT="0", SHUJAA_SOCIAL="false")
+    try:
+        proc = subprocess.run([sys.executable, str(Path(__file__).resolve()), "_case", json.dumps(spec)],
+                              cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=timeout)
+        for line in reversed(proc.stdout.splitlines()):
+            if line.startswith("{"):
+                return json.loads(line)
+        return {"pipeline": pipeline, "scenes": scenes, "status": "error",
+                "error": f"benchmark child exited {proc.returncode}: {proc.stderr.strip()[-500:]}"}
+    except subprocess.TimeoutExpired:
+        return {"pipeline": pipeline, "scenes": scenes, "status": "error", "error": f"timed out after {timeout}s"}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _median_case(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if r.get("status") == "ok"] or runs
+    merged = dict(ok[0])
+    merged["repeats"] = len(runs)
+    for key in ("wall_s", "peak_rss_mb", "children_peak_rss_mb", "subprocesses", "output_bytes"):
+        values = [r[key] for r in ok if r.get(key) is not None]
+        if values:
+            # Counts stay integral: median_low picks an observed value
+            merged[key] = statistics.median_low(values) if isinstance(values[0], int) else round(statistics.median(values), 4)
+    stages = sorted({stage for r in ok for stage in r.get("stages_s", {})})
+    merged["stages_s"] = {stage: round(statistics.median(r.get("stages_s", {}).get(stage, 0.0) for r in ok), 4)
+                          for stage in stages}
+    return merged
+
+
+def run_benchmarks(pipelines=PIPELINES, scenes=DEFAULT_SCENES, repeats: int = 3, costs: Optional[StubCosts] = None,
+                   aspect_ratio: str = "all", timeout: float = 900,
+                   runner: Optional[Callable[..., Dict[str, Any]]] = None, scenarios=("cold",)) -> Dict[str, Any]:
+    """Runs every (pipeline, scenes, scenario) case `repeats` times and returns a baseline document (medians)."""
+    costs = costs or StubCosts()
+    runner = runner or _run_case_isolated
+    cases = {}
+    for pipeline in pipelines:
+        for scene_count in scenes:
+            for scenario in scenarios:
+                runs = [runner(pipeline, scene_count, costs, aspect_ratio, timeout, scenario) for _ in range(repeats)]
+                name = f"{pipeline}/scenes={scene_count}" + ("" if scenario == "cold" else f"/{scenario}")
+                cases[name] = _median_case(runs)
+    return {
+        "version": BASELINE_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": bool(shutil.which("ffmpeg")),
+        },
+        "costs": asdict(costs),
+        "aspect_ratio": aspect_ratio,
+        "cases": cases,
+    }
+
+
+@dataclass
+class Finding:
+    case: str
+    metric: str
+    baseline: Any
+    current: Any
+    change: Optional[float] = None
+
+    def __str__(self):
+        change = f" ({self.change:+.1%})" if self.change is not None else ""
+        return f"{self.case} {self.metric}: {self.baseline} -> {self.current}{change}"
+
+
+@dataclass
+class Comparison:
+    regressions: List[Finding] = field(default_factory=list)
+    improvements: List[Finding] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.regressions
+
+
+# Absolute changes below these floors are noise, whatever the relative change
+NOISE_FLOORS = {"time": 0.01, "peak_rss_mb": 5.0, "subprocesses": 0, "output_bytes": 1024}
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.10) -> Comparison:
+    """Flags every metric that got worse than baseline by more than `threshold` (relative) and its noise floor."""
+    result = Comparison()
+    for name, base in baseline.get("cases", {}).items():
+        now = current.get("cases", {}).get(name)
+        if now is None:
+            result.missing.append(name)
+            continue
+        if base.get("status") == "ok" and now.get("status") != "ok":
+            result.regressions.append(Finding(name, "status", "ok", f"{now.get('status')}: {now.get('error')}"))
+            continue
+        if now.get("status") != "ok" or base.get("status") != "ok":
+            continue
+
+        metrics = [("wall_s", base.get("wall_s"), now.get("wall_s"), NOISE_FLOORS["time"])]
+        for stage, seconds in base.get("stages_s", {}).items():
+            metrics.append((f"stage:{stage}", seconds, now.get("stages_s", {}).get(stage, 0.0), NOISE_FLOORS["time"]))
+        for key in ("peak_rss_mb", "subprocesses", "output_bytes"):
+            metrics.append((key, base.get(key), now.get(key), NOISE_FLOORS[key]))
+
+        for metric, before, after, floor in metrics:
+            if before is None or after is None:
+                continue
+            delta = after - before
+            change = delta / before if before else (float("inf") if delta > 0 else 0.0)
+            if abs(delta) <= floor:
+                continue
+            if change > threshold:
+                result.regressions.append(Finding(name, metric, before, after, change))
+            elif change < -threshold:
+                result.improvements.append(Finding(name, metric, before, after, change))
+    return result
+
+
+def _print_summary(document: Dict[str, Any]):
+    for name, case in document["cases"].items():
+        stages = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in case.get("stages_s", {}).items())
+        line = (f"{name:45} {case.get('status'):5} wall={case.get('wall_s', 0):.3f}s "
+                f"rss={case.get('peak_rss_mb', 0)}MB procs={case.get('subprocesses', 0)} out={case.get('output_bytes', 0)}B")
+        print(line + (f" [{stages}]" if stages else ""))
+        if case.get("error"):
+            print(f"{'':45} {case['error']}")
+
+
+def _print_comparison(comparison: Comparison, threshold: float):
+    print(f"\nComparison (threshold {threshold:.0%}):")
+    for finding in comparison.regressions:
+        print(f"  REGRESSION  {finding}")
+    for finding in comparison.improvements:
+        print(f"  improved    {finding}")
+    for name in comparison.missing:
+        print(f"  missing     {name}")
+    if comparison.ok:
+        print("  no regressions")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Deterministic offline pipeline benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run the suite and write a baseline")
+    run.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    run.add_argument("--scenes", nargs="+", type=int, default=list(DEFAULT_SCENES))
+    run.add_argument("--repeats", type=int, default=3)
+    run.add_argument("--aspect-ratio", default="all", help="offline_video_maker export mode")
+    run.add_argument("--timeout", type=float, default=900, help="Per-case timeout in seconds")
+    run.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=["cold"],
+                     help="Asset store state before each measured run")
+    for backend, default in asdict(StubCosts()).items():
+        run.add_argument(f"--{backend.replace('_', '-')}", type=float, default=default, dest=backend,
+                         help=f"Simulated CPU cost per {backend[:-3].upper()} call (ms)")
+    run.add_argument("--out", default="benchmark_results.json")
+    run.add_argument("--compare", metavar="BASELINE", help="Compare against a baseline and exit 1 on regressions")
+    run.add_argument("--threshold", type=float, default=0.10)
+
+    cmp_parser = sub.add_parser("compare", help="Compare two result files")
+    cmp_parser.add_argument("baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--threshold", type=float, default=0.10)
+
+    case = sub.add_parser("_case", help=argparse.SUPPRESS)
+    case.add_argument("spec")
+
+    args = parser.parse_args(argv)
+    if args.command == "_case":
+        spec = json.loads(args.spec)
+        _enter_workdir(spec["pipeline"], Path(spec["workdir"]))
+        result = run_case(spec["pipeline"], spec["scenes"], StubCosts(**spec["costs"]), spec["aspect_ratio"],
+                          scenario=spec.get("scenario", "cold"))
+        sys.stdout.flush()
+        print(json.dumps(result))
+        return 0
+
+    if args.command == "compare":
+        baseline, current = (json.loads(Path(path).read_text()) for path in (args.baseline, args.current))
+        comparison = compare(baseline, current, args.threshold)
+        _print_comparison(comparison, args.threshold)
+        return 0 if comparison.ok else 1
+
+    costs = StubCosts(**{backend: getattr(args, backend) for backend in asdict(StubCosts())})
+    document = run_benchmarks(args.pipelines, args.scenes, args.repeats, costs, args.aspect_ratio, args.timeout,
+                              scenarios=args.scenarios)
+    Path(args.out).write_text(json.dumps(document, indent=2))
+    _print_summary(document)
+    print(f"\nResults written to {args.out}")
+    if args.compare:
+        comparison = compare(json.loads(Path(args.compare).read_text()), document, args.threshold)
+        _print_comparison(comparison, args.threshold)
+        return 0 if comparison.ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
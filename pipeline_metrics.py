@@ -0,0 +1,292 @@
+"""
+Per-stage Prometheus instrumentation for the video pipelines, plus a buffered JSONL event writer.
+
+// [TASK]: Time every pipeline stage (script parsing, image gen, TTS, subtitles, scene render, merge, export)
+// [GOAL]: Metrics scraped from /metrics and analytics events without slowing or blocking the render path
+"""
+import asyncio
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+
+from config_loader import get_config
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+config = get_config()
+
+STAGES = ("script_parsing", "image_generation", "tts", "subtitles", "scene_render", "merge", "export")
+# Stages range from a text call (~100 ms) to a full multi-format export (minutes)
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_current_stage: "contextvars.ContextVar[Optional[StageTimer]]" = contextvars.ContextVar("pipeline_stage", default=None)
+_current_run: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("pipeline_run", default=None)
+
+
+class BufferedEventWriter:
+    """
+    Appends JSON events to a JSONL file from a background thread. write() only appends to an
+    in-memory deque, so callers never wait on disk; the file is opened once per flush, not per
+    event. When the buffer is full new events are dropped and counted rather than blocking.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 1.0, max_buffer: int = 10000):
+        self.path = Path(path).absolute() # Pin to the start-up directory, as the per-event writer did
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer: deque = deque()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, event: Dict[str, Any]) -> bool:
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return False
+        self._buffer.append(event)
+        if self._thread is None:
+            self._start()
+        elif len(self._buffer) >= self.max_buffer // 2:
+            self._wake.set()
+        return True
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes everything buffered so far; returns the number of events written."""
+        with self._lock:
+            lines = []
+            while self._buffer:
+                lines.append(json.dumps(self._buffer.popleft(), ensure_ascii=False, default=str))
+            if not lines:
+                return 0
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except Exception as e:
+                # Never fail the pipeline due to analytics
+                self.dropped += len(lines)
+                logger.debug(f"Dropped {len(lines)} analytics events: {e}")
+                return 0
+            return len(lines)
+
+
+def _output_size(output: Any) -> int:
+    """Bytes on disk for a stage result: a path, or a dict/list of paths."""
+    if isinstance(output, (str, os.PathLike)):
+        try:
+            return os.path.getsize(output)
+        except (OSError, ValueError):
+            return 0
+    if isinstance(output, dict):
+        return sum(_output_size(value) for value in output.values())
+    if isinstance(output, (list, tuple)):
+        return sum(_output_size(value) for value in output)
+    return 0
+
+
+class StageTimer:
+    """One in-progress stage. Code inside the stage may relabel `backend` (e.g. on fallback) or add output bytes."""
+    __slots__ = ("metrics", "pipeline", "stage", "backend", "bytes_written", "started", "_token")
+
+    def __init__(self, metrics: "PipelineMetrics", pipeline: str, stage: str, backend: str):
+        self.metrics = metrics
+        self.pipeline = pipeline
+        self.stage = stage
+        self.backend = backend
+        self.bytes_written = 0
+
+    def add_output(self, output: Any):
+        self.bytes_written += _output_size(output)
+
+    def __enter__(self) -> "StageTimer":
+        self.metrics._child(self.metrics.stage_in_flight, self.pipeline, self.stage).inc()
+        self._token = _current_stage.set(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        _current_stage.reset(self._token)
+        self.metrics._finish_stage(self, duration, "error" if exc_type else "ok")
+        return False
+
+
+class _RunTimer:
+    __slots__ = ("metrics", "pipeline", "started", "_token")
+
+    def __init__(self, metrics: "PipelineMetrics", pipeline: str):
+        self.metrics = metrics
+        self.pipeline = pipeline
+
+    def __enter__(self):
+        self.metrics._child(self.metrics.runs_in_flight, self.pipeline).inc()
+        self._token = _current_run.set(self.pipeline)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        _current_run.reset(self._token)
+        self.metrics._finish_run(self.pipeline, duration, "error" if exc_type else "ok")
+        return False
+
+
+class _NullScope:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class PipelineMetrics:
+    """
+    // [TASK]: Own the pipeline histograms, counters and gauges
+    // [GOAL]: Cheap per-stage recording: label children are resolved once and reused
+    """
+
+    def __init__(self, registry: CollectorRegistry = REGISTRY, event_writer: Optional[BufferedEventWriter] = None,
+                 buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.event_writer = event_writer
+        self.stage_duration = Histogram(
+            "pipeline_stage_duration_seconds", "Duration of a pipeline stage in seconds",
+            ["pipeline", "stage", "backend", "status"], buckets=buckets, registry=registry)
+        self.stage_in_flight = Gauge(
+            "pipeline_stage_in_flight", "Pipeline stages currently executing",
+            ["pipeline", "stage"], registry=registry)
+        self.bytes_written = Counter(
+            "pipeline_bytes_written", "Bytes of output written by pipeline stages",
+            ["pipeline", "stage"], registry=registry)
+        self.run_duration = Histogram(
+            "pipeline_run_duration_seconds", "Duration of a full pipeline run in seconds",
+            ["pipeline", "status"], buckets=buckets, registry=registry)
+        self.runs_in_flight = Gauge(
+            "pipeline_runs_in_flight", "Pipeline runs currently executing",
+            ["pipeline"], registry=registry)
+        self._children: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+    def _child(self, metric, *labels: str):
+        key = (metric._name, labels)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = metric.labels(*labels)
+        return child
+
+    def stage(self, pipeline: str, stage: str, backend: str = "local") -> StageTimer:
+        return StageTimer(self, pipeline, stage, backend)
+
+    def run(self, pipeline: str):
+        """Times a whole run. Nested runs of the same pipeline (orchestrator -> pipeline entrypoint) count once."""
+        if _current_run.get() == pipeline:
+            return _NullScope()
+        return _RunTimer(self, pipeline)
+
+    def _finish_stage(self, timer: StageTimer, duration: float, status: str):
+        self._child(self.stage_in_flight, timer.pipeline, timer.stage).dec()
+        self._child(self.stage_duration, timer.pipeline, timer.stage, timer.backend, status).observe(duration)
+        if timer.bytes_written:
+            self._child(self.bytes_written, timer.pipeline, timer.stage).inc(timer.bytes_written)
+        if self.event_writer is not None:
+            self.event_writer.write({
+                "type": "stage", "pipeline": timer.pipeline, "stage": timer.stage, "backend": timer.backend,
+                "status": status, "duration_s": round(duration, 4), "bytes": timer.bytes_written, "ts": time.time(),
+            })
+
+    def _finish_run(self, pipeline: str, duration: float, status: str):
+        self._child(self.runs_in_flight, pipeline).dec()
+        self._child(self.run_duration, pipeline, status).observe(duration)
+        if self.event_writer is not None:
+            self.event_writer.write({"type": "run", "pipeline": pipeline, "status": status,
+                                     "duration_s": round(duration, 4), "ts": time.time()})
+
+    def instrument(self, pipeline: str, stage: str, backend: str = "local") -> Callable:
+        """Decorator form of stage() for sync and async functions; a returned path (or paths) counts as bytes written."""
+        def decorator(func: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.stage(pipeline, stage, backend) as timer:
+                        result = await func(*args, **kwargs)
+                        timer.add_output(result)
+                        return result
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(pipeline, stage, backend) as timer:
+                    result = func(*args, **kwargs)
+                    timer.add_output(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def instrument_run(self, pipeline: str) -> Callable:
+        """Decorator form of run() for a synchronous pipeline entrypoint."""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.run(pipeline):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def current_stage() -> Optional[StageTimer]:
+    """The innermost stage running in this context, if any."""
+    return _current_stage.get()
+
+
+def set_stage_backend(backend: str):
+    """Relabels the running stage's backend, e.g. when a router call falls back to a local path."""
+    timer = _current_stage.get()
+    if timer is not None:
+        timer.backend = backend
+
+
+def benchmark_stage_overhead(iterations: int = 100_000) -> Dict[str, float]:
+    """Per-stage instrumentation cost (enter + exit, with and without event emission) on a private registry."""
+    results = {}
+    for name, writer in (("metrics_only", None), ("with_events", BufferedEventWriter(Path(os.devnull), max_buffer=iterations + 1))):
+        metrics = PipelineMetrics(registry=CollectorRegistry(), event_writer=writer)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with metrics.stage("benchmark", "tts", "local"):
+                pass
+        results[f"{name}_us"] = round((time.perf_counter() - started) / iterations * 1e6, 3)
+    return results
+
+
+_settings = config.metrics if isinstance(config.metrics, dict) else {}
+event_writer = BufferedEventWriter(
+    Path(_settings.get("analytics_log", "debug_logs/shujaa_analytics.jsonl")),
+    flush_interval=_settings.get("analytics_flush_seconds", 1.0),
+    max_buffer=_settings.get("analytics_buffer_max", 10000),
+)
+pipeline_metrics = PipelineMetrics(event_writer=event_writer if _settings.get("stage_events", True) else None)
+
+
+if __name__ == "__main__":
+    print(json.dumps(benchmark_stage_overhead(), indent=2))
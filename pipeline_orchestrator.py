@@ -1,14 +1,12 @@
 from config_loader import get_config
 from logging_setup import get_logger
 import asyncio
+import contextvars
 import functools
-from typing import Any
+import importlib
+from typing import Any, Callable, Optional
 from enhanced_model_router import enhanced_router
-
-# Import pipeline entrypoints (do not call them yet)
-import news_video_generator
-import offline_video_maker.generate_video
-import cartoon_anime_pipeline
+from pipeline_metrics import pipeline_metrics
 
 # Import parallel processing utilities
 from utils.parallel_processing import ParallelProcessor, SceneProcessor
@@ -16,22 +14,44 @@ from utils.parallel_processing import ParallelProcessor, SceneProcessor
 logger = get_logger(__name__)
 config = get_config()
 
+# Pipeline entrypoints as (module, attribute). The pipeline modules pull in PIL, moviepy, diffusers
+# and friends, so they are imported on first use rather than when the orchestrator is imported.
+PIPELINE_ENTRYPOINTS = {
+    "news_video_generator": ("news_video_generator", "main"),
+    "offline_video_maker": ("offline_video_maker.generate_video", "main"),
+    "cartoon_anime_pipeline": ("cartoon_anime_pipeline", "create_african_cartoon_video"),
+    "basic_video_generator": ("generate_video", "create_gradio_interface"),
+}
+_LAZY_MODULES = {"news_video_generator", "offline_video_maker", "cartoon_anime_pipeline"}
+
+def __getattr__(name):
+    # Keeps `pipeline_orchestrator.news_video_generator` etc. addressable (e.g. for patching) without eager imports
+    if name in _LAZY_MODULES:
+        module = importlib.import_module(name)
+        if name == "offline_video_maker":
+            importlib.import_module("offline_video_maker.generate_video")
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class PipelineOrchestrator:
     """
     // [TASK]: Orchestrate pipeline selection and execution based on configuration and input
     // [GOAL]: Provide a single entry point for video generation, routing to the appropriate pipeline
     """
     def __init__(self):
-        self.pipelines = {
-            "news_video_generator": news_video_generator.main,
-            "offline_video_maker": offline_video_maker.generate_video.main,
-            "cartoon_anime_pipeline": cartoon_anime_pipeline.create_african_cartoon_video,
-            "basic_video_generator": lambda *args, **kwargs: __import__('generate_video').create_gradio_interface(*args, **kwargs)
-        }
+        self.pipelines = dict(PIPELINE_ENTRYPOINTS)
         self.parallel_processor = ParallelProcessor()
         self.scene_processor = SceneProcessor()
         logger.info("PipelineOrchestrator initialized.")
 
+    def get_pipeline(self, name: str) -> Callable[..., Any]:
+        """
+        Resolves a pipeline entrypoint, importing its module on first use.
+        """
+        module_name, attr = self.pipelines[name]
+        return getattr(importlib.import_module(module_name), attr)
+
     def decide_pipeline(self, config_dict: dict):
         """
         // [TASK]: Implement pipeline selection logic based on a single config dict
@@ -97,11 +117,20 @@ class PipelineOrchestrator:
         logger.info(f"Decision: Chosen pipeline: {chosen_pipeline}, Reason: {reason}")
         return {"chosen": chosen_pipeline, "reason": reason}
 
-    async def run_pipeline(self, input_type, input_data, user_preferences=None, api_call=False, request: Any = None): # Added request: Any
+    async def run_pipeline(self, input_type, input_data, user_preferences=None, api_call=False, request: Any = None, progress_callback: Optional[Callable[..., None]] = None): # Added request: Any
         """
         // [TASK]: Run the chosen pipeline with appropriate arguments and execution model (sync/async)
         // [GOAL]: Execute the selected pipeline and return its result
+        progress_callback(stage, progress, detail=None) receives per-stage progress events when provided.
         """
+        def report(stage: str, progress: int, detail: Optional[str] = None):
+            if progress_callback:
+                try:
+                    progress_callback(stage, progress, detail)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed for stage '{stage}': {e}")
+
+        report("selecting_pipeline", 5)
         # Construct config_dict for decide_pipeline
         config_dict = {
             "input_type": input_type,
@@ -117,6 +146,7 @@ class PipelineOrchestrator:
             return {"status": "error", "message": f"Failed to decide pipeline: {reason}"}
 
         logger.info(f"Orchestrator will run pipeline: {chosen} (Reason: {reason})")
+        report("pipeline_selected", 10, chosen)
         
         result = None
         pipeline_kwargs = user_preferences or {}
@@ -126,27 +156,31 @@ class PipelineOrchestrator:
         pipeline_kwargs['request'] = request # Pass the request object
 
         try:
-            if chosen == "news_video_generator":
-                # This async pipeline can handle all input types and extra preferences
-                result = await self.pipelines[chosen](
-                    news=(input_data if input_type == 'news_url' else None),
-                    script_file=(input_data if input_type == 'script_file' else None),
-                    prompt=(input_data if input_type in ['general_prompt', 'cartoon_prompt'] else None),
-                    **pipeline_kwargs
-                )
-            elif chosen == "offline_video_maker":
-                # Run sync function in a separate thread to avoid blocking the event loop
-                loop = asyncio.get_running_loop()
-                func = functools.partial(self.pipelines[chosen], prompt=input_data, **pipeline_kwargs)
-                result = await loop.run_in_executor(None, func)
-            elif chosen == "cartoon_anime_pipeline":
-                # The cartoon pipeline is async; call it directly
-                result = await self.pipelines[chosen](script=input_data, **pipeline_kwargs)
-            elif chosen == "basic_video_generator":
-                logger.warning("Basic_video_generator (Gradio UI) cannot be executed from the API.")
-                return {"status": "error", "message": "The selected pipeline is interactive and cannot be run from the API."}
-
-            return {"status": "success", "pipeline": chosen, "result": result}
+            with pipeline_metrics.run(chosen):
+                report("rendering", 15, chosen)
+                if chosen == "news_video_generator":
+                    # This async pipeline can handle all input types and extra preferences
+                    result = await self.get_pipeline(chosen)(
+                        news=(input_data if input_type == 'news_url' else None),
+                        script_file=(input_data if input_type == 'script_file' else None),
+                        prompt=(input_data if input_type in ['general_prompt', 'cartoon_prompt'] else None),
+                        **pipeline_kwargs
+                    )
+                elif chosen == "offline_video_maker":
+                    # Run sync function in a separate thread to avoid blocking the event loop.
+                    # The copied context carries the active metrics run so the pipeline doesn't count it twice.
+                    loop = asyncio.get_running_loop()
+                    func = functools.partial(self.get_pipeline(chosen), prompt=input_data, **pipeline_kwargs)
+                    result = await loop.run_in_executor(None, contextvars.copy_context().run, func)
+                elif chosen == "cartoon_anime_pipeline":
+                    # The cartoon pipeline is async; call it directly
+                    result = await self.get_pipeline(chosen)(script=input_data, **pipeline_kwargs)
+                elif chosen == "basic_video_generator":
+                    logger.warning("Basic_video_generator (Gradio UI) cannot be executed from the API.")
+                    return {"status": "error", "message": "The selected pipeline is interactive and cannot be run from the API."}
+
+                report("finalizing", 95, chosen)
+                return {"status": "success", "pipeline": chosen, "result": result}
 
         except Exception as e:
             logger.exception(f"An error occurred while running pipeline '{chosen}': {e}")
@@ -0,0 +1,227 @@
+"""
+Content-addressed store for generated scene assets (images, narration, scene clips).
+
+// [TASK]: Reuse a stage's output whenever its inputs match an earlier run, across videos and users
+// [GOAL]: Retries and near-duplicate videos skip the image generation, TTS and renders they already paid for
+
+Objects live at <root>/<key[:2]>/<key><suffix>, where key is the SHA-256 of the canonical JSON of the
+stage's inputs. Writes go to a temp file in the same directory followed by os.replace, so readers and
+concurrent writers (threads or processes) never see a partial object. An object's mtime is its
+last-use time; gc() evicts the least recently used objects once the store grows past max_bytes.
+"""
+import functools
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config_loader import get_config
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Bump when the meaning of stored objects changes (e.g. a stage starts post-processing its output)
+CACHE_KEY_VERSION = 1
+# A .tmp- file older than this was left by a crashed writer
+STALE_TEMP_SECONDS = 3600
+# gc() trims to this fraction of max_bytes so a full store doesn't collect on every put
+GC_LOW_WATERMARK = 0.9
+
+
+@functools.lru_cache(maxsize=4096)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's content, memoised on (path, mtime, size)."""
+    st = os.stat(path)
+    return _file_digest(str(path), st.st_mtime_ns, st.st_size)
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, Path):
+        return {"sha256": file_digest(value)}  # A file input is keyed by content, not location
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def asset_key(kind: str, **inputs: Any) -> str:
+    """
+    Canonical hash of a stage's inputs. Every input that changes the output (prompt, seed, model
+    version, voice, resolution, codec settings) must be passed; Path values are hashed by content.
+    """
+    payload = json.dumps({"v": CACHE_KEY_VERSION, "kind": kind, "inputs": _canonical(inputs)},
+                         sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(section: str) -> Dict[str, Any]:
+    """The configured model identity for a config.models section, for use as a cache-key input."""
+    models = config.models if isinstance(config.models, dict) else {}
+    settings = models.get(section) if isinstance(models.get(section), dict) else {}
+    return {field: settings.get(field) or "" for field in ("hf_api_id", "local_fallback_path", "checksum")}
+
+
+class SceneAssetStore:
+    """
+    // [TASK]: Content-addressed, size-bounded asset store shared by every pipeline run on this host
+    // [GOAL]: Atomic writes, LRU eviction and safe concurrent use without a lock server
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 10 * 1024 ** 3, enabled: bool = True):
+        self.root = Path(root).absolute()
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # Scanned on first put
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = "") -> Optional[Path]:
+        """Path of the stored object, or None. Stored objects are shared: treat them as read-only."""
+        if not self.enabled:
+            return None
+        path = self._path(key, suffix)
+        try:
+            os.utime(path)  # Mark as recently used, visible to gc() in every process
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def fetch(self, key: str, dest: Path, suffix: Optional[str] = None) -> bool:
+        """Copies a stored object to `dest`; False on a miss (including one evicted mid-copy)."""
+        dest = Path(dest)
+        path = self.get(key, dest.suffix if suffix is None else suffix)
+        if path is None:
+            return False
+        try:
+            # A copy, not a hard link: stages write to their outputs in place (ffmpeg -y) and must not reach the store
+            shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            self.hits -= 1
+            self.misses += 1
+            return False
+        except OSError as e:
+            logger.warning(f"Asset store fetch of {key} failed: {e}")
+            return False
+        return True
+
+    def put(self, key: str, source: Path, suffix: Optional[str] = None) -> Optional[Path]:
+        """Stores a copy of `source` under `key`. Never raises: a failed put only costs a future miss."""
+        if not self.enabled:
+            return None
+        source = Path(source)
+        path = self._path(key, source.suffix if suffix is None else suffix)
+        if path.exists():
+            return path  # Same key, same content: another writer got there first
+        tmp = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as out, open(source, "rb") as src:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            os.replace(tmp, path)
+            tmp = None
+            size = path.stat().st_size
+        except OSError as e:
+            logger.warning(f"Asset store put of {key} failed: {e}")
+            return None
+        finally:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.gc()
+        return path
+
+    def _scan(self):
+        entries, total = [], 0
+        now = time.time()
+        if not self.root.exists():
+            return entries, total
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process mid-scan
+                if entry.name.startswith(".tmp-"):
+                    if now - st.st_mtime > STALE_TEMP_SECONDS:
+                        try:
+                            os.unlink(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        return entries, total
+
+    def gc(self, target_bytes: Optional[int] = None) -> int:
+        """Evicts least recently used objects until the store fits in target_bytes; returns how many were removed."""
+        target = int(self.max_bytes * GC_LOW_WATERMARK) if target_bytes is None else target_bytes
+        with self._lock:
+            entries, total = self._scan()
+            evicted = 0
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass  # Another process evicted it first
+                except OSError as e:
+                    logger.warning(f"Asset store could not evict {path}: {e}")
+                    continue
+                total -= size
+                evicted += 1
+            self._size = total
+            self.evictions += evicted
+        if evicted:
+            logger.info(f"Asset store evicted {evicted} objects; {total} bytes remain")
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0, "bytes": self._size}
+
+
+_settings = config.asset_store if isinstance(config.asset_store, dict) else {}
+scene_asset_store = SceneAssetStore(
+    Path(_settings.get("root", "asset_cache/scenes")),
+    max_bytes=int(float(_settings.get("max_gb", 10)) * 1024 ** 3),
+    enabled=_settings.get("enabled", True),
+)
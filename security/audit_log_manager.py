@@ -3,6 +3,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 from auth.user_models import AuditLog # Assuming AuditLog model is defined here
+from backend.services.usage_analytics import usage_analytics
 import hashlib # For hashing log entries
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,7 @@ class AuditLogManager:
         last_log = db.query(AuditLog).order_by(AuditLog.timestamp.desc()).first()
         return last_log.current_hash if last_log else "0" * 64 # Default hash if no previous logs
 
-    def log_event(self, db: Session, event_type: str, message: str, user_id: Optional[int] = None, tenant_id: Optional[int] = None, ip_address: Optional[str] = None, event_details: Optional[Dict[str, Any]] = None):
+    def log_event(self, db: Session, event_type: str, message: str, user_id: Optional[int] = None, tenant_id: Optional[int] = None, ip_address: Optional[str] = None, event_details: Optional[Dict[str, Any]] = None, request: Optional[Any] = None):
         """
         Records a security audit event.
         
@@ -33,6 +34,8 @@ class AuditLogManager:
             tenant_id (Optional[int]): ID of the tenant associated with the event.
             ip_address (Optional[str]): IP address from which the event originated.
             event_details (Optional[Dict[str, Any]]): Additional structured details about the event.
+            request (Optional[Request]): Originating HTTP request; its path is the usage endpoint unless
+                event_details names one.
         """
         try:
             previous_hash = self._get_last_log_hash(db)
@@ -49,12 +52,30 @@ class AuditLogManager:
             log_entry.set_hash(previous_hash) # Calculate and set current_hash
             
             db.add(log_entry)
+
+            endpoint = (event_details or {}).get("endpoint") or getattr(getattr(request, "url", None), "path", None)
+            if endpoint:
+                # Structured usage event + daily rollup in a savepoint: if it fails, the audit entry is still committed
+                try:
+                    with db.begin_nested():
+                        usage_analytics.record(
+                            db,
+                            endpoint=endpoint,
+                            event_type=event_type,
+                            user_id=user_id,
+                            tenant_id=getattr(tenant_id, "id", tenant_id),
+                            timestamp=log_entry.timestamp,
+                        )
+                except Exception as e:
+                    logger.warning(f"Failed to record usage analytics for '{event_type}' on {endpoint}: {e}")
+
             db.commit()
             db.refresh(log_entry)
             
             logger.info(f"AUDIT_LOG: Event='{event_type}', User={user_id}, Tenant={tenant_id}, IP={ip_address}, Message='{message}'")
             # For external audit systems, you might send this log_entry to a SIEM here.
         except Exception as e:
+            db.rollback() # Leave the caller's session usable
             logger.error(f"Failed to record audit log event '{event_type}': {e}", exc_info=True)
 
 # Standardized Audit Event Types
@@ -1,10 +1,15 @@
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterable, Iterator, Optional
+import asyncio
 import base64
 import os
 import logging
+import struct
 
 from config_loader import get_config
 
@@ -105,6 +110,290 @@ def decrypt_bytes(encrypted_data: bytes) -> bytes:
         logger.error(f"Failed to decrypt bytes: {e}")
         return encrypted_data # Return original bytes on failure
 
+async def encrypt_bytes_async(data: bytes) -> bytes:
+    """encrypt_bytes off the event loop thread."""
+    return await asyncio.to_thread(encrypt_bytes, data)
+
+async def decrypt_bytes_async(encrypted_data: bytes) -> bytes:
+    """decrypt_bytes off the event loop thread."""
+    return await asyncio.to_thread(decrypt_bytes, encrypted_data)
+
+# --- Streaming Envelope Encryption ---
+# Layout: MAGIC | version u8 | chunk_size u32 | wrapped key length u16 | wrapped data key | nonce prefix (7)
+# followed by frames: u32 (top bit = last chunk, low 31 bits = ciphertext length) | AES-256-GCM ciphertext.
+# Each object gets its own random data key, wrapped (Fernet) by the derived master key. Chunk nonces are
+# prefix || counter u32 || last flag, and the header is the AAD, so a reordered, dropped, altered or
+# truncated chunk, a flipped last flag or a swapped header all fail authentication.
+
+STREAM_MAGIC = b"SJE1"
+STREAM_VERSION = 1
+_HEADER_FIXED = struct.Struct(">4sBIH")
+_FRAME = struct.Struct(">I")
+_LAST_FLAG = 0x80000000
+_NONCE_PREFIX_BYTES = 7
+_security_settings = config.security if isinstance(config.security, dict) else {}
+DEFAULT_CHUNK_SIZE = int(_security_settings.get("encryption_chunk_kb", 1024)) * 1024
+
+class EncryptionError(Exception):
+    """Raised when an encrypted stream is malformed, truncated or fails authentication."""
+    pass
+
+def _require_master_key() -> Fernet:
+    if not _fernet:
+        # Unlike the byte helpers, streams never fall back to plaintext: callers store the output as ciphertext
+        raise EncryptionError("Encryption not initialized: configure ENCRYPTION_PASSWORD and ENCRYPTION_SALT.")
+    return _fernet
+
+class StreamEncryptor:
+    """
+    // [TASK]: Incrementally encrypt an arbitrarily large payload
+    // [GOAL]: Constant memory (one chunk buffered) authenticated encryption with a per-object data key
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        if not 0 < self.chunk_size < _LAST_FLAG - 16:
+            raise ValueError(f"Invalid chunk size: {self.chunk_size}")
+        data_key = AESGCM.generate_key(bit_length=256)
+        wrapped_key = _require_master_key().encrypt(data_key)
+        self._aead = AESGCM(data_key)
+        self._nonce_prefix = os.urandom(_NONCE_PREFIX_BYTES)
+        self.header = _HEADER_FIXED.pack(STREAM_MAGIC, STREAM_VERSION, self.chunk_size, len(wrapped_key)) + wrapped_key + self._nonce_prefix
+        self._counter = 0
+        self._buffer = bytearray()
+        self._finalized = False
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def _seal(self, chunk: bytes, last: bool) -> bytes:
+        if self._counter >= 2 ** 32:
+            raise EncryptionError("Stream too long for a single data key.")
+        nonce = self._nonce_prefix + struct.pack(">IB", self._counter, 1 if last else 0)
+        self._counter += 1
+        sealed = self._aead.encrypt(nonce, chunk, self.header)
+        return _FRAME.pack(len(sealed) | (_LAST_FLAG if last else 0)) + sealed
+
+    def update(self, data: bytes) -> bytes:
+        """Buffers `data` and returns the frames for every chunk it completed."""
+        if self._finalized:
+            raise EncryptionError("update() after finalize()")
+        self._buffer += data
+        if len(self._buffer) < self.chunk_size:
+            return b""
+        out = []
+        view = memoryview(self._buffer)
+        offset = 0
+        while len(self._buffer) - offset >= self.chunk_size:
+            out.append(self._seal(view[offset:offset + self.chunk_size], last=False))
+            offset += self.chunk_size
+        view.release()
+        del self._buffer[:offset]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        """Seals the remaining (possibly empty) tail as the last chunk."""
+        if self._finalized:
+            return b""
+        self._finalized = True
+        tail = bytes(self._buffer)
+        self._buffer.clear()
+        return self._seal(tail, last=True)
+
+class StreamDecryptor:
+    """Incremental counterpart of StreamEncryptor; accepts the ciphertext in arbitrary pieces."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._aead: Optional[AESGCM] = None
+        self._header = b""
+        self._nonce_prefix = b""
+        self._max_frame = 0
+        self._counter = 0
+        self.done = False
+
+    def _parse_header(self) -> bool:
+        if len(self._buffer) < _HEADER_FIXED.size:
+            return False
+        magic, version, chunk_size, key_len = _HEADER_FIXED.unpack_from(self._buffer)
+        if magic != STREAM_MAGIC or version != STREAM_VERSION:
+            raise EncryptionError("Not an encrypted stream (bad magic or version).")
+        header_len = _HEADER_FIXED.size + key_len + _NONCE_PREFIX_BYTES
+        if len(self._buffer) < header_len:
+            return False
+        self._header = bytes(self._buffer[:header_len])
+        try:
+            data_key = _require_master_key().decrypt(self._header[_HEADER_FIXED.size:_HEADER_FIXED.size + key_len])
+        except InvalidToken:
+            raise EncryptionError("Data key could not be unwrapped (wrong master key or tampered header).")
+        self._aead = AESGCM(data_key)
+        self._nonce_prefix = self._header[-_NONCE_PREFIX_BYTES:]
+        self._max_frame = chunk_size + 16 # GCM tag
+        del self._buffer[:header_len]
+        return True
+
+    def update(self, data: bytes) -> bytes:
+        """Returns the plaintext of every chunk completed by `data`."""
+        self._buffer += data
+        if self._aead is None and not self._parse_header():
+            return b""
+        out = []
+        while len(self._buffer) >= _FRAME.size:
+            if self.done:
+                raise EncryptionError("Unexpected data after the last chunk.")
+            (frame,) = _FRAME.unpack_from(self._buffer)
+            last, length = bool(frame & _LAST_FLAG), frame & ~_LAST_FLAG
+            if length > self._max_frame:
+                raise EncryptionError(f"Chunk {self._counter} is larger than the stream's chunk size.")
+            if len(self._buffer) < _FRAME.size + length:
+                break
+            nonce = self._nonce_prefix + struct.pack(">IB", self._counter, 1 if last else 0)
+            try:
+                out.append(self._aead.decrypt(nonce, bytes(self._buffer[_FRAME.size:_FRAME.size + length]), self._header))
+            except InvalidTag:
+                raise EncryptionError(f"Chunk {self._counter} failed authentication (tampered, reordered or truncated).")
+            del self._buffer[:_FRAME.size + length]
+            self._counter += 1
+            self.done = last
+        return b"".join(out)
+
+    def finalize(self):
+        if not self.done or self._buffer:
+            raise EncryptionError("Encrypted stream is truncated.")
+
+def iter_encrypt(chunks: Iterable[bytes], chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    encryptor = StreamEncryptor(chunk_size)
+    yield encryptor.header
+    for chunk in chunks:
+        sealed = encryptor.update(chunk)
+        if sealed:
+            yield sealed
+    yield encryptor.finalize()
+
+def iter_decrypt(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    decryptor = StreamDecryptor()
+    for chunk in chunks:
+        plain = decryptor.update(chunk)
+        if plain:
+            yield plain
+    decryptor.finalize()
+
+def _read_blocks(src: BinaryIO, size: int) -> Iterator[bytes]:
+    while True:
+        block = src.read(size)
+        if not block:
+            return
+        yield block
+
+def encrypt_stream(src: BinaryIO, dst: BinaryIO, chunk_size: Optional[int] = None) -> int:
+    """
+    // [TASK]: Encrypt a file-like object into another
+    // [GOAL]: Handle large media without holding it (or a base64 copy) in memory
+    """
+    written = 0
+    for piece in iter_encrypt(_read_blocks(src, chunk_size or DEFAULT_CHUNK_SIZE), chunk_size):
+        dst.write(piece)
+        written += len(piece)
+    return written
+
+def decrypt_stream(src: BinaryIO, dst: BinaryIO) -> int:
+    """Decrypts an encrypt_stream output. Plaintext of a chunk is only written once it authenticated."""
+    written = 0
+    for piece in iter_decrypt(_read_blocks(src, DEFAULT_CHUNK_SIZE)):
+        dst.write(piece)
+        written += len(piece)
+    return written
+
+def _encrypt_path(src_path: str, dst_path: str, chunk_size: Optional[int]) -> int:
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return encrypt_stream(src, dst, chunk_size)
+
+def _decrypt_path(src_path: str, dst_path: str) -> int:
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return decrypt_stream(src, dst)
+
+async def encrypt_file(src_path: str, dst_path: str, chunk_size: Optional[int] = None) -> int:
+    """encrypt_stream between two paths, run off the event loop thread."""
+    return await asyncio.to_thread(_encrypt_path, src_path, dst_path, chunk_size)
+
+async def decrypt_file(src_path: str, dst_path: str) -> int:
+    """decrypt_stream between two paths, run off the event loop thread."""
+    return await asyncio.to_thread(_decrypt_path, src_path, dst_path)
+
+async def aiter_encrypt(chunks: AsyncIterable[bytes], chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Encrypts an async byte stream (e.g. an HTTP body); AES work for whole chunks runs in a thread."""
+    encryptor = await asyncio.to_thread(StreamEncryptor, chunk_size) # Key wrap is a Fernet call
+    yield encryptor.header
+    async for chunk in chunks:
+        if encryptor.buffered + len(chunk) < encryptor.chunk_size:
+            encryptor.update(chunk) # Only buffers
+            continue
+        sealed = await asyncio.to_thread(encryptor.update, chunk)
+        if sealed:
+            yield sealed
+    yield await asyncio.to_thread(encryptor.finalize)
+
+async def aiter_decrypt(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Decrypts an async byte stream produced by aiter_encrypt/encrypt_stream."""
+    decryptor = StreamDecryptor()
+    async for chunk in chunks:
+        plain = await asyncio.to_thread(decryptor.update, chunk)
+        if plain:
+            yield plain
+    decryptor.finalize()
+
+def _benchmark_mode(mode: str, payload_path: str, workdir: str) -> dict:
+    """Runs one benchmark mode in the current process and reports time and peak RSS."""
+    import resource
+    import time
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if mode == "bytes":
+        with open(payload_path, "rb") as f:
+            data = f.read()
+        restored = decrypt_bytes(encrypt_bytes(data))
+        assert len(restored) == len(data)
+    else:
+        sealed = os.path.join(workdir, "payload.sje")
+        _encrypt_path(payload_path, sealed, None)
+        _decrypt_path(sealed, os.path.join(workdir, "payload.out"))
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(payload_path) / 2 ** 20
+    return {
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(size_mb / elapsed, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "baseline_rss_mb": round(baseline_kb / 1024, 1),
+    }
+
+def benchmark_encryption(size_mb: int = 100) -> dict:
+    """
+    Encrypt+decrypt round trip of a `size_mb` payload with encrypt_bytes/decrypt_bytes (held in memory)
+    vs. encrypt_stream/decrypt_stream (file to file). Each mode runs in a fresh interpreter so peak RSS
+    is not shared between them.
+    """
+    import json
+    import subprocess
+    import sys
+    import tempfile
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        payload = os.path.join(workdir, "payload.bin")
+        with open(payload, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(2 ** 20))
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for mode in ("bytes", "stream"):
+            code = (
+                "import json, logging; logging.disable(logging.WARNING); "
+                "from security.encryption_utils import _benchmark_mode; "
+                f"print(json.dumps(_benchmark_mode({mode!r}, {payload!r}, {workdir!r})))"
+            )
+            out = subprocess.run([sys.executable, "-c", code], cwd=repo_root, capture_output=True, text=True, check=True)
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    return results
+
 # Example usage (conceptual)
 async def main():
     # Ensure ENCRYPTION_PASSWORD and ENCRYPTION_SALT are set in config.yaml or env
@@ -120,5 +409,9 @@ async def main():
         logger.warning("Encryption utilities not functional for example.")
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    import json
+    import sys
+    if "--benchmark" in sys.argv:
+        print(json.dumps(benchmark_encryption(), indent=2))
+    else:
+        asyncio.run(main())
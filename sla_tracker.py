@@ -1,55 +1,346 @@
 import asyncio
+import bisect
 import random
-from datetime import datetime
-from typing import Dict, Any
+import sqlite3
+import threading
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
 
 from logging_setup import get_logger
 from billing_models import SLARecord # Assuming SLARecord is defined in billing_models.py
 
 logger = get_logger(__name__)
 
+# Upper bounds (ms) of the latency sketch buckets; one extra overflow bucket follows the last bound.
+SLA_LATENCY_BOUNDS_MS = (25, 50, 100, 250, 500, 750, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+_NUM_BUCKETS = len(SLA_LATENCY_BOUNDS_MS) + 1
+
+UPTIME_TARGET_PERCENT = 99.9
+RESPONSE_TIME_SLO_MS = 1000.0
+
+
+def _empty_histogram() -> array:
+    return array('Q', bytes(8 * _NUM_BUCKETS))
+
+
+@dataclass
+class SLAAggregate:
+    """
+    Exact request counts plus a fixed-bucket latency sketch.
+    Aggregates are additive, so minutes merge into hours and hours into months without loss.
+    """
+    count: int = 0
+    success: int = 0
+    latency_sum_ms: float = 0.0
+    histogram: array = field(default_factory=_empty_histogram)
+
+    def merge(self, other: "SLAAggregate") -> "SLAAggregate":
+        self.count += other.count
+        self.success += other.success
+        self.latency_sum_ms += other.latency_sum_ms
+        for i in range(_NUM_BUCKETS):
+            self.histogram[i] += other.histogram[i]
+        return self
+
+    def copy(self) -> "SLAAggregate":
+        return SLAAggregate(self.count, self.success, self.latency_sum_ms, array('Q', self.histogram))
+
+    def quantile_ms(self, q: float) -> float:
+        """Returns the upper bound of the bucket holding the q-th latency (overflow reports the last bound)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.histogram):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return float(SLA_LATENCY_BOUNDS_MS[min(i, len(SLA_LATENCY_BOUNDS_MS) - 1)])
+        return float(SLA_LATENCY_BOUNDS_MS[-1])
+
+    @property
+    def uptime_percentage(self) -> float:
+        return (self.success / self.count) * 100 if self.count else 100.0
+
+    @property
+    def avg_response_time_ms(self) -> float:
+        return self.latency_sum_ms / self.count if self.count else 0.0
+
+
+class _TenantMinuteRing:
+    """
+    Array-backed ring of per-minute buckets for one tenant.
+    Slot i holds epoch-minute `minutes[i]`; its histogram lives at histograms[i*_NUM_BUCKETS:(i+1)*_NUM_BUCKETS].
+    """
+    __slots__ = ("size", "minutes", "counts", "successes", "latency_sums", "histograms")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.minutes = array('q', [-1] * size)
+        self.counts = array('L', [0] * size)
+        self.successes = array('L', [0] * size)
+        self.latency_sums = array('d', [0.0] * size)
+        self.histograms = array('L', [0] * (size * _NUM_BUCKETS))
+
+    def slot_aggregate(self, slot: int) -> SLAAggregate:
+        offset = slot * _NUM_BUCKETS
+        return SLAAggregate(
+            count=self.counts[slot],
+            success=self.successes[slot],
+            latency_sum_ms=self.latency_sums[slot],
+            histogram=array('Q', self.histograms[offset:offset + _NUM_BUCKETS]),
+        )
+
+    def clear_slot(self, slot: int):
+        offset = slot * _NUM_BUCKETS
+        self.minutes[slot] = -1
+        self.counts[slot] = 0
+        self.successes[slot] = 0
+        self.latency_sums[slot] = 0.0
+        for i in range(offset, offset + _NUM_BUCKETS):
+            self.histograms[i] = 0
+
+
+def _hour_key(epoch_minute: int) -> str:
+    return datetime.fromtimestamp(epoch_minute * 60, tz=timezone.utc).strftime("%Y-%m-%dT%H")
+
+
+def _month_key(epoch_minute: int) -> str:
+    return datetime.fromtimestamp(epoch_minute * 60, tz=timezone.utc).strftime("%Y-%m")
+
+
+class SLARollupEngine:
+    """
+    // [TASK]: Incremental per-tenant SLA rollups
+    // [GOAL]: Answer monthly SLA reports from pre-aggregated rows instead of raw events
+    // [ELITE_CURSOR_SNIPPET]: aihandle
+
+    Outcome events land in a per-tenant minute ring. When a slot is reused (or on flush) the minute
+    is folded into hourly and monthly aggregates, which are persisted to SQLite by `flush`.
+    """
+    def __init__(self, db_path: str = "sla_rollups.db", ring_minutes: int = 120):
+        self.db_path = db_path
+        self.ring_minutes = ring_minutes
+        self._rings: Dict[str, _TenantMinuteRing] = {}
+        # Rolled-up but not yet persisted deltas keyed by (tenant_id, granularity, period)
+        self._pending: Dict[Tuple[str, str, str], SLAAggregate] = {}
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        if not self._schema_ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sla_rollups (
+                    tenant_id TEXT NOT NULL,
+                    granularity TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    success INTEGER NOT NULL,
+                    latency_sum_ms REAL NOT NULL,
+                    histogram BLOB NOT NULL,
+                    PRIMARY KEY (tenant_id, granularity, period)
+                )
+            """)
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def record(self, tenant_id: str, latency_ms: float, success: bool, timestamp: Optional[float] = None):
+        """Records a single request outcome for a tenant. O(1); never touches the database."""
+        ts = timestamp if timestamp is not None else datetime.now(timezone.utc).timestamp()
+        minute = int(ts // 60)
+        bucket = bisect.bisect_left(SLA_LATENCY_BOUNDS_MS, latency_ms)
+        tenant_id = str(tenant_id)
+
+        with self._lock:
+            ring = self._rings.get(tenant_id)
+            if ring is None:
+                ring = self._rings[tenant_id] = _TenantMinuteRing(self.ring_minutes)
+            slot = minute % ring.size
+            if ring.minutes[slot] != minute:
+                if ring.minutes[slot] != -1:
+                    self._roll_slot(tenant_id, ring, slot)
+                ring.minutes[slot] = minute
+            ring.counts[slot] += 1
+            if success:
+                ring.successes[slot] += 1
+            ring.latency_sums[slot] += latency_ms
+            ring.histograms[slot * _NUM_BUCKETS + bucket] += 1
+
+    def _roll_slot(self, tenant_id: str, ring: _TenantMinuteRing, slot: int):
+        minute = ring.minutes[slot]
+        aggregate = ring.slot_aggregate(slot)
+        for granularity, period in (("hour", _hour_key(minute)), ("month", _month_key(minute))):
+            key = (tenant_id, granularity, period)
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = aggregate.copy()
+            else:
+                pending.merge(aggregate)
+        ring.clear_slot(slot)
+
+    def flush(self):
+        """Rolls every live minute into hour/month aggregates and merges them into SQLite."""
+        with self._lock:
+            for tenant_id, ring in self._rings.items():
+                for slot in range(ring.size):
+                    if ring.minutes[slot] != -1:
+                        self._roll_slot(tenant_id, ring, slot)
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return
+        conn = self._connect()
+        try:
+            # Take the write lock before reading, so another process's flush cannot interleave its merge
+            conn.execute("BEGIN IMMEDIATE")
+            for (tenant_id, granularity, period), delta in pending.items():
+                stored = self._load(conn, tenant_id, granularity, period)
+                merged = stored.merge(delta) if stored else delta
+                conn.execute(
+                    "INSERT OR REPLACE INTO sla_rollups (tenant_id, granularity, period, count, success, latency_sum_ms, histogram) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (tenant_id, granularity, period, merged.count, merged.success, merged.latency_sum_ms, merged.histogram.tobytes())
+                )
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Failed to persist SLA rollups: {e}")
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for key, delta in pending.items():
+                    if key in self._pending:
+                        self._pending[key].merge(delta)
+                    else:
+                        self._pending[key] = delta
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection, tenant_id: str, granularity: str, period: str) -> Optional[SLAAggregate]:
+        row = conn.execute(
+            "SELECT count, success, latency_sum_ms, histogram FROM sla_rollups WHERE tenant_id = ? AND granularity = ? AND period = ?",
+            (tenant_id, granularity, period)
+        ).fetchone()
+        if row is None:
+            return None
+        histogram = array('Q')
+        histogram.frombytes(row[3])
+        return SLAAggregate(count=row[0], success=row[1], latency_sum_ms=row[2], histogram=histogram)
+
+    def get_aggregate(self, tenant_id: str, granularity: str, period: str) -> SLAAggregate:
+        """Persisted rollup for a period merged with anything still pending or live in the ring."""
+        tenant_id = str(tenant_id)
+        conn = self._connect()
+        try:
+            aggregate = self._load(conn, tenant_id, granularity, period) or SLAAggregate()
+        finally:
+            conn.close()
+
+        period_of = _hour_key if granularity == "hour" else _month_key
+        with self._lock:
+            pending = self._pending.get((tenant_id, granularity, period))
+            if pending is not None:
+                aggregate.merge(pending)
+            ring = self._rings.get(tenant_id)
+            if ring is not None:
+                for slot in range(ring.size):
+                    minute = ring.minutes[slot]
+                    if minute != -1 and period_of(minute) == period:
+                        aggregate.merge(ring.slot_aggregate(slot))
+        return aggregate
+
+    def count_breached_hours(self, tenant_id: str, month: str, uptime_target: float = UPTIME_TARGET_PERCENT) -> int:
+        """Number of persisted hourly rollups in `month` whose availability fell below `uptime_target`."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM sla_rollups WHERE tenant_id = ? AND granularity = 'hour' AND period >= ? AND period < ? AND success * 100.0 < count * ?",
+                (str(tenant_id), month, f"{month}~", uptime_target)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+    def get_monthly_report(self, tenant_id: str, month: str) -> Optional[Dict[str, Any]]:
+        """SLA report for /reports/sla/{tenant_id}/{month}, or None when no events were recorded."""
+        aggregate = self.get_aggregate(tenant_id, "month", month)
+        if aggregate.count == 0:
+            return None
+        return {
+            "tenant_id": str(tenant_id),
+            "month": month,
+            "total_requests": aggregate.count,
+            "uptime_percentage": round(aggregate.uptime_percentage, 3),
+            "error_rate": round(1 - aggregate.success / aggregate.count, 5),
+            "avg_response_time_ms": round(aggregate.avg_response_time_ms, 2),
+            "p50_response_time_ms": aggregate.quantile_ms(0.50),
+            "p95_response_time_ms": aggregate.quantile_ms(0.95),
+            "p99_response_time_ms": aggregate.quantile_ms(0.99),
+            "response_time_slo_met": aggregate.avg_response_time_ms < RESPONSE_TIME_SLO_MS,
+            "incidents": self.count_breached_hours(tenant_id, month),
+        }
+
+
+sla_rollup_engine = SLARollupEngine()
+
 class SLATracker:
     """
     // [TASK]: Implement conceptual SLA tracking
     // [GOAL]: Periodically calculate and store SLA metrics for tenants
     // [ELITE_CURSOR_SNIPPET]: aihandle
     """
-    def __init__(self, router: Any): # Add router parameter
+    def __init__(self, router: Any = None, rollup_engine: Optional[SLARollupEngine] = None): # Add router parameter
         self.sla_records: Dict[str, SLARecord] = {}
         self.router = router # Store router instance
+        self.rollup_engine = rollup_engine or sla_rollup_engine
 
-    async def track_sla(self, tenant_id: str):
+    def record_outcome(self, tenant_id: str, latency_ms: float, success: bool, timestamp: Optional[float] = None):
         """
-        Calculates and tracks SLA metrics for a given tenant based on actual router performance data.
+        Feeds a per-request outcome event into the tenant's rollups.
         """
-        logger.info(f"Tracking SLA for tenant: {tenant_id} using router performance data.")
-        
-        # For a real multi-tenant system, you'd filter router.historical_performance by tenant_id
-        # For now, we'll use overall performance as a proxy.
-        
-        total_calls = 0
-        successful_calls = 0
-        total_response_time = 0.0
-        
-        for method_stats in self.router.historical_performance.values():
-            total_calls += method_stats["call_count"]
-            successful_calls += method_stats["success_count"]
-            total_response_time += method_stats["total_time"]
-            
-        uptime_percentage = 100.0 # Placeholder for actual system uptime
-        if total_calls > 0:
-            success_rate = (successful_calls / total_calls) * 100
-            uptime_percentage = success_rate # Using success rate as a proxy for uptime
-        
-        average_response_time = (total_response_time / successful_calls) if successful_calls > 0 else 0.0
-        response_time_slo_met = average_response_time < 1.0 # Assuming SLO is 1 second average response time
+        self.rollup_engine.record(tenant_id, latency_ms, success, timestamp)
+
+    async def track_sla(self, tenant_id: str, month: Optional[str] = None):
+        """
+        Calculates and tracks SLA metrics for a given tenant from its monthly rollup.
+        Falls back to overall router performance when no outcome events were recorded for the tenant.
+        """
+        month = month or datetime.now(timezone.utc).strftime("%Y-%m")
+        aggregate = self.rollup_engine.get_aggregate(tenant_id, "month", month)
+
+        if aggregate.count > 0:
+            logger.info(f"Tracking SLA for tenant: {tenant_id} using {aggregate.count} rolled-up outcome events.")
+            uptime_percentage = aggregate.uptime_percentage
+            average_response_time = aggregate.avg_response_time_ms / 1000
+        else:
+            logger.info(f"Tracking SLA for tenant: {tenant_id} using router performance data.")
+            # No tenant-scoped events yet; use overall router performance as a proxy.
+            total_calls = 0
+            successful_calls = 0
+            total_response_time = 0.0
+
+            historical_performance = getattr(self.router, "historical_performance", {}) or {}
+            for method_stats in historical_performance.values():
+                total_calls += method_stats["call_count"]
+                successful_calls += method_stats["success_count"]
+                total_response_time += method_stats["total_time"]
+
+            uptime_percentage = 100.0 # Placeholder for actual system uptime
+            if total_calls > 0:
+                success_rate = (successful_calls / total_calls) * 100
+                uptime_percentage = success_rate # Using success rate as a proxy for uptime
+
+            average_response_time = (total_response_time / successful_calls) if successful_calls > 0 else 0.0
+
+        response_time_slo_met = average_response_time < RESPONSE_TIME_SLO_MS / 1000 # SLO is 1 second average response time
         
         credits_due = 0.0
-        if uptime_percentage < 99.9 or not response_time_slo_met:
+        if uptime_percentage < UPTIME_TARGET_PERCENT or not response_time_slo_met:
             credits_due = round(random.uniform(1.0, 10.0), 2) # Simulate service credits for breaches
             logger.warning(f"SLA breach detected for tenant {tenant_id}. Credits due: {credits_due}")
 
-        month = datetime.now().strftime("%Y-%m")
         record = SLARecord(
             tenant_id=tenant_id,
             month=month,
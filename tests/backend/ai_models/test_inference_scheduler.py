@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import pytest
+
+from backend.ai_models.inference_scheduler import InferenceScheduler, StubBatchPipeline, benchmark
+
+class RecordingPipeline:
+    def __init__(self):
+        self.batches = []
+        self.threads = set()
+
+    def __call__(self, inputs, kwargs):
+        self.batches.append((list(inputs), dict(kwargs)))
+        self.threads.add(threading.current_thread().name)
+        return [f"{item}!" for item in inputs]
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_micro_batched():
+    pipeline = RecordingPipeline()
+    scheduler = InferenceScheduler("text", pipeline, max_batch_size=8, max_wait_ms=20)
+
+    results = await asyncio.gather(*(scheduler.submit(f"p{i}", max_new_tokens=5) for i in range(5)))
+
+    assert results == [f"p{i}!" for i in range(5)]
+    assert pipeline.batches == [([f"p{i}" for i in range(5)], {"max_new_tokens": 5})]
+    assert pipeline.threads == {"inference-text_0"}
+
+@pytest.mark.asyncio
+async def test_batches_split_at_max_size_and_by_kwargs():
+    pipeline = RecordingPipeline()
+    scheduler = InferenceScheduler("text", pipeline, max_batch_size=2, max_wait_ms=20)
+
+    await asyncio.gather(
+        scheduler.submit("a", temperature=0.1), scheduler.submit("b", temperature=0.1),
+        scheduler.submit("c", temperature=0.1), scheduler.submit("d", temperature=0.9),
+    )
+
+    assert sorted(inputs for inputs, _ in pipeline.batches) == [["a", "b"], ["c"], ["d"]]
+    assert scheduler.get_stats()["batches"] == 3
+
+@pytest.mark.asyncio
+async def test_identical_inflight_requests_are_coalesced():
+    pipeline = RecordingPipeline()
+    scheduler = InferenceScheduler("tts", pipeline, max_batch_size=8, max_wait_ms=20)
+
+    results = await asyncio.gather(*(scheduler.submit("habari", voice="sw") for _ in range(4)))
+
+    assert results == ["habari!"] * 4
+    assert pipeline.batches == [(["habari"], {"voice": "sw"})]
+    assert scheduler.get_stats()["coalesced"] == 3
+
+@pytest.mark.asyncio
+async def test_batch_failure_propagates_to_every_caller():
+    def broken(inputs, kwargs):
+        raise RuntimeError("CUDA out of memory")
+    scheduler = InferenceScheduler("image", broken, max_batch_size=4, max_wait_ms=5)
+
+    results = await asyncio.gather(scheduler.submit("x"), scheduler.submit("y"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # The failed keys are released, so a retry runs again
+    with pytest.raises(RuntimeError):
+        await scheduler.submit("x")
+
+@pytest.mark.asyncio
+async def test_benchmark_batching_beats_unbatched_baseline():
+    options = dict(requests=64, concurrency=16, max_wait_ms=2)
+    unbatched = await benchmark(max_batch_size=1, pipeline=StubBatchPipeline(overhead_s=0.005, per_item_s=0.0005), **options)
+    batched = await benchmark(max_batch_size=8, pipeline=StubBatchPipeline(overhead_s=0.005, per_item_s=0.0005), **options)
+
+    assert unbatched["pipeline_calls"] == 64
+    assert batched["pipeline_calls"] < 16
+    assert batched["throughput_rps"] > unbatched["throughput_rps"]
+    assert batched["p95_latency_ms"] < unbatched["p95_latency_ms"]
+
+@pytest.mark.asyncio
+async def test_identical_local_text_prompts_run_the_pipeline_once(monkeypatch):
+    import ai_model_manager
+
+    calls = []
+    def local_llm(inputs, **kwargs):
+        calls.append(list(inputs))
+        return [[{"generated_text": f"story for {item}"}] for item in inputs]  # transformers: one list per prompt
+
+    monkeypatch.setattr(ai_model_manager, "init_hf_client", lambda: None)
+    monkeypatch.setattr(ai_model_manager, "_load_local_llm_model", lambda: asyncio.sleep(0, result=True))
+    monkeypatch.setitem(ai_model_manager.__dict__, "_local_llm_pipeline", local_llm)
+    monkeypatch.setattr(ai_model_manager, "_inference_schedulers", {})
+
+    results = await asyncio.gather(ai_model_manager.generate_text("same"), ai_model_manager.generate_text("same"))
+
+    assert results == ["story for same", "story for same"]
+    assert calls == [["same"]]
@@ -0,0 +1,213 @@
+import asyncio
+import unittest
+import os
+import sys
+from typing import Any, Dict
+
+# Add the project root to the Python path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+from backend.ai_routing.provider_stats import (
+    CircuitBreaker, FakeProvider, ProviderStatsRegistry, benchmark_routing, hedged_call,
+)
+from backend.ai_routing.providers.base_provider import BaseProvider
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedProvider(BaseProvider):
+    """Answers after `delay` seconds, or raises when `fail` is set; records cancellations."""
+
+    def __init__(self, name: str, delay: float = 0.0, fail: bool = False, latency: float = float('inf')):
+        super().__init__(name, {})
+        self.delay = delay
+        self.fail = fail
+        self.latency = latency
+        self.calls = 0
+        self.cancelled = 0
+
+    async def process_request(self, task_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{self.name} failed")
+        return {"provider": self.name}
+
+    async def check_health(self) -> bool:
+        return True
+
+
+def call(provider):
+    return provider.process_request("task", {})
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=3, error_rate_threshold=0.5, min_samples=10,
+                                      cooldown_seconds=30, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        for samples in range(1, 3):
+            self.breaker.record(False, 0.1, samples)
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record(False, 0.1, 3)
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_opens_on_error_rate_once_enough_samples(self):
+        self.breaker.record(False, 0.9, 5)
+        self.assertEqual(self.breaker.state, "closed")  # Too few samples to trust the rate
+        self.breaker.record(True, 0.8, 9)
+        self.breaker.record(False, 0.6, 10)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_half_open_admits_one_probe(self):
+        for samples in range(1, 4):
+            self.breaker.record(False, 0.1, samples)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.available())
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, "half_open")
+        self.assertFalse(self.breaker.allow())  # Probe already in flight
+        self.assertFalse(self.breaker.available())
+
+        self.breaker.record(True, 0.1, 4)
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        for samples in range(1, 4):
+            self.breaker.record(False, 0.1, samples)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False, 0.1, 4)
+        self.assertEqual(self.breaker.state, "open")
+        self.clock.now += 29
+        self.assertFalse(self.breaker.available())
+
+
+class TestProviderStatsRegistry(unittest.TestCase):
+
+    def test_rank_prefers_observed_latency_over_probe(self):
+        registry = ProviderStatsRegistry(alpha=0.5)
+        fast_probe = ScriptedProvider("fast_probe", latency=5)
+        steady = ScriptedProvider("steady", latency=40)
+        self.assertEqual(registry.rank([steady, fast_probe], "task"), [fast_probe, steady])
+
+        for _ in range(5):
+            registry.record("fast_probe", "task", True, 300)
+            registry.record("steady", "task", True, 60)
+        self.assertEqual(registry.rank([fast_probe, steady], "task"), [steady, fast_probe])
+
+    def test_errors_penalise_and_are_tracked_per_task_type(self):
+        registry = ProviderStatsRegistry(alpha=0.5, failure_threshold=100)
+        a, b = ScriptedProvider("a", latency=50), ScriptedProvider("b", latency=80)
+        for _ in range(3):
+            registry.record("a", "chat", False, 5)  # Fast failures must not look like fast answers
+        self.assertIsNone(registry.get("a", "chat").latency_ewma_ms)
+        self.assertEqual(registry.rank([a, b], "chat"), [b, a])
+        self.assertEqual(registry.rank([a, b], "image"), [a, b])
+
+    def test_open_breaker_is_excluded(self):
+        registry = ProviderStatsRegistry(failure_threshold=2)
+        a, b = ScriptedProvider("a", latency=10), ScriptedProvider("b", latency=80)
+        registry.record("a", "task", False, 10)
+        registry.record("a", "task", False, 10)
+        self.assertEqual(registry.rank([a, b], "task"), [b])
+        self.assertEqual(registry.snapshot()["a:task"]["breaker"], "open")
+
+    def test_p90(self):
+        registry = ProviderStatsRegistry(latency_window=10)
+        for latency in range(1, 21):
+            registry.record("a", "task", True, latency)
+        self.assertEqual(registry.get("a", "task").percentile(0.9), 19)
+
+
+class TestHedgedCall(unittest.IsolatedAsyncioTestCase):
+
+    def warmed_registry(self, name: str, latency_ms: float, samples: int = 20) -> ProviderStatsRegistry:
+        registry = ProviderStatsRegistry()
+        for _ in range(samples):
+            registry.record(name, "task", True, latency_ms)
+        return registry
+
+    async def test_slow_primary_is_hedged_and_loser_cancelled(self):
+        registry = self.warmed_registry("primary", 20)
+        primary, backup = ScriptedProvider("primary", delay=2.0), ScriptedProvider("backup", delay=0.01)
+
+        started = asyncio.get_running_loop().time()
+        winner, result = await hedged_call([primary, backup], "task", call, registry, hedge_min_delay_ms=10)
+
+        self.assertIs(winner, backup)
+        self.assertEqual(result, {"provider": "backup"})
+        self.assertLess(asyncio.get_running_loop().time() - started, 0.5)
+        self.assertEqual(primary.cancelled, 1)
+        self.assertEqual(registry.get("primary", "task").samples, 20)  # Cancelled loser not recorded
+        self.assertEqual(registry.get("backup", "task").samples, 1)
+
+    async def test_fast_primary_is_not_hedged(self):
+        registry = self.warmed_registry("primary", 200)
+        primary, backup = ScriptedProvider("primary", delay=0.01), ScriptedProvider("backup")
+        winner, _ = await hedged_call([primary, backup], "task", call, registry)
+        self.assertIs(winner, primary)
+        self.assertEqual(backup.calls, 0)
+
+    async def test_no_hedge_without_enough_samples(self):
+        registry = self.warmed_registry("primary", 1, samples=5)
+        primary, backup = ScriptedProvider("primary", delay=0.1), ScriptedProvider("backup")
+        winner, _ = await hedged_call([primary, backup], "task", call, registry, hedge_min_delay_ms=1)
+        self.assertIs(winner, primary)
+        self.assertEqual(backup.calls, 0)
+
+    async def test_failure_falls_through_and_is_recorded(self):
+        registry = ProviderStatsRegistry()
+        primary, backup = ScriptedProvider("primary", fail=True), ScriptedProvider("backup")
+        winner, _ = await hedged_call([primary, backup], "task", call, registry)
+        self.assertIs(winner, backup)
+        self.assertEqual(registry.get("primary", "task").error_rate, 0.2)
+
+    async def test_all_failing_raises_last_error(self):
+        registry = ProviderStatsRegistry()
+        with self.assertRaises(ConnectionError):
+            await hedged_call([ScriptedProvider("a", fail=True), ScriptedProvider("b", fail=True)], "task", call, registry)
+
+    async def test_open_breaker_is_skipped(self):
+        registry = ProviderStatsRegistry(failure_threshold=1)
+        registry.record("a", "task", False, 1)
+        a, b = ScriptedProvider("a"), ScriptedProvider("b")
+        winner, _ = await hedged_call([a, b], "task", call, registry)
+        self.assertIs(winner, b)
+        self.assertEqual(a.calls, 0)
+        with self.assertRaises(RuntimeError):
+            await hedged_call([a], "task", call, registry)
+
+
+class TestBenchmark(unittest.IsolatedAsyncioTestCase):
+
+    async def test_ewma_routing_avoids_provider_that_only_probes_well(self):
+        def make_providers():
+            return [
+                FakeProvider("flaky", median_ms=40, failure_rate=0.5, probe_ms=1, seed=1),
+                FakeProvider("steady", median_ms=10, sigma=0.1, probe_ms=5, seed=2),
+            ]
+
+        results = await benchmark_routing(make_providers, requests=40)
+        self.assertEqual(set(results), {"probe", "ewma", "ewma_hedged"})
+        self.assertLess(results["ewma"]["p90_ms"], results["probe"]["p90_ms"])
+        self.assertLess(results["ewma"]["provider_calls"], results["probe"]["provider_calls"])
+
+
+if __name__ == '__main__':
+    unittest.main()
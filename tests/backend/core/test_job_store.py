@@ -0,0 +1,96 @@
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.core.job_store import InMemoryJobStore, SQLJobStore
+
+@pytest.fixture(params=["memory", "sql"])
+def store(request):
+    options = {"ttl_seconds": 60, "progress_min_interval_seconds": 10}
+    if request.param == "memory":
+        return InMemoryJobStore(**options)
+    test_engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    sql_store = SQLJobStore(session_factory=sessionmaker(bind=test_engine), bind=test_engine, **options)
+    sql_store.initialize()
+    return sql_store
+
+def _job(job_id="job-1", status="pending"):
+    return {"id": job_id, "type": "GENERATE_VIDEO", "status": status, "progress": 0, "payload": {"user_id": "1"}, "created_at": time.time()}
+
+def test_create_get_and_update_round_trip(store):
+    assert store.create(_job()) == ("job-1", True)
+    store.update("job-1", result={"video_path": "/v.mp4"}, stage="rendering")
+
+    job = store.get("job-1")
+    assert job["payload"] == {"user_id": "1"}
+    assert job["result"] == {"video_path": "/v.mp4"}
+    assert job["stage"] == "rendering"
+    assert store.get("missing") is None
+
+def test_transition_is_compare_and_set(store):
+    store.create(_job())
+    assert store.transition("job-1", ("pending", "retrying"), "running") is True
+    # A second worker claiming the same job loses
+    assert store.transition("job-1", ("pending", "retrying"), "running") is False
+    assert store.transition("job-1", ("running",), "completed", result={"ok": True}) is True
+    assert store.get("job-1")["status"] == "completed"
+    assert store.get("job-1")["expires_at"] > time.time()
+
+def test_idempotency_key_reuses_job_until_it_fails(store):
+    assert store.create(_job("job-1"), idempotency_key="1:abc") == ("job-1", True)
+    assert store.create(_job("job-2"), idempotency_key="1:abc") == ("job-1", False)
+
+    store.transition("job-1", ("pending",), "failed", error="boom")
+    assert store.create(_job("job-3"), idempotency_key="1:abc") == ("job-3", True)
+
+def test_progress_is_throttled_and_coalesced(store):
+    store.create(_job())
+    store.report_progress("job-1", "rendering", 10)
+    store.report_progress("job-1", "rendering", 20) # coalesced
+    store.report_progress("job-1", "rendering", 30) # coalesced, supersedes 20
+    store.report_progress("job-1", "merging", 80) # stage change flushes the latest coalesced update first
+
+    assert [(e["stage"], e["progress"]) for e in store.get_events("job-1")] == [("rendering", 10), ("rendering", 30), ("merging", 80)]
+    assert store.get("job-1")["progress"] == 80
+    assert len(store.get_events("job-1", 2)) == 1
+
+def test_cleanup_expired_removes_finished_jobs(store):
+    store.create(_job("job-1"), idempotency_key="1:abc")
+    store.create(_job("job-2"))
+    store.transition("job-1", ("pending",), "completed")
+    store.report_progress("job-1", "completed", 100)
+    store.update("job-1", expires_at=time.time() - 1)
+
+    assert store.cleanup_expired() == 1
+    assert store.get("job-1") is None
+    assert store.get_events("job-1") == []
+    assert store.get("job-2") is not None
+    # The idempotency key is released along with the expired job
+    assert store.create(_job("job-3"), idempotency_key="1:abc") == ("job-3", True)
+
+def test_claim_takes_over_running_job_only_after_its_lease_lapses(store):
+    store.lease_seconds = 30
+    store.create(_job())
+    assert store.claim("job-1", started_at=time.time()) is True
+    # Redelivered while the first worker still holds the lease
+    assert store.claim("job-1") is False
+
+    store.heartbeat("job-1")
+    assert 0 < store.lease_remaining(store.get("job-1")) <= 30
+    store.update("job-1", heartbeat_at=time.time() - 31) # The worker died and stopped heartbeating
+    assert store.claim("job-1") is True
+    assert store.get("job-1")["status"] == "running"
+
+    store.transition("job-1", ("running",), "completed")
+    store.update("job-1", heartbeat_at=0)
+    assert store.claim("job-1") is False
+
+def test_sql_store_creates_no_tables_until_initialized():
+    from sqlalchemy import inspect
+    test_engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    sql_store = SQLJobStore(session_factory=sessionmaker(bind=test_engine), bind=test_engine)
+    assert not inspect(test_engine).has_table("job_records")
+    sql_store.initialize()
+    assert inspect(test_engine).has_table("job_records")
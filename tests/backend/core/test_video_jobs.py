@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from celery_app import app as celery_app
+from backend.core import jobs
+from backend.core.job_store import InMemoryJobStore
+
+@pytest.fixture
+def eager_jobs():
+    store = InMemoryJobStore()
+    celery_app.conf.task_always_eager = True
+    with patch.object(jobs, "job_store", store), \
+         patch.object(jobs, "record_usage_cost", new_callable=AsyncMock):
+        yield store
+    celery_app.conf.task_always_eager = False
+
+async def _wait_for_terminal(job_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = await jobs.get_job_status(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+@pytest.mark.asyncio
+async def test_generate_video_job_runs_end_to_end_with_eager_broker(eager_jobs):
+    async def fake_run_pipeline(input_type, input_data, user_preferences=None, api_call=False, request=None, progress_callback=None):
+        progress_callback("rendering", 50, "offline_video_maker")
+        return {"status": "success", "pipeline": "offline_video_maker", "result": {"video_path": "/fake/video.mp4"}}
+
+    with patch.object(jobs, "_get_orchestrator", return_value=MagicMock(run_pipeline=fake_run_pipeline)):
+        payload = {"user_id": "1", "input_type": "general_prompt", "input_data": "Nairobi at dawn", "user_preferences": {}}
+        job_id = await jobs.enqueue_job("GENERATE_VIDEO", payload)
+        assert (await jobs.get_job_status(job_id))["status"] in ("pending", "running", "completed")
+
+        job = await _wait_for_terminal(job_id)
+
+    assert job["status"] == "completed"
+    assert job["result"]["result"]["video_path"] == "/fake/video.mp4"
+    stages = [e["stage"] for e in await jobs.get_job_events(job_id)]
+    assert stages[0] == "queued"
+    assert "rendering" in stages
+    assert stages[-1] == "completed"
+
+@pytest.mark.asyncio
+async def test_generate_video_job_failure_is_bounded_by_retry_budget(eager_jobs):
+    calls = []
+
+    async def failing_run_pipeline(*args, **kwargs):
+        calls.append(1)
+        return {"status": "error", "message": "render exploded"}
+
+    with patch.object(jobs, "_get_orchestrator", return_value=MagicMock(run_pipeline=failing_run_pipeline)):
+        job_id = await jobs.enqueue_job("GENERATE_VIDEO", {"user_id": "1", "input_type": "general_prompt", "input_data": "x"}, user_tier_code="FREE")
+        job = await _wait_for_terminal(job_id)
+
+    assert job["status"] == "failed"
+    assert job["error"] == "render exploded"
+    assert len(calls) == 2 # first attempt + FREE tier's single retry
+
+@pytest.mark.asyncio
+async def test_idempotent_resubmission_returns_cached_result(eager_jobs):
+    run_pipeline = AsyncMock(return_value={"status": "success", "pipeline": "offline_video_maker", "result": {"video_path": "/fake/video.mp4"}})
+
+    with patch.object(jobs, "_get_orchestrator", return_value=MagicMock(run_pipeline=run_pipeline)):
+        payload = {"user_id": "1", "input_type": "general_prompt", "input_data": "Nairobi at dawn"}
+        job_id = await jobs.enqueue_job("GENERATE_VIDEO", payload, idempotency_key="1:abc")
+        await _wait_for_terminal(job_id)
+
+        resubmitted_id = await jobs.enqueue_job("GENERATE_VIDEO", payload, idempotency_key="1:abc")
+
+    assert resubmitted_id == job_id
+    assert run_pipeline.await_count == 1
+    assert (await jobs.get_job_status(resubmitted_id))["result"]["result"]["video_path"] == "/fake/video.mp4"
+
+def test_redelivered_task_does_not_rerun_finished_job(eager_jobs):
+    eager_jobs.create({"id": "job-1", "type": "GENERATE_VIDEO", "status": "completed", "result": {"cached": True}})
+
+    with patch.object(jobs, "_run_generate_video") as run:
+        result = jobs.process_job_task.apply(args=["job-1", "GENERATE_VIDEO", {}, {}]).get()
+
+    run.assert_not_called()
+    assert result == {"cached": True}
+
+def test_redelivered_task_reclaims_job_abandoned_by_dead_worker(eager_jobs):
+    eager_jobs.lease_seconds = 30
+    eager_jobs.create({"id": "job-1", "type": "GENERATE_VIDEO", "status": "running", "heartbeat_at": time.time() - 60})
+
+    with patch.object(jobs, "_run_generate_video", return_value={"video_path": "/fake/video.mp4"}) as run:
+        jobs.process_job_task.apply(args=["job-1", "GENERATE_VIDEO", {}, {}]).get()
+
+    run.assert_called_once()
+    assert eager_jobs.get("job-1")["status"] == "completed"
+
+def test_redelivered_task_defers_while_lease_is_held(eager_jobs):
+    eager_jobs.create({"id": "job-1", "type": "GENERATE_VIDEO", "status": "running", "heartbeat_at": time.time()})
+    task = jobs.process_job_task
+    task.push_request(is_eager=False)
+    try:
+        with patch.object(task, "retry", side_effect=RuntimeError("retry")) as retry, \
+             patch.object(jobs, "_run_generate_video") as run:
+            with pytest.raises(RuntimeError, match="retry"):
+                task.run("job-1", "GENERATE_VIDEO", {}, {})
+    finally:
+        task.pop_request()
+
+    run.assert_not_called()
+    assert 0 < retry.call_args.kwargs["countdown"] <= eager_jobs.lease_seconds + 1
+    assert retry.call_args.kwargs["max_retries"] is None
+
+@pytest.mark.asyncio
+async def test_event_stream_ends_when_job_disappears(eager_jobs):
+    eager_jobs.create({"id": "job-1", "type": "GENERATE_VIDEO", "status": "running"})
+    eager_jobs.report_progress("job-1", "rendering", 40)
+    stream = jobs.stream_job_events("job-1", poll_interval=0.01)
+
+    assert (await stream.__anext__()).startswith("event: progress")
+    with eager_jobs._lock:  # Expired by its TTL, or deleted, mid-stream
+        del eager_jobs._jobs["job-1"]
+    messages = [message async for message in stream]
+
+    assert len(messages) == 1 and messages[0].startswith("event: error")
+
+@pytest.mark.asyncio
+async def test_job_store_reads_run_off_the_event_loop(eager_jobs):
+    loop_thread = threading.get_ident()
+    threads = []
+    with patch.object(eager_jobs, "get", side_effect=lambda job_id: threads.append(threading.get_ident())), \
+         patch.object(eager_jobs, "get_events", side_effect=lambda job_id, start: threads.append(threading.get_ident()) or []):
+        assert await jobs.get_job_status("job-1") == {"status": "not_found"}
+        assert await jobs.get_job_events("job-1") == []
+
+    assert len(threads) == 2 and loop_thread not in threads
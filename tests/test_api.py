@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock
+import time
+from unittest.mock import patch, AsyncMock, MagicMock
 
 # It's important to import the app object from the main script
 # As the tests directory is a sibling of api_server.py, we need to adjust the path
@@ -23,15 +24,31 @@ client = TestClient(app)
 
 @pytest.fixture
 def mock_orchestrator():
-    """Mocks the pipeline orchestrator to avoid running real pipelines."""
-    with patch("api_server.orchestrator.run_pipeline", new_callable=AsyncMock) as mock_run:
-        # Configure the mock to return a successful response
-        mock_run.return_value = {
-            "status": "success",
-            "pipeline": "mock_pipeline",
-            "result": {"video_path": "/fake/video.mp4"}
-        }
+    """Mocks the pipeline orchestrator and runs video jobs eagerly against an in-memory job store."""
+    from celery_app import app as celery_app
+    from backend.core import jobs
+    from backend.core.job_store import InMemoryJobStore
+
+    mock_run = AsyncMock(return_value={
+        "status": "success",
+        "pipeline": "mock_pipeline",
+        "result": {"video_path": "/fake/video.mp4"}
+    })
+    celery_app.conf.task_always_eager = True
+    with patch.object(jobs, "job_store", InMemoryJobStore()), \
+         patch.object(jobs, "record_usage_cost", new_callable=AsyncMock), \
+         patch.object(jobs, "_get_orchestrator", return_value=MagicMock(run_pipeline=mock_run)):
         yield mock_run
+    celery_app.conf.task_always_eager = False
+
+def wait_for_job(job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
 
 def test_health_check():
     """Tests the /health endpoint."""
@@ -40,11 +57,26 @@ def test_health_check():
     assert response.json() == {"status": "ok", "message": "Shujaa Studio API is running!"}
 
 def test_generate_single_video(mock_orchestrator):
-    """Tests the /generate_video endpoint with a mocked orchestrator."""
+    """Tests that /generate_video queues a job and the job completes via the eager broker."""
     response = client.post("/generate_video", json={"prompt": "test prompt"})
-    assert response.status_code == 200
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+
+    job = wait_for_job(response.json()["job_id"])
     mock_orchestrator.assert_called_once()
-    assert response.json()["status"] == "success"
+    assert job["status"] == "completed"
+    assert job["result"]["status"] == "success"
+
+def test_generate_video_progress_stream(mock_orchestrator):
+    """Tests that per-stage progress is streamed as server-sent events until the job finishes."""
+    job_id = client.post("/generate_video", json={"prompt": "test prompt"}).json()["job_id"]
+    wait_for_job(job_id)
+
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        body = "".join(response.iter_text())
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert '"stage": "queued"' in body
+    assert "event: completed" in body
 
 def test_batch_generate_video(mock_orchestrator):
     """Tests the /batch_generate_video endpoint."""
@@ -56,16 +88,15 @@ def test_batch_generate_video(mock_orchestrator):
     }
     response = client.post("/batch_generate_video", json=payload)
     
-    assert response.status_code == 200
+    assert response.status_code == 202
+    response_data = response.json()
+    assert response_data["status"] == "queued"
+    assert len(response_data["jobs"]) == 2
+
+    results = [wait_for_job(job["job_id"]) for job in response_data["jobs"]]
     # The orchestrator should have been called twice, once for each item in the batch
     assert mock_orchestrator.call_count == 2
-    
-    response_data = response.json()
-    assert response_data["status"] == "completed"
-    assert response_data["successful_videos"] == 2
-    assert response_data["failed_videos"] == 0
-    assert len(response_data["results"]) == 2
-    assert response_data["results"][0]["status"] == "success"
+    assert all(job["status"] == "completed" for job in results)
 
 def test_batch_generate_video_exceeds_limit(mock_orchestrator):
     """Tests that the batch endpoint rejects requests that are too large."""
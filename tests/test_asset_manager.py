@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from asset_manager import AssetManager
+
+PAYLOAD = os.urandom(300_000)
+CHECKSUM = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class FakeCDNs:
+    """Serves PAYLOAD under /<cdn>/<name> with per-CDN latency, status and one-shot disconnects."""
+
+    def __init__(self):
+        self.behaviour = {}
+        self.requests = []
+
+    def set(self, cdn, delay=0.0, status=200, disconnect_after=None, ignore_range=False):
+        self.behaviour[cdn] = {"delay": delay, "status": status, "disconnect_after": disconnect_after, "ignore_range": ignore_range}
+
+    async def handle(self, request):
+        cdn = request.match_info["cdn"]
+        spec = self.behaviour.get(cdn, {"delay": 0.0, "status": 200, "disconnect_after": None, "ignore_range": False})
+        self.requests.append((cdn, request.headers.get("Range")))
+        await asyncio.sleep(spec["delay"])
+        if spec["status"] != 200:
+            return web.Response(status=spec["status"])
+
+        start, status, headers = 0, 200, {}
+        range_header = request.headers.get("Range")
+        if range_header and not spec["ignore_range"]:
+            start = int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(PAYLOAD):
+                return web.Response(status=416)
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"
+        body = PAYLOAD[start:]
+
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        cut = spec["disconnect_after"]
+        if cut is not None:
+            spec["disconnect_after"] = None  # One-shot
+            await response.write(body[:cut])
+            await asyncio.sleep(0.05)
+            request.transport.close()
+            return response
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+
+@pytest_asyncio.fixture
+async def cdns():
+    fake = FakeCDNs()
+    app = web.Application()
+    app.router.add_get("/{cdn}/{name}", fake.handle)
+    server = TestServer(app)
+    await server.start_server()
+    fake.url = lambda path: str(server.make_url(path))
+    yield fake
+    await server.close()
+
+
+@pytest_asyncio.fixture
+async def manager(cdns, tmp_path):
+    am = AssetManager(cache_dir=tmp_path / "cache", cdn_endpoints=[cdns.url("/cdn1/"), cdns.url("/cdn2/")], hedge_delay_ms=50)
+    am.storage_provider = "local"
+    yield am
+    await am.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_cdn_is_hedged(manager, cdns):
+    cdns.set("cdn1", delay=2.0)
+    started = time.perf_counter()
+    path = await manager.get_asset("model", cdns.url("/origin/model.bin"), CHECKSUM)
+
+    assert time.perf_counter() - started < 1.0
+    assert path.read_bytes() == PAYLOAD
+    assert [cdn for cdn, _ in cdns.requests] == ["cdn1", "cdn2"]
+    assert manager.last_used_cdn_index == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_cdn_falls_through_without_waiting(manager, cdns):
+    cdns.set("cdn1", status=503)
+    cdns.set("cdn2", status=404)
+    path = await manager.get_asset("model", cdns.url("/origin/model.bin"))
+    assert path.read_bytes() == PAYLOAD
+    assert [cdn for cdn, _ in cdns.requests] == ["cdn1", "cdn2", "origin"]
+
+
+@pytest.mark.asyncio
+async def test_interrupted_download_resumes_with_range(manager, cdns):
+    cdns.set("cdn1", disconnect_after=120_000)
+    path = await manager.get_asset("model", cdns.url("/origin/model.bin"), CHECKSUM)
+
+    assert path.read_bytes() == PAYLOAD
+    assert cdns.requests[0] == ("cdn1", None)
+    resumed_from = int(cdns.requests[1][1].split("=")[1].rstrip("-"))
+    assert 0 < resumed_from <= 120_000
+    assert not path.with_name(path.name + ".part").exists()
+
+
+@pytest.mark.asyncio
+async def test_server_ignoring_range_restarts_cleanly(manager, cdns):
+    cdns.set("cdn1", disconnect_after=50_000, ignore_range=True)
+    path = await manager.get_asset("model", cdns.url("/origin/model.bin"), CHECKSUM)
+    assert path.read_bytes() == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_uses_recorded_checksum(manager, cdns):
+    url = cdns.url("/origin/model.bin")
+    path = await manager.get_asset("model", url, CHECKSUM)
+
+    with patch.object(manager, "_calculate_checksum", wraps=manager._calculate_checksum) as rehash:
+        assert await manager.get_asset("model", url, CHECKSUM) == path
+        rehash.assert_not_called()
+
+        # A changed file no longer matches its size+mtime record, is re-hashed and re-downloaded
+        path.write_bytes(b"corrupted")
+        assert (await manager.get_asset("model", url, CHECKSUM)).read_bytes() == PAYLOAD
+        assert rehash.call_count == 2  # Stale cache entry + fresh download
+    assert len(cdns.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_downloads_share_one_session_and_coalesce(manager, cdns):
+    url = cdns.url("/origin/model.bin")
+    paths = await asyncio.gather(*(manager.get_asset("model", url) for _ in range(4)))
+    session = manager._session
+    await manager.get_asset("other", cdns.url("/origin/other.bin"))
+
+    assert len(set(paths)) == 1
+    assert len(cdns.requests) == 2
+    assert manager._session is session
+
+
+@pytest.mark.asyncio
+async def test_all_candidates_failing_raises(manager, cdns):
+    for cdn in ("cdn1", "cdn2", "origin"):
+        cdns.set(cdn, status=500)
+    with pytest.raises(IOError):
+        await manager.get_asset("model", cdns.url("/origin/model.bin"))
+
+
+@pytest.mark.asyncio
+async def test_loop_change_closes_the_previous_session(tmp_path):
+    am = AssetManager(cache_dir=tmp_path / "cache", cdn_endpoints=[])
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever)
+    thread.start()
+    try:
+        old = asyncio.run_coroutine_threadsafe(am._get_session(), other).result()
+        new = await am._get_session()
+        assert new is not old and old.closed and not new.closed
+    finally:
+        await am.close()
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
+
+
+def test_session_left_by_a_finished_loop_is_closed(tmp_path):
+    am = AssetManager(cache_dir=tmp_path / "cache", cdn_endpoints=[])
+    old = asyncio.run(am._get_session())
+
+    async def next_run():
+        session = await am._get_session()
+        await am.close()
+        await am.close()  # Idempotent
+        return session
+
+    new = asyncio.run(next_run())
+    assert old.closed and new.closed and am._session is None
+
+
+@pytest.mark.asyncio
+async def test_shutdown_closes_the_shared_asset_manager(tmp_path, monkeypatch):
+    import ai_model_manager
+    await ai_model_manager.close_asset_manager()  # Never created: nothing to do
+    am = AssetManager(cache_dir=tmp_path / "cache", cdn_endpoints=[])
+    session = await am._get_session()
+    monkeypatch.setitem(ai_model_manager.__dict__, "asset_manager", am)
+    await ai_model_manager.close_asset_manager()
+    assert session.closed
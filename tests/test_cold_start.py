@@ -0,0 +1,112 @@
+# // [TASK]: Guard import-time cost of API/worker entrypoints
+# // [GOAL]: Pipelines and model backends stay lazy; importing entrypoints fits the cold-start budget
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).parent.parent
+COLD_START_BUDGET_SECONDS = float(os.environ.get("SHUJAA_COLD_START_BUDGET", "5.0"))
+
+# Heavy packages and pipeline modules that must only be imported on first use
+HEAVY_MODULES = [
+    "torch", "transformers", "diffusers", "whisper", "moviepy", "PIL", "cv2", "numpy",
+    "soundfile", "segment_anything", "news_video_generator", "cartoon_anime_pipeline",
+    "offline_video_maker.generate_video", "services.watermark_remover",
+]
+BLOCKED_IMPORT_MARKER = "heavy import at startup"
+# Modules api_server needs that this environment may lack (or ships in an incompatible version), with the
+# names it imports from them. Each is replaced by a permissive stand-in only when the real one is unusable,
+# so the budget is always asserted; importing the real module still counts towards the measured time.
+SHIMS = {
+    "fastapi_limiter": ["FastAPILimiter"],
+    "fastapi_limiter.depends": ["RateLimiter"],
+    "python_multipart": ["__version__"],
+    "backend.models.webhook_dlq": ["WebhookDLQItem"],
+}
+
+PRELUDE = """
+import importlib, sys, time, types
+
+HEAVY_MODULES = {heavy!r}
+SHIMS = {shims!r}
+
+class HeavyImportBlocker:
+    def find_spec(self, name, path=None, target=None):
+        if name in HEAVY_MODULES or name.split(".")[0] in HEAVY_MODULES:
+            raise ImportError("{marker}: " + name)
+        return None
+
+class Stub:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self):
+        return None
+
+    @classmethod
+    async def init(cls, *args, **kwargs):
+        return None
+
+class StubModule(types.ModuleType):
+    __path__ = []
+    __version__ = "0.0.20"
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Stub
+
+def usable(name, attrs):
+    try:
+        module = importlib.import_module(name)
+    except ImportError as e:
+        if "{marker}" in str(e):
+            raise
+        return False
+    return all(hasattr(module, attr) for attr in attrs)
+
+sys.meta_path.insert(0, HeavyImportBlocker())
+start = time.perf_counter()
+for name, attrs in SHIMS.items():
+    if not usable(name, attrs):
+        parent = name.rpartition(".")[0]
+        if parent and not usable(parent, []):
+            sys.modules[parent] = StubModule(parent)
+        sys.modules[name] = StubModule(name)
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def _time_import(module: str) -> subprocess.CompletedProcess:
+    code = PRELUDE.format(heavy=HEAVY_MODULES, shims=SHIMS, marker=BLOCKED_IMPORT_MARKER, module=module)
+    return subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, timeout=120)
+
+
+@pytest.mark.parametrize("module", ["pipeline_orchestrator", "ai_model_manager", "api_server"])
+def test_entrypoint_import_is_cheap(module):
+    result = _time_import(module)
+
+    assert BLOCKED_IMPORT_MARKER not in result.stderr, result.stderr[-2000:]
+    assert result.returncode == 0, result.stderr[-2000:]
+    elapsed = float(result.stdout.strip().splitlines()[-1])
+    assert elapsed < COLD_START_BUDGET_SECONDS, f"import {module} took {elapsed:.2f}s"
+
+
+def test_pipelines_resolve_on_first_use():
+    code = (
+        "import sys\n"
+        "from pipeline_orchestrator import PipelineOrchestrator\n"
+        "orchestrator = PipelineOrchestrator()\n"
+        "assert 'cartoon_anime_pipeline' not in sys.modules\n"
+        "sys.modules['cartoon_anime_pipeline'] = type(sys)('cartoon_anime_pipeline')\n"
+        "sys.modules['cartoon_anime_pipeline'].create_african_cartoon_video = lambda **kw: 'rendered'\n"
+        "print(orchestrator.get_pipeline('cartoon_anime_pipeline')())\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.strip().splitlines()[-1] == "rendered"
@@ -0,0 +1,153 @@
+import io
+import os
+import pytest
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from security import encryption_utils
+from security.encryption_utils import (
+    EncryptionError, StreamDecryptor, StreamEncryptor, aiter_decrypt, aiter_encrypt, decrypt_file,
+    decrypt_stream, encrypt_file, encrypt_stream, iter_decrypt, iter_encrypt,
+)
+
+CHUNK = 4096
+PAYLOAD = os.urandom(CHUNK * 5 + 123)
+
+
+def _encrypt(payload=PAYLOAD, chunk_size=CHUNK) -> bytes:
+    out = io.BytesIO()
+    encrypt_stream(io.BytesIO(payload), out, chunk_size)
+    return out.getvalue()
+
+
+def _decrypt(sealed: bytes) -> bytes:
+    out = io.BytesIO()
+    decrypt_stream(io.BytesIO(sealed), out)
+    return out.getvalue()
+
+
+def _frames(sealed: bytes):
+    """Splits an encrypted stream into (header, [frames])."""
+    fixed = encryption_utils._HEADER_FIXED
+    key_len = fixed.unpack_from(sealed)[3]
+    header_len = fixed.size + key_len + encryption_utils._NONCE_PREFIX_BYTES
+    frames, offset = [], header_len
+    while offset < len(sealed):
+        length = int.from_bytes(sealed[offset:offset + 4], "big") & ~encryption_utils._LAST_FLAG
+        frames.append(sealed[offset:offset + 4 + length])
+        offset += 4 + length
+    return sealed[:header_len], frames
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK - 1, CHUNK, CHUNK * 3, len(PAYLOAD)])
+def test_round_trip(size):
+    assert _decrypt(_encrypt(PAYLOAD[:size])) == PAYLOAD[:size]
+
+
+def test_each_object_gets_its_own_data_key():
+    first, second = _encrypt(), _encrypt()
+    assert _frames(first)[0] != _frames(second)[0]
+    assert first[-64:] != second[-64:]
+
+
+def test_ciphertext_split_arbitrarily_still_decrypts():
+    sealed = _encrypt()
+    pieces = [sealed[i:i + 777] for i in range(0, len(sealed), 777)]
+    assert b"".join(iter_decrypt(pieces)) == PAYLOAD
+    assert b"".join(iter_decrypt(iter_encrypt([PAYLOAD[i:i + 100] for i in range(0, len(PAYLOAD), 100)], CHUNK))) == PAYLOAD
+
+
+@pytest.mark.parametrize("index", [0, 2, 5])
+def test_tampered_chunk_is_rejected_at_that_chunk(index):
+    header, frames = _frames(_encrypt())
+    tampered = bytearray(frames[index])
+    tampered[10] ^= 0x01
+    frames[index] = bytes(tampered)
+
+    decryptor = StreamDecryptor()
+    recovered = decryptor.update(header + b"".join(frames[:index]))
+    assert recovered == PAYLOAD[:index * CHUNK]  # Everything before the bad chunk authenticated
+    with pytest.raises(EncryptionError, match=f"Chunk {index}"):
+        decryptor.update(frames[index])
+
+
+def test_reordered_chunks_are_rejected():
+    header, frames = _frames(_encrypt())
+    frames[1], frames[2] = frames[2], frames[1]
+    with pytest.raises(EncryptionError, match="Chunk 1"):
+        _decrypt(header + b"".join(frames))
+
+
+def test_truncated_stream_is_rejected():
+    header, frames = _frames(_encrypt())
+    with pytest.raises(EncryptionError, match="truncated"):
+        _decrypt(header + b"".join(frames[:-1]))
+
+
+def test_last_flag_cannot_be_forged_to_truncate():
+    header, frames = _frames(_encrypt())
+    forged = bytearray(frames[2])
+    forged[0] |= 0x80
+    with pytest.raises(EncryptionError, match="Chunk 2"):
+        _decrypt(header + b"".join(frames[:2]) + bytes(forged))
+
+
+def test_trailing_data_is_rejected():
+    with pytest.raises(EncryptionError, match="after the last chunk"):
+        _decrypt(_encrypt() + b"\x00\x00\x00\x10extra")
+
+
+def test_chunks_cannot_be_moved_between_streams():
+    header_a, frames_a = _frames(_encrypt())
+    _, frames_b = _frames(_encrypt())
+    with pytest.raises(EncryptionError, match="Chunk 0"):
+        _decrypt(header_a + frames_b[0] + b"".join(frames_a[1:]))
+
+
+def test_tampered_wrapped_key_is_rejected():
+    sealed = bytearray(_encrypt())
+    sealed[encryption_utils._HEADER_FIXED.size + 20] ^= 0x01
+    with pytest.raises(EncryptionError, match="unwrapped"):
+        _decrypt(bytes(sealed))
+
+
+def test_oversized_frame_is_rejected_before_buffering():
+    header, _ = _frames(_encrypt())
+    with pytest.raises(EncryptionError, match="larger than"):
+        StreamDecryptor().update(header + (CHUNK * 10).to_bytes(4, "big"))
+
+
+def test_encryptor_buffers_at_most_one_chunk():
+    encryptor = StreamEncryptor(CHUNK)
+    for i in range(0, len(PAYLOAD), 1000):
+        encryptor.update(PAYLOAD[i:i + 1000])
+        assert encryptor.buffered < CHUNK
+
+
+def test_streams_refuse_to_run_without_master_key(monkeypatch):
+    monkeypatch.setattr(encryption_utils, "_fernet", None)
+    with pytest.raises(EncryptionError):
+        StreamEncryptor()
+
+
+@pytest.mark.asyncio
+async def test_async_iterators_round_trip():
+    async def source(data, step):
+        for i in range(0, len(data), step):
+            yield data[i:i + step]
+
+    sealed = b"".join([piece async for piece in aiter_encrypt(source(PAYLOAD, 1500), CHUNK)])
+    assert _decrypt(sealed) == PAYLOAD
+    assert b"".join([piece async for piece in aiter_decrypt(source(sealed, 999))]) == PAYLOAD
+
+
+@pytest.mark.asyncio
+async def test_file_helpers(tmp_path):
+    (tmp_path / "in.bin").write_bytes(PAYLOAD)
+    await encrypt_file(str(tmp_path / "in.bin"), str(tmp_path / "in.sje"), CHUNK)
+    await decrypt_file(str(tmp_path / "in.sje"), str(tmp_path / "out.bin"))
+    assert (tmp_path / "out.bin").read_bytes() == PAYLOAD
+    assert PAYLOAD[:64] not in (tmp_path / "in.sje").read_bytes()
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import os
+import pytest
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from feature_flags import FeatureFlagManager, benchmark_flags
+
+
+FLAGS = {
+    "rollout": {"enabled": True, "rollout_percentage": 40},
+    "allowlist": {"enabled": True, "users": ["user_1", "user_2"]},
+    "tenants": {"enabled": True, "tenants": ["acme"]},
+    "combined": {"enabled": True, "rollout_percentage": 70, "users": ["user_3", "user_9"], "tenants": ["acme"]},
+    "disabled": {"enabled": False, "users": ["user_1"]},
+}
+
+
+def reference_is_enabled(flags, flag_name, user_id=None, tenant_id=None):
+    """The original list-scanning implementation, kept as the behavioural reference."""
+    flag_config = flags.get(flag_name)
+    if not flag_config:
+        return False
+    enabled = flag_config.get("enabled", False)
+    rollout_percentage = flag_config.get("rollout_percentage")
+    if rollout_percentage is not None and user_id:
+        if int(hashlib.sha256(user_id.encode()).hexdigest(), 16) % 100 >= rollout_percentage:
+            return False
+    if user_id and flag_config.get("users") and user_id not in flag_config["users"]:
+        return False
+    if tenant_id and flag_config.get("tenants") and tenant_id not in flag_config["tenants"]:
+        return False
+    return enabled
+
+
+@pytest.fixture
+def manager():
+    return FeatureFlagManager(FLAGS)
+
+
+def test_matches_reference_implementation(manager):
+    users = [None, ""] + [f"user_{i}" for i in range(500)]
+    for flag in list(FLAGS) + ["missing"]:
+        for user_id in users:
+            for tenant_id in (None, "acme", "other"):
+                assert manager.is_enabled(flag, user_id, tenant_id) == reference_is_enabled(FLAGS, flag, user_id, tenant_id), \
+                    (flag, user_id, tenant_id)
+
+
+def test_evaluate_all_agrees_with_is_enabled(manager):
+    for i in range(200):
+        user_id, tenant_id = f"user_{i}", ("acme", None)[i % 2]
+        assert manager.evaluate_all(user_id, tenant_id) == {
+            flag: manager.is_enabled(flag, user_id, tenant_id) for flag in FLAGS
+        }
+
+
+def test_reload_takes_effect_immediately(manager):
+    assert manager.is_enabled("allowlist", "user_1")
+    version = manager.version
+
+    manager.reload({"allowlist": {"enabled": False}})
+    assert manager.version == version + 1
+    assert not manager.is_enabled("allowlist", "user_1")
+    assert not manager.is_enabled("rollout", "user_1")  # Removed flags default to disabled
+
+
+def test_string_overrides_are_coerced():
+    manager = FeatureFlagManager({
+        "env_off": {"enabled": "false"},
+        "env_on": {"enabled": "true", "rollout_percentage": "100", "users": "a, b"},
+    })
+    assert not manager.is_enabled("env_off")
+    assert manager.is_enabled("env_on", "a")
+    assert not manager.is_enabled("env_on", "c")
+
+
+def test_missing_flag_warns_once_per_snapshot(manager, caplog):
+    with caplog.at_level("WARNING"):
+        for _ in range(100):
+            manager.is_enabled("missing")
+    assert sum("not found" in r.getMessage() for r in caplog.records) == 1
+
+
+def test_reload_from_file(manager, tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("feature_flags:\n  from_file:\n    enabled: true\n    tenants: [acme]\n")
+    manager.reload_from_file(str(path))
+    assert manager.is_enabled("from_file", tenant_id="acme")
+    assert not manager.is_enabled("from_file", tenant_id="other")
+    assert not manager.is_enabled("allowlist", "user_1")
+
+
+
+def test_reload_from_file_keeps_env_overrides(manager, tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text("feature_flags:\n  from_file:\n    enabled: true\n    rollout_percentage: 100\n")
+    monkeypatch.setenv("SHUJAA_FEATURE_FLAGS_FROM_FILE_ENABLED", "false")
+    manager.reload_from_file(str(path))
+    assert not manager.is_enabled("from_file", "user_1")
+
+@pytest.mark.asyncio
+async def test_watch_picks_up_file_changes(manager, tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("feature_flags:\n  watched:\n    enabled: false\n")
+    manager.reload_from_file(str(path))
+
+    watcher = asyncio.create_task(manager.watch(str(path), interval_seconds=0.01))
+    try:
+        await asyncio.sleep(0.05)  # Let the watcher record the starting mtime
+        path.write_text("feature_flags:\n  watched:\n    enabled: true\n")
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+        for _ in range(200):
+            if manager.is_enabled("watched"):
+                break
+            await asyncio.sleep(0.01)
+        assert manager.is_enabled("watched")
+    finally:
+        watcher.cancel()
+
+
+def test_benchmark_runs():
+    result = benchmark_flags(evaluations=4000, users=500, tenants=10)
+    assert result["is_enabled_per_s"] > 0
+    assert result["evaluate_all_flags_per_s"] > 0
@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+
+from gpu_fallback import HybridGPUManager, GPUResource, GPUSchedulerSimulator, TaskProfile
+
+NO_LOCAL_GPU = GPUResource("none", 0, 0, 0, 0, False)
+
+def _providers(slots=1):
+    return [{
+        "name": "cloud", "available": True,
+        "gpus": {
+            "SLOW": {"memory": 24, "cost_per_hour": 0.5, "performance_score": 100, "max_concurrency": slots},
+            "FAST": {"memory": 80, "cost_per_hour": 3.6, "performance_score": 400, "max_concurrency": slots},
+        },
+    }]
+
+def _manager(**kwargs):
+    kwargs.setdefault("cloud_providers", _providers())
+    kwargs.setdefault("cost_optimization_strategy", "expected_completion")
+    return HybridGPUManager(local_gpu=NO_LOCAL_GPU, cpu_slots=1, **kwargs)
+
+def _profile(**kwargs):
+    defaults = dict(task_type="image_generation", estimated_memory=8, estimated_time=40, priority=5, can_use_cpu=False)
+    defaults.update(kwargs)
+    return TaskProfile(**defaults)
+
+def test_prefers_fastest_resource_within_budget():
+    manager = _manager()
+    assert manager.select_best_resource(_profile())["name"] == "FAST"
+
+    # FAST costs 3.6 $/h * 10s = $0.01, SLOW 0.5 $/h * 40s = ~$0.0056
+    budget_manager = _manager(cost_budget_per_task=0.006)
+    assert budget_manager.select_best_resource(_profile())["name"] == "SLOW"
+    assert budget_manager.select_best_resource(_profile(max_cost=0.02))["name"] == "FAST"
+    # Nothing fits the budget -> cheapest
+    assert budget_manager.select_best_resource(_profile(max_cost=0.001))["name"] == "SLOW"
+
+def test_queue_depth_spills_over_to_idle_resource():
+    now = [0.0]
+    manager = _manager(clock=lambda: now[0])
+    profile = _profile()
+
+    first = manager.select_best_resource(profile)
+    for task_id in ("t1", "t2", "t3"):
+        resource = manager.select_best_resource(profile)
+        assert resource["name"] == "FAST"
+        manager._begin_task(task_id, resource, profile)
+    # FAST now has 30s of queued work, so a 40s run on idle SLOW finishes at the same time - cost breaks the tie
+    assert manager.select_best_resource(profile)["name"] == "SLOW"
+
+    manager._finish_task("t1", first, profile, run_time=10)
+    assert manager.in_flight["cloud:FAST"] == {"t2": pytest.approx(20.0), "t3": pytest.approx(30.0)}
+
+def test_warm_model_avoids_cold_start_penalty():
+    manager = _manager()
+    profile = _profile(model_name="sdxl", model_load_time=60)
+    slow = next(r for r in manager._get_eligible_resources(profile) if r["name"] == "SLOW")
+    slow["key"], slow["expected_completion"] = manager.resource_key(slow), 100
+
+    manager._begin_task("t0", slow, profile)
+    manager._finish_task("t0", slow, profile, run_time=40)
+    selected = manager.select_best_resource(profile)
+    assert selected["name"] == "SLOW"
+    assert selected["expected_completion"] == pytest.approx(40)
+
+def test_observed_durations_replace_profile_estimate():
+    manager = _manager()
+    profile = _profile()
+    fast = manager.select_best_resource(profile)
+    for run_time in (30, 31, 29):
+        manager._finish_task("t", fast, profile, run_time=run_time)
+
+    estimates = {r["name"]: manager.estimate_duration(profile, r) for r in manager._get_eligible_resources(profile)}
+    assert estimates["FAST"] == pytest.approx(30)
+    # Unseen resource estimates scale the observed work by relative speed
+    assert estimates["SLOW"] == pytest.approx(120)
+
+def test_performance_log_is_bounded():
+    manager = _manager(performance_log_size=3)
+    profile = _profile(can_use_cpu=True, estimated_memory=200)
+
+    for _ in range(5):
+        asyncio.run(manager.process_task(profile, lambda device="cpu": "ok"))
+
+    stats = manager.get_performance_stats()
+    assert len(stats["performance_log"]) == 3
+    assert stats["total_tasks"] == 5
+    assert stats["in_flight"] == {"local:cpu": 0}
+
+def test_simulator_compares_strategies_on_trace():
+    trace = [
+        {"started_at": 1000 + i, "task_type": "image_generation", "reference_time": 40, "estimated_memory": 8,
+         "can_use_cpu": False, "model_name": "sdxl", "model_load_time": 20}
+        for i in range(6)
+    ]
+    simulator = GPUSchedulerSimulator(local_gpu=NO_LOCAL_GPU, cloud_providers=_providers(), cpu_slots=1)
+    results = simulator.compare(trace, ["expected_completion", "low_cost", "high_performance"])
+
+    assert {r["tasks"] for r in results.values()} == {6}
+    assert results["low_cost"]["placements"] == {"cloud:SLOW": 6}
+    assert results["high_performance"]["placements"] == {"cloud:FAST": 6}
+    assert len(results["expected_completion"]["placements"]) == 2
+    assert results["expected_completion"]["makespan"] < results["low_cost"]["makespan"]
+    assert results["expected_completion"]["cold_starts"] == 2
+    assert simulator.run(trace) == results["expected_completion"]
+
+def test_balanced_stays_the_default_and_the_pipeline_opts_in():
+    from gpu_fallback import ShujaaGPUIntegration
+    assert HybridGPUManager(local_gpu=NO_LOCAL_GPU, cloud_providers=[]).cost_optimization_strategy == "balanced"
+    assert ShujaaGPUIntegration().gpu_manager.cost_optimization_strategy == "expected_completion"
@@ -0,0 +1,132 @@
+import os
+import pytest
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import i18n_utils
+from i18n_utils import TranslationCatalogs, benchmark_i18n, get_locale_from_request, gettext, negotiate_locale
+
+
+PO = '''
+msgid ""
+msgstr "Content-Type: text/plain; charset=UTF-8\\n"
+
+msgid "hello_world"
+msgstr "Habari, Dunia!"
+
+msgid "welcome_user"
+msgstr "Karibu, {name}!"
+
+msgid "untranslated"
+msgstr ""
+
+#, fuzzy
+msgid "guess"
+msgstr "Kisio"
+'''
+
+
+def write_po(root, lang_code, content=PO):
+    locale_dir = root / lang_code / "LC_MESSAGES"
+    locale_dir.mkdir(parents=True, exist_ok=True)
+    (locale_dir / "messages.po").write_text(content, encoding="utf-8")
+    return locale_dir / "messages.po"
+
+
+@pytest.fixture
+def catalogs(tmp_path):
+    write_po(tmp_path, "sw")
+    store = TranslationCatalogs(str(tmp_path), cache_files=True)
+    with patch.object(i18n_utils, "translation_catalogs", store):
+        yield store
+
+
+class Request:
+    def __init__(self, accept_language=None):
+        self.headers = {"Accept-Language": accept_language} if accept_language else {}
+
+
+def test_lookup_and_interpolation(catalogs):
+    assert gettext("hello_world", locale="sw") == "Habari, Dunia!"
+    assert gettext("welcome_user", locale="sw", name="Amani") == "Karibu, Amani!"
+    assert gettext("welcome_user", locale="sw", name=["unhashable"]) == "Karibu, ['unhashable']!"
+    assert gettext("welcome_user", locale="sw") == "Karibu, {name}!"
+    assert gettext("welcome_user", locale="sw", other=1) == "Karibu, {name}!"  # Missing variable
+
+
+def test_untranslated_header_and_fuzzy_entries_fall_back_to_id(catalogs):
+    assert gettext("untranslated", locale="sw") == "untranslated"
+    assert gettext("guess", locale="sw") == "guess"
+    assert "" not in catalogs.get("sw").messages
+
+
+def test_po_is_parsed_once(catalogs):
+    with patch.object(i18n_utils, "_po_messages", wraps=i18n_utils._po_messages) as parse:
+        for _ in range(100):
+            gettext("hello_world", locale="sw")
+    assert parse.call_count == 1
+
+
+def test_binary_cache_is_reused_until_source_changes(catalogs, tmp_path):
+    catalogs.get("sw")
+    assert (tmp_path / "sw" / "LC_MESSAGES" / "messages.cache").exists()
+
+    fresh = TranslationCatalogs(str(tmp_path), cache_files=True)
+    with patch.object(i18n_utils, "_po_messages", wraps=i18n_utils._po_messages) as parse:
+        assert fresh.get("sw").messages["hello_world"] == "Habari, Dunia!"
+        assert parse.call_count == 0
+
+        po_path = write_po(tmp_path, "sw", 'msgid "hello_world"\nmsgstr "Jambo, Dunia!"\n')
+        stat = po_path.stat()
+        os.utime(po_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert TranslationCatalogs(str(tmp_path), cache_files=True).get("sw").messages["hello_world"] == "Jambo, Dunia!"
+        assert parse.call_count == 1
+
+
+def test_reload_swaps_in_edited_catalog(catalogs, tmp_path):
+    assert gettext("hello_world", locale="sw") == "Habari, Dunia!"
+    po_path = write_po(tmp_path, "sw", 'msgid "hello_world"\nmsgstr "Jambo!"\n')
+    stat = po_path.stat()
+    os.utime(po_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    catalogs.reload()
+    assert gettext("hello_world", locale="sw") == "Jambo!"
+
+
+def test_missing_locale_warns_once(catalogs, caplog):
+    with caplog.at_level("WARNING"):
+        for _ in range(10):
+            assert gettext("hello_world", locale="zz") == "hello_world"
+    assert sum("not found" in r.getMessage() for r in caplog.records) == 1
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("en-US,en;q=0.9", "en"),
+    ("sw-KE,sw;q=0.9", "sw"),
+    ("de-DE,fr;q=0.5,sw;q=0.8", "sw"),
+    ("fr;q=0,sw;q=0.1", "sw"),
+    ("de-DE,de;q=0.9", "en"),
+    ("*", "en"),
+    ("SW_ke", "sw"),
+])
+def test_negotiate_locale(header, expected):
+    assert negotiate_locale(header, ("en", "sw", "fr"), "en") == expected
+
+
+def test_locale_negotiation_is_memoised_per_header():
+    negotiate_locale.cache_clear()
+    for _ in range(20):
+        assert get_locale_from_request(Request("sw-KE,sw;q=0.9")) == "sw"
+    assert get_locale_from_request(Request()) == "en"
+    info = negotiate_locale.cache_info()
+    assert (info.misses, info.hits) == (1, 19)
+
+
+def test_benchmark_runs():
+    result = benchmark_i18n(locales=3, templates=20, requests=200)
+    assert result["request_us"] > 0
+    assert result["load_from_cache_ms_per_locale"] > 0
@@ -0,0 +1,235 @@
+import base64
+import json
+import subprocess
+import pytest
+from unittest.mock import MagicMock, patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from enhanced_model_router import GenerationResult
+from offline_video_maker import generate_video as offline
+from offline_video_maker.render_manifest import MANIFEST_NAME, RenderManifest, scene_fingerprint, validate_project_id
+from pipeline_metrics import pipeline_metrics
+from scene_asset_store import SceneAssetStore
+
+SCENES = [f"Line number {i} about Kenyan innovators building the future" for i in range(10)]
+
+
+class StubRouter:
+    """Splits each script line into one scene; narration length (and so clip duration) follows the scene text."""
+
+    def __init__(self, sentences):
+        self.sentences = list(sentences)
+        self.prompts = {"image": [], "audio": [], "text": []}
+
+    def scene_text(self, line):
+        return line
+
+    async def route_generation(self, request):
+        self.prompts[request.type].append(request.prompt)
+        if request.type == "audio":
+            return GenerationResult(True, content_url="data:audio/wav;base64," + base64.b64encode(request.prompt.encode() * 10).decode())
+        if request.type == "image":
+            return GenerationResult(True, content_url="data:image/png;base64," + base64.b64encode(request.prompt.encode()).decode())
+        text = self.scene_text(request.prompt.split("Story: ", 1)[1])
+        return GenerationResult(True, metadata={"generated_text": f"Scene 1: {text}. Visual: {text.lower()}"})
+
+
+class DriftingRouter(StubRouter):
+    """An LLM that words the same line differently every time it is asked."""
+
+    def scene_text(self, line):
+        return f"{line} (take {len(self.prompts['text'])})"
+
+
+class FakeFFmpeg:
+    """Media files hold 'DUR=<seconds>'; a scene clip lasts as long as its narration (bytes / 1000)."""
+
+    def __init__(self):
+        self.calls = {"render": 0, "concat": 0, "export": 0}
+
+    @staticmethod
+    def duration(path):
+        return float(Path(path).read_text().split("DUR=")[1].split()[0])
+
+    def __call__(self, cmd, *args, **kwargs):
+        out = Path(cmd[-1])
+        if cmd[0] == "ffprobe":
+            return subprocess.CompletedProcess(cmd, 0, f"{self.duration(out)}\n", "")
+        if "-loop" in cmd:
+            self.calls["render"] += 1
+            image, audio = Path(cmd[cmd.index("-i") + 1]), Path(cmd[cmd.index("-i", cmd.index("-i") + 1) + 1])
+            out.write_text(f"DUR={audio.stat().st_size / 1000} IMG={image.read_bytes().hex()[:16]}")
+        elif "concat" in cmd:
+            self.calls["concat"] += 1
+            total, pending = 0.0, None
+            for line in Path(cmd[cmd.index("-i") + 1]).read_text().splitlines():
+                if line.startswith("file "):
+                    pending = self.duration(line[6:-1])
+                    total += pending
+                elif line.startswith("duration "):
+                    total += float(line.split()[1]) - pending  # The concat list's duration wins
+            out.write_text(f"DUR={total:.6f}")
+        elif "-vf" in cmd:
+            self.calls["export"] += 1
+            out.write_text(f"DUR={self.duration(cmd[cmd.index('-i') + 1])} FMT={cmd[cmd.index('-vf') + 1]}")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+@pytest.fixture
+def ffmpeg():
+    return FakeFFmpeg()
+
+
+@pytest.fixture
+def maker(tmp_path, monkeypatch, ffmpeg):
+    monkeypatch.chdir(tmp_path)
+    with patch.object(offline, "initialize_cache"), \
+            patch.object(offline, "scene_asset_store", SceneAssetStore(tmp_path / "assets", enabled=False)), \
+            patch.object(pipeline_metrics, "event_writer", None), \
+            patch.object(subprocess, "run", side_effect=ffmpeg), \
+            patch.dict(sys.modules, {"moviepy": None, "moviepy.editor": None}):
+        video_maker = offline.OfflineVideoMaker()
+        video_maker.enable_parallel = False
+        video_maker.enable_social = False
+        video_maker.video_effects = MagicMock()
+        yield video_maker
+
+
+def expected_duration(sentences):
+    # Narration bytes = (text + ".") * 10, as StubRouter encodes it
+    return round(sum(len((text + ".").encode()) * 10 / 1000 for text in sentences), 6)
+
+
+def render(maker, router, aspect_ratio="all"):
+    script = "\n".join(router.sentences)
+    return maker.generate_video(script, aspect_ratio=aspect_ratio, enhanced_router=router, project_id="demo")
+
+
+def test_first_render_builds_every_scene(maker, ffmpeg, tmp_path):
+    router = StubRouter(SCENES)
+    final = render(maker, router)
+
+    manifest = RenderManifest.load(final.parent, "demo")
+    assert final == tmp_path / "output" / "projects" / "demo" / "demo.mp4"
+    assert len(router.prompts["image"]) == len(router.prompts["audio"]) == 10
+    assert ffmpeg.calls == {"render": 10, "concat": 4, "export": 30}
+    assert len(manifest.scenes) == 10 and set(manifest.formats) == {"landscape", "portrait", "square"}
+    assert manifest.duration == expected_duration(SCENES)
+    assert FakeFFmpeg.duration(final) == pytest.approx(manifest.duration, abs=1e-6)
+
+
+def test_editing_one_scene_rerenders_only_that_scene(maker, ffmpeg):
+    router = StubRouter(SCENES)
+    render(maker, router)
+    before = RenderManifest.load(maker.output_dir / "projects" / "demo", "demo")
+
+    edited = list(SCENES)
+    edited[6] = "A brand new line about a Mombasa marine biologist tagging turtles at dawn"
+    router.sentences = edited
+    router.prompts = {"image": [], "audio": [], "text": []}
+    ffmpeg.calls = {"render": 0, "concat": 0, "export": 0}
+    final = render(maker, router)
+
+    assert len(router.prompts["text"]) == 1 and router.prompts["text"][0].endswith(edited[6])  # Only the edited line is re-split
+    assert [p.rstrip(".") for p in router.prompts["audio"]] == [edited[6]]
+    assert len(router.prompts["image"]) == 1 and edited[6].lower() in router.prompts["image"][0]
+    assert ffmpeg.calls == {"render": 1, "concat": 4, "export": 3}  # One clip; three format segments; stream-copy merges
+
+    after = RenderManifest.load(final.parent, "demo")
+    changed = [i for i, (a, b) in enumerate(zip(before.scenes, after.scenes)) if a.fingerprint != b.fingerprint]
+    assert changed == [6]
+    assert [e.clip for i, e in enumerate(after.scenes) if i != 6] == [e.clip for i, e in enumerate(before.scenes) if i != 6]
+    assert after.duration == expected_duration(edited)
+    for name in ("demo.mp4", "demo_landscape.mp4", "demo_portrait.mp4", "demo_square.mp4"):
+        assert FakeFFmpeg.duration(final.parent / name) == pytest.approx(after.duration, abs=1e-6)
+    # The replaced scene's clip and format segments are pruned
+    assert not (final.parent / before.scenes[6].clip).exists()
+    assert len(list((final.parent / "scenes").iterdir())) == 40
+
+
+def test_unchanged_script_renders_nothing_and_moved_scenes_are_reused(maker, ffmpeg):
+    router = StubRouter(SCENES)
+    render(maker, router, aspect_ratio="landscape")
+    ffmpeg.calls = {"render": 0, "concat": 0, "export": 0}
+
+    router.sentences = SCENES[5:] + SCENES[:5]
+    render(maker, router, aspect_ratio="landscape")
+    assert ffmpeg.calls == {"render": 0, "concat": 1, "export": 0}
+    assert len(router.prompts["audio"]) == 10  # Only the first render generated narration
+    assert len(router.prompts["text"]) == 10  # Moved lines keep their stored breakdown
+
+
+def test_non_deterministic_router_does_not_invalidate_unchanged_lines(maker, ffmpeg):
+    router = DriftingRouter(SCENES)
+    render(maker, router, aspect_ratio="landscape")
+    before = RenderManifest.load(maker.output_dir / "projects" / "demo", "demo")
+    ffmpeg.calls = {"render": 0, "concat": 0, "export": 0}
+
+    final = render(maker, router, aspect_ratio="landscape")
+    assert len(router.prompts["text"]) == 10  # The second render asked the LLM nothing
+    assert ffmpeg.calls == {"render": 0, "concat": 1, "export": 0}
+    assert RenderManifest.load(final.parent, "demo").scenes == before.scenes
+
+
+def test_explicit_scenes_skip_the_breakdown(maker, ffmpeg):
+    router = StubRouter(SCENES)
+    scenes = [{"text": text, "description": text.lower()} for text in SCENES[:3]]
+    maker.generate_video("ignored", aspect_ratio="landscape", enhanced_router=router, project_id="demo", scenes=scenes)
+    assert router.prompts["text"] == []
+    assert ffmpeg.calls["render"] == 3
+
+    scenes[1] = {"text": "A rewritten middle scene"}
+    ffmpeg.calls = {"render": 0, "concat": 0, "export": 0}
+    maker.generate_video("ignored", aspect_ratio="landscape", enhanced_router=router, project_id="demo", scenes=scenes)
+    assert ffmpeg.calls == {"render": 1, "concat": 1, "export": 0}
+    assert router.prompts["audio"][-1] == "A rewritten middle scene"
+
+
+def test_parallel_mode_renders_and_rerenders_project_scenes(maker, ffmpeg):
+    maker.enable_parallel = True  # SHUJAA_PARALLEL=true
+    router = StubRouter(SCENES)
+    final = render(maker, router, aspect_ratio="landscape")
+    assert ffmpeg.calls["render"] == 10
+    assert len(router.prompts["audio"]) == len(router.prompts["image"]) == 10
+
+    router.sentences = SCENES[:3] + ["A fresh line about a Nakuru flamingo census"] + SCENES[4:]
+    ffmpeg.calls = {"render": 0, "concat": 0, "export": 0}
+    render(maker, router, aspect_ratio="landscape")
+    assert ffmpeg.calls == {"render": 1, "concat": 1, "export": 0}
+    assert RenderManifest.load(final.parent, "demo").duration == expected_duration(router.sentences)
+
+
+def test_missing_clip_is_rerendered(maker, ffmpeg):
+    router = StubRouter(SCENES)
+    final = render(maker, router, aspect_ratio="landscape")
+    manifest = RenderManifest.load(final.parent, "demo")
+    (final.parent / manifest.scenes[2].clip).unlink()
+    ffmpeg.calls = {"render": 0, "concat": 0, "export": 0}
+
+    render(maker, router, aspect_ratio="landscape")
+    assert ffmpeg.calls["render"] == 1
+
+
+def test_fingerprint_ignores_position_but_not_content():
+    scene = {"id": "scene1", "scene_number": 1, "total_scenes": 5, "text": "Habari", "description": "Sunrise"}
+    moved = {**scene, "id": "scene4", "scene_number": 4}
+    assert scene_fingerprint(scene, dialect="sw") == scene_fingerprint(moved, dialect="sw")
+    assert scene_fingerprint(scene, dialect="sw") != scene_fingerprint({**scene, "text": "Jambo"}, dialect="sw")
+    assert scene_fingerprint(scene, dialect="sw") != scene_fingerprint(scene, dialect="sheng")
+
+
+def test_corrupt_or_old_manifest_starts_fresh(tmp_path):
+    (tmp_path / MANIFEST_NAME).write_text("{not json")
+    assert RenderManifest.load(tmp_path, "demo").scenes == []
+    (tmp_path / MANIFEST_NAME).write_text(json.dumps({"version": 0, "scenes": [{"fingerprint": "x", "clip": "y"}]}))
+    assert RenderManifest.load(tmp_path, "demo").scenes == []
+
+
+@pytest.mark.parametrize("project_id", ["../etc", "a/b", "", ".hidden", "x" * 200])
+def test_project_ids_cannot_escape_projects_dir(project_id):
+    with pytest.raises(ValueError):
+        validate_project_id(project_id)
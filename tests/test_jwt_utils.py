@@ -0,0 +1,157 @@
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from auth import jwt_utils
+from auth.jwt_utils import VerifiedTokenCache, create_jwt, verify_jwt
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache():
+    fresh = VerifiedTokenCache(max_entries=3, max_ttl_seconds=900, clock=FakeClock(time.time()))
+    with patch.object(jwt_utils, "token_cache", fresh), patch.object(jwt_utils, "_revocation_hooks", []):
+        yield fresh
+
+
+@pytest.fixture
+def signature_checks():
+    with patch.object(jwt_utils, "_verify_signature", wraps=jwt_utils._verify_signature) as spy:
+        yield spy
+
+
+@pytest.fixture
+def restore_keys():
+    saved = (jwt_utils._private_key, jwt_utils._public_key, jwt_utils._signing_kid, dict(jwt_utils._verification_keys))
+    yield
+    jwt_utils._private_key, jwt_utils._public_key, jwt_utils._signing_kid = saved[:3]
+    jwt_utils._verification_keys.clear()
+    jwt_utils._verification_keys.update(saved[3])
+
+
+def _token(**claims):
+    claims.setdefault("user_id", "u1")
+    return jwt.encode(claims, jwt_utils._private_key, algorithm="RS256", headers={"kid": jwt_utils._signing_kid})
+
+
+def test_repeat_verification_skips_signature_check(cache, signature_checks):
+    token = create_jwt({"user_id": "u1"})
+    claims = [verify_jwt(token) for _ in range(50)]
+
+    assert signature_checks.call_count == 1
+    assert all(c["user_id"] == "u1" for c in claims)
+    assert cache.stats["hits"] == 49
+    claims[0]["user_id"] = "tampered"
+    assert verify_jwt(token)["user_id"] == "u1"
+
+
+def test_cached_token_expires_exactly_at_exp(cache):
+    exp = int(time.time()) + 60
+    token = _token(exp=exp)
+    verify_jwt(token)
+
+    cache.clock.now = exp - 0.001
+    assert verify_jwt(token)["user_id"] == "u1"
+    cache.clock.now = exp
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verify_jwt(token)
+
+
+def test_cold_and_cached_paths_agree_on_nbf(cache):
+    nbf = int(time.time()) + 60
+    token = _token(nbf=nbf, exp=nbf + 60)
+    with pytest.raises(jwt.ImmatureSignatureError):
+        verify_jwt(token)
+    assert len(cache._entries) == 0
+
+
+def test_entries_never_outlive_max_ttl(cache, signature_checks):
+    token = _token(exp=int(time.time()) + 3600)
+    verify_jwt(token)
+    cache.clock.now += 901
+    verify_jwt(token)
+    assert signature_checks.call_count == 2
+
+
+def test_revoked_token_is_rejected_even_when_cached(cache):
+    token = create_jwt({"user_id": "u1"})
+    other = create_jwt({"user_id": "u2"})
+    verify_jwt(token)
+    verify_jwt(other)
+
+    jwt_utils.revoke_token(token)
+    with pytest.raises(jwt.InvalidTokenError, match="revoked"):
+        verify_jwt(token)
+    assert verify_jwt(other)["user_id"] == "u2"
+
+
+def test_revocation_hook_runs_on_cached_hits(cache):
+    token = create_jwt({"user_id": "banned"})
+    verify_jwt(token)
+    jwt_utils.register_revocation_hook(lambda claims: claims.get("user_id") == "banned")
+    with pytest.raises(jwt.InvalidTokenError):
+        verify_jwt(token)
+
+
+def test_cache_is_bounded(cache):
+    tokens = [create_jwt({"user_id": f"u{i}"}) for i in range(5)]
+    for token in tokens:
+        verify_jwt(token)
+    assert len(cache._entries) == 3
+
+
+def test_rotation_keeps_old_tokens_and_cache(cache, signature_checks, restore_keys):
+    old_token = create_jwt({"user_id": "u1"})
+    verify_jwt(old_token)
+    old_kid = jwt_utils._signing_kid
+
+    new_kid = jwt_utils.rotate_signing_key(rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    new_token = create_jwt({"user_id": "u2"})
+    assert jwt.get_unverified_header(new_token)["kid"] == new_kid != old_kid
+
+    assert verify_jwt(old_token)["user_id"] == "u1"
+    assert verify_jwt(new_token)["user_id"] == "u2"
+    assert signature_checks.call_count == 2  # Old token stayed cached across the rotation
+
+    jwt_utils.retire_key(old_kid)
+    with pytest.raises(jwt.InvalidTokenError, match="Unknown signing key"):
+        verify_jwt(old_token)
+    assert verify_jwt(new_token)["user_id"] == "u2"
+
+
+def test_active_signing_key_cannot_be_retired(restore_keys):
+    with pytest.raises(ValueError):
+        jwt_utils.retire_key(jwt_utils._signing_kid)
+
+
+def test_tokens_without_kid_use_current_key(cache):
+    token = jwt.encode({"user_id": "legacy", "exp": int(time.time()) + 60}, jwt_utils._private_key, algorithm="RS256")
+    assert verify_jwt(token)["user_id"] == "legacy"
+
+
+def test_forged_token_is_not_cached(cache):
+    forger = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    forged = jwt.encode({"user_id": "admin"}, forger, algorithm="RS256", headers={"kid": jwt_utils._signing_kid})
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidSignatureError):
+            verify_jwt(forged)
+    assert len(cache._entries) == 0
+
+
+def test_benchmark_reports_cached_speedup(cache):
+    result = jwt_utils.benchmark_verify(iterations=50)
+    assert result["cached_us"] < result["cold_us"]
@@ -0,0 +1,151 @@
+import re
+import shutil
+import subprocess
+import pytest
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from offline_video_maker.helpers import media_utils
+from offline_video_maker.helpers.media_utils import MediaUtils, RenderPlan
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+@pytest.fixture
+def utils():
+    return MediaUtils()
+
+
+def _full_plan(utils, tmp_path, img="scene.png", voice="voice.wav", music="bed.wav", srt="subs.srt"):
+    return (
+        utils.render_plan()
+        .scene(str(tmp_path / img))
+        .narration(str(tmp_path / voice))
+        .music(str(tmp_path / music), 0.3)
+        .subtitles(str(tmp_path / srt))
+        .output(str(tmp_path / "final.mp4"))
+        .output(str(tmp_path / "whatsapp.mp4"), "whatsapp")
+        .output(str(tmp_path / "tiktok.mp4"), "tiktok")
+    )
+
+
+def test_plan_renders_every_output_in_one_invocation(utils, tmp_path):
+    with patch.object(media_utils.subprocess, "run") as run:
+        assert _full_plan(utils, tmp_path).render()
+    assert run.call_count == 1
+
+
+def test_chained_steps_cost_one_invocation_each(utils, tmp_path):
+    for name in ("scene.png", "voice.wav", "bed.wav", "subs.srt", "scene.mp4", "mixed.aac", "subbed.mp4"):
+        (tmp_path / name).write_bytes(b"")
+    p = lambda name: str(tmp_path / name)
+    with patch.object(media_utils.subprocess, "run") as run:
+        assert utils.mix_audio(p("voice.wav"), p("bed.wav"), p("mixed.aac"))
+        assert utils.make_scene_video(p("scene.png"), p("mixed.aac"), p("scene.mp4"))
+        assert utils.burn_subtitles(p("scene.mp4"), p("subs.srt"), p("subbed.mp4"))
+        assert utils.create_whatsapp_preset(p("subbed.mp4"), p("whatsapp.mp4"))
+        assert utils.create_tiktok_preset(p("subbed.mp4"), p("tiktok.mp4"))
+    assert run.call_count == 5
+
+
+def test_graph_decodes_once_and_splits_per_output(utils, tmp_path):
+    cmd = _full_plan(utils, tmp_path).build_command()
+    graph = cmd[cmd.index("-filter_complex") + 1]
+
+    assert cmd.count("-filter_complex") == 1
+    assert graph.count("subtitles=") == 1
+    assert graph.count("amix=") == 1
+    assert "split=3" in graph and "asplit=3" in graph
+    assert "scale=720:1280" in graph and "scale=1080:1920" in graph
+
+    # Every filter label feeding an output is consumed exactly once
+    maps = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-map"]
+    assert len(maps) == 6 and len(set(maps)) == 6
+    for label in maps:
+        assert graph.count(label) == 1
+
+
+def test_presets_keep_their_encoding(utils, tmp_path):
+    cmd = _full_plan(utils, tmp_path).build_command()
+    outputs = {}
+    start = cmd.index("-filter_complex") + 2
+    for i, arg in enumerate(cmd[start:], start):
+        if arg.endswith(".mp4"):
+            outputs[Path(arg).name] = cmd[start:i]
+            start = i + 1
+
+    assert outputs["whatsapp.mp4"][outputs["whatsapp.mp4"].index("-crf") + 1] == "28"
+    assert outputs["whatsapp.mp4"][outputs["whatsapp.mp4"].index("-b:a") + 1] == "96k"
+    assert outputs["tiktok.mp4"][outputs["tiktok.mp4"].index("-b:v") + 1] == "2500k"
+    assert "-tune" in outputs["final.mp4"] and "-shortest" in outputs["final.mp4"]
+
+
+def test_unfiltered_streams_are_mapped_directly():
+    cmd = RenderPlan().video("in.mp4").output("out.mp4", "master").build_command()
+    assert "-filter_complex" not in cmd
+    assert cmd[cmd.index("-map") + 1] == "0:v"
+
+
+def test_filtered_audio_cannot_be_stream_copied():
+    plan = RenderPlan().video("in.mp4").narration("voice.wav", 0.8)
+    plan.output("out.mp4", media_utils.OutputPreset(audio_args=("-c:a", "copy")))
+    with pytest.raises(ValueError):
+        plan.build_command()
+
+
+def test_padded_preset_letterboxes_instead_of_stretching():
+    preset = media_utils.OutputPreset(scale=(720, 1280), pad="black")
+    cmd = RenderPlan().video("in.mp4").output("out.mp4", preset).build_command()
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "scale=720:1280:force_original_aspect_ratio=decrease,pad=720:1280:(ow-iw)/2:(oh-ih)/2:black" in graph
+
+
+def _ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", *args], check=True)
+
+
+def _probe(path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type,width,height:format=duration", "-of", "default=nw=1", str(path)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return out
+
+
+def _psnr(a, b):
+    result = subprocess.run(["ffmpeg", "-i", str(a), "-i", str(b), "-lavfi", "psnr", "-f", "null", "-"], capture_output=True, text=True)
+    match = re.search(r"average:(\S+)", result.stderr)
+    return float("inf") if match.group(1) == "inf" else float(match.group(1))
+
+
+@requires_ffmpeg
+def test_single_pass_matches_chained_output(utils, tmp_path):
+    _ffmpeg("-f", "lavfi", "-i", "testsrc=size=320x568:duration=1", "-frames:v", "1", str(tmp_path / "scene.png"))
+    _ffmpeg("-f", "lavfi", "-i", "sine=frequency=440:duration=2", str(tmp_path / "voice.wav"))
+    _ffmpeg("-f", "lavfi", "-i", "sine=frequency=220:duration=3", str(tmp_path / "bed.wav"))
+    (tmp_path / "subs.srt").write_text("1\n00:00:00,000 --> 00:00:01,500\nHabari\n", encoding="utf-8")
+
+    chained = tmp_path / "chained"
+    chained.mkdir()
+    p = lambda name: str(tmp_path / name)
+    c = lambda name: str(chained / name)
+    assert utils.mix_audio(p("voice.wav"), p("bed.wav"), c("mixed.m4a"))
+    assert utils.make_scene_video(p("scene.png"), c("mixed.m4a"), c("scene.mp4"))
+    assert utils.burn_subtitles(c("scene.mp4"), p("subs.srt"), c("final.mp4"))
+    assert utils.create_whatsapp_preset(c("final.mp4"), c("whatsapp.mp4"))
+
+    plan = (utils.render_plan().scene(p("scene.png")).narration(p("voice.wav")).music(p("bed.wav"), 0.3)
+            .subtitles(p("subs.srt")).output(p("final.mp4")).output(p("whatsapp.mp4"), "whatsapp"))
+    assert plan.render()
+
+    for name in ("final.mp4", "whatsapp.mp4"):
+        single, multi = _probe(tmp_path / name), _probe(chained / name)
+        assert re.findall(r"(?:width|height|codec_type)=\S+", single) == re.findall(r"(?:width|height|codec_type)=\S+", multi)
+        durations = [float(re.search(r"duration=(\S+)", out).group(1)) for out in (single, multi)]
+        assert durations[0] == pytest.approx(durations[1], abs=0.15)
+        # Fewer generations can only bring the single pass closer to the source
+        assert _psnr(tmp_path / name, chained / name) > 30
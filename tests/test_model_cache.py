@@ -0,0 +1,149 @@
+import threading
+import pytest
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from offline_video_maker.model_cache import ModelCache
+
+MB = 1024**2
+
+class FakeModel:
+    def __init__(self, name, nbytes):
+        self.name = name
+        self.nbytes = nbytes
+
+def _cache(tmp_path, budget_mb=100, policy="lru", **sizes_mb):
+    loads = []
+    def loader(name, size):
+        def load():
+            loads.append(name)
+            return FakeModel(name, size * MB)
+        return load
+    cache = ModelCache(
+        memory_budget_bytes=budget_mb * MB, eviction_policy=policy, cache_dir=str(tmp_path),
+        loaders={name: loader(name, size) for name, size in sizes_mb.items()},
+    )
+    return cache, loads
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache, loads = _cache(tmp_path, a=10)
+    assert cache.get_model("a").name == "a"
+    assert cache.get_model("a").name == "a"
+
+    stats = cache.get_cache_stats()
+    assert loads == ["a"]
+    assert (stats["cache_hits"], stats["cache_misses"]) == (1, 1)
+    assert stats["cached_bytes"] == 10 * MB
+
+def test_lru_eviction_keeps_within_budget(tmp_path):
+    cache, loads = _cache(tmp_path, budget_mb=100, a=40, b=40, c=40)
+    cache.get_model("a")
+    cache.get_model("b")
+    cache.get_model("a")  # b is now least recently used
+    cache.get_model("c")
+
+    stats = cache.get_cache_stats()
+    assert sorted(stats["cached_models"]) == ["a", "c"]
+    assert stats["evictions"] == 1
+    assert stats["cached_bytes"] <= 100 * MB
+
+def test_lfu_eviction_prefers_rarely_used(tmp_path):
+    cache, _ = _cache(tmp_path, budget_mb=100, policy="lfu", a=40, b=40, c=40)
+    for _ in range(4):
+        cache.get_model("a")
+    cache.get_model("b")
+    cache.get_model("b")  # a is least recently used, b least frequently used
+    cache.get_model("c")
+    assert sorted(cache.get_cache_stats()["cached_models"]) == ["a", "c"]
+
+def test_in_use_and_pinned_models_are_never_evicted(tmp_path):
+    cache, _ = _cache(tmp_path, budget_mb=100, a=40, b=40, c=40)
+    cache.pin("a")
+    cache.get_model("a")
+    with cache.acquire("b") as model:
+        with pytest.raises(MemoryError):
+            cache.acquire("c")
+        assert model.name == "b"
+        assert "b" in cache.get_cache_stats()["cached_models"]
+
+    # Once released, b becomes evictable
+    with cache.acquire("c"):
+        pass
+    stats = cache.get_cache_stats()
+    assert sorted(stats["cached_models"]) == ["a", "c"]
+    assert stats["rejected_loads"] == 1
+
+def test_clear_cache_skips_models_in_use(tmp_path):
+    cache, _ = _cache(tmp_path, a=10, b=10)
+    cache.get_model("a")
+    handle = cache.acquire("b")
+    cache.clear_cache()
+    assert cache.get_cache_stats()["cached_models"] == ["b"]
+    handle.release()
+    cache.clear_cache("b")
+    assert cache.get_cache_stats()["cached_models"] == []
+
+def test_concurrent_misses_load_once(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    def slow_load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return FakeModel("slow", MB)
+    cache = ModelCache(memory_budget_bytes=10 * MB, cache_dir=str(tmp_path), loaders={"slow": slow_load})
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_model("slow"))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert len({id(r) for r in results}) == 1
+
+def test_unknown_model_returns_none(tmp_path):
+    cache, _ = _cache(tmp_path)
+    assert cache.get_model("nope") is None
+
+def test_measured_footprint_overrides_size_table(tmp_path):
+    cache, _ = _cache(tmp_path, a=10)
+    cache.model_sizes["a"] = 50 * MB  # Table guess; the loaded model measures 10MB
+    cache.get_model("a")
+    assert cache.get_cache_stats()["cached_bytes"] == 10 * MB
+
+    cache.loaders["opaque"] = lambda: "unmeasurable"
+    cache.model_sizes["opaque"] = 30 * MB
+    cache.get_model("opaque")
+    assert cache.get_cache_stats()["usage_stats"]["opaque"]["size_bytes"] == 30 * MB
+
+def test_get_model_evicts_idle_models_and_retries_once_on_oom(tmp_path):
+    cache, loads = _cache(tmp_path, budget_mb=100, a=20)
+    cache.get_model("a")
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise MemoryError("CUDA out of memory")
+        return FakeModel("big", 30 * MB)
+    cache.loaders["big"] = flaky
+
+    assert cache.get_model("big").name == "big"
+    assert len(attempts) == 2
+    assert cache.get_cache_stats()["cached_models"] == ["big"]  # The idle model was evicted to make room
+
+def test_get_model_raises_when_retry_also_runs_out_of_memory(tmp_path):
+    cache, _ = _cache(tmp_path)
+    def always_oom():
+        raise MemoryError("CUDA out of memory")
+    cache.loaders["big"] = always_oom
+    with pytest.raises(MemoryError):
+        cache.get_model("big")
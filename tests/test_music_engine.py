@@ -0,0 +1,115 @@
+import array
+import math
+import wave
+import pytest
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from offline_video_maker import music_engine
+from offline_video_maker.music_engine import MusicEngine, crossfade_loop
+
+RATE = 8000
+
+
+def _write_track(path, seconds=2.03, freq=220, channels=1):
+    # 2.03s of 220 Hz does not end on a whole period, so a naive loop clicks at the seam
+    samples = array.array("h")
+    for n in range(int(seconds * RATE)):
+        value = int(8000 * math.sin(2 * math.pi * freq * n / RATE))
+        samples.extend([value] * channels)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return path
+
+
+def _read(path):
+    with wave.open(str(path), "rb") as wav:
+        return array.array("h", wav.readframes(wav.getnframes())), wav.getparams()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    _write_track(tmp_path / "storytelling_background.wav")
+    return MusicEngine(tmp_path, bucket_seconds=5.0, crossfade_seconds=0.25)
+
+
+def test_near_identical_durations_share_one_bed(engine):
+    first = engine._get_music_track("storytelling", 10.2)
+    second = engine._get_music_track("storytelling", 11.7)
+
+    assert first == second
+    assert engine.stats == {"bed_hits": 1, "bed_renders": 1, "loop_renders": 1, "evictions": 0}
+    samples, params = _read(first)
+    assert params.nframes == 15 * RATE  # 10.2s and 11.7s both round up to the 15s bucket
+
+
+def test_new_bucket_reuses_loop_unit(engine):
+    engine._get_music_track("storytelling", 4.0)
+    engine._get_music_track("storytelling", 22.0)
+    assert engine.stats["bed_renders"] == 2
+    assert engine.stats["loop_renders"] == 1
+
+
+def test_bed_loops_without_clicks(engine):
+    bed = engine._get_music_track("storytelling", 10.0)
+    samples, _ = _read(bed)
+
+    # A 220 Hz sine at 8 kHz moves at most ~1400 per sample; a hard seam jumps far more
+    max_step = max(abs(samples[i + 1] - samples[i]) for i in range(len(samples) - 1))
+    assert max_step < 1600
+
+
+def test_crossfade_loop_keeps_channels_interleaved():
+    stereo = array.array("h", [v for n in range(400) for v in (n, -n)])
+    unit = crossfade_loop(stereo, channels=2, crossfade_frames=50)
+    assert len(unit) == (400 - 50) * 2
+    assert all(unit[i] == -unit[i + 1] for i in range(0, len(unit), 2))
+
+
+def test_bed_cache_is_bounded_by_disk_size(tmp_path):
+    _write_track(tmp_path / "storytelling_background.wav")
+    bed_bytes = 5 * RATE * 2
+    engine = MusicEngine(tmp_path, bucket_seconds=5.0, max_cache_bytes=int(bed_bytes * 4.5))
+
+    beds = [engine._get_music_track("storytelling", seconds) for seconds in (5, 10, 15, 20)]
+
+    total = sum(f.stat().st_size for f in engine.bed_dir.glob("*.wav"))
+    assert total <= engine.max_cache_bytes
+    assert engine.stats["evictions"] > 0
+    assert beds[-1].exists()
+    assert not beds[0].exists()
+
+
+def test_changed_track_invalidates_its_beds(engine, tmp_path):
+    first = engine._get_music_track("storytelling", 5.0)
+    _write_track(tmp_path / "storytelling_background.wav", seconds=1.5, freq=330)
+    assert engine._get_music_track("storytelling", 5.0) != first
+
+
+def test_mixing_is_one_ffmpeg_graph_with_ducking(engine, tmp_path):
+    voice, bed, out = tmp_path / "voice.wav", tmp_path / "bed.wav", tmp_path / "out.wav"
+    with patch.object(music_engine, "FFMPEG_AVAILABLE", True), patch.object(music_engine.subprocess, "run") as run:
+        assert engine.combine_voice_and_music(voice, bed, out)
+
+    run.assert_called_once()
+    command = run.call_args.args[0]
+    graph = command[command.index("-filter_complex") + 1]
+    assert command[0] == "ffmpeg"
+    assert "sidechaincompress" in graph
+    assert f"volume={engine.music_volume}" in graph
+    assert "duration=first" in graph
+
+
+def test_mixing_without_ffmpeg_keeps_the_voice(engine, tmp_path):
+    voice = _write_track(tmp_path / "voice.wav", seconds=0.5)
+    out = tmp_path / "out.wav"
+    with patch.object(music_engine, "FFMPEG_AVAILABLE", False):
+        assert engine.combine_voice_and_music(voice, tmp_path / "bed.wav", out)
+    assert out.read_bytes() == voice.read_bytes()
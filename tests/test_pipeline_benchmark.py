@@ -0,0 +1,107 @@
+import asyncio
+import base64
+import importlib
+import io
+import wave
+from unittest.mock import MagicMock
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pipeline_benchmark
+from enhanced_model_router import GenerationRequest
+from pipeline_benchmark import StubCosts, StubRouter, compare, run_benchmarks, run_case, script_for
+
+FREE = StubCosts(llm_ms=0, image_ms=0, tts_ms=0, asr_ms=0)
+
+
+def route(router, **request):
+    return asyncio.run(router.route_generation(GenerationRequest(**request)))
+
+
+def decode(result):
+    return base64.b64decode(result.content_url.split(",", 1)[1])
+
+
+def test_stub_outputs_are_deterministic():
+    sentences = ["A solar pump in Turkana", "A robot in Kibera"]
+    first, second = StubRouter(sentences, FREE), StubRouter(sentences, FREE)
+    for request in ({"prompt": "sunrise", "type": "image", "preferences": {"width": 64, "height": 36}},
+                    {"prompt": "Habari ya asubuhi", "type": "audio"},
+                    {"prompt": "Break this story into scenes", "type": "text"}):
+        a, b = route(first, **request), route(second, **request)
+        assert (a.content_url, a.metadata) == (b.content_url, b.metadata)
+    assert route(first, prompt="sunset", type="image").content_url != route(first, prompt="sunrise", type="image").content_url
+
+
+def test_stub_assets_are_valid_media():
+    router = StubRouter(["One", "Two"], FREE)
+    png = decode(route(router, prompt="x", type="image", preferences={"width": 64, "height": 36}))
+    assert png.startswith(b"\x89PNG") and int.from_bytes(png[16:20], "big") == 64 and int.from_bytes(png[20:24], "big") == 36
+    with wave.open(io.BytesIO(decode(route(router, prompt="one two three", type="audio")))) as wf:
+        assert wf.getnframes() > 0
+
+
+def test_stub_script_reply_has_one_scene_per_sentence():
+    router = StubRouter(["First scene", "Second scene", "Third scene"], FREE)
+    text = route(router, prompt="Break this into scenes", type="text").metadata["generated_text"]
+    assert [line.split(":")[0] for line in text.splitlines()] == ["Scene 1", "Scene 2", "Scene 3"]
+    route(router, prompt="Transcribe the audio", type="text")
+    assert router.calls == {"llm": 1, "image": 0, "tts": 0, "asr": 1}
+
+
+def test_stub_costs_burn_cpu():
+    router = StubRouter(["One"], StubCosts(llm_ms=30, image_ms=0, tts_ms=0, asr_ms=0))
+    started = pipeline_benchmark.time.perf_counter()
+    route(router, prompt="Scenes please", type="text")
+    assert pipeline_benchmark.time.perf_counter() - started >= 0.03
+
+
+def test_script_for_is_fixed():
+    assert script_for(3) == script_for(3)
+    assert script_for(12).count(".") == 12 and script_for(14).count(".") == 14
+
+
+def test_run_case_records_failure_instead_of_raising(tmp_path, monkeypatch):
+    # Pipeline modules read relative paths at import time, so load them from the repo root first (as _enter_workdir does)
+    monkeypatch.chdir(pipeline_benchmark.REPO_ROOT)
+    for module in pipeline_benchmark.PIPELINE_MODULES["offline_video_maker"]:
+        importlib.import_module(module)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pipeline_benchmark, "_invoke", MagicMock(side_effect=SystemExit("ffmpeg missing")))
+    result = run_case("offline_video_maker", 2, FREE, workdir=tmp_path)
+    assert result["status"] == "error" and "ffmpeg missing" in result["error"]
+    assert result["subprocesses"] == 0 and result["output_bytes"] == 0
+
+
+def case(wall, status="ok", **overrides):
+    return {"status": status, "wall_s": wall, "stages_s": {"tts": wall / 2}, "peak_rss_mb": 100.0,
+            "subprocesses": 4, "output_bytes": 10_000, **overrides}
+
+
+def test_compare_flags_regressions_beyond_threshold_and_noise_floor():
+    baseline = {"cases": {"a": case(1.0), "b": case(1.0), "c": case(0.02), "d": case(1.0), "e": case(1.0)}}
+    current = {"cases": {"a": case(1.25), "b": case(1.05), "c": case(0.028), "d": case(1.0, status="error"),
+                         "e": case(1.0, subprocesses=6)}}
+    result = compare(baseline, current, threshold=0.10)
+    assert {(f.case, f.metric) for f in result.regressions} == {
+        ("a", "wall_s"), ("a", "stage:tts"), ("d", "status"), ("e", "subprocesses")}
+    assert not result.ok
+
+
+def test_compare_reports_improvements_and_missing_cases():
+    result = compare({"cases": {"a": case(2.0), "gone": case(1.0)}}, {"cases": {"a": case(1.0)}})
+    assert result.ok
+    assert {f.metric for f in result.improvements} == {"wall_s", "stage:tts"}
+    assert result.missing == ["gone"]
+
+
+def test_run_benchmarks_takes_medians():
+    walls = iter([3.0, 1.0, 2.0])
+    runner = lambda pipeline, scenes, costs, aspect_ratio, timeout, scenario: case(next(walls), subprocesses=scenes)
+    document = run_benchmarks(["offline_video_maker"], [5], repeats=3, costs=FREE, runner=runner)
+    result = document["cases"]["offline_video_maker/scenes=5"]
+    assert (result["wall_s"], result["stages_s"]["tts"], result["subprocesses"], result["repeats"]) == (2.0, 1.0, 5, 3)
+    assert document["version"] == pipeline_benchmark.BASELINE_VERSION
@@ -0,0 +1,145 @@
+import base64
+import json
+import subprocess
+import pytest
+from unittest.mock import MagicMock, patch
+from prometheus_client import REGISTRY, CollectorRegistry
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pipeline_orchestrator
+from enhanced_model_router import GenerationResult
+from offline_video_maker import generate_video as offline
+from pipeline_metrics import BufferedEventWriter, PipelineMetrics, benchmark_stage_overhead, pipeline_metrics
+from scene_asset_store import SceneAssetStore
+
+# Per-stage instrumentation budget (enter + exit with event emission). The shortest real stage is
+# a ~100 ms router call, so this keeps overhead under 0.1% of any stage.
+STAGE_OVERHEAD_BUDGET_US = 100
+
+
+@pytest.fixture(autouse=True)
+def events(tmp_path):
+    writer = BufferedEventWriter(tmp_path / "analytics.jsonl", flush_interval=3600)
+    with patch.object(pipeline_metrics, "event_writer", writer):
+        yield writer
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def stage_count(stage, backend, status="ok"):
+    return sample("pipeline_stage_duration_seconds_count", pipeline="offline_video_maker",
+                  stage=stage, backend=backend, status=status)
+
+
+class StubRouter:
+    async def route_generation(self, request):
+        if request.type == "audio":
+            return GenerationResult(True, content_url="data:audio/wav;base64," + base64.b64encode(b"a" * 400).decode())
+        if request.type == "image":
+            return GenerationResult(True, content_url="data:image/png;base64," + base64.b64encode(b"i" * 300).decode())
+        return GenerationResult(True, metadata={"generated_text":
+            "Scene 1: A girl in Turkana dreams of engines. Visual: desert sunrise\n"
+            "Scene 2: She builds a solar pump. Visual: village workshop"})
+
+
+def fake_ffmpeg(cmd, *args, **kwargs):
+    Path(cmd[-1]).write_bytes(b"v" * 1000)
+    return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+@pytest.fixture
+def maker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with patch.object(offline, "initialize_cache"), \
+            patch.object(offline, "scene_asset_store", SceneAssetStore(tmp_path / "assets", enabled=False)), \
+            patch.object(offline.subprocess, "run", side_effect=fake_ffmpeg), \
+            patch.dict(sys.modules, {"moviepy": None, "moviepy.editor": None}):
+        video_maker = offline.OfflineVideoMaker()
+        video_maker.enable_parallel = False
+        video_maker.enable_social = False
+        video_maker.video_effects = MagicMock()
+        yield video_maker
+
+
+def test_stubbed_run_records_every_stage(maker, events):
+    before = {
+        "script": stage_count("script_parsing", "router"),
+        "tts": stage_count("tts", "router"),
+        "image": stage_count("image_generation", "router"),
+        "render": stage_count("scene_render", "ffmpeg"),
+        "merge": stage_count("merge", "ffmpeg"),
+        "runs": sample("pipeline_run_duration_seconds_count", pipeline="offline_video_maker", status="ok"),
+        "tts_bytes": sample("pipeline_bytes_written_total", pipeline="offline_video_maker", stage="tts"),
+        "merge_bytes": sample("pipeline_bytes_written_total", pipeline="offline_video_maker", stage="merge"),
+    }
+
+    final_video = maker.generate_video("A Turkana engineer", aspect_ratio="landscape", enhanced_router=StubRouter(),
+                                       parallel_processor=MagicMock(), scene_processor=MagicMock())
+
+    assert final_video.exists()
+    assert stage_count("script_parsing", "router") - before["script"] == 1
+    assert stage_count("tts", "router") - before["tts"] == 2
+    assert stage_count("image_generation", "router") - before["image"] == 2
+    assert stage_count("scene_render", "ffmpeg") - before["render"] == 2
+    assert stage_count("merge", "ffmpeg") - before["merge"] == 1  # MoviePy unavailable: relabelled on fallback
+    assert sample("pipeline_run_duration_seconds_count", pipeline="offline_video_maker", status="ok") - before["runs"] == 1
+    assert sample("pipeline_bytes_written_total", pipeline="offline_video_maker", stage="tts") - before["tts_bytes"] == 800
+    assert sample("pipeline_bytes_written_total", pipeline="offline_video_maker", stage="merge") - before["merge_bytes"] == 1000
+    for stage in ("script_parsing", "tts", "image_generation", "scene_render", "merge"):
+        assert sample("pipeline_stage_in_flight", pipeline="offline_video_maker", stage=stage) == 0
+    assert sample("pipeline_runs_in_flight", pipeline="offline_video_maker") == 0
+    assert events.flush() == 11  # 10 stages (render and effects per scene) + the run
+
+
+def test_failed_stage_is_labelled_error(maker, tmp_path):
+    before = stage_count("export", "moviepy", status="error")
+    with pytest.raises(Exception):
+        maker.create_multiple_formats(tmp_path / "final.mp4")
+    assert stage_count("export", "moviepy", status="error") - before == 1
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_counts_nested_run_once():
+    def entrypoint(prompt, **kwargs):
+        with pipeline_metrics.run("offline_video_maker"):  # As OfflineVideoMaker.generate_video does
+            assert sample("pipeline_runs_in_flight", pipeline="offline_video_maker") == 1
+            return "video.mp4"
+
+    before = sample("pipeline_run_duration_seconds_count", pipeline="offline_video_maker", status="ok")
+    with patch.object(pipeline_orchestrator.PipelineOrchestrator, "get_pipeline", return_value=entrypoint):
+        result = await pipeline_orchestrator.PipelineOrchestrator().run_pipeline(
+            "general_prompt", "A story", user_preferences={"mode": "offline"})
+    assert result["status"] == "success"
+    assert sample("pipeline_run_duration_seconds_count", pipeline="offline_video_maker", status="ok") - before == 1
+
+
+def test_events_are_buffered_until_flush(tmp_path):
+    path = tmp_path / "events.jsonl"
+    writer = BufferedEventWriter(path, flush_interval=3600)
+    metrics = PipelineMetrics(registry=CollectorRegistry(), event_writer=writer)
+    for _ in range(3):
+        with metrics.stage("p", "tts", "local"):
+            pass
+
+    assert not path.exists()  # Nothing touched the disk on the render path
+    assert writer.flush() == 3
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [e["stage"] for e in events] == ["tts"] * 3
+    assert all(e["status"] == "ok" for e in events)
+
+
+def test_full_buffer_drops_instead_of_blocking(tmp_path):
+    writer = BufferedEventWriter(tmp_path / "events.jsonl", flush_interval=3600, max_buffer=2)
+    assert [writer.write({"n": i}) for i in range(4)] == [True, True, False, False]
+    assert writer.dropped == 2
+
+
+def test_stage_overhead_within_budget():
+    result = benchmark_stage_overhead(iterations=20_000)
+    assert result["with_events_us"] < STAGE_OVERHEAD_BUDGET_US
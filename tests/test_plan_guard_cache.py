@@ -0,0 +1,205 @@
+import asyncio
+import json
+import threading
+from dataclasses import asdict
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from billing import plan_guard as plan_guard_module
+from billing.plan_guard import PlanGuard, PlanGuardException
+from billing_models import get_default_plans, get_user_subscription
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSession:
+    def __init__(self, admins):
+        self.admins = admins
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def query(self, model):
+        return self
+
+    def filter(self, clause):
+        self.user_id = clause.right.value
+        return self
+
+    def first(self):
+        threading.Event().wait(0.02)  # Query latency
+        role = "admin" if self.user_id in self.admins else "user"
+        return type("FakeUser", (), {"role": role})()
+
+
+class CountingSessionFactory:
+    """Stands in for a SQLAlchemy session factory and counts sessions opened."""
+
+    def __init__(self, admins=()):
+        self.admins = set(admins)
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.opened += 1
+        return FakeSession(self.admins)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def db():
+    return CountingSessionFactory(admins={"root"})
+
+
+@pytest.fixture
+def counters():
+    return {"http": 0, "subscriptions": 0}
+
+
+@pytest.fixture
+def guard(clock, db, counters):
+    g = PlanGuard(db_session_factory=db, clock=clock, plans_ttl_seconds=300, entitlement_ttl_seconds=60)
+
+    async def fetch_plans():
+        counters["http"] += 1
+        await asyncio.sleep(0.02)
+        return get_default_plans()
+
+    def subscription(user_id):
+        counters["subscriptions"] += 1
+        return get_user_subscription(user_id)
+
+    with patch.object(g, "_fetch_plans_from_api", side_effect=fetch_plans), \
+            patch.object(plan_guard_module, "get_user_subscription", side_effect=subscription):
+        yield g
+
+
+@pytest.mark.asyncio
+async def test_burst_of_checks_does_one_lookup_per_user(guard, db, counters):
+    checks = []
+    for user in ("test_pro_user", "test_enterprise_user", "root"):
+        checks += [guard.check_model_access(user, "gpt-5.5") for _ in range(20)]
+        checks += [guard.check_tts_voice_access(user, "xtts-v2") for _ in range(10)]
+    results = await asyncio.gather(*checks, return_exceptions=True)
+
+    assert counters["http"] == 1
+    assert db.opened == 3
+    assert counters["subscriptions"] == 3
+    # Pro may not use gpt-5.5; the super admin and enterprise users may
+    denied = [r for r in results if isinstance(r, PlanGuardException)]
+    assert len(denied) == 20
+
+
+@pytest.mark.asyncio
+async def test_entitlements_expire_after_ttl(guard, clock, db):
+    await guard.check_download_permission("test_enterprise_user")
+    await guard.check_download_permission("test_enterprise_user")
+    assert db.opened == 1
+
+    clock.now += 61
+    await guard.check_download_permission("test_enterprise_user")
+    assert db.opened == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_forces_a_fresh_lookup(guard, db, counters):
+    await guard.get_user_plan("test_pro_user")
+    guard.invalidate_user("test_pro_user")
+    await guard.get_user_plan("test_pro_user")
+    assert counters["subscriptions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_lookup_is_not_overwritten(guard, counters):
+    lookup = asyncio.create_task(guard.get_entitlement("test_pro_user"))
+    await asyncio.sleep(0)
+    guard.invalidate_user("test_pro_user")
+    await lookup
+
+    await guard.get_entitlement("test_pro_user")
+    assert counters["subscriptions"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_catalogue_is_served_while_one_refresh_runs(guard, clock, counters):
+    first = await guard.get_plans()
+    clock.now += 301
+
+    stale = await asyncio.gather(*(guard.get_plans() for _ in range(25)))
+    assert all(plans is first for plans in stale)  # No caller waited on the refresh
+    assert counters["http"] == 2  # One background refresh for the whole burst
+
+    await guard._plans_refresh
+    assert await guard.get_plans() is not first
+    assert counters["http"] == 2
+
+
+@pytest.mark.asyncio
+async def test_unreachable_api_falls_back_without_retrying_every_check(clock):
+    guard = PlanGuard(backend_api_url="http://127.0.0.1:9", clock=clock, request_timeout_seconds=1)
+    plans = await guard.get_plans()
+    assert [p.name for p in plans] == [p.name for p in get_default_plans()]
+
+    with patch.object(guard, "_fetch_plans_from_api") as fetch:
+        await guard.get_plans()
+        fetch.assert_not_called()
+
+
+@pytest_asyncio.fixture
+async def plans_api():
+    served = {"count": 0}
+
+    async def handle(request):
+        served["count"] += 1
+        await asyncio.sleep(0.05)
+        catalogue = [asdict(p) for p in get_default_plans()]
+        catalogue[0]["price"] = 1
+        return web.json_response(catalogue, dumps=lambda d: json.dumps(d, default=str))
+
+    app = web.Application()
+    app.router.add_get("/api/plans", handle)
+    server = TestServer(app)
+    await server.start_server()
+    served["url"] = str(server.make_url("")).rstrip("/")
+    yield served
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_catalogue_fetch_is_async_and_coalesced(plans_api, clock):
+    guard = PlanGuard(backend_api_url=plans_api["url"], clock=clock)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    results = await asyncio.gather(ticker(), *(guard.get_plans() for _ in range(10)))
+
+    assert ticks == 5  # The event loop kept running during the HTTP call
+    assert plans_api["count"] == 1
+    assert all(plans[0].price == 1 for plans in results[1:])
@@ -0,0 +1,201 @@
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from unittest.mock import AsyncMock, patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from billing_models import get_default_plans, get_user_subscription
+from backend.middleware import policy_resolver
+from backend.middleware.policy_resolver import PolicyResolverMiddleware, benchmark_policy_middleware
+from backend.services import quota_service as quota_module
+from backend.services.quota_service import QuotaService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class UserFromHeader:
+    """Stands in for the auth layer that puts user_id on request.state."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = dict(scope["headers"])
+            if b"x-user" in headers:
+                scope.setdefault("state", {})["user_id"] = headers[b"x-user"].decode()
+        await self.app(scope, receive, send)
+
+
+async def plan_endpoint(request: Request):
+    return JSONResponse({"plan": request.state.user_plan.name})
+
+
+@pytest.fixture
+def counters():
+    return {"plans": 0, "subscriptions": 0}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest_asyncio.fixture
+async def resolver(counters, clock):
+    def plans():
+        counters["plans"] += 1
+        return get_default_plans()
+
+    def subscription(user_id):
+        counters["subscriptions"] += 1
+        return get_user_subscription(user_id)
+
+    app = Starlette(routes=[Route("/plan", plan_endpoint), Route("/generate_video", plan_endpoint, methods=["POST"]),
+                            Route("/health", lambda request: JSONResponse({"ok": True}))])
+    middleware = PolicyResolverMiddleware(app, ttl_seconds=60, max_entries=3, clock=clock)
+    with patch.object(policy_resolver, "get_default_plans", side_effect=plans), \
+            patch.object(policy_resolver, "get_user_subscription", side_effect=subscription):
+        async with AsyncClient(transport=ASGITransport(app=UserFromHeader(middleware)), base_url="http://test") as client:
+            client.middleware = middleware
+            yield client
+
+
+@pytest.mark.asyncio
+async def test_plan_is_resolved_once_per_user(resolver, counters):
+    for _ in range(5):
+        assert (await resolver.get("/plan", headers={"x-user": "test_pro_user"})).json() == {"plan": "Pro"}
+        assert (await resolver.get("/plan", headers={"x-user": "test_enterprise_user"})).json() == {"plan": "Enterprise"}
+    assert (await resolver.get("/plan")).json() == {"plan": "Starter"}  # The FREE tier
+
+    assert counters == {"plans": 1, "subscriptions": 2}
+    assert resolver.middleware.stats == {"hits": 8, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_policies_expire_and_can_be_invalidated(resolver, counters, clock):
+    await resolver.get("/plan", headers={"x-user": "test_pro_user"})
+    clock.now += 61
+    await resolver.get("/plan", headers={"x-user": "test_pro_user"})
+    assert counters["subscriptions"] == 2
+
+    resolver.middleware.invalidate_user("test_pro_user")
+    await resolver.get("/plan", headers={"x-user": "test_pro_user"})
+    assert counters["subscriptions"] == 3
+
+    resolver.middleware.invalidate()
+    await resolver.get("/plan", headers={"x-user": "test_pro_user"})
+    assert counters == {"plans": 2, "subscriptions": 4}
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_lru(resolver, counters):
+    for user in ("a", "b", "c", "a", "d"):
+        await resolver.get("/plan", headers={"x-user": user})
+    assert list(resolver.middleware._policies) == ["c", "a", "d"]
+    await resolver.get("/plan", headers={"x-user": "a"})
+    assert counters["subscriptions"] == 4
+
+
+@pytest.mark.asyncio
+async def test_exempt_paths_skip_resolution(resolver, counters):
+    assert (await resolver.get("/health", headers={"x-user": "test_pro_user"})).json() == {"ok": True}
+    assert counters == {"plans": 0, "subscriptions": 0}
+
+
+@pytest.mark.asyncio
+async def test_cost_cap_hard_stop_returns_403(resolver):
+    with patch.object(quota_module.quota_service, "get_monthly_cost", new=AsyncMock(return_value=10_000.0)):
+        response = await resolver.post("/generate_video", headers={"x-user": "test_enterprise_user"})
+    assert response.status_code == 403
+    assert "Monthly cost cap exceeded" in response.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_returns_429(resolver):
+    with patch.object(quota_module.quota_service, "get_monthly_cost", new=AsyncMock(return_value=0.0)), \
+            patch.object(quota_module.quota_service, "check_rate_limit", new=AsyncMock(return_value=False)):
+        response = await resolver.post("/generate_video", headers={"x-user": "test_pro_user"})
+    assert response.status_code == 429
+    assert "Too Many Requests" in response.json()["detail"]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return False
+        self.data[key] = str(value)
+        return True
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+    async def incrbyfloat(self, key, amount):
+        self.data[key] = str(float(self.data[key]) + amount)
+        return float(self.data[key])
+
+
+@pytest.mark.asyncio
+async def test_running_monthly_cost_is_seeded_once_then_incremented():
+    service = QuotaService()
+    service.redis_client = FakeRedis()
+    service.cost_cache_seconds = 0  # Always re-read the shared counter
+
+    with patch.object(quota_module, "_query_monthly_cost_in_session", return_value=12.5) as aggregate:
+        assert await service.get_monthly_cost("u1") == 12.5
+        await service.add_monthly_cost("u1", 2.5)
+        assert await service.get_monthly_cost("u1") == 15.0
+        assert aggregate.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_unseeded_counter_is_not_created_by_increments():
+    service = QuotaService()
+    service.redis_client = FakeRedis()
+
+    await service.add_monthly_cost("u1", 4.0)
+    assert service.redis_client.data == {}
+    with patch.object(quota_module, "_query_monthly_cost_in_session", return_value=4.0):
+        assert await service.get_monthly_cost("u1") == 4.0
+
+
+@pytest.mark.asyncio
+async def test_monthly_cost_is_served_locally_within_cache_window():
+    service = QuotaService()
+    service.redis_client = FakeRedis()
+    service.cost_cache_seconds = 60
+
+    with patch.object(quota_module, "_query_monthly_cost_in_session", return_value=1.0):
+        await service.get_monthly_cost("u1")
+        await service.add_monthly_cost("u1", 1.0)
+        assert await service.get_monthly_cost("u1") == 2.0
+    assert service.redis_client.gets == 1
+
+
+@pytest.mark.asyncio
+async def test_benchmark_reports_middleware_overhead():
+    result = await benchmark_policy_middleware(users=50, requests=500)
+    assert result["policy_cache_hit_rate"] == 0.9
+    assert 0 < result["middleware_share"] < 1
@@ -0,0 +1,164 @@
+import asyncio
+import base64
+import os
+import threading
+import pytest
+from unittest.mock import AsyncMock, patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from enhanced_model_router import GenerationResult
+from offline_video_maker import generate_video as offline
+from pipeline_metrics import pipeline_metrics
+from scene_asset_store import SceneAssetStore, asset_key, model_fingerprint
+
+
+BASE_INPUTS = {
+    "prompt": "Mount Kenya at sunrise",
+    "seed": 42,
+    "model": {"hf_api_id": "stabilityai/stable-diffusion-xl-base-1.0", "local_fallback_path": "", "checksum": ""},
+    "voice": "sw-KE-female",
+    "resolution": [1920, 1080],
+    "codec": ["-c:v", "libx264", "-pix_fmt", "yuv420p"],
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SceneAssetStore(tmp_path / "store", max_bytes=10_000)
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return path
+
+
+def test_key_is_stable_and_order_independent():
+    reordered = dict(reversed(list(BASE_INPUTS.items())))
+    assert asset_key("image", **BASE_INPUTS) == asset_key("image", **reordered)
+
+
+@pytest.mark.parametrize("field, value", [
+    ("prompt", "Mount Kenya at sunset"),
+    ("seed", 43),
+    ("seed", None),
+    ("model", {**BASE_INPUTS["model"], "hf_api_id": "stabilityai/sdxl-turbo"}),
+    ("model", {**BASE_INPUTS["model"], "checksum": "abc123"}),
+    ("voice", "sw-KE-male"),
+    ("resolution", [1080, 1920]),
+    ("codec", ["-c:v", "libx265", "-pix_fmt", "yuv420p"]),
+])
+def test_key_changes_with_each_input(field, value):
+    assert asset_key("image", **{**BASE_INPUTS, field: value}) != asset_key("image", **BASE_INPUTS)
+
+
+def test_key_depends_on_stage_kind():
+    assert asset_key("image", prompt="x") != asset_key("tts", prompt="x")
+
+
+def test_file_inputs_are_keyed_by_content_not_location(tmp_path):
+    a = write(tmp_path / "a.png", b"same pixels")
+    b = write(tmp_path / "b.png", b"same pixels")
+    assert asset_key("scene_render", image=a) == asset_key("scene_render", image=b)
+    write(b, b"other pixels")
+    assert asset_key("scene_render", image=a) != asset_key("scene_render", image=b)
+
+
+def test_model_fingerprint_reads_config_section():
+    fingerprint = model_fingerprint("image_generation")
+    assert fingerprint["hf_api_id"] == "stabilityai/stable-diffusion-xl-base-1.0"
+    assert model_fingerprint("no_such_section") == {"hf_api_id": "", "local_fallback_path": "", "checksum": ""}
+
+
+def test_put_then_fetch_roundtrip(store, tmp_path):
+    key = asset_key("tts", text="Habari")
+    assert not store.fetch(key, tmp_path / "miss.wav")
+    store.put(key, write(tmp_path / "voice.wav", b"RIFF audio"))
+    assert store.fetch(key, tmp_path / "hit.wav")
+    assert (tmp_path / "hit.wav").read_bytes() == b"RIFF audio"
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_fetched_copy_is_independent_of_store(store, tmp_path):
+    key = asset_key("scene_render", clip="1")
+    stored = store.put(key, write(tmp_path / "clip.mp4", b"original"))
+    store.fetch(key, tmp_path / "out.mp4")
+    write(tmp_path / "out.mp4", b"overwritten by ffmpeg -y")
+    assert stored.read_bytes() == b"original"
+
+
+def test_concurrent_writers_of_one_key_leave_one_complete_object(store, tmp_path):
+    key = asset_key("image", prompt="race")
+    payload = os.urandom(200_000)
+    store.max_bytes = 10 ** 9
+    sources = [write(tmp_path / f"src{i}.png", payload) for i in range(8)]
+    threads = [threading.Thread(target=store.put, args=(key, source)) for source in sources]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    objects = [p for p in (store.root / key[:2]).iterdir()]
+    assert [p.name for p in objects] == [f"{key}.png"]  # No temp files left behind
+    assert objects[0].read_bytes() == payload
+
+
+def test_gc_evicts_least_recently_used_first(store, tmp_path):
+    store.max_bytes = 12_500
+    keys = [asset_key("image", prompt=str(i)) for i in range(4)]
+    for i, key in enumerate(keys):
+        path = store.put(key, write(tmp_path / f"{i}.png", b"x" * 3000))
+        os.utime(path, (1000 + i, 1000 + i))
+    store.get(keys[0], ".png")  # Touch the oldest: it becomes most recently used
+
+    assert store.put(asset_key("image", prompt="new"), write(tmp_path / "new.png", b"x" * 3000))
+    remaining = {key for key in keys if store._path(key, ".png").exists()}
+    assert keys[1] not in remaining and keys[2] not in remaining
+    assert keys[0] in remaining
+    assert store.evictions == 2 and store.stats()["bytes"] <= store.max_bytes
+
+
+def test_gc_removes_stale_temp_files(store, tmp_path):
+    shard = store.root / "ab"
+    shard.mkdir(parents=True)
+    stale = write(shard / ".tmp-crashed", b"partial")
+    os.utime(stale, (0, 0))
+    fresh = write(shard / ".tmp-writing", b"partial")
+    store.gc()
+    assert not stale.exists() and fresh.exists()
+
+
+def test_disabled_store_never_hits(tmp_path):
+    store = SceneAssetStore(tmp_path / "store", enabled=False)
+    key = asset_key("tts", text="x")
+    assert store.put(key, write(tmp_path / "a.wav", b"a")) is None
+    assert not store.fetch(key, tmp_path / "b.wav")
+    assert not (tmp_path / "store").exists()
+
+
+def test_failed_put_does_not_raise(store, tmp_path):
+    assert store.put(asset_key("tts", text="x"), tmp_path / "missing.wav") is None
+    assert not any(p.name.startswith(".tmp-") for p in store.root.rglob("*"))
+
+
+def test_retry_skips_router_for_stored_scene_assets(store, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    image = "data:image/png;base64," + base64.b64encode(b"png bytes").decode()
+    router = AsyncMock()
+    router.route_generation.return_value = GenerationResult(True, content_url=image)
+    scene = {"id": "scene_1", "text": "Habari", "description": "Mount Kenya at sunrise"}
+    store.max_bytes = 10 ** 6
+
+    with patch.object(offline, "initialize_cache"), patch.object(offline, "scene_asset_store", store), \
+            patch.object(pipeline_metrics, "event_writer", None):
+        maker = offline.OfflineVideoMaker()
+        first = asyncio.run(maker.generate_image(scene, router))
+        first.unlink()
+        second = asyncio.run(maker.generate_image(scene, router))
+        asyncio.run(maker.generate_image({**scene, "seed": 7}, router))
+
+    assert second.read_bytes() == b"png bytes"
+    assert router.route_generation.await_count == 2  # First run and the new seed; the retry was served from the store
@@ -0,0 +1,120 @@
+import threading
+import pytest
+from datetime import datetime, timezone
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sla_tracker import SLARollupEngine, SLATracker, SLAAggregate
+
+AUG_1_2025 = datetime(2025, 8, 1, tzinfo=timezone.utc).timestamp()
+SEP_1_2025 = datetime(2025, 9, 1, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return SLARollupEngine(db_path=str(tmp_path / "sla.db"), ring_minutes=4)
+
+
+def test_monthly_report_counts_are_exact(engine):
+    for i in range(1000):
+        engine.record("tenant_1", latency_ms=80, success=(i % 100 != 0), timestamp=AUG_1_2025 + i)
+
+    report = engine.get_monthly_report("tenant_1", "2025-08")
+    assert report["total_requests"] == 1000
+    assert report["uptime_percentage"] == pytest.approx(99.0)
+    assert report["avg_response_time_ms"] == pytest.approx(80)
+    assert report["p95_response_time_ms"] == 100.0
+
+
+def test_ring_reuse_rolls_minutes_up_without_loss(engine):
+    # 10 distinct minutes through a 4-slot ring forces slot reuse
+    for minute in range(10):
+        engine.record("tenant_1", latency_ms=10, success=True, timestamp=AUG_1_2025 + minute * 60)
+
+    assert engine.get_aggregate("tenant_1", "month", "2025-08").count == 10
+    assert engine.get_aggregate("tenant_1", "hour", "2025-08-01T00").count == 10
+
+
+def test_tenants_and_months_are_isolated(engine):
+    engine.record("tenant_1", latency_ms=10, success=True, timestamp=AUG_1_2025)
+    engine.record("tenant_2", latency_ms=10, success=False, timestamp=AUG_1_2025)
+    engine.record("tenant_1", latency_ms=10, success=True, timestamp=SEP_1_2025)
+
+    assert engine.get_aggregate("tenant_1", "month", "2025-08").count == 1
+    assert engine.get_aggregate("tenant_2", "month", "2025-08").success == 0
+    assert engine.get_aggregate("tenant_1", "month", "2025-09").count == 1
+    assert engine.get_monthly_report("tenant_3", "2025-08") is None
+
+
+def test_flush_persists_and_merges_across_restarts(tmp_path):
+    db_path = str(tmp_path / "sla.db")
+    first = SLARollupEngine(db_path=db_path)
+    first.record("tenant_1", latency_ms=200, success=True, timestamp=AUG_1_2025)
+    first.flush()
+
+    second = SLARollupEngine(db_path=db_path)
+    second.record("tenant_1", latency_ms=400, success=False, timestamp=AUG_1_2025 + 3600)
+    second.flush()
+
+    aggregate = SLARollupEngine(db_path=db_path).get_aggregate("tenant_1", "month", "2025-08")
+    assert aggregate.count == 2
+    assert aggregate.success == 1
+    assert aggregate.latency_sum_ms == pytest.approx(600)
+    assert second.count_breached_hours("tenant_1", "2025-08") == 1
+
+
+def test_concurrent_flushes_from_separate_engines_lose_no_counts(tmp_path):
+    db_path = str(tmp_path / "sla.db")
+    SLARollupEngine(db_path=db_path)._connect().close()
+    engines = [SLARollupEngine(db_path=db_path) for _ in range(2)]
+    # Hold each flush between its read and its write until the other has read too (if it can)
+    both_read = threading.Barrier(len(engines), timeout=0.5)
+
+    def load_then_wait(*args):
+        stored = SLARollupEngine._load(*args)
+        try:
+            both_read.wait()
+        except threading.BrokenBarrierError:
+            pass
+        return stored
+
+    def record_and_flush(engine):
+        engine._load = load_then_wait
+        for i in range(50):
+            engine.record("tenant_1", latency_ms=100, success=True, timestamp=AUG_1_2025 + i)
+        engine.flush()
+
+    threads = [threading.Thread(target=record_and_flush, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(not engine._pending for engine in engines)
+    assert SLARollupEngine(db_path=db_path).get_aggregate("tenant_1", "hour", "2025-08-01T00").count == 100
+
+
+def test_sketch_quantiles():
+    aggregate = SLAAggregate()
+    assert aggregate.quantile_ms(0.99) == 0.0
+    aggregate.count = 100
+    aggregate.histogram[0] = 90  # <= 25ms
+    aggregate.histogram[4] = 10  # <= 500ms
+    assert aggregate.quantile_ms(0.5) == 25.0
+    assert aggregate.quantile_ms(0.95) == 500.0
+
+
+@pytest.mark.asyncio
+async def test_track_sla_uses_tenant_rollups(engine):
+    tracker = SLATracker(router=None, rollup_engine=engine)
+    for i in range(10):
+        tracker.record_outcome("tenant_1", latency_ms=100, success=True, timestamp=AUG_1_2025 + i)
+
+    await tracker.track_sla("tenant_1", month="2025-08")
+    record = tracker.get_sla_record("tenant_1", "2025-08")
+    assert record.uptime_percentage == 100.0
+    assert record.response_time_slo_met is True
+    assert record.credits_due == 0.0
@@ -0,0 +1,97 @@
+import array
+import math
+import random
+import wave
+import pytest
+from unittest.mock import patch
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from offline_video_maker.helpers.subtitle_engine import SubtitleEngine
+from offline_video_maker.voice_engine import write_sentence_timings
+
+RATE = 16000
+SCRIPT = "Habari za asubuhi. Leo tunazungumza kuhusu teknolojia, hapa Nairobi. Asante."
+
+def _write_audio(path, layout):
+    """layout: list of ("tone"|"silence", seconds); low noise throughout."""
+    rng = random.Random(7)
+    samples = array.array("h")
+    for kind, seconds in layout:
+        for n in range(int(seconds * RATE)):
+            tone = 8000 * math.sin(2 * math.pi * 220 * n / RATE) if kind == "tone" else 0
+            samples.append(int(tone) + rng.randint(-30, 30))
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+@pytest.fixture
+def engine():
+    return SubtitleEngine()
+
+@pytest.fixture
+def narration(tmp_path):
+    # Sentence boundaries at 0.2-1.2, 1.5-4.1 (with a comma pause at 2.5-2.65), 4.4-4.9
+    return _write_audio(tmp_path / "narration.wav", [
+        ("silence", 0.2), ("tone", 1.0), ("silence", 0.3),
+        ("tone", 1.0), ("silence", 0.15), ("tone", 1.45), ("silence", 0.3),
+        ("tone", 0.5), ("silence", 0.2),
+    ])
+
+def test_energy_alignment_snaps_to_sentence_pauses(engine, narration):
+    segments = engine.align_script(narration, SCRIPT)
+
+    assert [s["text"] for s in segments] == ["Habari za asubuhi.", "Leo tunazungumza kuhusu teknolojia, hapa Nairobi.", "Asante."]
+    expected = [(0.2, 1.2), (1.5, 4.1), (4.4, 4.9)]
+    for segment, (start, end) in zip(segments, expected):
+        assert segment["start"] == pytest.approx(start, abs=0.03)
+        assert segment["end"] == pytest.approx(end, abs=0.03)
+
+def test_recorded_tts_durations_are_used_exactly(engine, tmp_path):
+    audio = _write_audio(tmp_path / "voice.wav", [("tone", 0.8), ("tone", 1.7), ("tone", 0.6)])
+    segments = engine.align_script(audio, SCRIPT, sentence_durations=[0.8, 1.7, 0.6])
+    assert [(s["start"], s["end"]) for s in segments] == [(0.0, 0.8), (0.8, 2.5), (2.5, 3.1)]
+
+def test_voice_engine_timings_sidecar_is_picked_up(engine, tmp_path):
+    parts = [_write_audio(tmp_path / f"s{i}.wav", [("tone", d)]) for i, d in enumerate([0.8, 1.7, 0.6])]
+    audio = _write_audio(tmp_path / "voice_scene.wav", [("tone", 3.1)])
+    write_sentence_timings(Path(audio), ["Habari za asubuhi.", "Leo tunazungumza kuhusu teknolojia, hapa Nairobi.", "Asante."], [Path(p) for p in parts])
+
+    segments = engine.align_script(audio)
+    assert [s["end"] for s in segments] == [0.8, 2.5, 3.1]
+
+def test_long_sentences_are_split_into_readable_cues(engine, narration):
+    engine.aligner.max_chars_per_cue = 30
+    segments = engine.align_script(narration, SCRIPT)
+    assert all(len(s["text"]) <= 30 for s in segments)
+    assert segments[1]["start"] == pytest.approx(1.5, abs=0.03)
+    assert segments[-2]["end"] == pytest.approx(4.1, abs=0.03)
+
+def test_srt_uses_alignment_and_skips_asr(engine, narration, tmp_path):
+    srt = tmp_path / "out.srt"
+    with patch.object(engine, "transcribe_audio") as transcribe:
+        assert engine.generate_subtitles_from_audio(narration, str(srt), script_text=SCRIPT)
+    transcribe.assert_not_called()
+    assert "00:00:01,500 --> 00:00:04,100" in srt.read_text()
+
+def test_falls_back_to_asr_when_alignment_is_impossible(engine, tmp_path):
+    silent = _write_audio(tmp_path / "silent.wav", [("silence", 1.0)])
+    srt = tmp_path / "out.srt"
+    asr_segments = [{"start": 0.0, "end": 1.0, "text": "habari"}]
+    with patch.object(engine, "transcribe_audio", return_value=asr_segments) as transcribe:
+        assert engine.generate_subtitles_from_audio(silent, str(srt), script_text=SCRIPT)
+    transcribe.assert_called_once_with(silent)
+    assert "Habari." in srt.read_text()
+
+def test_vtt_output(engine, narration, tmp_path):
+    vtt = tmp_path / "out.vtt"
+    assert engine.generate_vtt(engine.align_script(narration, SCRIPT), str(vtt))
+    content = vtt.read_text()
+    assert content.startswith("WEBVTT")
+    assert "teknolojia, hapa Nairobi." in content
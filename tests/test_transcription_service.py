@@ -0,0 +1,223 @@
+import array
+import math
+import threading
+import wave
+import pytest
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from offline_video_maker.helpers.transcription_service import AudioChunk, TranscriptionService, WhisperTranscriber, WHISPER_SAMPLE_RATE
+from offline_video_maker.helpers.subtitle_engine import SubtitleEngine
+
+RATE = WHISPER_SAMPLE_RATE
+
+
+class StubTranscriber:
+    """Records batch sizes; returns one segment per chunk spanning the chunk."""
+
+    def __init__(self, delay=0.0):
+        self.batch_sizes = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def is_available(self):
+        return True
+
+    def cache_identity(self):
+        return {"model": "stub", "language": "en", "task": "transcribe"}
+
+    def transcribe_batch(self, chunks):
+        with self.lock:
+            self.batch_sizes.append(len(chunks))
+        if self.delay:
+            threading.Event().wait(self.delay)
+        return [[{"start": 0.0, "end": len(c.samples) / RATE, "text": f"{c.language or 'en'} chunk@{c.offset:.2f}"}] for c in chunks]
+
+
+def _write_audio(path, layout, freq=220):
+    """layout: list of ("tone"|"silence", seconds)."""
+    samples = array.array("h")
+    for kind, seconds in layout:
+        for n in range(int(seconds * RATE)):
+            samples.append(int(8000 * math.sin(2 * math.pi * freq * n / RATE)) if kind == "tone" else 0)
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def stub():
+    return StubTranscriber(delay=0.05)
+
+
+@pytest.fixture
+def service(stub, tmp_path):
+    return TranscriptionService(stub, max_batch_size=8, max_wait_ms=100, max_chunk_seconds=3.0, cache_dir=str(tmp_path / "cache"))
+
+
+def test_long_audio_is_chunked_at_pauses_and_stitched(service, stub, tmp_path):
+    audio = _write_audio(tmp_path / "long.wav", [
+        ("silence", 0.5), ("tone", 2.0), ("silence", 0.5), ("tone", 2.0), ("silence", 0.5), ("tone", 1.0),
+    ])
+
+    segments = service.transcribe(audio)
+
+    # Speech spans 0.5-6.5; chunks of <= 3s must cut at the pauses, not mid-speech
+    starts = [s["start"] for s in segments]
+    assert starts == pytest.approx([0.5, 3.0, 5.5], abs=0.02)
+    assert [s["end"] for s in segments] == pytest.approx([2.5, 5.0, 6.5], abs=0.02)
+    assert sum(stub.batch_sizes) == 3
+
+
+def test_audio_without_pauses_gets_hard_cuts(service, tmp_path):
+    audio = _write_audio(tmp_path / "monologue.wav", [("tone", 7.0)])
+    segments = service.transcribe(audio)
+    assert all(s["end"] - s["start"] <= 3.0 + 1e-6 for s in segments)
+    assert segments[-1]["end"] == pytest.approx(7.0, abs=0.02)
+
+
+def test_concurrent_requests_share_batches(service, stub, tmp_path):
+    files = [_write_audio(tmp_path / f"clip{i}.wav", [("tone", 1.0)], freq=200 + 20 * i) for i in range(6)]
+    results = {}
+
+    def run(path):
+        results[path] = service.transcribe(path)
+
+    threads = [threading.Thread(target=run, args=(f,)) for f in files]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 6 and all(len(r) == 1 for r in results.values())
+    assert max(stub.batch_sizes) > 1
+    assert len(stub.batch_sizes) < 6
+
+
+def test_identical_content_is_served_from_cache(service, stub, tmp_path):
+    first = _write_audio(tmp_path / "a.wav", [("tone", 1.0)])
+    copy = tmp_path / "b.wav"
+    copy.write_bytes(Path(first).read_bytes())
+
+    assert service.transcribe(first) == service.transcribe(str(copy))
+    assert sum(stub.batch_sizes) == 1
+    assert service.stats["cache_hits"] == 1
+
+    # A fresh service finds the result on disk
+    fresh_stub = StubTranscriber()
+    fresh = TranscriptionService(fresh_stub, cache_dir=service.cache_dir)
+    assert fresh.transcribe(first) == service.transcribe(first)
+    assert fresh_stub.batch_sizes == []
+
+
+def test_concurrent_identical_requests_transcribe_once(service, stub, tmp_path):
+    audio = _write_audio(tmp_path / "same.wav", [("tone", 1.0)])
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.transcribe(audio))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(results) == 4 and all(r == results[0] for r in results)
+    assert sum(stub.batch_sizes) == 1
+
+
+def test_silence_yields_no_segments(service, stub, tmp_path):
+    audio = _write_audio(tmp_path / "silence.wav", [("silence", 2.0)])
+    assert service.transcribe(audio) == []
+    assert stub.batch_sizes == []
+
+
+def test_subtitle_engines_share_the_service(service, stub, tmp_path):
+    audio = _write_audio(tmp_path / "narration.wav", [("tone", 1.0)])
+    engines = [SubtitleEngine(transcription_service=service) for _ in range(2)]
+
+    assert engines[0].transcribe_audio(audio) == engines[1].transcribe_audio(audio)
+    assert engines[0].is_available()
+    assert sum(stub.batch_sizes) == 1
+
+
+def test_cache_key_includes_language_and_model(service, stub, tmp_path):
+    audio = _write_audio(tmp_path / "habari.wav", [("tone", 1.0)])
+
+    english = service.transcribe(audio)
+    swahili = service.transcribe(audio, language="sw")
+    assert english != swahili and swahili[0]["text"].startswith("sw ")
+    assert service.transcribe(audio, language="en") == english
+    assert sum(stub.batch_sizes) == 2
+
+    # Same file, other model: the disk cache must not serve the stub's transcript
+    other_stub = StubTranscriber()
+    other_stub.cache_identity = lambda: {"model": "whisper-large", "language": "en", "task": "transcribe"}
+    TranscriptionService(other_stub, cache_dir=service.cache_dir).transcribe(audio)
+    assert other_stub.batch_sizes == [1]
+
+
+def test_memory_cache_is_bounded_lru(stub, tmp_path):
+    service = TranscriptionService(stub, max_wait_ms=1, cache_dir=None, max_cached_results=2)
+    files = [_write_audio(tmp_path / f"clip{i}.wav", [("tone", 1.0)], freq=200 + 20 * i) for i in range(3)]
+    service.transcribe(files[0])
+    service.transcribe(files[1])
+    service.transcribe(files[0])  # Most recently used
+    service.transcribe(files[2])  # Evicts files[1]
+
+    assert len(service._results) == 2
+    service.transcribe(files[0])
+    assert sum(stub.batch_sizes) == 3
+    service.transcribe(files[1])
+    assert sum(stub.batch_sizes) == 4
+
+
+def test_short_batch_result_fails_every_caller(tmp_path):
+    class ShortTranscriber(StubTranscriber):
+        def transcribe_batch(self, chunks):
+            return super().transcribe_batch(chunks)[:-1]
+
+    service = TranscriptionService(ShortTranscriber(), max_wait_ms=50, max_chunk_seconds=3.0, cache_dir=None)
+    audio = _write_audio(tmp_path / "two_chunks.wav", [("tone", 2.0), ("silence", 0.5), ("tone", 2.0)])
+    errors = []
+    thread = threading.Thread(target=lambda: errors.append(pytest.raises(RuntimeError, service.transcribe, audio)))
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive(), "caller hung on an unresolved chunk"
+    assert "returned 1 results" in str(errors[0].value)
+
+
+class FakeSegment:
+    def __init__(self, start, end, text):
+        self.start, self.end, self.text = start, end, text
+
+
+class FakeBatchedPipeline:
+    """Emits one segment per clip, in concatenated time, and records each call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append({"samples": len(audio), **options})
+        clips = options["clip_timestamps"]
+        return iter([FakeSegment(c["start"] + 0.1, c["end"], f" {options['language']} clip {i}") for i, c in enumerate(clips)]), None
+
+
+def test_whisper_transcriber_runs_each_language_group_as_one_batched_call():
+    transcriber = WhisperTranscriber(language="en")
+    pipeline = FakeBatchedPipeline()
+    transcriber._backend, transcriber._batched = "faster_whisper", pipeline
+    second = array.array("h", [0] * RATE)
+    chunks = [AudioChunk(second, 0.0), AudioChunk(second * 2, 1.0, language="sw"), AudioChunk(second * 3, 3.0)]
+
+    results = transcriber.transcribe_batch(chunks)
+
+    assert sorted((c["language"], c["batch_size"], c["samples"]) for c in pipeline.calls) == [("en", 2, 4 * RATE), ("sw", 1, 2 * RATE)]
+    assert [r[0]["text"] for r in results] == ["en clip 0", "sw clip 0", "en clip 1"]
+    # Timestamps are mapped back to each chunk's own timeline
+    assert results[2][0]["start"] == pytest.approx(0.1) and results[2][0]["end"] == pytest.approx(3.0)
@@ -0,0 +1,145 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import Base
+from auth.user_models import AuditLog, UsageEvent, DailyUsageRollup
+from security.audit_log_manager import audit_log_manager, AuditEventType
+from backend.services.usage_analytics import UsageAnalytics
+
+@pytest.fixture
+def db_session():
+    test_engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=test_engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def test_record_maintains_daily_rollup(db_session):
+    analytics = UsageAnalytics()
+    day_one = datetime.utcnow() - timedelta(days=1)
+    for _ in range(3):
+        analytics.record(db_session, "/generate_video", AuditEventType.API_ACCESS, timestamp=day_one)
+    analytics.record(db_session, "/generate_tts", AuditEventType.API_ACCESS, timestamp=day_one)
+    analytics.record(db_session, "/generate_video", AuditEventType.API_ACCESS)
+    db_session.commit()
+
+    assert db_session.query(UsageEvent).count() == 5
+    rollups = {(r.day, r.endpoint): r.count for r in db_session.query(DailyUsageRollup).all()}
+    assert rollups[(day_one.date(), "/generate_video")] == 3
+    assert rollups[(day_one.date(), "/generate_tts")] == 1
+    assert rollups[(datetime.utcnow().date(), "/generate_video")] == 1
+
+def test_dashboard_usage_reads_rollups(db_session):
+    analytics = UsageAnalytics()
+    analytics.record(db_session, "/generate_video", AuditEventType.API_ACCESS, timestamp=datetime.utcnow() - timedelta(days=20))
+    analytics.record(db_session, "/generate_video", AuditEventType.API_ACCESS)
+    analytics.record(db_session, "/generate_tts", AuditEventType.API_ACCESS)
+    db_session.commit()
+
+    usage = analytics.get_dashboard_usage(db_session, "7d")
+    assert usage["overview"]["total_videos"] == 2
+    assert usage["overview"]["total_images"] == 10
+    assert usage["overview"]["total_audio"] == 1
+    assert usage["usage_trends"] == [
+        {"date": datetime.utcnow().date().isoformat(), "videos": 1, "images": 5, "audio": 1}
+    ]
+    assert len(analytics.get_dashboard_usage(db_session, "30d")["usage_trends"]) == 2
+
+def test_dashboard_usage_is_cached_per_time_range(db_session):
+    analytics = UsageAnalytics(cache_ttl_seconds=60)
+    first = analytics.get_dashboard_usage(db_session, "7d")
+    analytics.record(db_session, "/generate_video", AuditEventType.API_ACCESS)
+    db_session.commit()
+
+    assert analytics.get_dashboard_usage(db_session, "7d") is first
+    assert analytics.get_dashboard_usage(db_session, "30d")["overview"]["total_videos"] == 1
+    analytics.invalidate()
+    assert analytics.get_dashboard_usage(db_session, "7d")["overview"]["total_videos"] == 1
+
+def test_audit_log_writes_usage_event_alongside(db_session):
+    audit_log_manager.log_event(db_session, AuditEventType.API_ACCESS, "User 1 accessing /generate_video.", user_id=1, event_details={"endpoint": "/generate_video"})
+    audit_log_manager.log_event(db_session, AuditEventType.USER_LOGIN_SUCCESS, "User logged in")
+
+    assert db_session.query(AuditLog).count() == 2
+    event = db_session.query(UsageEvent).one()
+    assert event.endpoint == "/generate_video"
+    assert event.event_type == AuditEventType.API_ACCESS
+    assert db_session.query(DailyUsageRollup).one().count == 1
+
+def test_rollup_upsert_counts_events_from_separate_sessions(tmp_path):
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    Base.metadata.create_all(bind=test_engine)
+    SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    analytics = UsageAnalytics()
+    first, second = SessionFactory(), SessionFactory()
+    try:
+        analytics.record(first, "/generate_video", AuditEventType.API_ACCESS)
+        first.commit()
+        analytics.record(second, "/generate_video", AuditEventType.API_ACCESS)
+        second.commit()
+        assert first.query(DailyUsageRollup).one().count == 2
+    finally:
+        first.close()
+        second.close()
+
+def test_savepoint_fallback_survives_a_lost_insert_race(db_session):
+    analytics = UsageAnalytics()
+    real_begin_nested = db_session.begin_nested
+
+    def racing_begin_nested():
+        # Another writer inserts the (day, endpoint) row between our UPDATE and INSERT
+        db_session.execute(DailyUsageRollup.__table__.insert().values(day=datetime.utcnow().date(), endpoint="/generate_video", count=1))
+        return real_begin_nested()
+
+    with patch("backend.services.usage_analytics._UPSERT_DIALECTS", {}), \
+         patch.object(db_session, "begin_nested", side_effect=racing_begin_nested):
+        analytics.record(db_session, "/generate_video", AuditEventType.API_ACCESS)
+    db_session.commit()
+
+    assert db_session.query(UsageEvent).count() == 1
+    assert db_session.query(DailyUsageRollup).one().count == 2
+
+def test_audit_entry_is_kept_when_usage_analytics_fails(db_session):
+    with patch("security.audit_log_manager.usage_analytics.record", side_effect=RuntimeError("rollup failed")):
+        audit_log_manager.log_event(db_session, AuditEventType.API_ACCESS, "User 1 accessing /generate_video.", user_id=1, event_details={"endpoint": "/generate_video"})
+
+    assert db_session.query(AuditLog).count() == 1
+    assert db_session.query(UsageEvent).count() == 0
+    audit_log_manager.log_event(db_session, AuditEventType.API_ACCESS, "Session is still usable", event_details={"endpoint": "/generate_video"})
+    assert db_session.query(DailyUsageRollup).one().count == 1
+
+def test_usage_endpoint_is_derived_from_request(db_session):
+    request = MagicMock()
+    request.url.path = "/login"
+    audit_log_manager.log_event(db_session, AuditEventType.USER_LOGIN_SUCCESS, "User logged in", user_id=1, request=request)
+
+    assert db_session.query(UsageEvent).one().endpoint == "/login"
+
+def test_backfill_rolls_up_audit_history_once(db_session):
+    three_days_ago = datetime.utcnow() - timedelta(days=3)
+    for i, message in enumerate(["User 1 accessing /generate_video.", "User 2 accessing /generate_video.", "User 1 accessing /generate_tts.", "Batch request for /batch_generate_video"]):
+        entry = AuditLog(timestamp=three_days_ago, event_type=AuditEventType.API_ACCESS, message=message)
+        entry.set_hash(str(i))
+        db_session.add(entry)
+    db_session.commit()
+    audit_log_manager.log_event(db_session, AuditEventType.API_ACCESS, "User 1 accessing /generate_video.", user_id=1, event_details={"endpoint": "/generate_video"})
+
+    analytics = UsageAnalytics()
+    assert analytics.backfill_from_audit_logs(db_session) == 2
+    analytics.backfill_from_audit_logs(db_session)
+
+    usage = analytics.get_dashboard_usage(db_session, "7d")
+    assert usage["overview"]["total_videos"] == 3
+    assert usage["overview"]["total_audio"] == 1
+    assert usage["usage_trends"][0] == {"date": three_days_ago.date().isoformat(), "videos": 2, "images": 10, "audio": 1}
@@ -0,0 +1,126 @@
+import asyncio
+import time
+import wave
+import pytest
+
+# Adjust path for imports
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from offline_video_maker import voice_engine as voice_module
+from offline_video_maker.voice_engine import VoiceEngine, SAMPLE_RATE, split_sentences
+
+SECONDS_PER_CHAR = 0.002
+FRAMES_PER_CHAR = 100
+
+class FakeEngine:
+    """Sleeps proportionally to text length and writes FRAMES_PER_CHAR frames per character."""
+    def __init__(self):
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, text, voice, output_file):
+        self.calls.append(text)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(SECONDS_PER_CHAR * len(text))
+        self.active -= 1
+        with wave.open(str(output_file), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(b"\x01\x00" * FRAMES_PER_CHAR * len(text))
+
+@pytest.fixture
+def fake_engine():
+    return FakeEngine()
+
+@pytest.fixture
+def voice_engine(tmp_path, fake_engine):
+    engine = VoiceEngine(tmp_path / "out", cache_dir=tmp_path / "cache", max_parallel_sentences=3)
+    engine.engines = {"fake": True}
+    engine.kenyan_voices["fake"] = ["sw-KE"]
+    engine.synthesizers["fake"] = fake_engine
+    return engine
+
+INTRO = "Karibu to Shujaa Studio news."
+OUTRO = "Thanks for watching, see you tomorrow!"
+
+def _frames(path):
+    with wave.open(str(path), "rb") as wav:
+        return wav.getnframes()
+
+def test_split_sentences_normalizes_whitespace():
+    assert split_sentences("  Habari   yako?  Nzuri sana.\nAsante!") == ["Habari yako?", "Nzuri sana.", "Asante!"]
+
+@pytest.mark.asyncio
+async def test_sentences_are_joined_sample_accurately(voice_engine):
+    text = f"{INTRO} Grace from Kibera studies computer science. {OUTRO}"
+    output = await voice_engine.generate_voice_async(text, "scene_1")
+
+    expected_chars = sum(len(s) for s in split_sentences(text))
+    assert output.name == "voice_scene_1.wav"
+    assert _frames(output) == expected_chars * FRAMES_PER_CHAR
+
+@pytest.mark.asyncio
+async def test_repeated_phrases_hit_the_cache_across_videos(voice_engine, fake_engine):
+    first = time.perf_counter()
+    await voice_engine.generate_voice_async(f"{INTRO} Rains return to Nairobi this week. {OUTRO}", "video_1")
+    first = time.perf_counter() - first
+
+    second = time.perf_counter()
+    await voice_engine.generate_voice_async(f"{INTRO} Matatu fares drop in Mombasa. {OUTRO}", "video_2")
+    second = time.perf_counter() - second
+
+    assert fake_engine.calls.count(INTRO) == 1
+    assert fake_engine.calls.count(OUTRO) == 1
+    stats = voice_engine.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["synthesized"]) == (2, 4, 4)
+    assert stats["hit_rate"] == pytest.approx(2 / 6)
+    # Only the new middle sentence is synthesized the second time
+    assert second < first
+
+@pytest.mark.asyncio
+async def test_synthesis_is_parallel_but_bounded(voice_engine, fake_engine):
+    text = " ".join(f"Sentence number {i} is here." for i in range(8))
+    started = time.perf_counter()
+    await voice_engine.generate_voice_async(text, "long")
+    elapsed = time.perf_counter() - started
+
+    serial = sum(SECONDS_PER_CHAR * len(s) for s in split_sentences(text))
+    assert fake_engine.max_active == 3
+    assert elapsed < serial * 0.6
+
+@pytest.mark.asyncio
+async def test_falls_back_to_next_engine(voice_engine, fake_engine):
+    async def broken(text, voice, output_file):
+        raise RuntimeError("service unavailable")
+    voice_engine.engines = {"broken": True, "fake": True}
+    voice_engine.synthesizers["broken"] = broken
+
+    output = await voice_engine.generate_voice_async(INTRO, "fallback")
+    assert output is not None
+    assert fake_engine.calls == [INTRO]
+
+@pytest.mark.asyncio
+async def test_sentence_cache_is_size_bounded(voice_engine, fake_engine):
+    voice_engine.sentence_cache.max_bytes = 12 * FRAMES_PER_CHAR * 2 * len(INTRO)  # Room for about ten sentences
+    for i in range(30):
+        await voice_engine.generate_voice_async(f"{INTRO} Story number {i} from Kisumu.", f"scene_{i}")
+
+    stats = voice_engine.get_cache_stats()
+    assert stats["evictions"] > 0
+    stored = sum(p.stat().st_size for p in voice_engine.sentence_cache.cache_dir.rglob("*.wav"))
+    assert stored <= voice_engine.sentence_cache.max_bytes
+    # The intro is used by every scene, so it is never the least recently used sentence
+    assert voice_engine.sentence_cache.get("fake", "sw-KE", INTRO) is not None
+    assert fake_engine.calls.count(INTRO) == 1
+
+def test_default_cache_dir_is_anchored_to_the_project_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("SHUJAA_TTS_CACHE_DIR", raising=False)
+    assert voice_module.default_tts_cache_dir() == voice_module.PROJECT_ROOT / "asset_cache" / "tts_sentences"
+    monkeypatch.setenv("SHUJAA_TTS_CACHE_DIR", "elsewhere")
+    assert voice_module.default_tts_cache_dir() == voice_module.PROJECT_ROOT / "elsewhere"